@@ -5,14 +5,18 @@ AI Resources Database - Gradio版本
 import gradio as gr
 import os
 import sys
+import threading
 from pathlib import Path
 
 # 添加当前目录到Python路径
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
-from components import create_dataset_tab, create_models_tab
+from components import create_dataset_tab, create_models_tab, create_stats_tab
+from config import APP_CONFIG
 from database import db_manager
+from grid import GRID_HEAD
+from query_control import cancel_session_queries
 from utils import setup_logging, check_database_health, get_system_info
 
 # 创建必要的目录
@@ -93,13 +97,22 @@ def create_app():
     .toggle-button {
         margin-bottom: 15px !important;
     }
+    
+    .grid-message {
+        padding: 20px;
+        color: #6c757d;
+        text-align: center;
+    }
     """
     
     # 创建Gradio界面
     with gr.Blocks(
         title="AI Resources Database",
         theme=gr.themes.Soft(),
-        css=custom_css
+        css=custom_css,
+        # 虚拟滚动表格的自定义元素脚本
+        head=GRID_HEAD,
+        analytics_enabled=False
     ) as app:
         
         # 应用标题和描述
@@ -115,6 +128,7 @@ def create_app():
         with gr.Tabs():
             dataset_tab = create_dataset_tab()
             models_tab = create_models_tab()
+            stats_tab = create_stats_tab()
         
         # 页脚信息
         gr.Markdown("""
@@ -127,6 +141,9 @@ def create_app():
             <p><small>💡 提示: 使用筛选器可以快速定位所需数据，支持多条件组合筛选</small></p>
         </div>
         """)
+        
+        # 关闭或刷新标签页时终止该会话仍在执行的查询
+        app.unload(cancel_session_queries)
     
     return app
 
@@ -148,6 +165,17 @@ def test_database_connection():
         logger.error(f"数据库连接测试失败: {e}")
         return False
 
+def report_database_connection():
+    """测试数据库连接并在失败时给出离线提示"""
+    if not test_database_connection():
+        if db_manager.serving_snapshot:
+            taken_at = db_manager.snapshot.status()["taken_at"]
+            print(f"⚠️  数据库连接失败，应用将以只读快照模式启动（快照时间 {taken_at}）")
+            logger.warning(f"数据库连接失败，应用将以只读快照模式启动（快照时间 {taken_at}）")
+        else:
+            print("⚠️  数据库连接失败，但应用仍将启动（没有可用的数据快照，可能显示空数据）")
+            logger.warning("数据库连接失败，应用将以离线模式启动")
+
 def main():
     """主函数"""
     print("🚀 启动 AI Resources Database (Gradio版本)")
@@ -155,32 +183,30 @@ def main():
     
     logger.info("应用启动开始")
     
-    # 测试数据库连接
-    if not test_database_connection():
-        print("⚠️  数据库连接失败，但应用仍将启动（可能显示空数据）")
-        logger.warning("数据库连接失败，应用将以离线模式启动")
+    # 测试数据库连接（默认在后台线程中进行，不阻塞服务启动）
+    db_check_mode = APP_CONFIG["startup_db_check"]
+    if db_check_mode == "blocking":
+        report_database_connection()
+    elif db_check_mode == "background":
+        threading.Thread(target=report_database_connection, name="startup-db-check", daemon=True).start()
     
-    # 创建并启动应用
-    app = create_app()
+    workers = max(APP_CONFIG["workers"], 1)
+    port = APP_CONFIG["server_port"]
     
     print("\n🌟 应用配置:")
     print(f"   📁 工作目录: {os.getcwd()}")
     print(f"   💾 导出目录: exports/")
     print(f"   📝 日志目录: logs/")
-    print(f"   🌐 访问地址: http://localhost:7860")
+    if workers > 1:
+        print(f"   ⚙️  工作进程: {workers} (端口 {port}-{port + workers - 1})")
+    print(f"   🌐 访问地址: http://localhost:{port}")
     print("\n🎯 启动应用...")
     
-    logger.info("Gradio应用启动")
-    
-    # 启动Gradio应用
-    app.launch(
-        server_name="0.0.0.0",  # 允许外部访问
-        server_port=7860,       # 端口号
-        share=False,            # 不创建公共链接
-        debug=True,             # 开启调试模式
-        show_error=True,        # 显示错误信息
-        quiet=False             # 显示启动信息
-    )
+    logger.info(f"Gradio应用启动，工作进程数: {workers}")
+    
+    # 启动服务（FastAPI + Gradio，可多进程）
+    from server import serve
+    serve(workers=workers, base_port=port)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,325 @@
+"""
+存储后端模块
+Pluggable storage backends (MySQL for production, embedded SQLite)
+"""
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from database_config import DATABASE_BACKEND, DATABASE_CONFIG, SQLITE_CONFIG
+from lazy_imports import lazy_import
+from query_control import QueryCancelled, QueryTimeout
+from replica_router import ReplicaRouter
+
+mysql_connector = lazy_import("mysql.connector")
+
+logger = logging.getLogger(__name__)
+
+# 语句开头的 SELECT，优化器提示需紧跟其后
+SELECT_PREFIX = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+
+# MySQL 错误码：超过 MAX_EXECUTION_TIME / 被 KILL QUERY 终止
+ER_QUERY_TIMEOUT = 3024
+ER_QUERY_INTERRUPTED = 1317
+# MySQL 客户端错误码：无法连接、连接断开（服务器不可用，计入熔断器）
+CONNECTION_ERRNOS = {2002, 2003, 2005, 2006, 2013, 2055}
+
+
+class DatabaseUnavailable(Exception):
+    """数据库不可用：熔断器打开期间不再尝试连接"""
+
+    def __init__(self, retry_after: float = 0.0):
+        super().__init__(f"数据库不可用，{max(int(retry_after), 1)} 秒后重试连接")
+        self.retry_after = retry_after
+
+
+class StorageBackend:
+    """存储后端接口
+
+    DatabaseManager 使用 MySQL 风格的 %s 占位符和 FIND_IN_SET 构建SQL，
+    后端负责建立连接、引用标识符、转换占位符并以字典列表返回结果。
+    """
+
+    name = "base"
+
+    @property
+    def error_types(self) -> Tuple[type, ...]:
+        """该后端抛出的数据库异常类型"""
+        return (Exception,)
+
+    def is_unavailable(self, error: Exception) -> bool:
+        """异常是否表示数据库不可用（连接失败或连接断开），而不是语句本身出错"""
+        return isinstance(error, DatabaseUnavailable)
+
+    def connect(self, read_only: bool = False):
+        """建立新连接，read_only 表示只执行读操作（可路由到只读副本）"""
+        raise NotImplementedError
+
+    def quote(self, identifier: str) -> str:
+        """引用列名/表名"""
+        raise NotImplementedError
+
+    def prepare(self, query: str) -> str:
+        """把 %s 占位符转换为后端的参数风格"""
+        return query
+
+    def fetch_all(self, connection, query: str, params: Optional[List] = None,
+                  timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """执行查询并以字典列表返回结果
+
+        timeout 为语句超时秒数，超时抛出 QueryTimeout；查询被 cancel() 终止时抛出 QueryCancelled。
+        """
+        raise NotImplementedError
+
+    def cancel(self, connection) -> None:
+        """终止 connection 上正在执行的查询（可从其他线程调用）"""
+
+    def upsert_sql(self, table_name: str, columns: List[str], key_columns: List[str],
+                   update_columns: Optional[List[str]] = None) -> str:
+        """生成按唯一键插入或更新的语句（%s 占位符），key_columns 必须对应唯一索引"""
+        raise NotImplementedError
+
+    def insert_sql(self, table_name: str, columns: List[str]) -> str:
+        """生成多列INSERT语句（%s 占位符）"""
+        column_list = ", ".join(self.quote(column) for column in columns)
+        placeholders = ", ".join(["%s"] * len(columns))
+        return f"INSERT INTO {table_name} ({column_list}) VALUES ({placeholders})"
+
+    def begin(self, connection) -> None:
+        """在写连接上开始事务（之后的语句直到 commit/rollback 为止一起生效）"""
+
+    def execute_many(self, connection, query: str, rows: List[Tuple]) -> int:
+        """批量执行写语句（不提交事务），返回影响的行数"""
+        cursor = connection.cursor()
+        try:
+            cursor.executemany(self.prepare(query), rows)
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def release(self, connection) -> None:
+        """释放连接"""
+        connection.close()
+
+    def status(self) -> Dict[str, Any]:
+        """后端状态"""
+        return {"backend": self.name}
+
+
+class MySQLBackend(StorageBackend):
+    """MySQL 后端（生产环境）"""
+
+    name = "mysql"
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, router: Optional[ReplicaRouter] = None):
+        self.config = config or DATABASE_CONFIG
+        self.router = router or ReplicaRouter(self.config)
+
+    @property
+    def error_types(self) -> Tuple[type, ...]:
+        return (mysql_connector.Error, DatabaseUnavailable)
+
+    def is_unavailable(self, error: Exception) -> bool:
+        return super().is_unavailable(error) or getattr(error, "errno", None) in CONNECTION_ERRNOS
+
+    def connect(self, read_only: bool = False):
+        self.router.start_health_checks()
+        return self.router.connect(read_only=read_only)
+
+    def quote(self, identifier: str) -> str:
+        return f"`{identifier}`"
+
+    def begin(self, connection) -> None:
+        # 连接配置为 autocommit，写入需显式开始事务，否则每条语句立即提交、rollback 无效
+        connection.start_transaction()
+
+    def upsert_sql(self, table_name: str, columns: List[str], key_columns: List[str],
+                   update_columns: Optional[List[str]] = None) -> str:
+        update_columns = update_columns or [c for c in columns if c not in key_columns]
+        updates = ", ".join(f"{self.quote(c)} = VALUES({self.quote(c)})" for c in update_columns)
+        return f"{self.insert_sql(table_name, columns)} ON DUPLICATE KEY UPDATE {updates}"
+
+    def fetch_all(self, connection, query: str, params: Optional[List] = None,
+                  timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        if timeout:
+            query = with_execution_time(query, timeout)
+        cursor = connection.cursor(dictionary=True)
+        try:
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            return cursor.fetchall()
+        except mysql_connector.Error as e:
+            if e.errno == ER_QUERY_TIMEOUT:
+                raise QueryTimeout(timeout) from e
+            if e.errno == ER_QUERY_INTERRUPTED:
+                raise QueryCancelled() from e
+            raise
+        finally:
+            cursor.close()
+
+    def cancel(self, connection) -> None:
+        """在同一节点的旁路连接上执行 KILL QUERY，连接本身保持可用"""
+        config = {**self.config, "host": connection.server_host, "port": connection.server_port}
+        side = mysql_connector.connect(**config)
+        try:
+            cursor = side.cursor()
+            cursor.execute(f"KILL QUERY {int(connection.connection_id)}")
+            cursor.close()
+        finally:
+            side.close()
+
+    def release(self, connection) -> None:
+        if connection.is_connected():
+            connection.close()
+
+    def status(self) -> Dict[str, Any]:
+        return {"backend": self.name, "endpoints": self.router.status()}
+
+
+def with_execution_time(query: str, timeout: float) -> str:
+    """为 SELECT 语句加上 MAX_EXECUTION_TIME 优化器提示（毫秒），其他语句不变"""
+    match = SELECT_PREFIX.match(query)
+    if not match:
+        return query
+    return f"{match.group(0)} /*+ MAX_EXECUTION_TIME({max(int(timeout * 1000), 1)}) */{query[match.end():]}"
+
+
+def find_in_set(needle: Optional[str], haystack: Optional[str]) -> int:
+    """MySQL FIND_IN_SET 的等价实现，返回1起始的位置，未找到返回0"""
+    if needle is None or haystack is None:
+        return 0
+    try:
+        return str(haystack).split(",").index(needle) + 1
+    except ValueError:
+        return 0
+
+
+# SQLite 进度回调的间隔（虚拟机指令数）
+SQLITE_PROGRESS_STEPS = 10000
+
+
+class SQLiteBackend(StorageBackend):
+    """嵌入式 SQLite 后端
+
+    SET/ENUM 列以逗号分隔的文本保存（与 MySQL 返回值格式一致），
+    FIND_IN_SET 通过自定义函数提供，因此筛选/搜索/统计语义与 MySQL 相同。
+    path 为 ":memory:" 时使用共享缓存的内存数据库，适合测试和基准。
+    """
+
+    name = "sqlite"
+    _memory_ids = itertools.count(1)
+
+    def __init__(self, path: Optional[str] = None, init_script: Optional[str] = None):
+        self.path = path or SQLITE_CONFIG["path"]
+        self.init_script = init_script if init_script is not None else SQLITE_CONFIG["init_script"]
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._anchor = None
+        if self.path == ":memory:":
+            # 内存数据库在最后一个连接关闭时销毁，保留一个锚定连接
+            self._uri = f"file:ai_resources_mem_{next(self._memory_ids)}?mode=memory&cache=shared"
+            self._anchor = self._open()
+        else:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._uri = None
+
+    @property
+    def error_types(self) -> Tuple[type, ...]:
+        return (sqlite3.Error, DatabaseUnavailable)
+
+    def _open(self) -> sqlite3.Connection:
+        if self._uri:
+            connection = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        else:
+            connection = sqlite3.connect(self.path, check_same_thread=False, timeout=SQLITE_CONFIG["busy_timeout"])
+        connection.row_factory = sqlite3.Row
+        connection.create_function("FIND_IN_SET", 2, find_in_set, deterministic=True)
+        return connection
+
+    def _ensure_schema(self, connection: sqlite3.Connection) -> None:
+        """首次连接时按初始化脚本建表"""
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            exists = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'dataset_index'"
+            ).fetchone()
+            if not exists and self.init_script:
+                with open(self.init_script, encoding="utf-8") as f:
+                    connection.executescript(f.read())
+                logger.info(f"SQLite数据库初始化完成: {self.path}")
+            self._initialized = True
+
+    def connect(self, read_only: bool = False) -> sqlite3.Connection:
+        connection = self._open()
+        self._ensure_schema(connection)
+        return connection
+
+    def quote(self, identifier: str) -> str:
+        return f'"{identifier}"'
+
+    def prepare(self, query: str) -> str:
+        return query.replace("%s", "?")
+
+    def begin(self, connection) -> None:
+        # sqlite3 在第一条写语句前隐式开始事务
+        pass
+
+    def upsert_sql(self, table_name: str, columns: List[str], key_columns: List[str],
+                   update_columns: Optional[List[str]] = None) -> str:
+        update_columns = update_columns or [c for c in columns if c not in key_columns]
+        keys = ", ".join(self.quote(c) for c in key_columns)
+        updates = ", ".join(f"{self.quote(c)} = excluded.{self.quote(c)}" for c in update_columns)
+        return f"{self.insert_sql(table_name, columns)} ON CONFLICT ({keys}) DO UPDATE SET {updates}"
+
+    def fetch_all(self, connection, query: str, params: Optional[List] = None,
+                  timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        deadline = time.monotonic() + timeout if timeout else None
+        if deadline is not None:
+            # 每执行一批虚拟机指令检查一次，超过期限时中断语句
+            connection.set_progress_handler(lambda: time.monotonic() > deadline, SQLITE_PROGRESS_STEPS)
+        try:
+            cursor = connection.execute(self.prepare(query), params or [])
+            try:
+                return [dict(row) for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+        except sqlite3.OperationalError as e:
+            if "interrupted" not in str(e):
+                raise
+            if deadline is not None and time.monotonic() > deadline:
+                raise QueryTimeout(timeout) from e
+            raise QueryCancelled() from e
+        finally:
+            if deadline is not None:
+                connection.set_progress_handler(None, 0)
+
+    def cancel(self, connection) -> None:
+        connection.interrupt()
+
+
+BACKENDS = {
+    "mysql": MySQLBackend,
+    "sqlite": SQLiteBackend
+}
+
+
+def create_backend(name: Optional[str] = None, **kwargs) -> StorageBackend:
+    """按名称创建存储后端"""
+    name = (name or DATABASE_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"不支持的存储后端: {name}")
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1 @@
+# 基准测试模块初始化文件
\ No newline at end of file
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+数据库基准测试套件
+Benchmark suite for DatabaseManager query, export and DataFrame paths
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pandas as pd
+
+from backends import SQLiteBackend
+from database import DatabaseManager
+from database_config import TABLE_CONFIG
+from exporters import EXPORT_EXTENSIONS, write_export
+from benchmarks.synthetic_data import generate_rows
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# 每个表的基准筛选/搜索条件（使用中文列名，与界面一致）
+WORKLOADS = {
+    "dataset_index": {
+        "filter_single": {"正向目标": ["行人"]},
+        "filter_multi": {"正向目标": ["车辆", "动物"], "目标距离": ["20m"]},
+        "filter_range": {"宽度": {"min": 2560}},
+        "search_common": "urban",
+        "search_rare": "no_such_image_zzz"
+    },
+    "test_cases": {
+        "filter_single": {"框架": ["onnx"]},
+        "filter_multi": {"类别": ["模型", "block块"], "标签": ["fusion"]},
+        "filter_range": {"FLOPs": {"min": 1e9, "max": 5e9}},
+        "search_common": "ResNet",
+        "search_rare": "no_such_case_zzz"
+    }
+}
+
+
+def git_commit() -> Optional[str]:
+    """获取当前提交号，便于跨提交比较"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """多次执行并统计耗时"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        "timings": [round(t, 6) for t in timings],
+        "min_s": round(min(timings), 6),
+        "median_s": round(statistics.median(timings), 6),
+        "mean_s": round(statistics.fmean(timings), 6),
+        "max_s": round(max(timings), 6),
+        "result_rows": len(result) if hasattr(result, "__len__") else result
+    }
+
+
+def populate(manager: DatabaseManager, table_name: str, size: int, seed: int) -> float:
+    """清空示例数据并写入合成数据，返回耗时"""
+    start = time.perf_counter()
+    connection = manager.get_connection()
+    try:
+        with connection:
+            connection.execute(f"DELETE FROM {table_name}")
+    finally:
+        manager.backend.release(connection)
+    manager.insert_rows(table_name, generate_rows(table_name, size, seed), batch_size=10000, commit_every=size)
+    return time.perf_counter() - start
+
+
+def benchmark_table(manager: DatabaseManager, table_name: str, size: int, repeat: int,
+                    export_dir: str, excel_limit: int) -> List[Dict[str, Any]]:
+    """对单个表运行全部基准操作"""
+    workload = WORKLOADS[table_name]
+    column_mapping = TABLE_CONFIG[table_name]["columns"]
+    raw_rows = manager.execute_query(f"SELECT * FROM {table_name}")
+    export_df = manager.filter_data(table_name, workload["filter_single"])
+
+    operations: Dict[str, Callable[[], Any]] = {
+        "get_all_data": lambda: manager.get_all_data(table_name),
+        "filter_single": lambda: manager.filter_data(table_name, workload["filter_single"]),
+        "filter_multi": lambda: manager.filter_data(table_name, workload["filter_multi"]),
+        "filter_range": lambda: manager.filter_data(table_name, workload["filter_range"]),
+        "search_common": lambda: manager.search_data(table_name, workload["search_common"]),
+        "search_rare": lambda: manager.search_data(table_name, workload["search_rare"]),
+        "table_stats": lambda: manager.get_table_stats(table_name)[0],
+        "table_stats_filtered": lambda: manager.get_table_stats(table_name, workload["filter_single"])[1],
+        "dataframe_construction": lambda: pd.DataFrame(raw_rows).rename(columns=column_mapping),
+    }
+    for export_format, extension in EXPORT_EXTENSIONS.items():
+        if export_format == "excel" and len(export_df) > excel_limit:
+            continue
+        path = str(Path(export_dir) / f"{table_name}_{size}.{extension}")
+        operations[f"export_{export_format}"] = (
+            lambda fmt=export_format, p=path: (write_export(export_df, p, fmt), len(export_df))[1]
+        )
+
+    results = []
+    for name, fn in operations.items():
+        stats = measure(fn, repeat)
+        results.append({"table": table_name, "rows": size, "operation": name, **stats})
+        print(f"   {name:<24} median {stats['median_s'] * 1000:>10.1f}ms  ({stats['result_rows']} 行)")
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, max_regression: float) -> bool:
+    """与基线结果比较中位数耗时，返回是否无回退"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(r["table"], r["rows"], r["operation"]): r for r in baseline["results"]}
+    ok = True
+    print(f"\n📈 与基线比较 ({baseline['meta'].get('commit')}):")
+    for r in results:
+        old = previous.get((r["table"], r["rows"], r["operation"]))
+        if not old or old["median_s"] <= 0:
+            continue
+        change = r["median_s"] / old["median_s"] - 1
+        flag = "❌" if change > max_regression else "✅"
+        ok = ok and change <= max_regression
+        print(f"   {flag} {r['table']}/{r['rows']}/{r['operation']}: {change:+.1%}")
+    return ok
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="DatabaseManager 基准测试")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="逗号分隔的数据量，例如 10000,100000")
+    parser.add_argument("--tables", default="dataset_index,test_cases", help="逗号分隔的表名")
+    parser.add_argument("--repeat", type=int, default=3, help="每个操作的重复次数")
+    parser.add_argument("--seed", type=int, default=42, help="合成数据随机种子")
+    parser.add_argument("--sqlite-path", default=":memory:", help="SQLite数据库路径，默认使用内存数据库")
+    parser.add_argument("--excel-limit", type=int, default=20_000, help="超过该行数时跳过Excel导出")
+    parser.add_argument("--output", default="bench_results.json", help="结果JSON路径")
+    parser.add_argument("--baseline", help="用于比较的历史结果JSON")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="允许的中位数回退比例")
+    args = parser.parse_args()
+
+    # 每次查询的连接日志会干扰计时
+    logging.getLogger("database").setLevel(logging.WARNING)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    tables = [t for t in args.tables.split(",") if t]
+    results = []
+
+    print("🏁 AI Resources Database - 基准测试")
+    print("=" * 50)
+    with tempfile.TemporaryDirectory() as export_dir:
+        for size in sizes:
+            manager = DatabaseManager(SQLiteBackend(args.sqlite_path))
+            for table_name in tables:
+                load_time = populate(manager, table_name, size, args.seed)
+                print(f"📦 {table_name} × {size:,} (生成并写入 {load_time:.2f}s)")
+                results.extend(benchmark_table(manager, table_name, size, args.repeat,
+                                               export_dir, args.excel_limit))
+
+    output = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "backend": f"sqlite:{args.sqlite_path}",
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat
+        },
+        "results": results
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f"\n📄 结果已写入 {args.output}")
+
+    if args.baseline and not compare(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准
+Import-time profile of the startup path (python -X importtime style report)
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# 默认剖析的启动入口模块
+DEFAULT_MODULES = ["database", "utils", "components", "app"]
+
+# 构建界面的计时脚本，在子进程中执行以保证冷启动
+BUILD_UI_SNIPPET = (
+    "import time; t = time.perf_counter(); import app; "
+    "t_import = time.perf_counter() - t; t = time.perf_counter(); app.create_app(); "
+    "print('BUILD_UI', t_import, time.perf_counter() - t)"
+)
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """解析 -X importtime 输出"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_part, cumulative_part, name = line.split(":", 1)[1].split("|", 2)
+            self_us, cumulative_us = int(self_part), int(cumulative_part)
+        except ValueError:
+            continue
+        name = name[1:]  # 去掉分隔符后的单个空格，保留缩进
+        entries.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_us": self_us,
+            "cumulative_us": cumulative_us
+        })
+    return entries
+
+
+def profile_module(module: str, top: int) -> Dict[str, Any]:
+    """在全新解释器中导入模块并收集导入耗时"""
+    env = dict(os.environ, PYTHONPATH=str(project_root))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=project_root, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    entries = parse_importtime(proc.stderr)
+    top_level = [e for e in entries if e["depth"] == 0]
+    heavy = sorted(top_level, key=lambda e: e["cumulative_us"], reverse=True)[:top]
+    return {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "wall_seconds": round(wall, 4),
+        "import_seconds": round(sum(e["cumulative_us"] for e in top_level) / 1e6, 4),
+        "modules_imported": len(entries),
+        "heaviest": heavy,
+        "deferred": {
+            name: name not in {e["module"] for e in entries}
+            for name in ("pandas", "mysql.connector", "openpyxl")
+        }
+    }
+
+
+def profile_build_ui() -> Dict[str, Any]:
+    """测量导入 app 与构建 Blocks 界面的耗时"""
+    env = dict(os.environ, PYTHONPATH=str(project_root))
+    proc = subprocess.run(
+        [sys.executable, "-c", BUILD_UI_SNIPPET],
+        cwd=project_root, env=env, capture_output=True, text=True
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith("BUILD_UI"):
+            _, t_import, t_build = line.split()
+            return {"ok": True, "import_seconds": float(t_import), "build_seconds": float(t_build)}
+    return {"ok": False, "error": (proc.stderr.strip().splitlines() or ["unknown"])[-1]}
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="启动路径导入耗时剖析")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="要剖析的模块")
+    parser.add_argument("--top", type=int, default=10, help="每个模块列出的最重依赖数量")
+    parser.add_argument("--build-ui", action="store_true", help="同时测量构建Gradio界面的耗时")
+    parser.add_argument("--json", dest="json_path", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    results = {
+        "benchmark": "startup_importtime",
+        "python": sys.version.split()[0],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "modules": [profile_module(m, args.top) for m in args.modules]
+    }
+    if args.build_ui:
+        results["build_ui"] = profile_build_ui()
+
+    print("⏱️  启动导入耗时剖析")
+    print("=" * 50)
+    for item in results["modules"]:
+        status = "✅" if item["ok"] else "❌"
+        print(f"{status} import {item['module']}: {item['import_seconds']:.3f}s "
+              f"(进程 {item['wall_seconds']:.3f}s, {item['modules_imported']} 个模块)")
+        deferred = [name for name, flag in item["deferred"].items() if flag]
+        if deferred:
+            print(f"   延迟加载: {', '.join(deferred)}")
+        for entry in item["heaviest"]:
+            print(f"   {entry['cumulative_us'] / 1000:>9.1f}ms  {entry['module']}")
+    if "build_ui" in results:
+        build = results["build_ui"]
+        if build["ok"]:
+            print(f"🧱 构建界面: 导入 {build['import_seconds']:.3f}s, 构建 {build['build_seconds']:.3f}s")
+        else:
+            print(f"❌ 构建界面失败: {build['error']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
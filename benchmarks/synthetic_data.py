@@ -0,0 +1,160 @@
+"""
+合成数据生成器
+Synthetic dataset_index / test_cases rows with realistic value distributions
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database_config import TABLE_CONFIG
+
+DATASET_FILTERS = TABLE_CONFIG["dataset_index"]["filter_columns"]
+CASE_FILTERS = TABLE_CONFIG["test_cases"]["filter_columns"]
+
+# 图像仓库画像: (仓库名, 权重, 名称前缀, 正向目标偏好, 负向目标偏好, 来源)
+IMAGE_REPOSITORIES = [
+    ("urban_dataset", 30, "urban_road", {"行人": 5, "车辆": 5, "建筑": 3, "基础设施": 2, "动物": 0.2},
+     {"天空": 4, "路面": 5, "背景": 2, "植被": 1, "水面": 0.2}, ["road_camera", "park_camera", "street_camera"]),
+    ("traffic_dataset", 25, "highway_traffic", {"车辆": 8, "基础设施": 4, "行人": 1, "建筑": 1, "动物": 0.1},
+     {"路面": 6, "天空": 4, "背景": 1, "植被": 1, "水面": 0.1}, ["highway_camera", "toll_camera"]),
+    ("wildlife_dataset", 15, "wildlife", {"动物": 8, "基础设施": 1, "行人": 0.3, "车辆": 0.2, "建筑": 0.2},
+     {"植被": 6, "水面": 3, "天空": 2, "背景": 2, "路面": 0.2}, ["wildlife_camera", "drone_camera"]),
+    ("industrial_dataset", 12, "bridge_inspection", {"建筑": 6, "基础设施": 5, "车辆": 1, "行人": 0.5, "动物": 0.1},
+     {"背景": 5, "天空": 3, "水面": 2, "路面": 1, "植被": 1}, ["bridge_sensor", "pipeline_sensor"]),
+    ("indoor_dataset", 10, "indoor_scene", {"行人": 6, "建筑": 2, "基础设施": 1, "动物": 0.5, "车辆": 0.1},
+     {"背景": 8, "路面": 1, "植被": 0.5, "天空": 0.1, "水面": 0.1}, ["indoor_camera"]),
+    ("night_dataset", 8, "night_drive", {"车辆": 6, "行人": 3, "基础设施": 2, "建筑": 1, "动物": 0.3},
+     {"路面": 5, "天空": 3, "背景": 2, "植被": 1, "水面": 0.3}, ["road_camera", "highway_camera"]),
+]
+
+# 常见分辨率 (高, 宽, 权重)
+RESOLUTIONS = [(1080, 1920, 35), (720, 1280, 25), (512, 512, 10), (1920, 1080, 8),
+               (2160, 3840, 7), (480, 640, 10), (1024, 1024, 5)]
+
+# 模型族: (名称, 权重, 类别, 框架权重, 输入形状, 模型大小中位数MB)
+MODEL_FAMILIES = [
+    ("ResNet50", 10, "模型", {"onnx": 6, "caffe": 3, "ir": 1}, "1x3x224x224", 97.8),
+    ("YOLOv5s", 8, "模型", {"onnx": 8, "caffe": 0, "ir": 2}, "1x3x640x640", 14.1),
+    ("MobileNetV2", 8, "级联算子", {"onnx": 6, "caffe": 2, "ir": 2}, "1x3x224x224", 13.4),
+    ("BERT_Base", 4, "模型", {"onnx": 8, "caffe": 0, "ir": 2}, "1x128", 420.0),
+    ("Conv2D", 20, "单算子", {"onnx": 3, "caffe": 2, "ir": 5}, "1x64x56x56", 0.5),
+    ("MatMul", 12, "单算子", {"onnx": 4, "caffe": 1, "ir": 5}, "1x512x512", 1.0),
+    ("Softmax", 8, "单算子", {"onnx": 4, "caffe": 2, "ir": 4}, "1x1000", 0.01),
+    ("DepthFusion", 10, "block块", {"onnx": 2, "caffe": 5, "ir": 3}, "1x128x28x28", 2.3),
+    ("ResidualBlock", 10, "block块", {"onnx": 5, "caffe": 3, "ir": 2}, "1x256x14x14", 4.5),
+    ("ConvBnRelu", 10, "级联算子", {"onnx": 4, "caffe": 3, "ir": 3}, "1x32x112x112", 0.8),
+]
+
+FRAMEWORK_EXTENSIONS = {"onnx": "onnx", "caffe": "prototxt", "ir": "ir"}
+CASE_SOURCES = ["torchvision", "ultralytics", "custom", "research", "huggingface", "model_zoo"]
+REMARKS = ["经典图像分类模型", "轻量级目标检测模型", "基础卷积算子", "深度融合模块", "移动端优化模型",
+           "回归测试用例", "性能基线", "精度对齐用例", None, None]
+
+
+def _weighted_choice(rng: random.Random, items: Sequence[Any], weights: Sequence[float]) -> Any:
+    return rng.choices(items, weights=weights, k=1)[0]
+
+
+def _sample_set(rng: random.Random, options: List[str], preference: Dict[str, float],
+                size_weights: Sequence[float] = (55, 30, 15)) -> str:
+    """按偏好采样SET值，输出顺序与列定义一致（与MySQL返回格式相同）"""
+    size = _weighted_choice(rng, range(1, len(size_weights) + 1), size_weights)
+    chosen = set()
+    candidates = [o for o in options if preference.get(o, 1) > 0]
+    weights = [preference.get(o, 1) for o in candidates]
+    while len(chosen) < min(size, len(candidates)):
+        chosen.add(_weighted_choice(rng, candidates, weights))
+    return ",".join(o for o in options if o in chosen)
+
+
+def generate_dataset_rows(count: int, seed: int = 42, start_id: int = 1) -> Iterator[Dict[str, Any]]:
+    """生成 dataset_index 行"""
+    rng = random.Random(seed)
+    repo_weights = [r[1] for r in IMAGE_REPOSITORIES]
+    res_weights = [r[2] for r in RESOLUTIONS]
+    distance_options = DATASET_FILTERS["target_distance"]
+    for offset in range(count):
+        image_id = start_id + offset
+        repo, _, prefix, positive, negative, sources = _weighted_choice(rng, IMAGE_REPOSITORIES, repo_weights)
+        height, width, _ = _weighted_choice(rng, RESOLUTIONS, res_weights)
+        name = f"{prefix}_{image_id:07d}"
+        yield {
+            "image_id": image_id,
+            "image_name": name,
+            "image_height": height,
+            "image_width": width,
+            "image_repository": repo,
+            "bmp_path": f"/data/bmp/{repo}/{name}.bmp",
+            "yuv_path": f"/data/yuv/{repo}/{name}.yuv" if rng.random() < 0.9 else None,
+            "json_path": f"/data/json/{repo}/{name}.json" if rng.random() < 0.95 else None,
+            "positive_target": _sample_set(rng, DATASET_FILTERS["positive_target"], positive),
+            "negative_target": _sample_set(rng, DATASET_FILTERS["negative_target"], negative),
+            "target_distance": _sample_set(rng, distance_options, {}, size_weights=(60, 40)),
+            "source": rng.choice(sources),
+            "file_status": "正常"
+        }
+
+
+def generate_case_rows(count: int, seed: int = 42, start_id: int = 1) -> Iterator[Dict[str, Any]]:
+    """生成 test_cases 行"""
+    rng = random.Random(seed + 1)
+    family_weights = [f[1] for f in MODEL_FAMILIES]
+    frameworks = CASE_FILTERS["framework"]
+    labels = CASE_FILTERS["label"]
+    now = datetime(2025, 6, 1)
+    for offset in range(count):
+        case_id = start_id + offset
+        family, _, category, fw_pref, input_shape, size_mb = _weighted_choice(rng, MODEL_FAMILIES, family_weights)
+        framework = _weighted_choice(rng, frameworks, [fw_pref[f] for f in frameworks])
+        model_size = round(size_mb * rng.lognormvariate(0, 0.35), 2)
+        params = int(model_size * 1024 * 1024 / 4)
+        flops = int(params * rng.uniform(20, 200))
+        name = f"{family}_{case_id:07d}"
+        directory = f"/models/{family.lower()}/{name}"
+        yield {
+            "case_id": case_id,
+            "case_name": name,
+            "case_repository": f"{category}_{framework}_repo",
+            "case_path": f"{directory}/{name}.{FRAMEWORK_EXTENSIONS[framework]}",
+            "case_json_path": f"{directory}/config.json",
+            "category": category,
+            "label": _sample_set(rng, labels, {}, size_weights=(50, 35, 15)) if rng.random() < 0.8 else None,
+            "framework": framework,
+            "input_shape": input_shape,
+            "model_size": model_size,
+            "params": params,
+            "flops": flops,
+            "sources": rng.choice(CASE_SOURCES),
+            "update_time": (now - timedelta(minutes=rng.randrange(0, 365 * 24 * 60))).strftime("%Y-%m-%d %H:%M:%S"),
+            "remark": rng.choice(REMARKS),
+            "file_status": "正常"
+        }
+
+
+GENERATORS = {
+    "dataset_index": generate_dataset_rows,
+    "test_cases": generate_case_rows
+}
+
+
+def generate_rows(table_name: str, count: int, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    """按表名生成合成数据"""
+    return GENERATORS[table_name](count, seed=seed)
+
+
+def iter_batches(rows: Iterator[Dict[str, Any]], columns: List[str], batch_size: int = 10000) -> Iterator[List[Tuple]]:
+    """把行字典按列顺序打包为批次元组"""
+    batch = []
+    for row in rows:
+        batch.append(tuple(row[c] for c in columns))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
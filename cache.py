@@ -0,0 +1,268 @@
+"""
+查询缓存模块
+Query result cache: in-process stand-in and a cross-process shared cache
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from config import PERFORMANCE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class CacheBackend:
+    """缓存后端接口
+
+    缓存键按命名空间（通常为表名）划分，每个命名空间有一个版本号，
+    bump_version 使该命名空间下的所有旧条目失效。多进程共享的后端中
+    版本号同样是共享的，因此任一进程的失效对所有进程立即生效。
+    """
+
+    name = "base"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def get_version(self, namespace: str) -> int:
+        raise NotImplementedError
+
+    def bump_version(self, namespace: str) -> int:
+        raise NotImplementedError
+
+    def make_key(self, namespace: str, parts: Hashable) -> str:
+        """生成带命名空间版本号的缓存键"""
+        digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+        return f"{namespace}:v{self.get_version(namespace)}:{digest}"
+
+    def lookup(self, namespace: str, parts: Hashable) -> Tuple[bool, Any]:
+        """只查询不计算，返回 (是否命中, 值)"""
+        value = self.get(self.make_key(namespace, parts), _MISSING)
+        return (value is not _MISSING), (None if value is _MISSING else value)
+
+    def get_or_set(self, namespace: str, parts: Hashable, loader: Callable[[], Any],
+                   ttl: Optional[float] = None) -> Any:
+        """命中则返回缓存值，否则调用 loader 计算并写入缓存"""
+        key = self.make_key(namespace, parts)
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value, ttl)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class MemoryCache(CacheBackend):
+    """进程内LRU缓存（单进程部署与测试使用）"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: Optional[int] = None, default_ttl: Optional[float] = None):
+        self.max_entries = max_entries or PERFORMANCE_CONFIG["cache_max_entries"]
+        self.default_ttl = default_ttl or PERFORMANCE_CONFIG["cache_ttl"]
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl or self.default_ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    def bump_version(self, namespace: str) -> int:
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            return self._versions[namespace]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def default_shared_cache_path() -> str:
+    """共享缓存文件默认放在 /dev/shm（内存文件系统），不存在时使用临时目录"""
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "ai_resources_cache.db")
+
+
+class SharedCache(CacheBackend):
+    """同一主机上多个工作进程共享的缓存
+
+    以SQLite文件保存序列化后的结果（默认位于 /dev/shm，即共享内存），
+    各进程通过同一文件读写缓存和命名空间版本号，结果只需计算和存储一份。
+    """
+
+    name = "shared"
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None,
+                 default_ttl: Optional[float] = None):
+        self.path = path or PERFORMANCE_CONFIG["cache_path"] or default_shared_cache_path()
+        self.max_bytes = max_bytes or PERFORMANCE_CONFIG["cache_max_bytes"]
+        self.default_ttl = default_ttl or PERFORMANCE_CONFIG["cache_ttl"]
+        self._local = threading.local()
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "expires REAL NOT NULL, created REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache_versions (namespace TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = OFF")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self._connection().execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            return default
+        try:
+            return pickle.loads(row[0])
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            logger.warning(f"缓存条目损坏，已忽略: {e}")
+            return default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        connection = self._connection()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, size, expires, created) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now + (ttl or self.default_ttl), now)
+            )
+            connection.execute("DELETE FROM cache_entries WHERE expires <= ?", (now,))
+            total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+            if total > self.max_bytes:
+                # 超出容量时按写入时间淘汰最旧的条目
+                rows = connection.execute(
+                    "SELECT key, size FROM cache_entries WHERE key != ? ORDER BY created", (key,)
+                ).fetchall()
+                evict = []
+                for old_key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    evict.append((old_key,))
+                    total -= size
+                connection.executemany("DELETE FROM cache_entries WHERE key = ?", evict)
+            connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            logger.warning(f"写入共享缓存失败: {e}")
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM cache_entries")
+
+    def get_version(self, namespace: str) -> int:
+        row = self._connection().execute(
+            "SELECT version FROM cache_versions WHERE namespace = ?", (namespace,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, namespace: str) -> int:
+        connection = self._connection()
+        connection.execute(
+            "INSERT INTO cache_versions (namespace, version) VALUES (?, 1) "
+            "ON CONFLICT(namespace) DO UPDATE SET version = version + 1",
+            (namespace,)
+        )
+        return self.get_version(namespace)
+
+    def stats(self) -> Dict[str, Any]:
+        count, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()
+        return {"backend": self.name, "path": self.path, "entries": count, "bytes": size}
+
+
+CACHE_BACKENDS = {
+    "memory": MemoryCache,
+    "shared": SharedCache
+}
+
+
+def create_cache(name: Optional[str] = None, **kwargs) -> CacheBackend:
+    """按名称创建缓存后端"""
+    name = (name or PERFORMANCE_CONFIG["cache_backend"]).lower()
+    if name not in CACHE_BACKENDS:
+        raise ValueError(f"不支持的缓存后端: {name}")
+    return CACHE_BACKENDS[name](**kwargs)
+
+
+_query_cache: Optional[CacheBackend] = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> CacheBackend:
+    """获取全局查询缓存（首次使用时按配置创建）"""
+    global _query_cache
+    if _query_cache is None:
+        with _query_cache_lock:
+            if _query_cache is None:
+                _query_cache = create_cache()
+    return _query_cache
@@ -0,0 +1,318 @@
+"""
+查询缓存预热模块
+Cache warmer: re-materialises the most used views after startup and after data changes
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import CACHE_WARMUP_CONFIG, GRID_CONFIG, PERFORMANCE_CONFIG
+from database_config import TABLE_CONFIG
+
+try:
+    import fcntl
+except ImportError:  # Windows 下不做跨进程互斥
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 视图：(搜索词, 筛选条件, 显示列, 排序)，与 update_data_display 的参数一致
+View = Tuple[str, Dict[str, Any], List[str], List[str]]
+
+
+def view_key(search_text: str, filters: Optional[Dict[str, Any]], fields: Optional[List[str]],
+             sort: Optional[List[str]]) -> str:
+    """视图的频率表键（筛选条件保持原有顺序，与查询缓存键一致）"""
+    return json.dumps([search_text or "", filters or {}, list(fields or []), list(sort or [])], ensure_ascii=False)
+
+
+def parse_view_key(key: str) -> View:
+    search_text, filters, fields, sort = json.loads(key)
+    return search_text, filters, fields, sort
+
+
+def trim_counts(counts: Dict[str, int]) -> Dict[str, int]:
+    """频率表超出 max_views 时丢弃最少使用的一半，保留的计数减半，使新的常用视图能够进入前列"""
+    if len(counts) <= CACHE_WARMUP_CONFIG["max_views"]:
+        return counts
+    kept = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:CACHE_WARMUP_CONFIG["max_views"] // 2]
+    return {view: max(count // 2, 1) for view, count in kept}
+
+
+def add_counts(target: Dict[str, Dict[str, int]], source: Dict[str, Dict[str, int]]) -> None:
+    """把 source 中各表各视图的次数累加到 target"""
+    for table_name, views in source.items():
+        counts = target.setdefault(table_name, {})
+        for key, count in views.items():
+            counts[key] = counts.get(key, 0) + count
+
+
+def seed_views(table_name: str) -> List[View]:
+    """固定预热的视图：无筛选视图和 seed_columns 中每个选项的单选筛选（默认显示列、默认排序）"""
+    from grid import default_fields
+    config = TABLE_CONFIG[table_name]
+    fields = default_fields(table_name)
+    views: List[View] = [("", {}, fields, [])]
+    for column in CACHE_WARMUP_CONFIG["seed_columns"].get(table_name, []):
+        options = config.get("filter_columns", {}).get(column) or config.get("choice_columns", {}).get(column, [])
+        views.extend(("", {config["columns"][column]: [option]}, fields, []) for option in options)
+    return views
+
+
+class CacheWarmer:
+    """查询缓存预热
+
+    update_data_display 记录每次实际请求的视图（搜索词、筛选条件、显示列和排序）及次数，频率表
+    保存在 state_path 中，重启和部署后保留。以下时机在后台线程中按界面的查询路径重新计算固定视图
+    和最常用的 top_n 个视图（虚拟表格为计数和第一页行窗口，dataframe 模式为完整结果），
+    使这些视图的第一个请求直接命中查询缓存：
+
+    - 服务启动后
+    - 经本进程写入接口的数据变更后（缓存失效回调，延迟 delay 秒合并连续写入）
+    - 定期检查发现缓存版本号变化（其他工作进程写入）或上次预热的结果已超过缓存有效期
+    未启用查询缓存时不预热。多个工作进程共享查询缓存，同一主机上只有取得锁文件
+    （state_path.lock）的进程在后台预热，其余进程只记录视图请求；持锁进程退出后由其他进程接替。
+    """
+
+    def __init__(self, db, state_path: Optional[str] = None):
+        self.db = db
+        self.state_path = CACHE_WARMUP_CONFIG["state_path"] if state_path is None else state_path
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = self._load()
+        # 上次保存以来本进程新增的请求次数，保存时累加到频率表文件
+        self._pending: Dict[str, Dict[str, int]] = {}
+        self._timers: Dict[str, threading.Timer] = {}
+        self._warmed: Dict[str, Tuple[Any, float]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._leader_file = None
+        db.add_invalidation_hook(self.schedule)
+
+    # ---- 频率表 ----
+
+    def _load(self) -> Dict[str, Dict[str, int]]:
+        if not self.state_path:
+            return {}
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                counts = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {table: dict(views) for table, views in counts.items() if table in TABLE_CONFIG}
+
+    def save(self) -> None:
+        """把本进程新增的请求次数合并到频率表文件
+
+        在锁文件（state_path.save.lock）内读取文件、累加上次保存以来本进程记录的次数后写回
+        （写临时文件后替换），多个工作进程的计数相加而不互相覆盖；合并后的频率表同时成为本进程的频率表。
+        """
+        if not self.state_path:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        lock = None
+        try:
+            directory = os.path.dirname(self.state_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            lock = open(f"{self.state_path}.save.lock", "w")
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            counts = self._load()
+            add_counts(counts, pending)
+            for table_name in pending:
+                counts[table_name] = trim_counts(counts[table_name])
+            if pending:
+                temp = f"{self.state_path}.{os.getpid()}.tmp"
+                with open(temp, "w", encoding="utf-8") as f:
+                    json.dump(counts, f, ensure_ascii=False)
+                os.replace(temp, self.state_path)
+        except OSError as e:
+            logger.warning(f"保存缓存预热频率表失败: {e}")
+            with self._lock:
+                add_counts(self._pending, pending)
+            return
+        finally:
+            if lock is not None:
+                lock.close()
+        with self._lock:
+            # 保存期间新记录的次数仍在 _pending 中，计入本进程的频率表
+            add_counts(counts, self._pending)
+            self._counts = counts
+
+    def record(self, table_name: str, search_text: str = "", filters: Optional[Dict[str, Any]] = None,
+               fields: Optional[List[str]] = None, sort: Optional[List[str]] = None) -> None:
+        """记录一次视图请求"""
+        if table_name not in TABLE_CONFIG:
+            return
+        key = view_key(search_text, filters, fields, sort)
+        with self._lock:
+            counts = self._counts.setdefault(table_name, {})
+            counts[key] = counts.get(key, 0) + 1
+            self._counts[table_name] = trim_counts(counts)
+            pending = self._pending.setdefault(table_name, {})
+            pending[key] = pending.get(key, 0) + 1
+
+    def top_views(self, table_name: str, n: Optional[int] = None) -> List[Tuple[View, int]]:
+        """请求次数最多的 n 个视图及次数"""
+        n = CACHE_WARMUP_CONFIG["top_n"] if n is None else n
+        with self._lock:
+            counts = list(self._counts.get(table_name, {}).items())
+        counts.sort(key=lambda item: item[1], reverse=True)
+        return [(parse_view_key(key), count) for key, count in counts[:n]]
+
+    def views(self, table_name: str) -> List[View]:
+        """需要预热的视图：固定视图在前，其后为最常用的视图（去重）"""
+        views, seen = [], set()
+        for view in [*seed_views(table_name), *(view for view, _ in self.top_views(table_name))]:
+            key = view_key(*view)
+            if key not in seen:
+                seen.add(key)
+                views.append(view)
+        return views
+
+    # ---- 预热 ----
+
+    def warm_view(self, table_name: str, view: View) -> None:
+        """按 update_data_display 与表格接口的查询路径执行一个视图的查询，结果写入查询缓存"""
+        search_text, filters, fields, sort = view
+        self.db.get_table_stats(table_name, filters if not search_text else None)
+        if GRID_CONFIG["mode"] == "virtual":
+            from grid import fetch_window
+            # 浏览器的第一个行窗口请求（同时计算匹配行数）
+            fetch_window(self.db, table_name, 0, GRID_CONFIG["page_size"], search_text, filters,
+                         GRID_CONFIG["wire_format"], fields, sort)
+        elif search_text:
+            self.db.search_data(table_name, search_text, fields, sort)
+        else:
+            self.db.filter_data(table_name, filters, fields, sort)
+
+    def warm(self, table_name: str) -> Dict[str, Any]:
+        """预热一张表的全部视图，单个视图失败不影响其他视图"""
+        started = time.perf_counter()
+        stats = {"table": table_name, "warmed": 0, "failed": 0}
+        if self.db.cache is None:
+            return {**stats, "seconds": 0.0}
+        version = self.db.data_version(table_name)
+        for view in self.views(table_name):
+            if self._stop.is_set():
+                break
+            try:
+                # 预热的结果在缓存有效期内被所有请求共享，从主库读取，避免缓存副本上复制延迟前的旧数据
+                with self.db.primary_reads():
+                    self.warm_view(table_name, view)
+                stats["warmed"] += 1
+            except Exception as e:
+                stats["failed"] += 1
+                logger.warning(f"缓存预热失败: {table_name} {view_key(*view)} - {e}")
+        with self._lock:
+            self._warmed[table_name] = (version, time.monotonic())
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        logger.info(f"{table_name} 缓存预热完成: {stats['warmed']} 个视图，耗时 {stats['seconds']}s")
+        return stats
+
+    def schedule(self, table_name: str, delay: Optional[float] = None) -> None:
+        """延迟预热表（缓存失效回调），已有待执行的预热时不重复安排"""
+        if (table_name not in TABLE_CONFIG or not CACHE_WARMUP_CONFIG["enabled"] or self._stop.is_set()
+                or self.db.cache is None):
+            return
+        delay = CACHE_WARMUP_CONFIG["delay"] if delay is None else delay
+        with self._lock:
+            if table_name in self._timers:
+                return
+            timer = threading.Timer(delay, self._scheduled_warm, args=(table_name,))
+            timer.name = f"cache-warmup-{table_name}"
+            timer.daemon = True
+            self._timers[table_name] = timer
+        timer.start()
+
+    def _scheduled_warm(self, table_name: str) -> None:
+        with self._lock:
+            self._timers.pop(table_name, None)
+        if self.is_leader():
+            self.warm(table_name)
+        self.save()
+
+    def is_leader(self) -> bool:
+        """本进程是否负责后台预热：取得锁文件后一直持有到进程退出，未配置 state_path 时不互斥"""
+        if self._leader_file is not None or not self.state_path or fcntl is None:
+            return True
+        lock_path = f"{self.state_path}.lock"
+        try:
+            directory = os.path.dirname(lock_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            lock = open(lock_path, "w")
+        except OSError as e:
+            logger.warning(f"无法打开缓存预热锁文件，本进程预热: {e}")
+            return True
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        self._leader_file = lock
+        logger.info(f"本进程负责缓存预热: pid={os.getpid()}")
+        return True
+
+    def stale_tables(self) -> List[str]:
+        """缓存版本号变化（其他进程写入）或预热结果已超过缓存有效期的表"""
+        stale = []
+        now = time.monotonic()
+        for table_name in TABLE_CONFIG:
+            with self._lock:
+                warmed = self._warmed.get(table_name)
+            if (warmed is None or warmed[0] != self.db.data_version(table_name)
+                    or now - warmed[1] > PERFORMANCE_CONFIG["cache_ttl"]):
+                stale.append(table_name)
+        return stale
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            # 未取得锁的进程每次检查时重试，持锁进程退出后接替预热
+            for table_name in (self.stale_tables() if self.is_leader() else []):
+                if self._stop.is_set():
+                    break
+                self.warm(table_name)
+            self.save()
+            self._stop.wait(CACHE_WARMUP_CONFIG["check_interval"])
+
+    def start(self) -> bool:
+        """启动后台预热线程（启动后立即预热全部表，之后定期检查），未启用时返回 False"""
+        if not CACHE_WARMUP_CONFIG["enabled"] or self.db.cache is None:
+            return False
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="cache-warmup", daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        """停止后台线程并取消待执行的预热"""
+        self._stop.set()
+        with self._lock:
+            timers, self._timers = list(self._timers.values()), {}
+        for timer in timers:
+            timer.cancel()
+        if self._leader_file is not None:
+            self._leader_file.close()
+            self._leader_file = None
+
+
+_cache_warmer: Optional[CacheWarmer] = None
+_cache_warmer_lock = threading.Lock()
+
+
+def get_cache_warmer() -> CacheWarmer:
+    """获取全局缓存预热器（绑定全局 db_manager）"""
+    global _cache_warmer
+    if _cache_warmer is None:
+        with _cache_warmer_lock:
+            if _cache_warmer is None:
+                from database import db_manager
+                _cache_warmer = CacheWarmer(db_manager)
+    return _cache_warmer
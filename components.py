@@ -4,12 +4,17 @@ UI components for the Gradio application
 """
 import gradio as gr
 import pandas as pd
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Callable, Dict, List, Any, Optional, Tuple, Union
 import os
 from datetime import datetime
 from database import db_manager
+from cache_warmer import get_cache_warmer
+from config import GRID_CONFIG, STATS_CONFIG
 from database_config import TABLE_CONFIG
-from utils import create_status_message, create_export_filename, performance_monitor
+from grid import default_fields, render_grid, render_message
+from query_control import QueryInterrupted, cancellable
+from rate_limit import Overloaded, acquire_for_request, retry_message
+from utils import create_status_message, create_export_filename, format_number, performance_monitor
 
 def toggle_filter_visibility(current_visible: bool) -> Tuple[gr.Column, str]:
     """切换筛选器显示/隐藏状态"""
@@ -17,6 +22,66 @@ def toggle_filter_visibility(current_visible: bool) -> Tuple[gr.Column, str]:
     button_text = "🔧 隐藏筛选选项" if new_visible else "🔧 显示筛选选项"
     return gr.Column(visible=new_visible), button_text
 
+# 排序选项中的方向标记
+SORT_ASCENDING = "↑"
+SORT_DESCENDING = "↓"
+
+def sort_choices(table_name: str) -> List[str]:
+    """可排序列（主键与有索引的列）的升序、降序选项"""
+    table_config = TABLE_CONFIG[table_name]
+    columns = [table_config["primary_key"]] + table_config.get("sortable_columns", [])
+    return [f"{table_config['columns'][column]} {direction}"
+            for column in columns for direction in (SORT_ASCENDING, SORT_DESCENDING)]
+
+def parse_sort_choices(choices: Optional[List[str]]) -> List[str]:
+    """排序选项转换为排序规则（中文列名，前缀 - 表示降序），同一列只取第一次选择"""
+    sort, seen = [], set()
+    for choice in choices or []:
+        column, _, direction = choice.rpartition(" ")
+        if column in seen:
+            continue
+        seen.add(column)
+        sort.append(f"-{column}" if direction == SORT_DESCENDING else column)
+    return sort
+
+# 范围滑块的两个端点
+RANGE_BOUNDS = ("min", "max")
+
+def range_label(table_name: str, column_original: str, bound: str) -> str:
+    """范围滑块的标签"""
+    table_config = TABLE_CONFIG[table_name]
+    unit = table_config["range_columns"][column_original].get("unit")
+    label = f"📏 {table_config['columns'][column_original]} {'下限' if bound == 'min' else '上限'}"
+    return f"{label} ({unit})" if unit else label
+
+def range_defaults(table_name: str) -> List[float]:
+    """范围滑块的初始值：每列依次为下限、上限，均位于端点"""
+    return [config[bound] for config in TABLE_CONFIG[table_name].get("range_columns", {}).values()
+            for bound in RANGE_BOUNDS]
+
+def range_sliders(components: Dict[str, gr.components.Component], table_name: str) -> List[gr.components.Component]:
+    """按列依次取出范围滑块（下限、上限）"""
+    table_config = TABLE_CONFIG[table_name]
+    return [components[f"{bound}_{table_config['columns'][column]}"]
+            for column in table_config.get("range_columns", {}) for bound in RANGE_BOUNDS]
+
+def range_filter_kwargs(table_name: str, values: List[Optional[float]]) -> Dict[str, Dict[str, float]]:
+    """范围滑块取值（每列依次为下限、上限）转换为 filter_<中文列名> 筛选参数
+
+    滑块位于端点时该侧不限，不排除超出滑块范围或为空的行；取值乘以 scale 后与列值比较。
+    """
+    table_config = TABLE_CONFIG[table_name]
+    kwargs = {}
+    for index, (column, config) in enumerate(table_config.get("range_columns", {}).items()):
+        bounds = {}
+        for offset, bound in enumerate(RANGE_BOUNDS):
+            value = values[index * 2 + offset] if index * 2 + offset < len(values) else None
+            if value is not None and value != config[bound]:
+                bounds[bound] = round(value * config.get("scale", 1), 6)
+        if bounds:
+            kwargs[f"filter_{table_config['columns'][column]}"] = bounds
+    return kwargs
+
 def create_filter_interface(table_name: str) -> Dict[str, gr.components.Component]:
     """创建筛选界面组件"""
     components = {}
@@ -32,8 +97,8 @@ def create_filter_interface(table_name: str) -> Dict[str, gr.components.Componen
         value=""
     )
     
-    # 为每个可筛选字段创建多选框
-    for column_original, options in filter_columns.items():
+    # 为每个可筛选字段（SET/ENUM 筛选列与单值枚举筛选列）创建多选框
+    for column_original, options in {**filter_columns, **table_config.get("choice_columns", {})}.items():
         column_chinese = table_config["columns"][column_original]
         components[f"filter_{column_chinese}"] = gr.CheckboxGroup(
             label=f"📋 {column_chinese}",
@@ -42,6 +107,39 @@ def create_filter_interface(table_name: str) -> Dict[str, gr.components.Componen
             interactive=True
         )
     
+    # 数值范围筛选：每列一对下限/上限滑块，在数据库中按索引范围筛选
+    for column_original, config in table_config.get("range_columns", {}).items():
+        column_chinese = table_config["columns"][column_original]
+        with gr.Row():
+            for bound in RANGE_BOUNDS:
+                components[f"{bound}_{column_chinese}"] = gr.Slider(
+                    label=range_label(table_name, column_original, bound),
+                    minimum=config["min"],
+                    maximum=config["max"],
+                    step=config["step"],
+                    value=config[bound],
+                    interactive=True
+                )
+    
+    # 显示列选择：只查询和传输勾选的列，导出同样只包含这些列
+    column_mapping = table_config["columns"]
+    components["columns"] = gr.CheckboxGroup(
+        label="🧩 显示列",
+        choices=list(column_mapping.values()),
+        value=[column_mapping[field] for field in default_fields(table_name)],
+        interactive=True
+    )
+    
+    # 服务端排序：按选择顺序依次排序
+    components["sort"] = gr.Dropdown(
+        label="↕️ 排序",
+        choices=sort_choices(table_name),
+        value=[],
+        multiselect=True,
+        info="按选择的先后顺序多列排序",
+        interactive=True
+    )
+    
     # 重置按钮
     components["reset"] = gr.Button("🔄 重置所有筛选", variant="secondary")
     
@@ -53,41 +151,59 @@ def create_filter_interface(table_name: str) -> Dict[str, gr.components.Componen
     
     return components
 
+# 各表的列宽（与 TABLE_CONFIG 中列的顺序一致）
+COLUMN_WIDTHS = {
+    # 数据集表格有14列
+    "dataset_index": ["7%", "11%", "5%", "5%", "9%", "12%", "12%", "12%", "7%", "7%", "6%", "7%", "5%", "8%"],
+    # 测试用例表格有16列
+    "test_cases": ["5%", "10%", "7%", "8%", "8%", "6%", "6%", "5%", "7%", "6%", "6%", "6%", "6%", "7%", "8%", "5%"]
+}
+
+def selected_fields(table_name: str, columns: Optional[List[str]] = None) -> List[str]:
+    """列选择（中文列名）转换为原始列名，未选择任何列时使用默认列"""
+    if not columns:
+        return default_fields(table_name)
+    return db_manager.resolve_columns(table_name, columns)
+
+def column_widths(table_name: str, fields: List[str]) -> Optional[List[str]]:
+    """按显示的列取列宽"""
+    widths = COLUMN_WIDTHS.get(table_name)
+    if widths is None:
+        return None
+    order = list(TABLE_CONFIG[table_name]["columns"])
+    return [widths[order.index(field)] for field in fields]
+
+def use_virtual_grid() -> bool:
+    """是否使用虚拟滚动表格（GRID_MODE=virtual）"""
+    return GRID_CONFIG["mode"] == "virtual"
+
 def create_data_display(table_name: str = None) -> Dict[str, gr.components.Component]:
     """创建数据显示组件"""
     components = {}
     
-    # 获取初始数据
+    # 初始数据在页面加载事件中获取，构建界面时不访问数据库
     if table_name:
-        try:
-            initial_df, initial_stats, _ = update_data_display(table_name)
-        except:
-            initial_df = pd.DataFrame({"提示": ["数据加载中..."]})
-            initial_stats = "📊 **统计信息**: 数据加载中..."
+        initial_message = "数据加载中..."
+        initial_stats = "📊 **统计信息**: 数据加载中..."
     else:
-        initial_df = pd.DataFrame({"提示": ["请选择数据表"]})
+        initial_message = "请选择数据表"
         initial_stats = "📊 **统计信息**: 请选择数据表"
     
     # 统计信息
     components["stats"] = gr.Markdown(initial_stats)
     
-    # 数据表格 - 根据表格内容动态调整列宽
-    if table_name == "dataset_index":
-        # 数据集表格有12列，调整列宽
-        column_widths = ["8%", "12%", "6%", "6%", "10%", "12%", "12%", "12%", "8%", "8%", "8%", "8%"]
-    elif table_name == "test_cases":
-        # 测试用例表格有15列，调整列宽
-        column_widths = ["6%", "10%", "8%", "8%", "8%", "6%", "6%", "6%", "8%", "6%", "6%", "6%", "8%", "8%", "10%"]
+    if use_virtual_grid():
+        # 虚拟滚动表格：浏览器只请求可见窗口的行
+        components["dataframe"] = gr.HTML(value=render_message(initial_message), label="数据表格")
     else:
-        column_widths = None
-    
-    components["dataframe"] = gr.Dataframe(
-        label="数据表格",
-        interactive=False,
-        wrap=True,
-        value=initial_df,
-        column_widths=column_widths
-    )
+        # 数据表格 - 根据表格内容调整列宽
+        components["dataframe"] = gr.Dataframe(
+            label="数据表格",
+            interactive=False,
+            wrap=True,
+            value=pd.DataFrame({"提示": [initial_message]}),
+            column_widths=COLUMN_WIDTHS.get(table_name)
+        )
     
     # 下载文件组件
     components["download"] = gr.File(
@@ -97,59 +213,110 @@ def create_data_display(table_name: str = None) -> Dict[str, gr.components.Compo
     
     return components
 
+def collect_filters(filter_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """从 filter_<中文列名> 参数中提取非空的筛选条件（取值列表或数值范围）"""
+    filters = {}
+    for key, value in filter_kwargs.items():
+        if key.startswith("filter_") and value:
+            column_name = key.replace("filter_", "")
+            filters[column_name] = value
+    return filters
+
+def query_data(table_name: str, search_text: str = "", columns: Optional[List[str]] = None,
+               sort: Optional[List[str]] = None, **filter_kwargs) -> pd.DataFrame:
+    """按搜索词或筛选条件获取完整结果（导出与 dataframe 模式使用），只获取选择的列，按所选排序"""
+    fields = selected_fields(table_name, columns)
+    order = parse_sort_choices(sort)
+    if search_text:
+        return db_manager.search_data(table_name, search_text, fields, order)
+    return db_manager.filter_data(table_name, collect_filters(filter_kwargs), fields, order)
+
 def update_data_display(
     table_name: str,
     search_text: str = "",
+    columns: Optional[List[str]] = None,
+    sort: Optional[List[str]] = None,
     **filter_kwargs
-) -> Tuple[pd.DataFrame, str, gr.File]:
+) -> Tuple[Any, str, gr.File]:
     """更新数据显示"""
     performance_monitor.start(f"update_data_display_{table_name}")
     
     try:
         # 提取筛选条件
-        filters = {}
-        for key, value in filter_kwargs.items():
-            if key.startswith("filter_") and value:
-                column_name = key.replace("filter_", "")
-                filters[column_name] = value
-        
-        # 获取数据
-        if search_text:
-            df = db_manager.search_data(table_name, search_text)
-        else:
-            df = db_manager.filter_data(table_name, filters)
+        filters = collect_filters(filter_kwargs)
         
         # 获取统计信息
         total_count, filtered_count = db_manager.get_table_stats(table_name, filters if not search_text else None)
         
+        # 获取数据：虚拟表格只需要匹配行数，行数据由浏览器分页请求
+        fields = selected_fields(table_name, columns)
+        if use_virtual_grid():
+            matched = db_manager.count_rows(table_name, filters, search_text) if search_text else filtered_count
+            display = render_grid(table_name, matched, search_text, filters, column_widths(table_name, fields), fields,
+                                  parse_sort_choices(sort))
+        else:
+            display = query_data(table_name, search_text, columns, sort, **filter_kwargs)
+            matched = len(display)
+        # 记录实际请求的视图，缓存预热按请求次数选择要预先计算的视图
+        get_cache_warmer().record(table_name, search_text, filters if not search_text else {}, fields,
+                                  parse_sort_choices(sort))
+        
         # 使用工具函数格式化统计信息
         table_chinese_name = TABLE_CONFIG[table_name]["name"]
         if search_text:
-            stats_text = f"🔍 **{table_chinese_name}**: 搜索 \"{search_text}\" 找到 {len(df):,} 条结果 / 总计 {total_count:,} 条"
+            stats_text = f"🔍 **{table_chinese_name}**: 搜索 \"{search_text}\" 找到 {matched:,} 条结果 / 总计 {total_count:,} 条"
         else:
             stats_text = create_status_message(total_count, filtered_count, table_chinese_name)
         
+        # 数据库不可用时提示当前显示的是只读快照
+        notice = db_manager.degraded_notice()
+        if notice:
+            stats_text = f"{notice}\n\n{stats_text}"
+        
         # 添加性能信息
         duration = performance_monitor.end()
         stats_text += f" | ⏱️ 查询耗时: {duration:.2f}s"
         
-        return df, stats_text, gr.File(visible=False)
+        return display, stats_text, gr.File(visible=False)
         
+    except (Overloaded, QueryInterrupted) as e:
+        # 服务繁忙（等待执行名额超时）、查询超时或已取消：提示原因而不是报错
+        performance_monitor.end()
+        if use_virtual_grid():
+            notice_display = render_message(f"⏳ {e}")
+        else:
+            notice_display = pd.DataFrame({"提示": [str(e)]})
+        return notice_display, f"⏳ **{e}**", gr.File(visible=False)
     except Exception as e:
         performance_monitor.end()
-        error_df = pd.DataFrame({"错误": [f"数据加载失败: {str(e)}"]})
+        if use_virtual_grid():
+            error_display = render_message(f"数据加载失败: {str(e)}")
+        else:
+            error_display = pd.DataFrame({"错误": [f"数据加载失败: {str(e)}"]})
         error_stats = f"❌ **错误**: 数据加载失败 - {str(e)}"
-        return error_df, error_stats, gr.File(visible=False)
+        return error_display, error_stats, gr.File(visible=False)
 
 def export_data(
     table_name: str,
-    current_df: pd.DataFrame,
-    export_format: str = "csv"
+    current_df: Union[pd.DataFrame, Callable[[], pd.DataFrame]],
+    export_format: str = "csv",
+    request: Optional[gr.Request] = None
 ) -> gr.File:
-    """导出当前显示的数据"""
+    """导出当前显示的数据
+
+    current_df 也可以是获取数据的函数，取得导出预算后才调用，被限流的导出不查询数据库。
+    界面导出经过 Gradio 事件队列，中间件只能按查询计数，这里按 request 的客户端扣除导出预算。
+    """
+    wait = acquire_for_request(request, "export")
+    if wait:
+        gr.Warning(retry_message("export", wait))
+        return gr.File(visible=False)
+    
     performance_monitor.start(f"export_data_{table_name}_{export_format}")
     
     try:
+        if callable(current_df):
+            current_df = current_df()
         if current_df.empty:
             return gr.File(visible=False)
         
@@ -162,16 +329,9 @@ def export_data(
         filename = create_export_filename(table_chinese_name, export_format)
         filepath = os.path.join(export_dir, filename)
         
-        # 根据格式导出
-        if export_format == "csv":
-            current_df.to_csv(filepath, index=False, encoding='utf-8-sig')
-        elif export_format == "excel":
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                current_df.to_excel(writer, index=False, sheet_name='数据')
-        elif export_format == "json":
-            current_df.to_json(filepath, orient='records', force_ascii=False, indent=2)
-        else:
-            raise ValueError(f"不支持的导出格式: {export_format}")
+        # 根据格式导出（导出依赖在首次导出时才加载）
+        from exporters import write_export
+        write_export(current_df, filepath, export_format)
         
         duration = performance_monitor.end()
         print(f"✅ 导出完成: {filename} ({len(current_df)} 条记录, 耗时 {duration:.2f}s)")
@@ -183,23 +343,29 @@ def export_data(
         print(f"❌ 导出失败: {e}")
         return gr.File(visible=False)
 
-def reset_all_filters(table_name: str) -> Tuple[str, Dict[str, List], pd.DataFrame, str, gr.File]:
-    """重置所有筛选条件"""
+def reset_all_filters(table_name: str, columns: Optional[List[str]] = None,
+                      sort: Optional[List[str]] = None) -> Tuple[Any, ...]:
+    """重置所有筛选条件和范围滑块（保留列选择和排序）"""
     # 重置搜索框
     search_text = ""
     
     # 重置所有筛选器
     filter_resets = {}
     table_config = TABLE_CONFIG[table_name]
-    filter_columns = table_config.get("filter_columns", {})
+    filter_columns = [*table_config.get("filter_columns", {}), *table_config.get("choice_columns", {})]
     
-    for column_original in filter_columns.keys():
+    for column_original in filter_columns:
         column_chinese = table_config["columns"][column_original]
         filter_resets[f"filter_{column_chinese}"] = []
     
     # 获取重置后的数据
-    df = db_manager.get_all_data(table_name)
     total_count, _ = db_manager.get_table_stats(table_name)
+    fields = selected_fields(table_name, columns)
+    if use_virtual_grid():
+        display = render_grid(table_name, total_count, column_widths=column_widths(table_name, fields), fields=fields,
+                              sort=parse_sort_choices(sort))
+    else:
+        display = db_manager.get_all_data(table_name, fields, parse_sort_choices(sort))
     table_chinese_name = table_config["name"]
     stats_text = create_status_message(total_count, total_count, table_chinese_name)
     
@@ -207,14 +373,24 @@ def reset_all_filters(table_name: str) -> Tuple[str, Dict[str, List], pd.DataFra
     result = [search_text]  # 搜索框重置
     
     # 添加各个筛选器的重置值
-    for column_original in filter_columns.keys():
+    for column_original in filter_columns:
         result.append([])  # 每个筛选器都重置为空列表
     
+    # 范围滑块重置到端点
+    result.extend(range_defaults(table_name))
+    
     # 添加数据显示更新
-    result.extend([df, stats_text, gr.File(visible=False)])
+    result.extend([display, stats_text, gr.File(visible=False)])
     
     return tuple(result)
 
+def export_event(fn: Callable[..., gr.File]) -> Callable[..., Any]:
+    """导出按钮的事件处理函数：Gradio 注入的 gr.Request 以关键字参数 request 传给 fn"""
+    def handler(request: gr.Request, *args):
+        return fn(*args, request=request)
+
+    return cancellable(handler)
+
 def create_dataset_tab() -> gr.Tab:
     """创建数据集标签页"""
     with gr.Tab("📊 数据集") as tab:
@@ -236,6 +412,10 @@ def create_dataset_tab() -> gr.Tab:
                 positive_target_filter = filter_components["filter_正向目标"]
                 negative_target_filter = filter_components["filter_负向目标"]
                 target_distance_filter = filter_components["filter_目标距离"]
+                file_status_filter = filter_components["filter_文件状态"]
+                columns_box = filter_components["columns"]
+                sort_box = filter_components["sort"]
+                range_inputs = range_sliders(filter_components, "dataset_index")
                 reset_btn = filter_components["reset"]
                 export_csv_btn = filter_components["export_csv"]
                 export_excel_btn = filter_components["export_excel"]
@@ -269,51 +449,67 @@ def create_dataset_tab() -> gr.Tab:
             search_box,
             positive_target_filter,
             negative_target_filter, 
-            target_distance_filter
+            target_distance_filter,
+            file_status_filter,
+            columns_box,
+            sort_box,
+            *range_inputs
         ]
         
         outputs = [data_display, stats_display, download_file]
         
-        # 搜索和筛选事件
-        for component in inputs:
-            component.change(
-                fn=lambda search, pos, neg, dist: update_data_display(
-                    "dataset_index", search, 
-                    **{"filter_正向目标": pos, "filter_负向目标": neg, "filter_目标距离": dist}
-                ),
-                inputs=inputs,
-                outputs=outputs
-            )
+        # 搜索和筛选事件（triggers=None 时同时在页面加载时触发，用于加载初始数据）
+        search_event = gr.on(
+            triggers=None,
+            fn=cancellable(lambda search, pos, neg, dist, status, cols, order, *bounds: update_data_display(
+                "dataset_index", search, cols, order,
+                **{"filter_正向目标": pos, "filter_负向目标": neg, "filter_目标距离": dist, "filter_文件状态": status,
+                   **range_filter_kwargs("dataset_index", bounds)}
+            )),
+            inputs=inputs,
+            outputs=outputs
+        )
         
         # 重置事件
         reset_btn.click(
-            fn=lambda: reset_all_filters("dataset_index"),
-            inputs=[],
+            fn=lambda cols, order: reset_all_filters("dataset_index", cols, order),
+            inputs=[columns_box, sort_box],
             outputs=[search_box, positive_target_filter, negative_target_filter, 
-                    target_distance_filter, data_display, stats_display, download_file]
+                    target_distance_filter, file_status_filter, *range_inputs, data_display, stats_display, download_file],
+            # 重置时终止仍在执行的搜索或筛选查询
+            cancels=[search_event]
         )
         
-        # 导出事件
+        # 导出事件：按当前搜索和筛选条件在服务端重新获取完整结果（命中查询缓存）
         export_csv_btn.click(
-            fn=lambda df: export_data("dataset_index", df, "csv"),
-            inputs=[data_display],
+            fn=export_event(lambda search, pos, neg, dist, status, cols, order, *bounds, request=None: export_data("dataset_index", lambda: query_data(
+                "dataset_index", search, cols, order,
+                **{"filter_正向目标": pos, "filter_负向目标": neg, "filter_目标距离": dist, "filter_文件状态": status,
+                   **range_filter_kwargs("dataset_index", bounds)}
+            ), "csv", request)),
+            inputs=inputs,
             outputs=[download_file]
         )
         
         export_excel_btn.click(
-            fn=lambda df: export_data("dataset_index", df, "excel"),
-            inputs=[data_display],
+            fn=export_event(lambda search, pos, neg, dist, status, cols, order, *bounds, request=None: export_data("dataset_index", lambda: query_data(
+                "dataset_index", search, cols, order,
+                **{"filter_正向目标": pos, "filter_负向目标": neg, "filter_目标距离": dist, "filter_文件状态": status,
+                   **range_filter_kwargs("dataset_index", bounds)}
+            ), "excel", request)),
+            inputs=inputs,
             outputs=[download_file]
         )
         
         export_json_btn.click(
-            fn=lambda df: export_data("dataset_index", df, "json"),
-            inputs=[data_display],
+            fn=export_event(lambda search, pos, neg, dist, status, cols, order, *bounds, request=None: export_data("dataset_index", lambda: query_data(
+                "dataset_index", search, cols, order,
+                **{"filter_正向目标": pos, "filter_负向目标": neg, "filter_目标距离": dist, "filter_文件状态": status,
+                   **range_filter_kwargs("dataset_index", bounds)}
+            ), "json", request)),
+            inputs=inputs,
             outputs=[download_file]
         )
-        
-        # 初始化数据加载
-        # 在Gradio 4.x中，我们在组件创建时直接设置初始值
     
     return tab
 
@@ -338,6 +534,10 @@ def create_models_tab() -> gr.Tab:
                 category_filter = filter_components["filter_类别"]
                 label_filter = filter_components["filter_标签"]
                 framework_filter = filter_components["filter_框架"]
+                file_status_filter = filter_components["filter_文件状态"]
+                columns_box = filter_components["columns"]
+                sort_box = filter_components["sort"]
+                range_inputs = range_sliders(filter_components, "test_cases")
                 reset_btn = filter_components["reset"]
                 export_csv_btn = filter_components["export_csv"]
                 export_excel_btn = filter_components["export_excel"]
@@ -371,50 +571,139 @@ def create_models_tab() -> gr.Tab:
             search_box,
             category_filter,
             label_filter,
-            framework_filter
+            framework_filter,
+            file_status_filter,
+            columns_box,
+            sort_box,
+            *range_inputs
         ]
         
         outputs = [data_display, stats_display, download_file]
         
-        # 搜索和筛选事件
-        for component in inputs:
-            component.change(
-                fn=lambda search, cat, lab, frame: update_data_display(
-                    "test_cases", search,
-                    **{"filter_类别": cat, "filter_标签": lab, "filter_框架": frame}
-                ),
-                inputs=inputs,
-                outputs=outputs
-            )
+        # 搜索和筛选事件（triggers=None 时同时在页面加载时触发，用于加载初始数据）
+        search_event = gr.on(
+            triggers=None,
+            fn=cancellable(lambda search, cat, lab, frame, status, cols, order, *bounds: update_data_display(
+                "test_cases", search, cols, order,
+                **{"filter_类别": cat, "filter_标签": lab, "filter_框架": frame, "filter_文件状态": status,
+                   **range_filter_kwargs("test_cases", bounds)}
+            )),
+            inputs=inputs,
+            outputs=outputs
+        )
         
         # 重置事件
         reset_btn.click(
-            fn=lambda: reset_all_filters("test_cases"),
-            inputs=[],
-            outputs=[search_box, category_filter, label_filter, framework_filter,
-                    data_display, stats_display, download_file]
+            fn=lambda cols, order: reset_all_filters("test_cases", cols, order),
+            inputs=[columns_box, sort_box],
+            outputs=[search_box, category_filter, label_filter, framework_filter, file_status_filter, *range_inputs,
+                    data_display, stats_display, download_file],
+            # 重置时终止仍在执行的搜索或筛选查询
+            cancels=[search_event]
         )
         
-        # 导出事件
+        # 导出事件：按当前搜索和筛选条件在服务端重新获取完整结果（命中查询缓存）
         export_csv_btn.click(
-            fn=lambda df: export_data("test_cases", df, "csv"),
-            inputs=[data_display],
+            fn=export_event(lambda search, cat, lab, frame, status, cols, order, *bounds, request=None: export_data("test_cases", lambda: query_data(
+                "test_cases", search, cols, order,
+                **{"filter_类别": cat, "filter_标签": lab, "filter_框架": frame, "filter_文件状态": status,
+                   **range_filter_kwargs("test_cases", bounds)}
+            ), "csv", request)),
+            inputs=inputs,
             outputs=[download_file]
         )
         
         export_excel_btn.click(
-            fn=lambda df: export_data("test_cases", df, "excel"),
-            inputs=[data_display],
+            fn=export_event(lambda search, cat, lab, frame, status, cols, order, *bounds, request=None: export_data("test_cases", lambda: query_data(
+                "test_cases", search, cols, order,
+                **{"filter_类别": cat, "filter_标签": lab, "filter_框架": frame, "filter_文件状态": status,
+                   **range_filter_kwargs("test_cases", bounds)}
+            ), "excel", request)),
+            inputs=inputs,
             outputs=[download_file]
         )
         
         export_json_btn.click(
-            fn=lambda df: export_data("test_cases", df, "json"),
-            inputs=[data_display],
+            fn=export_event(lambda search, cat, lab, frame, status, cols, order, *bounds, request=None: export_data("test_cases", lambda: query_data(
+                "test_cases", search, cols, order,
+                **{"filter_类别": cat, "filter_标签": lab, "filter_框架": frame, "filter_文件状态": status,
+                   **range_filter_kwargs("test_cases", bounds)}
+            ), "json", request)),
+            inputs=inputs,
             outputs=[download_file]
         )
-        
-        # 初始化数据加载
-        # 在Gradio 4.x中，我们在组件创建时直接设置初始值
     
-    return tab
\ No newline at end of file
+    return tab
+
+def format_stats_markdown(table_name: str, stats: Dict[str, Any]) -> str:
+    """把物化的汇总统计渲染为Markdown"""
+    table_config = TABLE_CONFIG[table_name]
+    if stats.get("pending"):
+        return f"### {table_config['name']}\n⏳ 汇总统计首次计算中，请稍后刷新页面查看"
+    columns = table_config["columns"]
+    refreshed = datetime.fromtimestamp(stats["refreshed_at"]).strftime("%Y-%m-%d %H:%M:%S")
+    lines = [
+        f"### {table_config['name']}",
+        f"总计 **{stats['total']:,}** 条 | 🕒 汇总更新于 {refreshed}（计算耗时 {stats['seconds']:.2f}s）",
+        "",
+        "| 列 | 去重数 | 非空 | 空值 |",
+        "| --- | ---: | ---: | ---: |"
+    ]
+    for column, column_stats in stats["columns"].items():
+        lines.append(f"| {columns.get(column, column)} | {column_stats['unique_count']:,} | "
+                     f"{column_stats['non_null_count']:,} | {column_stats['null_count']:,} |")
+    
+    for column, histogram in stats["histograms"].items():
+        values = " · ".join(f"{value} {count:,}" for value, count in histogram.items())
+        lines.extend(["", f"**{columns.get(column, column)}**: {values or '无数据'}"])
+    
+    measures = [("model_size", "模型大小(MB)"), ("params", "参数量"), ("flops", "FLOPs")]
+    
+    def measure_cell(summary: Dict[str, Any]) -> str:
+        if not summary["count"]:
+            return "-"
+        percentiles = " · ".join(f"P{q} {format_number(summary[f'p{q}'])}" for q in STATS_CONFIG["percentiles"])
+        return f"合计 {format_number(summary['sum'])} · {percentiles}"
+    
+    for group_column, groups in stats["groups"].items():
+        if group_column == "all":
+            continue
+        lines.extend([
+            "",
+            f"| {columns.get(group_column, group_column)} | 用例数 | " + " | ".join(name for _, name in measures) + " |",
+            "| --- | ---: | " + " | ".join("---" for _ in measures) + " |"
+        ])
+        rows = list(groups.items())
+        if "all" in stats["groups"]:
+            rows.append(("**全部**", stats["groups"]["all"]))
+        for value, group in rows:
+            lines.append(f"| {value} | {group['count']:,} | "
+                         + " | ".join(measure_cell(group[m]) for m, _ in measures) + " |")
+    
+    return "\n".join(lines)
+
+def load_stats_panel(refresh: bool = False) -> Tuple[str, ...]:
+    """读取（refresh 为 True 时重新计算）各表的汇总统计并渲染"""
+    panels = []
+    for table_name in TABLE_CONFIG:
+        try:
+            stats = db_manager.stats.refresh(table_name) if refresh else db_manager.stats.get(table_name)
+            panels.append(format_stats_markdown(table_name, stats))
+        except Exception as e:
+            panels.append(f"❌ **{TABLE_CONFIG[table_name]['name']}**: 统计加载失败 - {str(e)}")
+    return tuple(panels)
+
+def create_stats_tab() -> gr.Tab:
+    """创建统计汇总标签页"""
+    with gr.Tab("📈 统计") as tab:
+        gr.Markdown("## 📈 统计汇总")
+        gr.Markdown("各表的列统计、选项分布和测试用例规模汇总，数据变更后自动刷新。")
+        
+        refresh_btn = gr.Button("🔄 重新计算", variant="secondary")
+        panels = [gr.Markdown("📊 统计加载中...", elem_classes=["stats-box"]) for _ in TABLE_CONFIG]
+        
+        # 页面加载时读取物化的汇总（不扫描数据表）
+        gr.on(triggers=None, fn=lambda: load_stats_panel(False), inputs=[], outputs=panels)
+        refresh_btn.click(fn=lambda: load_stats_panel(True), inputs=[], outputs=panels)
+    
+    return tab
@@ -14,7 +14,13 @@ APP_CONFIG = {
     "server_name": os.getenv("GRADIO_SERVER_NAME", "0.0.0.0"),
     "server_port": int(os.getenv("GRADIO_SERVER_PORT", "7860")),
     "debug": os.getenv("GRADIO_DEBUG", "true").lower() == "true",
-    "share": os.getenv("GRADIO_SHARE", "false").lower() == "true"
+    "share": os.getenv("GRADIO_SHARE", "false").lower() == "true",
+    # 工作进程数，大于1时在 server_port 起的连续端口上各启动一个进程（由nginx负载均衡）
+    "workers": int(os.getenv("APP_WORKERS", "1")),
+    # 启动时数据库连接检查: background(后台线程) / blocking(阻塞启动) / off(跳过)
+    "startup_db_check": os.getenv("STARTUP_DB_CHECK", "background"),
+    # 服务就绪后在后台预加载的模块，避免首次导出时付出导入开销
+    "preload_modules": ["openpyxl"]
 }
 
 # 界面配置
@@ -35,7 +41,10 @@ DB_CONFIG = {
     "max_retries": 3,
     "retry_delay": 1,
     "pool_size": 5,
-    "charset": "utf8mb4"
+    "charset": "utf8mb4",
+    # 批量写入：每批 executemany 的行数、每个事务提交的行数
+    "write_batch_size": int(os.getenv("DB_WRITE_BATCH_SIZE", "1000")),
+    "write_commit_every": int(os.getenv("DB_WRITE_COMMIT_EVERY", "20000"))
 }
 
 # 导出配置
@@ -59,9 +68,147 @@ LOG_CONFIG = {
 # 性能配置
 PERFORMANCE_CONFIG = {
     "enable_monitoring": True,
-    "cache_enabled": False,
+    "cache_enabled": os.getenv("CACHE_ENABLED", "false").lower() == "true",
     "cache_ttl": 300,  # 5分钟
-    "max_concurrent_requests": 10
+    # 缓存后端: memory(进程内) / shared(同一主机的多个工作进程共享)
+    "cache_backend": os.getenv("CACHE_BACKEND", "memory"),
+    "cache_path": os.getenv("CACHE_PATH", ""),  # shared后端的缓存文件，默认位于 /dev/shm
+    "cache_max_entries": 256,
+    "cache_max_bytes": 256 * 1024 * 1024,  # 256MB
+    "max_concurrent_requests": 10,  # 每个进程同时执行的未命中缓存的查询数，命中缓存的请求不受限制
+    "queue_timeout": float(os.getenv("QUERY_QUEUE_TIMEOUT", "2"))  # 等待执行名额的秒数，超时返回“服务繁忙”（503）
+}
+
+# 语句级查询超时（秒，0表示不限制，见 query_control.py）：MySQL 使用 MAX_EXECUTION_TIME 优化器提示，
+# SQLite 使用进度回调中断；超时的查询接口返回504，界面提示缩小搜索范围
+QUERY_TIMEOUT_CONFIG = {
+    "search": float(os.getenv("QUERY_TIMEOUT_SEARCH", "20")),  # 全局搜索（所有列的 LIKE 扫描）
+    "filter": float(os.getenv("QUERY_TIMEOUT_FILTER", "30")),  # 筛选、计数、分页、排序和导出
+    "default": float(os.getenv("QUERY_TIMEOUT_DEFAULT", "0")),  # 其他只读查询（统计汇总刷新、完整性扫描等后台任务）
+    # 请求取消、客户端断开或关闭标签页时终止正在执行的查询（MySQL 在旁路连接上执行 KILL QUERY）
+    "kill_on_disconnect": os.getenv("QUERY_KILL_ON_DISCONNECT", "true").lower() == "true"
+}
+
+# 降级只读模式配置（见 snapshot.py）：定期把各表保存为本地 SQLite 快照，数据库不可用时从快照提供筛选和搜索
+SNAPSHOT_CONFIG = {
+    "enabled": os.getenv("SNAPSHOT_ENABLED", "true").lower() == "true",
+    "path": os.getenv("SNAPSHOT_PATH", "data/snapshot.db"),
+    "tables": ["dataset_index", "test_cases", "table_stats"],
+    "refresh_interval": int(os.getenv("SNAPSHOT_REFRESH_INTERVAL", "3600")),  # 快照刷新间隔（秒）
+    "check_interval": 60,  # 检查快照是否需要刷新的间隔（秒）
+    "page_size": 5000,  # 复制时每批读取的行数
+    # 熔断器：连续失败次数达到阈值后停止连接数据库，冷却期后放行一次探测，探测失败时冷却期加倍
+    "failure_threshold": int(os.getenv("DB_BREAKER_THRESHOLD", "3")),
+    "reset_timeout": float(os.getenv("DB_BREAKER_RESET_TIMEOUT", "5")),
+    "max_reset_timeout": 60.0
+}
+
+# 查询缓存预热配置（启用查询缓存时生效，见 cache_warmer.py）
+CACHE_WARMUP_CONFIG = {
+    "enabled": os.getenv("CACHE_WARMUP", "true").lower() == "true",
+    "top_n": int(os.getenv("CACHE_WARMUP_TOP_N", "20")),  # 除固定视图外预热的最常用筛选/搜索组合数
+    # 固定预热的视图：无筛选视图，以及这些列的每个单选筛选
+    "seed_columns": {
+        "dataset_index": ["positive_target"],
+        "test_cases": ["category", "framework"]
+    },
+    "delay": 3,  # 数据变更后延迟预热（秒），合并连续写入
+    "check_interval": 30,  # 检查其他进程的数据变更（共享缓存版本号）和缓存过期的间隔（秒）
+    "max_views": 1000,  # 频率表保留的不同视图数上限，超出时丢弃最少使用的视图
+    "state_path": os.getenv("CACHE_WARMUP_STATE", "data/cache_warmup.json")  # 频率表，重启和部署后保留
+}
+
+# 表格显示配置
+GRID_CONFIG = {
+    # virtual: 虚拟滚动表格，浏览器只请求可见窗口的行；dataframe: 一次性传输全部结果
+    "mode": os.getenv("GRID_MODE", "virtual"),
+    "page_size": 200,  # 每次请求的行数
+    "overscan": 40,  # 可见区域上下额外渲染的行数
+    "max_window": 1000,  # 单次请求允许的最大行数
+    "row_height": 34,  # 行高（像素）
+    "height": 600,  # 表格可视区域高度（像素）
+    "cached_pages": 50,  # 浏览器端保留的页数
+    "preview_delay": 150,  # 滚动停止该毫秒数后才请求可见行的缩略图
+    # 行窗口传输格式: compact(低基数列字典编码、路径前缀压缩) / json(逐行列表)
+    "wire_format": os.getenv("GRID_WIRE_FORMAT", "compact")
+}
+
+# HTTP响应配置
+HTTP_CONFIG = {
+    # 数据接口、导出下载和静态脚本的响应压缩（br需安装brotli，否则使用gzip）
+    "compression": os.getenv("HTTP_COMPRESSION", "true").lower() == "true",
+    "compression_min_size": int(os.getenv("HTTP_COMPRESSION_MIN_SIZE", "1024")),  # 小于该字节数的响应不压缩
+    "compress_paths": ["/api/", "/static/", "/gradio_api/file="],
+    "compress_types": ["application/json", "application/x-ndjson", "application/javascript", "text/"],
+    "gzip_level": 6,
+    "brotli_quality": 5,
+    # 数据接口与导出下载带 ETag，浏览器缓存但每次使用前重新验证
+    "cache_control": "private, no-cache"
+}
+
+# REST查询接口配置（/api/{table}）
+API_CONFIG = {
+    "default_limit": 1000,  # JSON格式未指定 limit 时返回的行数
+    "max_limit": 10000,  # JSON格式单次请求允许的最大行数
+    "stream_batch_size": 5000  # NDJSON流式输出时每次查询的行数
+}
+
+# 数据导入配置
+INGEST_CONFIG = {
+    "workers": int(os.getenv("INGEST_WORKERS", "0")),  # 文件解析进程数，0表示CPU核数
+    "batch_size": 1000,  # 每条多行INSERT的行数
+    "commit_every": 20000,  # 每个事务提交的行数
+    "parse_chunksize": 256,  # 每次分发给解析进程的文件组数
+    "manifest_path": os.getenv("INGEST_MANIFEST", "data/ingest_manifest.db"),  # 增量导入清单
+    "default_category": "模型",  # 测试用例JSON配置未指定类别时使用
+    "metadata_cache_path": os.getenv("MODEL_METADATA_CACHE", "data/model_metadata.db"),  # 模型元数据提取结果缓存
+    "flops_per_mac": 1  # 一次乘加计为几次运算（FLOPs口径）
+}
+
+# 统计汇总配置
+STATS_CONFIG = {
+    "refresh_delay": float(os.getenv("STATS_REFRESH_DELAY", "2")),  # 数据变更后延迟刷新（秒），合并连续写入
+    "max_age": int(os.getenv("STATS_MAX_AGE", "600")),  # 超过该时间（秒）的汇总在读取时后台刷新
+    "percentiles": [50, 90, 99]  # test_cases 模型大小/参数量/FLOPs 的分位数
+}
+
+# 近似重复图像配置（感知哈希）
+DEDUP_CONFIG = {
+    "max_distance": int(os.getenv("DEDUP_MAX_DISTANCE", "8")),  # 默认相似阈值：64位哈希的最大汉明距离
+    "max_results": 100,  # 相似图像接口默认返回的最大行数
+    # 相似图像索引：最多每隔该秒数检查一次哈希数量是否变化（其他进程写入），变化时重建
+    "index_check_interval": float(os.getenv("DEDUP_INDEX_CHECK_SECONDS", "10")),
+    # 索引的最长使用时间（秒），到期重建，覆盖数量不变的哈希更新
+    "index_max_age": float(os.getenv("DEDUP_INDEX_MAX_AGE", "600"))
+}
+
+# 缩略图配置（dataset_index 的BMP预览）
+THUMBNAIL_CONFIG = {
+    "size": 128,  # 默认缩略图最长边（像素）
+    "max_size": 512,  # 接口允许的最大尺寸
+    # 编码格式: webp / jpeg（需安装Pillow，未安装时使用png）
+    "format": os.getenv("THUMBNAIL_FORMAT", "webp"),
+    "quality": 80,
+    "cache_dir": os.getenv("THUMBNAIL_CACHE_DIR", "data/thumbnails"),
+    "max_cache_mb": int(os.getenv("THUMBNAIL_CACHE_MB", "512")),  # 磁盘缓存上限，超出后删除最久未使用的缩略图
+    "workers": int(os.getenv("THUMBNAIL_WORKERS", "2")),  # 生成缩略图的进程数
+    "max_pending": 64,  # 排队中的生成任务上限，超出时返回503
+    "cache_control": "private, max-age=86400"
+}
+
+# YUV帧配置（yuv_path 的原始帧，尺寸取 image_width/image_height）
+YUV_CONFIG = {
+    "layout": os.getenv("YUV_LAYOUT", "NV12"),  # 默认布局: I420 / NV12 / NV21 / YUYV
+    "full_range": os.getenv("YUV_FULL_RANGE", "false").lower() == "true"  # BT.601 全范围（默认有限范围 16-235）
+}
+
+# 文件完整性扫描配置（路径列引用的文件，见 integrity.py）
+INTEGRITY_CONFIG = {
+    "workers": int(os.getenv("INTEGRITY_WORKERS", "32")),  # 并发stat的线程数（网络存储上stat以等待为主，可适当调大）
+    "read_workers": int(os.getenv("INTEGRITY_READ_WORKERS", "4")),  # 校验和模式下同时流式读取的文件数
+    "page_size": 5000,  # 每批按主键顺序读取并检查的行数，每批完成后保存进度
+    "checkpoint_path": os.getenv("INTEGRITY_CHECKPOINT", "data/integrity_checkpoint.json"),  # 断点续扫进度文件
+    "max_reported": 1000  # 结果中列出的问题文件数上限（全部问题行均写入 file_status）
 }
 
 # 安全配置
@@ -69,9 +216,18 @@ SECURITY_CONFIG = {
     "enable_auth": False,
     "allowed_origins": ["*"],
     "max_request_size": 100 * 1024 * 1024,  # 100MB
+    # 按客户端（nginx 转发的 X-Real-IP）的令牌桶限流，查询与导出各自独立预算，超出时返回429
     "rate_limit": {
-        "enabled": False,
-        "requests_per_minute": 60
+        "enabled": os.getenv("RATE_LIMIT_ENABLED", "false").lower() == "true",
+        "requests_per_minute": int(os.getenv("RATE_LIMIT_PER_MINUTE", "60")),  # 表格、搜索筛选与REST查询
+        "burst": 30,  # 查询的突发容量（快速滚动表格时的连续行窗口请求）
+        "exports_per_minute": int(os.getenv("RATE_LIMIT_EXPORTS_PER_MINUTE", "6")),
+        "export_burst": 3,
+        "client_header": "X-Real-IP",
+        # 只信任来自这些地址（nginx）的 client_header，其他对端直接以连接地址区分；默认本机和Docker网络
+        "trusted_proxies": [item.strip() for item in os.getenv(
+            "RATE_LIMIT_TRUSTED_PROXIES", "127.0.0.0/8,::1,172.16.0.0/12").split(",") if item.strip()],
+        "max_clients": 10000  # 保留令牌桶的客户端数上限
     }
 }
 
@@ -94,6 +250,18 @@ def get_config(section: str = None) -> Dict[str, Any]:
         "export": EXPORT_CONFIG,
         "log": LOG_CONFIG,
         "performance": PERFORMANCE_CONFIG,
+        "query_timeout": QUERY_TIMEOUT_CONFIG,
+        "snapshot": SNAPSHOT_CONFIG,
+        "grid": GRID_CONFIG,
+        "http": HTTP_CONFIG,
+        "api": API_CONFIG,
+        "ingest": INGEST_CONFIG,
+        "stats": STATS_CONFIG,
+        "dedup": DEDUP_CONFIG,
+        "thumbnail": THUMBNAIL_CONFIG,
+        "yuv": YUV_CONFIG,
+        "integrity": INTEGRITY_CONFIG,
+        "cache_warmup": CACHE_WARMUP_CONFIG,
         "security": SECURITY_CONFIG,
         "features": FEATURE_FLAGS
     }
@@ -2,160 +2,651 @@
 数据库操作模块
 Database operations module for Gradio app
 """
-import mysql.connector
-from mysql.connector import Error
-import pandas as pd
-from typing import List, Dict, Any, Optional, Tuple
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import chain, islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 import logging
-from database_config import DATABASE_CONFIG, TABLE_CONFIG
-import json
+import math
+import time
+from backends import DatabaseUnavailable, StorageBackend, create_backend
+from cache import CacheBackend, get_query_cache
+from config import DB_CONFIG, PERFORMANCE_CONFIG, SNAPSHOT_CONFIG
+from database_config import DATABASE_CONFIG, REPLICA_CONFIG, TABLE_CONFIG
+from lazy_imports import lazy_import
+from query_control import query_timeout, track_query
+from rate_limit import LoadShedder
+from snapshot import CircuitBreaker, SnapshotStore, get_snapshot_store, staleness_notice
+from stats import StatsManager
+
+# 重量级依赖延迟到首次查询时再导入
+pd = lazy_import("pandas")
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 为 True 时当前上下文中的读查询使用主库（见 DatabaseManager.primary_reads）
+_primary_reads: ContextVar[bool] = ContextVar("primary_reads", default=False)
+
 class DatabaseManager:
     """数据库管理器"""
     
-    def __init__(self):
+    def __init__(self, backend: Optional[StorageBackend] = None, cache: Optional[CacheBackend] = None,
+                 snapshot: Optional[SnapshotStore] = None):
         self.config = DATABASE_CONFIG
         self.table_config = TABLE_CONFIG
+        self.backend = backend or create_backend()
+        self._cache = cache
+        # 降级只读模式：连接熔断器，以及数据库不可用时提供读取的本地快照（嵌入式 SQLite 后端不需要快照）
+        self.breaker = CircuitBreaker()
+        if snapshot is None and SNAPSHOT_CONFIG["enabled"] and self.backend.name != "sqlite":
+            snapshot = get_snapshot_store()
+        self.snapshot = snapshot
+        self._invalidation_hooks: List[Callable[[str], None]] = []
+        # 本进程最后一次写入各表的时间（单调时钟），写后短时间内该表的读查询使用主库
+        self._written_at: Dict[str, float] = {}
+        # 过载保护：限制同时执行的未命中缓存的查询，命中缓存的读取不受影响
+        self.load_shedder = LoadShedder()
+        # 物化汇总统计，数据变更后经失效回调刷新
+        self.stats = StatsManager(self)
+    
+    @property
+    def cache(self) -> Optional[CacheBackend]:
+        """查询缓存，未启用时为 None"""
+        if self._cache is None and PERFORMANCE_CONFIG["cache_enabled"]:
+            self._cache = get_query_cache()
+        return self._cache
     
-    def get_connection(self):
-        """获取数据库连接"""
+    def get_connection(self, read_only: bool = False):
+        """获取数据库连接，read_only 为 True 时可路由到只读副本
+
+        熔断器打开期间不尝试连接，直接抛出 DatabaseUnavailable。
+        """
+        if not self.breaker.allow():
+            raise DatabaseUnavailable(self.breaker.retry_after())
         try:
-            connection = mysql.connector.connect(**self.config)
-            if connection.is_connected():
-                logger.info("数据库连接成功")
-                return connection
-        except Error as e:
+            connection = self.backend.connect(read_only=read_only)
+        except Exception as e:
             logger.error(f"数据库连接失败: {e}")
+            self._record_failure(e)
             raise e
+        logger.info("数据库连接成功")
+        self._record_success()
+        return connection
+    
+    def _record_failure(self, error: Exception) -> None:
+        if self.breaker.record_failure(error):
+            if self.serving_snapshot:
+                logger.warning(f"数据库不可用，切换到只读快照模式（快照时间 {self.snapshot.status()['taken_at']}）")
+            self._invalidate_source()
+    
+    def _record_success(self) -> None:
+        if self.breaker.record_success():
+            logger.info("数据库连接已恢复")
+            self._invalidate_source()
+    
+    def _invalidate_source(self) -> None:
+        """切换数据来源（数据库与快照）后，使缓存的结果失效"""
+        self.invalidate_cache(notify=False)
+    
+    @property
+    def serving_snapshot(self) -> bool:
+        """数据库连接失败且有可用快照时，读取由快照提供"""
+        return self.snapshot is not None and not self.breaker.healthy and self.snapshot.available()
+    
+    def degraded_notice(self) -> str:
+        """只读快照模式的提示横幅，正常时为空"""
+        return staleness_notice(self.snapshot.taken_at()) if self.serving_snapshot else ""
+    
+    @contextmanager
+    def primary_reads(self) -> Iterator[None]:
+        """作用域内的读查询使用主库，不受只读副本复制延迟影响（数据变更后的统计刷新和缓存预热）"""
+        reset = _primary_reads.set(True)
+        try:
+            yield
+        finally:
+            _primary_reads.reset(reset)
+    
+    def _read_only(self, table_name: Optional[str] = None) -> bool:
+        """读查询是否可以路由到只读副本
+
+        primary_reads 作用域内，或本进程在 read_your_writes 秒内写入过该表时使用主库，
+        避免刚写入的数据因副本复制延迟而读不到（读己之写）。
+        """
+        if _primary_reads.get():
+            return False
+        written_at = self._written_at.get(table_name) if table_name else None
+        return written_at is None or time.monotonic() - written_at >= REPLICA_CONFIG["read_your_writes"]
+    
+    def _run_query(self, query: str, params: Optional[List] = None, kind: str = "default",
+                   table_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """执行只读查询，数据库异常直接抛出
+
+        kind 为查询类别（search / filter / default），决定语句超时（QUERY_TIMEOUT_CONFIG），
+        超时抛出 QueryTimeout；所属请求被取消时查询被终止并抛出 QueryCancelled。
+        table_name 为查询的表，刚写入过该表时查询使用主库（见 _read_only）。
+        数据库不可用（连接失败、连接断开或熔断器打开）且有快照时，改为在快照上执行。
+        """
+        try:
+            connection = self.get_connection(read_only=self._read_only(table_name))
+        except self.backend.error_types:
+            if self.serving_snapshot:
+                return self.snapshot.fetch_all(query, params, timeout=query_timeout(kind))
+            raise
+        try:
+            with track_query(self.backend, connection):
+                return self.backend.fetch_all(connection, query, params, timeout=query_timeout(kind))
+        except self.backend.error_types as e:
+            if not self.backend.is_unavailable(e):
+                raise
+            self._record_failure(e)
+            if self.serving_snapshot:
+                return self.snapshot.fetch_all(query, params, timeout=query_timeout(kind))
+            raise
+        finally:
+            self.backend.release(connection)
     
     def execute_query(self, query: str, params: Optional[List] = None) -> List[Dict[str, Any]]:
-        """执行查询并返回结果"""
-        connection = None
+        """执行只读查询并返回结果"""
         try:
-            connection = self.get_connection()
-            cursor = connection.cursor(dictionary=True)
-            
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            results = cursor.fetchall()
-            return results
-            
-        except Error as e:
+            return self._run_query(query, params)
+        except self.backend.error_types as e:
             logger.error(f"查询执行失败: {e}")
             return []
-        finally:
-            if connection and connection.is_connected():
-                cursor.close()
-                connection.close()
-    
-    def get_all_data(self, table_name: str) -> pd.DataFrame:
-        """获取表的所有数据"""
-        query = f"SELECT * FROM {table_name}"
-        results = self.execute_query(query)
-        
-        if results:
+    
+    def _cached(self, table_name: str, key: Any, loader):
+        """通过查询缓存获取结果，失败的查询不会被缓存
+
+        未命中时在过载保护的名额内执行查询，等待超时抛出 Overloaded。
+        只读快照模式下不使用缓存，数据库恢复后的第一个请求即可探测到并切回数据库。
+        """
+        def guarded():
+            with self.load_shedder.slot():
+                return loader()
+
+        cache = self.cache
+        if cache is None or self.serving_snapshot:
+            return guarded()
+        return cache.get_or_set(table_name, key, guarded)
+    
+    def cached_query(self, table_name: str, query: str, params: Optional[List] = None,
+                     kind: str = "default") -> List[Dict[str, Any]]:
+        """执行只读查询，结果按表缓存"""
+        try:
+            return self._cached(table_name, ("rows", query, tuple(params or [])),
+                                lambda: self._run_query(query, params, kind, table_name))
+        except self.backend.error_types as e:
+            logger.error(f"查询执行失败: {e}")
+            return []
+    
+    def query_dataframe(self, table_name: str, query: str, params: Optional[List] = None,
+                        kind: str = "default") -> pd.DataFrame:
+        """执行查询并返回中文列名的DataFrame，结果按表缓存
+
+        缓存命中时多个调用方共享同一个DataFrame，调用方不应原地修改返回值。
+        """
+        def load() -> pd.DataFrame:
+            results = self._run_query(query, params, kind, table_name)
+            if not results:
+                return pd.DataFrame()
             df = pd.DataFrame(results)
             # 重命名列为中文
             if table_name in self.table_config:
-                column_mapping = self.table_config[table_name]["columns"]
-                df = df.rename(columns=column_mapping)
+                df = df.rename(columns=self.table_config[table_name]["columns"])
             return df
-        else:
+        
+        try:
+            return self._cached(table_name, ("frame", query, tuple(params or [])), load)
+        except self.backend.error_types as e:
+            logger.error(f"查询执行失败: {e}")
             return pd.DataFrame()
     
-    def filter_data(self, table_name: str, filters: Dict[str, List[str]]) -> pd.DataFrame:
-        """根据筛选条件获取数据"""
-        if not filters:
-            return self.get_all_data(table_name)
+    def add_invalidation_hook(self, hook: Callable[[str], None]) -> None:
+        """注册缓存失效回调，表数据变更后以表名调用"""
+        self._invalidation_hooks.append(hook)
+    
+    def invalidate_cache(self, table_name: Optional[str] = None, notify: bool = True) -> None:
+        """使表（默认所有表）的缓存失效，共享缓存下对所有工作进程生效
+
+        notify 为 False 时不调用失效回调（数据未变化，只是数据来源切换）。
+        """
+        cache = self.cache
+        for name in ([table_name] if table_name else list(self.table_config.keys())):
+            if cache is not None:
+                cache.bump_version(name)
+            if not notify:
+                continue
+            for hook in self._invalidation_hooks:
+                try:
+                    hook(name)
+                except Exception as e:
+                    logger.error(f"缓存失效回调失败: {e}")
+    
+    def data_version(self, table_name: str) -> int:
+        """表的缓存版本号：随 invalidate_cache 递增（共享缓存下跨进程一致），未启用缓存时为0
+
+        只反映经写入接口的变更，不能作为数据是否变化的依据（HTTP 条件请求使用内容 ETag）。
+        """
+        cache = self.cache
+        return cache.get_version(table_name) if cache is not None else 0
+    
+    # ---- 批量写入 ----
+    
+    def resolve_columns(self, table_name: str, columns: Iterable[str]) -> List[str]:
+        """把中文列名或原始列名统一转换为原始列名，未知列抛出 ValueError"""
+        column_mapping = self.table_config[table_name]["columns"]
+        reverse_mapping = {v: k for k, v in column_mapping.items()}
+        resolved = []
+        for column in columns:
+            original = column if column in column_mapping else reverse_mapping.get(column)
+            if original is None:
+                raise ValueError(f"表 {table_name} 中不存在列: {column}")
+            resolved.append(original)
+        if len(set(resolved)) != len(resolved):
+            raise ValueError(f"列重复: {list(columns)}")
+        return resolved
+    
+    def _row_tuples(self, table_name: str, rows: Union["pd.DataFrame", Iterable[Any]],
+                    columns: Optional[Sequence[str]]) -> Tuple[List[str], Iterator[tuple]]:
+        """把 DataFrame、字典行或元组行统一为 (原始列名, 元组迭代器)
+
+        元组行需要通过 columns 指定列顺序；字典行以第一行的键为列，
+        之后每一行必须包含相同的列。
+        """
+        if hasattr(rows, "itertuples"):
+            names = list(columns or rows.columns)
+            # 转为 object 后 NaN 替换为 None、numpy 标量转为 Python 类型，驱动才能直接绑定
+            frame = rows[names].astype(object)
+            frame = frame.where(frame.notna(), None)
+            return self.resolve_columns(table_name, names), frame.itertuples(index=False, name=None)
         
+        iterator = iter(rows)
+        first = next(iterator, None)
+        if first is None:
+            return self.resolve_columns(table_name, columns or []), iter(())
+        if isinstance(first, dict):
+            names = list(columns or first.keys())
+            
+            def tuples() -> Iterator[tuple]:
+                for row in chain([first], iterator):
+                    try:
+                        yield tuple(row[name] for name in names)
+                    except KeyError as e:
+                        raise ValueError(f"行缺少列 {e}: {row}") from None
+            
+            return self.resolve_columns(table_name, names), tuples()
+        if not columns:
+            raise ValueError("元组行必须指定 columns")
+        return self.resolve_columns(table_name, columns), map(tuple, chain([first], iterator))
+    
+    def execute_batches(self, table_name: str, query: str, rows: Iterable[Sequence[Any]],
+                        batch_size: Optional[int] = None, commit_every: Optional[int] = None) -> int:
+        """分批执行写语句，每 commit_every 行提交一次事务，返回写入的行数
+
+        MySQL 驱动会把 executemany 的 INSERT 合并为多行 VALUES 语句，每个批次只需
+        一次网络往返。每个事务显式开始（MySQL 连接默认 autocommit），出错时只回滚
+        未提交的事务，已提交的批次保留；只要有批次提交（或执行后未能回滚），
+        就使该表的缓存失效并触发失效回调。
+        """
+        batch_size = batch_size or DB_CONFIG["write_batch_size"]
+        commit_every = commit_every or DB_CONFIG["write_commit_every"]
+        iterator = iter(rows)
+        written = pending = 0
+        uncertain = False
+        connection = self.get_connection()
+        try:
+            self.backend.begin(connection)
+            while True:
+                batch = list(islice(iterator, batch_size))
+                if not batch:
+                    break
+                pending += len(batch)
+                self.backend.execute_many(connection, query, batch)
+                if pending >= commit_every:
+                    connection.commit()
+                    written += pending
+                    pending = 0
+                    logger.info(f"{table_name} 已写入 {written} 行")
+                    self.backend.begin(connection)
+            connection.commit()
+            written += pending
+            pending = 0
+        except Exception:
+            try:
+                connection.rollback()
+            except Exception as e:
+                # 无法确认未提交的批次是否生效，按已写入处理
+                uncertain = pending > 0
+                logger.error(f"{table_name} 回滚失败: {e}")
+            raise
+        finally:
+            self.backend.release(connection)
+            if written or uncertain:
+                self._written_at[table_name] = time.monotonic()
+                self.invalidate_cache(table_name)
+        return written
+    
+    def insert_rows(self, table_name: str, rows: Union["pd.DataFrame", Iterable[Any]],
+                    columns: Optional[Sequence[str]] = None, batch_size: Optional[int] = None,
+                    commit_every: Optional[int] = None) -> int:
+        """批量插入行，返回写入的行数
+
+        rows 可以是 DataFrame、字典列表或元组列表（需指定 columns），
+        列名可使用中文列名或原始列名。
+        """
+        names, tuples = self._row_tuples(table_name, rows, columns)
+        if not names:
+            return 0
+        query = self.backend.insert_sql(table_name, names)
+        return self.execute_batches(table_name, query, tuples, batch_size, commit_every)
+    
+    def upsert_rows(self, table_name: str, rows: Union["pd.DataFrame", Iterable[Any]],
+                    columns: Optional[Sequence[str]] = None, key_columns: Optional[Sequence[str]] = None,
+                    update_columns: Optional[Sequence[str]] = None, batch_size: Optional[int] = None,
+                    commit_every: Optional[int] = None) -> int:
+        """批量插入或更新行，返回处理的行数
+
+        key_columns 默认为表的主键，也可以指定其他唯一索引的列（例如
+        dataset_index 的仓库+图像名称）；键列必须出现在写入的列中。
+        update_columns 默认为除键列外的全部写入列。
+        """
+        names, tuples = self._row_tuples(table_name, rows, columns)
+        if not names:
+            return 0
+        keys = self.resolve_columns(table_name, key_columns or [self.table_config[table_name]["primary_key"]])
+        missing = [key for key in keys if key not in names]
+        if missing:
+            raise ValueError(f"写入的列中缺少键列: {missing}")
+        updates = self.resolve_columns(table_name, update_columns) if update_columns else None
+        if not (updates or [name for name in names if name not in keys]):
+            raise ValueError("没有可更新的列")
+        query = self.backend.upsert_sql(table_name, names, keys, updates)
+        return self.execute_batches(table_name, query, tuples, batch_size, commit_every)
+    
+    def quote(self, column: str) -> str:
+        """按后端方言引用列名"""
+        return self.backend.quote(column)
+    
+    def select_list(self, table_name: str, columns: Optional[Iterable[str]] = None) -> str:
+        """SELECT 的列清单：columns 为中文或原始列名，None 表示所有列，未知列抛出 ValueError"""
+        if columns is None:
+            return "*"
+        resolved = self.resolve_columns(table_name, columns)
+        if not resolved:
+            raise ValueError("至少需要选择一列")
+        return ", ".join(self.quote(column) for column in resolved)
+    
+    def sort_keys(self, table_name: str, sort: Optional[Iterable[str]] = None) -> List[Tuple[str, bool]]:
+        """排序键：(原始列名, 是否降序) 列表，以主键结尾，唯一确定每一行的位置
+
+        sort 为列名列表（中文或原始列名，前缀 - 表示降序），只允许主键和 sortable_columns
+        中有索引的列，其余列抛出 ValueError。末尾追加与最后一个排序列同方向的主键。
+        """
+        config = self.table_config[table_name]
+        primary_key = config["primary_key"]
+        sortable = set(config.get("sortable_columns", []))
+        keys: List[Tuple[str, bool]] = []
+        seen = set()
+        descending = False
+        for item in sort or []:
+            name = item.strip()
+            if not name:
+                continue
+            column = self.resolve_columns(table_name, [name.lstrip("+-").strip()])[0]
+            if column != primary_key and column not in sortable:
+                raise ValueError(f"列不支持排序: {name.lstrip('+-').strip()}")
+            if column in seen:
+                continue
+            seen.add(column)
+            descending = name.startswith("-")
+            keys.append((column, descending))
+            if column == primary_key:
+                break
+        if primary_key not in seen:
+            keys.append((primary_key, descending))
+        return keys
+    
+    def order_clause(self, table_name: str, sort: Optional[Iterable[str]] = None) -> str:
+        """ORDER BY 子句（见 sort_keys）
+
+        以主键结尾使分页顺序稳定，且单列排序可以沿二级索引（InnoDB/SQLite 的二级索引包含主键）顺序或逆序读取。
+        """
+        return "ORDER BY " + ", ".join(f"{self.quote(column)} {'DESC' if descending else 'ASC'}"
+                                       for column, descending in self.sort_keys(table_name, sort))
+    
+    def keyset_condition(self, keys: Sequence[Tuple[str, bool]], last: Sequence[Any]) -> Tuple[str, List[Any]]:
+        """按排序键位于 last 之后的行的条件（键集分页）
+
+        展开为 (k1 之后) OR (k1 相等 AND k2 之后) OR ...；MySQL 和 SQLite 都把 NULL 视为最小值，
+        升序时排在最前、降序时排在最后。
+        """
+        branches = []
+        params: List[Any] = []
+        equal: List[str] = []
+        equal_params: List[Any] = []
+        for (column, descending), value in zip(keys, last):
+            quoted = self.quote(column)
+            if value is None:
+                after = None if descending else f"{quoted} IS NOT NULL"
+                after_params: List[Any] = []
+            else:
+                after = f"({quoted} < %s OR {quoted} IS NULL)" if descending else f"{quoted} > %s"
+                after_params = [value]
+            if after is not None:
+                branches.append(" AND ".join(equal + [after]))
+                params.extend(equal_params + after_params)
+            equal.append(f"{quoted} IS NULL" if value is None else f"{quoted} = %s")
+            equal_params.extend([] if value is None else [value])
+        if not branches:
+            return "1=0", []
+        return " OR ".join(f"({branch})" for branch in branches), params
+    
+    def get_all_data(self, table_name: str, columns: Optional[Iterable[str]] = None,
+                     sort: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """获取表的所有数据，columns 指定只获取的列，sort 指定排序"""
+        query = f"SELECT {self.select_list(table_name, columns)} FROM {table_name}"
+        if sort:
+            query += f" {self.order_clause(table_name, sort)}"
+        return self.query_dataframe(table_name, query, kind="filter")
+    
+    def range_condition(self, table_name: str, column: str, bounds: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """数值范围筛选的条件和参数
+
+        只允许 range_columns 中有索引的列，其余列或非数值的边界抛出 ValueError。
+        条件直接比较列值（BETWEEN / >= / <=），可以使用列上的二级索引做范围扫描；
+        两侧都省略时返回空条件。
+        """
+        if column not in self.table_config[table_name].get("range_columns", {}):
+            raise ValueError(f"列不支持范围筛选: {column}")
+        unknown = set(bounds) - {"min", "max"}
+        if unknown:
+            raise ValueError(f"范围筛选只支持 min/max: {', '.join(sorted(unknown))}")
+        values = {}
+        for key in ("min", "max"):
+            if bounds.get(key) is None or bounds.get(key) == "":
+                continue
+            try:
+                value = float(bounds[key])
+            except (TypeError, ValueError):
+                value = math.nan
+            if not math.isfinite(value):
+                raise ValueError(f"范围边界不是有效数值: {bounds[key]}")
+            # 整数边界按整数传入，与整数列比较时不发生类型转换
+            values[key] = int(value) if value.is_integer() else value
+        quoted = self.quote(column)
+        if len(values) == 2:
+            return f"{quoted} BETWEEN %s AND %s", [values["min"], values["max"]]
+        if "min" in values:
+            return f"{quoted} >= %s", [values["min"]]
+        if "max" in values:
+            return f"{quoted} <= %s", [values["max"]]
+        return "", []
+    
+    def build_conditions(self, table_name: str, filters: Optional[Dict[str, Any]] = None,
+                         search_text: str = "") -> Tuple[str, List[Any]]:
+        """构建 WHERE 条件和参数：有搜索词时全局搜索，否则按筛选条件
+
+        filters 的取值为列表时按取值匹配（SET 列用 FIND_IN_SET，其余列用 IN），
+        为 {"min": ..., "max": ...} 时按数值范围筛选（见 range_condition）。
+        """
         conditions = []
-        params = []
+        params: List[Any] = []
+        
+        if search_text:
+            # 在所有列中搜索
+            for column in self.table_config[table_name]["columns"].keys():
+                conditions.append(f"{self.quote(column)} LIKE %s")
+                params.append(f"%{search_text}%")
+            return " OR ".join(conditions), params
         
         # 获取原始列名映射
         column_mapping = self.table_config[table_name]["columns"]
         reverse_mapping = {v: k for k, v in column_mapping.items()}
+        filter_columns = self.table_config[table_name].get("filter_columns", {})
         
-        for column_chinese, values in filters.items():
+        for column_chinese, values in (filters or {}).items():
             if not values:
                 continue
                 
             # 转换为原始列名
             column_original = reverse_mapping.get(column_chinese, column_chinese)
             
+            if isinstance(values, dict):
+                # 数值范围：{"min": 下限, "max": 上限}，任一侧可省略
+                condition, bounds = self.range_condition(table_name, column_original, values)
+                if condition:
+                    conditions.append(condition)
+                    params.extend(bounds)
             # 检查是否为SET类型字段
-            filter_columns = self.table_config[table_name].get("filter_columns", {})
-            if column_original in filter_columns:
+            elif column_original in filter_columns:
                 # SET类型字段使用FIND_IN_SET
-                set_conditions = [f"FIND_IN_SET(%s, `{column_original}`)" for _ in values]
+                set_conditions = [f"FIND_IN_SET(%s, {self.quote(column_original)})" for _ in values]
                 conditions.append(f"({' OR '.join(set_conditions)})")
                 params.extend(values)
             else:
                 # 普通字段使用IN
                 placeholders = ', '.join(['%s'] * len(values))
-                conditions.append(f"`{column_original}` IN ({placeholders})")
+                conditions.append(f"{self.quote(column_original)} IN ({placeholders})")
                 params.extend(values)
         
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
-        query = f"SELECT * FROM {table_name} WHERE {where_clause}"
+        return (" AND ".join(conditions) if conditions else "1=1"), params
+    
+    def filter_data(self, table_name: str, filters: Dict[str, Any],
+                    columns: Optional[Iterable[str]] = None, sort: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """根据筛选条件获取数据"""
+        if not filters:
+            return self.get_all_data(table_name, columns, sort)
         
-        results = self.execute_query(query, params)
+        where_clause, params = self.build_conditions(table_name, filters)
+        query = f"SELECT {self.select_list(table_name, columns)} FROM {table_name} WHERE {where_clause}"
+        if sort:
+            query += f" {self.order_clause(table_name, sort)}"
         
-        if results:
-            df = pd.DataFrame(results)
-            # 重命名列为中文
-            df = df.rename(columns=column_mapping)
-            return df
-        else:
-            return pd.DataFrame()
+        return self.query_dataframe(table_name, query, params, kind="filter")
     
-    def search_data(self, table_name: str, search_text: str) -> pd.DataFrame:
-        """全局搜索数据"""
+    def search_data(self, table_name: str, search_text: str, columns: Optional[Iterable[str]] = None,
+                    sort: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """全局搜索数据（在所有列中匹配，columns 只限定返回的列）"""
         if not search_text:
-            return self.get_all_data(table_name)
-        
-        # 获取所有列名
-        columns = list(self.table_config[table_name]["columns"].keys())
-        
-        # 构建搜索条件
-        search_conditions = []
-        params = []
-        
-        for column in columns:
-            search_conditions.append(f"`{column}` LIKE %s")
-            params.append(f"%{search_text}%")
-        
-        where_clause = " OR ".join(search_conditions)
-        query = f"SELECT * FROM {table_name} WHERE {where_clause}"
+            return self.get_all_data(table_name, columns, sort)
         
-        results = self.execute_query(query, params)
+        where_clause, params = self.build_conditions(table_name, search_text=search_text)
+        query = f"SELECT {self.select_list(table_name, columns)} FROM {table_name} WHERE {where_clause}"
+        if sort:
+            query += f" {self.order_clause(table_name, sort)}"
         
-        if results:
-            df = pd.DataFrame(results)
-            # 重命名列为中文
-            column_mapping = self.table_config[table_name]["columns"]
-            df = df.rename(columns=column_mapping)
-            return df
+        return self.query_dataframe(table_name, query, params, kind="search")
+    
+    def count_rows(self, table_name: str, filters: Optional[Dict[str, Any]] = None,
+                   search_text: str = "") -> int:
+        """统计匹配搜索或筛选条件的行数"""
+        where_clause, params = self.build_conditions(table_name, filters, search_text)
+        result = self.cached_query(table_name, f"SELECT COUNT(*) as total FROM {table_name} WHERE {where_clause}", params,
+                                   kind="search" if search_text else "filter")
+        return int(result[0]["total"]) if result else 0
+    
+    def query_page(self, table_name: str, offset: int, limit: int,
+                   filters: Optional[Dict[str, Any]] = None, search_text: str = "",
+                   columns: Optional[Iterable[str]] = None, sort: Optional[Iterable[str]] = None,
+                   after: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+        """分页获取匹配的行（默认按主键排序），只传输需要显示的窗口和列
+
+        after 为上一页最后一行的排序键（与 sort_keys 一一对应），给出时从该行之后读取
+        （见 keyset_condition），沿索引定位而不用 OFFSET 跳过前面的行，offset 被忽略。
+        """
+        where_clause, params = self.build_conditions(table_name, filters, search_text)
+        if after is None:
+            tail, tail_params = "LIMIT %s OFFSET %s", [max(int(limit), 0), max(int(offset), 0)]
         else:
-            return pd.DataFrame()
+            keys = self.sort_keys(table_name, sort)
+            if len(after) != len(keys):
+                raise ValueError(f"排序键应有 {len(keys)} 个值")
+            keyset, keyset_params = self.keyset_condition(keys, after)
+            where_clause, params = f"({where_clause}) AND ({keyset})", params + keyset_params
+            tail, tail_params = "LIMIT %s", [max(int(limit), 0)]
+        query = (f"SELECT {self.select_list(table_name, columns)} FROM {table_name} WHERE {where_clause} "
+                 f"{self.order_clause(table_name, sort)} {tail}")
+        return self.query_dataframe(table_name, query, params + tail_params,
+                                    kind="search" if search_text else "filter")
+    
+    def iter_pages(self, table_name: str, batch_size: int, filters: Optional[Dict[str, Any]] = None,
+                   search_text: str = "", columns: Optional[Iterable[str]] = None,
+                   sort: Optional[Iterable[str]] = None, offset: int = 0,
+                   limit: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """按排序键（默认主键）分批读取匹配的行，返回中文列名的DataFrame
+
+        用于流式导出整张表：只有第一批使用 OFFSET，之后按上一批最后一行的排序键继续
+        （见 keyset_condition），每批都沿索引定位，总耗时与行数成正比。结果只使用一次，
+        不写入查询缓存，不会挤出界面常用视图的缓存。
+        """
+        keys = self.sort_keys(table_name, sort)
+        key_columns = [column for column, _ in keys]
+        selected = self.resolve_columns(table_name, columns) if columns is not None else None
+        select = ", ".join(self.quote(column) for column in chain(
+            selected, (column for column in key_columns if column not in selected)
+        )) if selected is not None else "*"
+        where_clause, params = self.build_conditions(table_name, filters, search_text)
+        order = self.order_clause(table_name, sort)
+        kind = "search" if search_text else "filter"
+        last: Optional[List[Any]] = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            if last is None:
+                condition, page_params = where_clause, list(params)
+                tail, tail_params = "LIMIT %s OFFSET %s", [size, max(int(offset), 0)]
+            else:
+                keyset, keyset_params = self.keyset_condition(keys, last)
+                condition, page_params = f"({where_clause}) AND ({keyset})", params + keyset_params
+                tail, tail_params = "LIMIT %s", [size]
+            with self.load_shedder.slot():
+                rows = self._run_query(f"SELECT {select} FROM {table_name} WHERE {condition} {order} {tail}",
+                                       page_params + tail_params, kind, table_name)
+            if not rows:
+                return
+            last = [rows[-1][column] for column in key_columns]
+            df = pd.DataFrame(rows)
+            if selected is not None:
+                df = df[selected]
+            yield df.rename(columns=self.table_config[table_name]["columns"])
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < size:
+                return
     
-    def get_table_stats(self, table_name: str, filters: Optional[Dict[str, List[str]]] = None) -> Tuple[int, int]:
+    def get_table_stats(self, table_name: str, filters: Optional[Dict[str, Any]] = None) -> Tuple[int, int]:
         """获取表统计信息"""
         # 总数
         total_query = f"SELECT COUNT(*) as total FROM {table_name}"
-        total_result = self.execute_query(total_query)
+        total_result = self.cached_query(table_name, total_query, kind="filter")
         total_count = total_result[0]["total"] if total_result else 0
         
         # 筛选后数量
         if filters:
-            filtered_df = self.filter_data(table_name, filters)
-            filtered_count = len(filtered_df)
+            filtered_count = self.count_rows(table_name, filters)
         else:
             filtered_count = total_count
         
@@ -164,10 +655,8 @@ class DatabaseManager:
     def export_to_csv(self, df: pd.DataFrame, filename: str) -> str:
         """导出数据为CSV文件"""
         try:
-            # 添加BOM以支持Excel正确显示中文
-            csv_path = f"exports/{filename}"
-            df.to_csv(csv_path, index=False, encoding='utf-8-sig')
-            return csv_path
+            from exporters import write_export
+            return write_export(df, f"exports/{filename}", "csv")
         except Exception as e:
             logger.error(f"导出CSV失败: {e}")
             return ""
@@ -175,10 +664,8 @@ class DatabaseManager:
     def export_to_excel(self, df: pd.DataFrame, filename: str) -> str:
         """导出数据为Excel文件"""
         try:
-            excel_path = f"exports/{filename}"
-            with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='数据')
-            return excel_path
+            from exporters import write_export
+            return write_export(df, f"exports/{filename}", "excel")
         except Exception as e:
             logger.error(f"导出Excel失败: {e}")
             return ""
@@ -186,9 +673,8 @@ class DatabaseManager:
     def export_to_json(self, df: pd.DataFrame, filename: str) -> str:
         """导出数据为JSON文件"""
         try:
-            json_path = f"exports/{filename}"
-            df.to_json(json_path, orient='records', force_ascii=False, indent=2)
-            return json_path
+            from exporters import write_export
+            return write_export(df, f"exports/{filename}", "json")
         except Exception as e:
             logger.error(f"导出JSON失败: {e}")
             return ""
@@ -202,11 +688,16 @@ class DatabaseManager:
             reverse_mapping = {v: k for k, v in column_mapping.items()}
             original_column = reverse_mapping.get(column_name, column_name)
             
+            # 优先使用物化的汇总统计，无需扫描全表
+            summary = self.stats.get(table_name)
+            if original_column in summary["columns"]:
+                return {"total_count": summary["total"], **summary["columns"][original_column]}
+            
             query = f"""
             SELECT 
                 COUNT(*) as total_count,
-                COUNT(DISTINCT `{original_column}`) as unique_count,
-                COUNT(`{original_column}`) as non_null_count
+                COUNT(DISTINCT {self.quote(original_column)}) as unique_count,
+                COUNT({self.quote(original_column)}) as non_null_count
             FROM {table_name}
             """
             
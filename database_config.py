@@ -3,7 +3,7 @@
 Database configuration for Gradio app
 """
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 # 数据库连接配置
 DATABASE_CONFIG: Dict[str, Any] = {
@@ -17,6 +17,42 @@ DATABASE_CONFIG: Dict[str, Any] = {
     "autocommit": True
 }
 
+def parse_replicas(spec: str) -> List[Dict[str, Any]]:
+    """解析只读副本列表，格式: host[:port[:weight]]，多个副本以逗号分隔"""
+    replicas = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        host, _, rest = item.partition(":")
+        port, _, weight = rest.partition(":")
+        replicas.append({
+            "host": host,
+            "port": int(port or DATABASE_CONFIG["port"]),
+            "weight": int(weight or 1)
+        })
+    return replicas
+
+# 只读副本配置: 筛选、搜索、计数和导出等读请求按权重分配到副本，写请求始终使用主库
+REPLICA_CONFIG: Dict[str, Any] = {
+    "replicas": parse_replicas(os.getenv("MYSQL_REPLICAS", "")),
+    "health_check_interval": int(os.getenv("MYSQL_REPLICA_CHECK_INTERVAL", "10")),  # 秒
+    "failure_cooldown": int(os.getenv("MYSQL_REPLICA_COOLDOWN", "30")),  # 失败后暂停分配的秒数
+    "max_lag_seconds": int(os.getenv("MYSQL_REPLICA_MAX_LAG", "0")),  # 0表示不检查复制延迟
+    # 本进程写入一张表后，该表的读查询在这段时间（秒）内使用主库（读己之写），0表示不限制
+    "read_your_writes": float(os.getenv("MYSQL_REPLICA_PIN_SECONDS", "10"))
+}
+
+# 文件状态取值：导入时为“正常”，导入扫描不到的记录为“已删除”，完整性扫描（integrity.py）写入缺失/损坏
+FILE_STATUS_OPTIONS = ["正常", "已删除", "文件缺失", "文件损坏"]
+
+# 存储后端: mysql(生产环境) / sqlite(单机部署、测试与基准)
+DATABASE_BACKEND = os.getenv("DB_BACKEND", "mysql")
+
+# 嵌入式SQLite配置
+SQLITE_CONFIG: Dict[str, Any] = {
+    "path": os.getenv("SQLITE_PATH", "data/ai_resources.db"),
+    "init_script": os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql", "sqlite", "init.sql"),
+    "busy_timeout": 30
+}
+
 # 表配置
 TABLE_CONFIG = {
     "dataset_index": {
@@ -34,13 +70,37 @@ TABLE_CONFIG = {
             "positive_target": "正向目标",
             "negative_target": "负向目标",
             "target_distance": "目标距离",
-            "source": "来源"
+            "source": "来源",
+            "file_status": "文件状态",
+            "phash": "感知哈希"
         },
         "filter_columns": {
             "positive_target": ["行人", "车辆", "建筑", "动物", "基础设施"],
             "negative_target": ["天空", "植被", "水面", "路面", "背景"],
             "target_distance": ["10m", "15m", "20m", "25m", "30m"]
-        }
+        },
+        # 单值枚举筛选列：按取值 IN 匹配（有二级索引），界面同样显示为多选框
+        "choice_columns": {
+            "file_status": FILE_STATUS_OPTIONS
+        },
+        # 表格默认显示的列（不含路径列），其余列可在列选择中勾选
+        "default_columns": ["image_id", "image_name", "image_height", "image_width", "image_repository",
+                            "positive_target", "negative_target", "target_distance", "source", "file_status"],
+        # 可在服务端排序的列（均有二级索引，见 sql/init.sql），主键始终可排序
+        "sortable_columns": ["image_name", "image_height", "image_width"],
+        # 数值范围筛选列（均有二级索引）及界面滑块的范围；滑块取值乘以 scale 后与列值比较
+        "range_columns": {
+            "image_height": {"min": 0, "max": 4320, "step": 8},
+            "image_width": {"min": 0, "max": 7680, "step": 8}
+        },
+        # 紧凑传输格式：低基数列字典编码，路径列前缀压缩
+        "dictionary_columns": ["image_height", "image_width", "image_repository", "positive_target",
+                               "negative_target", "target_distance", "source", "file_status"],
+        "path_columns": ["bmp_path", "yuv_path", "json_path"],
+        # 表格“预览”列显示该路径列的BMP缩略图（/api/thumbnail/{主键}），需要显示主键列
+        "thumbnail_column": "bmp_path",
+        # 原始YUV帧的路径列，预览时按 image_width/image_height 和 YUV_LAYOUT 解码第一帧
+        "yuv_column": "yuv_path"
     },
     "test_cases": {
         "name": "测试用例",
@@ -60,12 +120,27 @@ TABLE_CONFIG = {
             "flops": "FLOPs",
             "sources": "来源",
             "update_time": "更新时间",
-            "remark": "备注"
+            "remark": "备注",
+            "file_status": "文件状态"
         },
         "filter_columns": {
             "category": ["单算子", "级联算子", "block块", "模型"],
             "label": ["depth fusion", "fusion", "M2M", "tiling"],
             "framework": ["onnx", "caffe", "ir"]
-        }
+        },
+        "choice_columns": {
+            "file_status": FILE_STATUS_OPTIONS
+        },
+        "default_columns": ["case_id", "case_name", "case_repository", "category", "label", "framework",
+                            "input_shape", "model_size", "params", "flops", "update_time", "file_status"],
+        "sortable_columns": ["case_name", "model_size", "params", "flops", "update_time"],
+        "range_columns": {
+            "model_size": {"min": 0, "max": 2048, "step": 0.5},
+            "params": {"min": 0, "max": 2000, "step": 0.1, "scale": 1_000_000, "unit": "M"},
+            "flops": {"min": 0, "max": 1000, "step": 0.1, "scale": 1_000_000_000, "unit": "G"}
+        },
+        "dictionary_columns": ["case_repository", "category", "label", "framework", "input_shape", "sources",
+                               "file_status"],
+        "path_columns": ["case_path", "case_json_path"]
     }
 }
\ No newline at end of file
@@ -36,6 +36,20 @@ echo "   数据库: $MYSQL_DATABASE"
 echo "   用户: $MYSQL_USER"
 echo "   主机: $(hostname)"
 
+# nginx upstream 与工作进程数一致：每个工作进程一个端口（与 docker-compose.prod.yml 的默认值相同）
+APP_WORKERS=${APP_WORKERS:-4}
+if ! [[ "$APP_WORKERS" =~ ^[1-9][0-9]*$ ]]; then
+    echo "❌ APP_WORKERS 必须为正整数: $APP_WORKERS"
+    exit 1
+fi
+echo "🔧 生成nginx upstream（${APP_WORKERS} 个工作进程）..."
+servers=""
+for ((i = 0; i < APP_WORKERS; i++)); do
+    servers+="        server gradio-app:$((7860 + i));\n"
+done
+awk -v servers="$servers" '/# END workers/ {skip = 0} !skip {print} /# BEGIN workers/ {printf "%s", servers; skip = 1}' \
+    nginx.conf > nginx.conf.tmp && mv nginx.conf.tmp nginx.conf
+
 # 创建必要的目录
 echo "📁 创建目录结构..."
 mkdir -p ../logs ../exports ssl
@@ -0,0 +1,51 @@
+"""
+数据导出模块
+Export writers shared by the UI and DatabaseManager
+"""
+from __future__ import annotations
+
+from typing import Callable, Dict
+
+from config import EXPORT_CONFIG
+from lazy_imports import lazy_import
+
+pd = lazy_import("pandas")
+
+# 导出格式对应的文件扩展名
+EXPORT_EXTENSIONS = {
+    "csv": "csv",
+    "excel": "xlsx",
+    "json": "json"
+}
+
+
+def write_csv(df: pd.DataFrame, filepath: str) -> None:
+    """写出CSV文件（带BOM以支持Excel正确显示中文）"""
+    df.to_csv(filepath, index=False, encoding=EXPORT_CONFIG["csv_encoding"])
+
+
+def write_excel(df: pd.DataFrame, filepath: str) -> None:
+    """写出Excel文件，openpyxl仅在此处才会被导入"""
+    with pd.ExcelWriter(filepath, engine=EXPORT_CONFIG["excel_engine"]) as writer:
+        df.to_excel(writer, index=False, sheet_name='数据')
+
+
+def write_json(df: pd.DataFrame, filepath: str) -> None:
+    """写出JSON文件"""
+    df.to_json(filepath, orient=EXPORT_CONFIG["json_orient"], force_ascii=False, indent=2)
+
+
+EXPORT_WRITERS: Dict[str, Callable[[pd.DataFrame, str], None]] = {
+    "csv": write_csv,
+    "excel": write_excel,
+    "json": write_json
+}
+
+
+def write_export(df: pd.DataFrame, filepath: str, export_format: str) -> str:
+    """按格式导出DataFrame并返回文件路径"""
+    writer = EXPORT_WRITERS.get(export_format)
+    if writer is None:
+        raise ValueError(f"不支持的导出格式: {export_format}")
+    writer(df, filepath)
+    return filepath
@@ -0,0 +1,290 @@
+"""
+虚拟滚动表格模块
+Windowed grid: row windows served over HTTP, rendered by static/virtual_grid.js
+"""
+from __future__ import annotations
+
+import html
+import json
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from config import GRID_CONFIG
+from database_config import TABLE_CONFIG
+from lazy_imports import lazy_import
+from thumbnails import THUMBNAIL_API_PREFIX
+
+pd = lazy_import("pandas")
+
+# 浏览器端脚本，由 server.create_server 以 /static 提供
+GRID_SCRIPT_URL = "/static/virtual_grid.js"
+GRID_API_PREFIX = "/api/grid"
+# 页面<head>中加载脚本的标签
+GRID_HEAD = f'<script src="{GRID_SCRIPT_URL}" defer></script>'
+# 行窗口的传输格式：json（行列表）/ compact（按列字典编码与前缀压缩）
+WIRE_FORMATS = ("json", "compact")
+
+
+def grid_columns(table_name: str, fields: Optional[List[str]] = None) -> List[str]:
+    """表格显示的列（中文列名），fields 为原始列名，默认所有列"""
+    column_mapping = TABLE_CONFIG[table_name]["columns"]
+    return [column_mapping[field] for field in (fields or column_mapping)]
+
+
+def default_fields(table_name: str) -> List[str]:
+    """表格默认显示的列（原始列名）"""
+    config = TABLE_CONFIG[table_name]
+    return list(config.get("default_columns") or config["columns"])
+
+
+def parse_fields(db, table_name: str, raw: Optional[str]) -> List[str]:
+    """解析逗号分隔的字段列表（中文或原始列名），返回原始列名；为空时返回所有列，未知列抛出 ValueError"""
+    names = [name.strip() for name in (raw or "").split(",") if name.strip()]
+    if not names:
+        return list(TABLE_CONFIG[table_name]["columns"])
+    return db.resolve_columns(table_name, names)
+
+
+def parse_filters(raw: Optional[str]) -> Dict[str, Any]:
+    """解析请求中的筛选条件，格式错误抛出 ValueError
+
+    JSON：{中文列名: [取值...]} 或 {中文列名: {"min": 下限, "max": 上限}}（数值范围，见
+    DatabaseManager.range_condition）。
+    """
+    if not raw:
+        return {}
+    filters = json.loads(raw)
+    if not isinstance(filters, dict) or not all(isinstance(v, (list, dict)) for v in filters.values()):
+        raise ValueError("筛选条件格式错误")
+    parsed: Dict[str, Any] = {}
+    for column, values in filters.items():
+        if isinstance(values, dict):
+            bounds = {key: value for key, value in values.items() if value is not None}
+            if bounds:
+                parsed[str(column)] = bounds
+        elif values:
+            parsed[str(column)] = [str(value) for value in values]
+    return parsed
+
+
+def parse_sort(raw: Optional[str]) -> List[str]:
+    """解析逗号分隔的排序（列名，前缀 - 表示降序），列的校验由 DatabaseManager.order_clause 完成"""
+    return [item.strip() for item in (raw or "").split(",") if item.strip()]
+
+
+def parse_after(raw: Optional[str]) -> Optional[List[Any]]:
+    """解析上一页最后一行的排序键（JSON 列表，即上一个窗口的 last），为空时返回 None"""
+    if not raw:
+        return None
+    after = json.loads(raw)
+    if not isinstance(after, list) or not all(v is None or isinstance(v, (str, int, float)) for v in after):
+        raise ValueError("排序键格式错误")
+    return after
+
+
+def key_value(value: Any) -> Any:
+    """排序键转为可原样作为查询参数传回的JSON值（时间为 'YYYY-MM-DD HH:MM:SS' 格式）"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, "isoformat"):
+        return str(value)
+    return value.item() if hasattr(value, "item") else value
+
+
+def encode_dictionary(values: List[Any]) -> Dict[str, Any]:
+    """字典编码：取值表 + 每行的取值下标（空值为 null）"""
+    index: Dict[Any, int] = {}
+    dictionary: List[Any] = []
+    codes: List[Optional[int]] = []
+    for value in values:
+        if value is None:
+            codes.append(None)
+            continue
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(dictionary)
+            dictionary.append(value)
+        codes.append(code)
+    return {"type": "dict", "values": dictionary, "codes": codes}
+
+
+def _directory_prefixes(value: str) -> List[str]:
+    """路径中以 / 结尾的各级前缀，按长度递增"""
+    return [value[:index + 1] for index, char in enumerate(value) if char == "/"]
+
+
+def encode_prefix(values: List[Optional[str]]) -> Dict[str, Any]:
+    """路径列前缀压缩
+
+    已出现过的目录前缀按出现顺序编号（编号0为空前缀），编号表不随数据传输，
+    解码端按同样规则重建。每个值编码为 (最长已知目录前缀的编号, 与该前缀下上一个
+    值的剩余部分共享的字符数, 后缀)，同一目录下按序排列的文件名通常只需传输末尾几个字符。
+    """
+    table: Dict[str, int] = {"": 0}
+    previous: Dict[int, str] = {}
+    prefixes: List[Optional[int]] = []
+    shared: List[Optional[int]] = []
+    suffixes: List[Optional[str]] = []
+    for value in values:
+        if value is None:
+            prefixes.append(None)
+            shared.append(None)
+            suffixes.append(None)
+            continue
+        value = str(value)
+        directories = _directory_prefixes(value)
+        known = next((p for p in reversed(directories) if p in table), "")
+        code = table[known]
+        rest = value[len(known):]
+        last = previous.get(code, "")
+        length = 0
+        limit = min(len(last), len(rest))
+        while length < limit and last[length] == rest[length]:
+            length += 1
+        prefixes.append(code)
+        shared.append(length)
+        suffixes.append(rest[length:])
+        previous[code] = rest
+        for directory in directories:
+            if directory not in table:
+                table[directory] = len(table)
+    return {"type": "prefix", "prefix": prefixes, "shared": shared, "suffix": suffixes}
+
+
+def encode_compact(table_name: str, rows: List[List[Any]], fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """把行窗口转为按列编码的紧凑格式（列顺序与 grid_columns(table_name, fields) 一致）"""
+    config = TABLE_CONFIG[table_name]
+    dictionary_columns = set(config.get("dictionary_columns", []))
+    path_columns = set(config.get("path_columns", []))
+    encoded = []
+    for index, column in enumerate(fields or config["columns"]):
+        values = [row[index] for row in rows]
+        if column in dictionary_columns:
+            encoded.append(encode_dictionary(values))
+        elif column in path_columns:
+            encoded.append(encode_prefix(values))
+        else:
+            encoded.append({"type": "plain", "values": values})
+    return encoded
+
+
+def decode_compact(data: List[Dict[str, Any]], count: int) -> List[List[Any]]:
+    """紧凑格式还原为行（与浏览器端解码逻辑一致，用于测试和调试）"""
+    columns = []
+    for column in data:
+        if column["type"] == "dict":
+            columns.append([None if code is None else column["values"][code] for code in column["codes"]])
+        elif column["type"] == "prefix":
+            values, table, known, previous = [], [""], {""}, {}
+            for code, length, suffix in zip(column["prefix"], column["shared"], column["suffix"]):
+                if code is None:
+                    values.append(None)
+                    continue
+                rest = previous.get(code, "")[:length] + suffix
+                previous[code] = rest
+                value = table[code] + rest
+                values.append(value)
+                for directory in _directory_prefixes(value):
+                    if directory not in known:
+                        known.add(directory)
+                        table.append(directory)
+            columns.append(values)
+        else:
+            columns.append(column["values"])
+    return [[values[i] for values in columns] for i in range(count)]
+
+
+def fetch_window(db, table_name: str, offset: int, limit: int, search_text: str = "",
+                 filters: Optional[Dict[str, Any]] = None, wire_format: str = "json",
+                 fields: Optional[List[str]] = None, sort: Optional[List[str]] = None,
+                 after: Optional[List[Any]] = None, with_total: bool = False) -> Dict[str, Any]:
+    """获取一个行窗口
+
+    fields 为要获取的列（中文或原始列名，默认所有列），只查询和传输这些列；
+    sort 为排序（见 DatabaseManager.order_clause），默认按主键。
+    after 为上一个窗口的 last（最后一行的排序键），给出时按键集读取 offset 之后的行，
+    顺序滚动时每个窗口都沿索引定位；没有时按 offset 分页。
+    total（匹配行数）只在第一个窗口或 with_total 为 True 时计算，其余窗口不重复 COUNT。
+    wire_format 为 json 时行按 columns 的顺序排列为列表；为 compact 时按列编码
+    （见 encode_compact），行数据放在 data 中，count 为行数。
+    """
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(f"不支持的传输格式: {wire_format}")
+    if table_name not in TABLE_CONFIG:
+        raise KeyError(table_name)
+    offset = max(int(offset), 0)
+    limit = min(max(int(limit), 1), GRID_CONFIG["max_window"])
+    fields = db.resolve_columns(table_name, fields) if fields else list(TABLE_CONFIG[table_name]["columns"])
+    columns = grid_columns(table_name, fields)
+    # 不在显示列中的排序键也一并查询，用于返回窗口最后一行的排序键
+    key_fields = [column for column, _ in db.sort_keys(table_name, sort)]
+    df = db.query_page(table_name, offset, limit, filters, search_text,
+                       columns=fields + [column for column in key_fields if column not in fields], sort=sort,
+                       after=after)
+    if df.empty:
+        rows: List[List[Any]] = []
+        last = None
+    else:
+        # to_json 负责把空值、时间和DECIMAL转换为JSON可表示的值
+        rows = json.loads(df.reindex(columns=columns).to_json(orient="values", date_format="iso",
+                                                               default_handler=str))
+        last = [key_value(df.iloc[-1][column]) for column in grid_columns(table_name, key_fields)]
+    window: Dict[str, Any] = {
+        "table": table_name,
+        "offset": offset,
+        "columns": columns,
+        "last": last
+    }
+    if with_total or (offset == 0 and after is None):
+        window["total"] = db.count_rows(table_name, filters, search_text)
+    if wire_format == "compact":
+        window.update(encoding="compact", count=len(rows), data=encode_compact(table_name, rows, fields))
+    else:
+        window["rows"] = rows
+    return window
+
+
+def render_grid(table_name: str, total: int, search_text: str = "",
+                filters: Optional[Dict[str, Any]] = None,
+                column_widths: Optional[List[str]] = None, fields: Optional[List[str]] = None,
+                sort: Optional[List[str]] = None) -> str:
+    """生成虚拟表格元素，行数据由浏览器按滚动位置分页请求
+
+    fields 为显示的列（原始列名，默认所有列），浏览器只请求这些列；
+    sort 为服务端排序（中文列名，前缀 - 表示降序），表头显示排序方向。
+    表配置了 thumbnail_column 且显示主键列时，表格首列为缩略图预览。
+    """
+    attributes = {
+        "data-endpoint": f"{GRID_API_PREFIX}/{table_name}",
+        "data-format": GRID_CONFIG["wire_format"],
+        "data-fields": ",".join(fields or []),
+        "data-sort": ",".join(sort or []),
+        "data-total": total,
+        "data-search": search_text or "",
+        "data-filters": json.dumps(filters or {}, ensure_ascii=False),
+        "data-columns": json.dumps(grid_columns(table_name, fields), ensure_ascii=False),
+        "data-widths": json.dumps(column_widths or []),
+        "data-page-size": GRID_CONFIG["page_size"],
+        "data-overscan": GRID_CONFIG["overscan"],
+        "data-row-height": GRID_CONFIG["row_height"],
+        "data-height": GRID_CONFIG["height"],
+        "data-cached-pages": GRID_CONFIG["cached_pages"]
+    }
+    config = TABLE_CONFIG[table_name]
+    shown = fields or list(config["columns"])
+    if config.get("thumbnail_column") and config["primary_key"] in shown:
+        # 预览列按行的主键请求缩略图
+        attributes["data-preview"] = THUMBNAIL_API_PREFIX
+        attributes["data-preview-key"] = shown.index(config["primary_key"])
+        attributes["data-preview-delay"] = GRID_CONFIG["preview_delay"]
+        # 有YUV列时在BMP旁显示第一帧的预览
+        attributes["data-preview-sources"] = "bmp,yuv" if config.get("yuv_column") else "bmp"
+    rendered = " ".join(f'{name}="{html.escape(str(value), quote=True)}"' for name, value in attributes.items())
+    return f"<virtual-grid {rendered}></virtual-grid>"
+
+
+def render_message(message: str) -> str:
+    """表格区域显示提示或错误信息"""
+    return f'<div class="grid-message">{html.escape(message)}</div>'
@@ -0,0 +1,283 @@
+"""
+HTTP缓存与压缩模块
+Response compression middleware and conditional request (ETag/Last-Modified) helpers
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import importlib.util
+import json
+import zlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import HTTP_CONFIG
+
+# brotli 为可选依赖，未安装时只使用 gzip
+BROTLI_AVAILABLE = importlib.util.find_spec("brotli") is not None
+
+# 不压缩的状态码：无响应体、部分内容和重定向
+_UNCOMPRESSED_STATUS = {204, 206, 304}
+
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """解析 Accept-Encoding，返回 {编码: q值}"""
+    encodings: Dict[str, float] = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        encodings[name] = quality
+    return encodings
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    """按客户端偏好选择压缩编码：br（已安装 brotli 时）优先，其次 gzip"""
+    encodings = accepted_encodings(header)
+    candidates = (["br"] if BROTLI_AVAILABLE else []) + ["gzip"]
+    wildcard = encodings.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for name in candidates:
+        quality = encodings.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+class _Compressor:
+    """流式压缩器，统一 gzip 与 brotli 的接口"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            import brotli
+            self._compressor = brotli.Compressor(quality=HTTP_CONFIG["brotli_quality"])
+            self._compress = self._compressor.process
+            self._finish = self._compressor.finish
+        else:
+            # wbits=31 输出带gzip头和尾的数据流
+            self._compressor = zlib.compressobj(HTTP_CONFIG["gzip_level"], zlib.DEFLATED, 31)
+            self._compress = self._compressor.compress
+            self._finish = self._compressor.flush
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compress(data)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    """一次性压缩完整的响应体"""
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=HTTP_CONFIG["gzip_level"], mtime=0)
+    compressor = _Compressor(encoding)
+    return compressor.compress(data) + compressor.finish()
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _is_compressible(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return False
+    content_type = content_type.split(";")[0].strip().lower()
+    return any(content_type.startswith(prefix) for prefix in HTTP_CONFIG["compress_types"])
+
+
+class CompressionMiddleware:
+    """响应压缩中间件（ASGI）
+
+    只处理 compress_paths 下的请求（数据接口、导出下载和静态脚本），Gradio 的事件流
+    不经过压缩。响应体小于 minimum_size、已编码、非文本类型或部分内容响应原样返回；
+    带 Content-Length 的大响应和分块响应均流式压缩，不在内存中缓冲整个文件。
+    压缩后的强 ETag 转为弱 ETag，与未压缩的表示区分。
+    """
+
+    def __init__(self, app, minimum_size: Optional[int] = None, paths: Optional[List[str]] = None):
+        self.app = app
+        self.minimum_size = HTTP_CONFIG["compression_min_size"] if minimum_size is None else minimum_size
+        self.paths = tuple(HTTP_CONFIG["compress_paths"] if paths is None else paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+        request_headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        # 压缩需要经过响应体消息，禁止 FileResponse 使用 pathsend 等直接发送文件的扩展
+        extensions = {key: value for key, value in (scope.get("extensions") or {}).items()
+                      if key not in ("http.response.pathsend", "http.response.zerocopysend")}
+        responder = _CompressingResponder(send, encoding, self.minimum_size)
+        await self.app(dict(scope, extensions=extensions), receive, responder.send)
+
+
+class _CompressingResponder:
+    """按响应头和第一块响应体决定是否压缩，之后逐块转发"""
+
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[Dict[str, Any]] = None
+        self.state = "pending"
+        self.buffer = b""
+        self.compressor: Optional[_Compressor] = None
+
+    def _should_compress(self) -> bool:
+        headers = self.start["headers"]
+        if self.start["status"] in _UNCOMPRESSED_STATUS or self.start["status"] < 200:
+            return False
+        if _header(headers, b"content-encoding") or _header(headers, b"content-range"):
+            return False
+        if not _is_compressible(_header(headers, b"content-type")):
+            return False
+        length = _header(headers, b"content-length")
+        return length is None or int(length) >= self.minimum_size
+
+    def _compressed_headers(self, length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        headers = []
+        for key, value in self.start["headers"]:
+            name = key.lower()
+            if name in (b"content-length", b"vary"):
+                continue
+            if name == b"etag" and not value.startswith(b"W/"):
+                value = b"W/" + value
+            headers.append((key, value))
+        vary = _header(self.start["headers"], b"vary")
+        headers.append((b"vary", (f"{vary}, Accept-Encoding" if vary else "Accept-Encoding").encode("latin-1")))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode("latin-1")))
+        return headers
+
+    async def _passthrough(self, message: Dict[str, Any]) -> None:
+        self.state = "passthrough"
+        await self._send(self.start)
+        await self._send(message)
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            self.start = message
+            return
+        if kind != "http.response.body" or self.state == "passthrough":
+            if self.state == "pending" and self.start is not None:
+                self.state = "passthrough"
+                await self._send(self.start)
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.state == "pending":
+            if not self._should_compress():
+                await self._passthrough(message)
+                return
+            self.buffer += body
+            if more_body and _header(self.start["headers"], b"content-length") is None \
+                    and len(self.buffer) < self.minimum_size:
+                # 分块响应：先缓冲到足以判断大小
+                return
+            body, self.buffer = self.buffer, b""
+            if not more_body:
+                if len(body) < self.minimum_size:
+                    await self._passthrough({"type": "http.response.body", "body": body})
+                    return
+                compressed = compress_bytes(body, self.encoding)
+                self.state = "done"
+                await self._send(dict(self.start, headers=self._compressed_headers(len(compressed))))
+                await self._send({"type": "http.response.body", "body": compressed})
+                return
+            self.state = "streaming"
+            self.compressor = _Compressor(self.encoding)
+            await self._send(dict(self.start, headers=self._compressed_headers(None)))
+
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.finish()
+            self.state = "done"
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+# ---- 条件请求 ----
+
+def make_etag(*parts: Any) -> str:
+    """由内容或版本信息生成弱 ETag"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else repr(part).encode("utf-8"))
+        digest.update(b"\0")
+    return f'W/"{digest.hexdigest()[:20]}"'
+
+
+def http_date(timestamp: float) -> str:
+    """Unix时间戳格式化为HTTP日期"""
+    return formatdate(timestamp, usegmt=True)
+
+
+def _etag_value(tag: str) -> str:
+    """弱比较：忽略 W/ 前缀"""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(headers, etag: str, last_modified: Optional[float] = None) -> bool:
+    """判断条件请求是否可以返回 304
+
+    有 If-None-Match 时只按 ETag 弱比较（此时忽略 If-Modified-Since）；
+    否则按 If-Modified-Since 与最后修改时间（秒级）比较。
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        return _etag_value(etag) in {_etag_value(tag) for tag in if_none_match.split(",")}
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(last_modified) <= since
+
+
+def cache_headers(etag: str, last_modified: Optional[float] = None) -> Dict[str, str]:
+    """条件请求相关的响应头：浏览器可缓存，但每次使用前需重新验证"""
+    headers = {"ETag": etag, "Cache-Control": HTTP_CONFIG["cache_control"]}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def conditional_json(request, payload: Any):
+    """返回带 ETag 的JSON响应，条件请求命中时返回 304
+
+    ETag 由响应内容计算，因此任何进程写入的数据变更都会使其失效。数据接口不带
+    Last-Modified：单个进程无法知道其他进程写入的时间，按时间验证会返回过期的 304。
+    """
+    from fastapi import Response
+
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = make_etag(body)
+    headers = cache_headers(etag)
+    if is_not_modified(request.headers, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
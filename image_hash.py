@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+图像感知哈希模块
+Perceptual hashes (pHash) of dataset BMP images and a multi-index hash for near-duplicate lookup
+
+用法:
+    python image_hash.py similar 42 --max-distance 6
+    python image_hash.py groups --max-distance 4
+"""
+import argparse
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 添加当前目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import DEDUP_CONFIG
+from lazy_imports import lazy_import
+
+# numpy 只在计算哈希时需要
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+HASH_TABLE = "dataset_index"
+HASH_COLUMN = "phash"
+# 缩放到 DCT_SIZE x DCT_SIZE 后取 HASH_SIZE x HASH_SIZE 个低频系数，64位哈希以16位十六进制字符串保存
+DCT_SIZE = 32
+HASH_SIZE = 8
+HASH_HEX_DIGITS = HASH_SIZE * HASH_SIZE // 4
+
+_dct_matrices: Dict[int, Any] = {}
+
+
+class ImageHashError(Exception):
+    """图像无法解码"""
+
+
+# ---- BMP解码 ----
+
+def read_bmp_rgb(path: str, min_side: Optional[int] = None):
+    """读取未压缩BMP（8位调色板、24位、32位）为RGB矩阵（uint8，高x宽x3，自上而下）
+
+    像素数据以内存映射方式访问。指定 min_side 时按整数步长隔行隔列取样，结果的最长边不小于
+    min_side，生成缩略图时大图只读取需要的行，不解码全部像素。
+    """
+    with open(path, "rb") as f:
+        header = f.read(70)
+    if len(header) < 26 or header[:2] != b"BM":
+        raise ImageHashError(f"不是有效的BMP文件: {path}")
+    offset, dib_size = struct.unpack_from("<II", header, 10)
+    if dib_size == 12:
+        # BITMAPCOREHEADER
+        width, height, _, bits = struct.unpack_from("<HHHH", header, 18)
+        compression, colors, palette_entry = 0, 0, 3
+    else:
+        width, height, _, bits, compression = struct.unpack_from("<iiHHI", header, 18)
+        colors = struct.unpack_from("<I", header, 46)[0] if len(header) >= 50 else 0
+        palette_entry = 4
+    # BI_BITFIELDS 只支持标准的 BGRA 掩码
+    if compression == 3 and bits == 32 and len(header) >= 66:
+        if struct.unpack_from("<III", header, 54) == (0xFF0000, 0xFF00, 0xFF):
+            compression = 0
+    if compression != 0 or bits not in (8, 24, 32):
+        raise ImageHashError(f"不支持的BMP格式（{bits}位，压缩方式 {compression}）: {path}")
+    bottom_up = height > 0
+    width, height = abs(width), abs(height)
+    if not width or not height:
+        raise ImageHashError(f"BMP尺寸为0: {path}")
+
+    row_size = (bits * width + 31) // 32 * 4
+    if os.path.getsize(path) < offset + row_size * height:
+        raise ImageHashError(f"BMP像素数据不完整: {path}")
+    data = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(height, row_size))
+    step = max(max(width, height) // min_side, 1) if min_side else 1
+    rows = np.arange(0, height, step)
+    if bottom_up:
+        # 自下而上存储：按显示顺序的第 i 行位于文件中的第 height-1-i 行
+        rows = height - 1 - rows
+    if bits == 8:
+        count = colors or 256
+        palette = np.fromfile(path, dtype=np.uint8, count=count * palette_entry, offset=14 + dib_size)
+        palette = palette[:palette.size // palette_entry * palette_entry].reshape(-1, palette_entry)
+        colors_rgb = np.zeros((256, 3), dtype=np.uint8)
+        colors_rgb[:len(palette)] = palette[:256, 2::-1]
+        pixels = colors_rgb[data[rows, :width:step]]
+    else:
+        channels = bits // 8
+        # BMP按 BGR(A) 顺序存储
+        pixels = np.asarray(data[rows, :width * channels]).reshape(len(rows), width, channels)[:, ::step, 2::-1]
+    return np.ascontiguousarray(pixels)
+
+
+def read_bmp_gray(path: str):
+    """读取BMP为灰度矩阵（float32，自上而下）"""
+    pixels = read_bmp_rgb(path)
+    return (pixels[:, :, 0] * np.float32(0.299) + pixels[:, :, 1] * np.float32(0.587)
+            + pixels[:, :, 2] * np.float32(0.114))
+
+
+# ---- 感知哈希 ----
+
+def downscale(gray, size: int):
+    """按区域平均缩放到 size x size（小于目标尺寸的方向按最近邻放大）"""
+    for axis in (0, 1):
+        length = gray.shape[axis]
+        index = np.arange(size) * length // size
+        if length >= size:
+            sums = np.add.reduceat(gray, index, axis=axis)
+            counts = np.diff(np.append(index, length)).astype(np.float32)
+            gray = sums / (counts[:, None] if axis == 0 else counts[None, :])
+        else:
+            gray = np.take(gray, index, axis=axis)
+    return gray
+
+
+def dct_matrix(size: int):
+    """正交 DCT-II 变换矩阵"""
+    matrix = _dct_matrices.get(size)
+    if matrix is None:
+        k = np.arange(size)[:, None]
+        n = np.arange(size)[None, :]
+        matrix = np.sqrt(2.0 / size) * np.cos(np.pi * (2 * n + 1) * k / (2 * size))
+        matrix[0] /= np.sqrt(2.0)
+        _dct_matrices[size] = matrix
+    return matrix
+
+
+def phash(gray) -> int:
+    """DCT感知哈希：缩放后取二维DCT左上角的低频系数，按中位数二值化为64位整数
+
+    缩放、亮度和对比度的整体变化以及轻微的压缩噪声只改变少数几位。
+    """
+    pixels = downscale(np.asarray(gray, dtype=np.float32), DCT_SIZE).astype(np.float64)
+    matrix = dct_matrix(DCT_SIZE)
+    low = (matrix @ pixels @ matrix.T)[:HASH_SIZE, :HASH_SIZE]
+    bits = (low > np.median(low)).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def format_hash(value: int) -> str:
+    return format(value, f"0{HASH_HEX_DIGITS}x")
+
+
+def image_phash(path: str) -> str:
+    """BMP文件的感知哈希（十六进制字符串）"""
+    return format_hash(phash(read_bmp_gray(path)))
+
+
+def hamming(a: int, b: int) -> int:
+    """两个哈希的汉明距离"""
+    return bin(a ^ b).count("1")
+
+
+def popcount(values):
+    """uint64 数组逐元素的置位数（numpy 2.0 起有 bitwise_count，旧版本按字节查表）"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+# ---- 多索引哈希 ----
+
+# 64位哈希切分为 CHUNKS 段，每段 CHUNK_BITS 位
+CHUNKS = 4
+CHUNK_BITS = HASH_SIZE * HASH_SIZE // CHUNKS
+_CHUNK_MASK = (1 << CHUNK_BITS) - 1
+_probe_masks: Dict[int, List[int]] = {}
+
+
+def probe_masks(bits: int) -> List[int]:
+    """一段内至多翻转 bits 位的所有异或掩码（含0）"""
+    masks = _probe_masks.get(bits)
+    if masks is None:
+        masks = [mask for mask in range(1 << CHUNK_BITS) if bin(mask).count("1") <= bits]
+        _probe_masks[bits] = masks
+    return masks
+
+
+class MultiIndexHash:
+    """汉明距离的多索引哈希（multi-index hashing）
+
+    哈希切分为 CHUNKS 段，每段各建一张 {段取值: [节点]} 哈希表。由鸽巢原理，与查询距离
+    不超过 r 的哈希至少有一段与查询的距离不超过 r // CHUNKS，因此只需在每张表中探查
+    这一小范围内的取值，再逐个核对候选的完整距离，不与全部哈希比较。
+    每个不同的哈希是一个节点，保存对应的所有条目。
+    """
+
+    def __init__(self):
+        self.hashes: List[int] = []
+        self.items: List[List[Any]] = []
+        self._nodes: Dict[int, int] = {}
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(CHUNKS)]
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self.items)
+
+    def add(self, value: int, item: Any) -> None:
+        """插入一个条目"""
+        node = self._nodes.get(value)
+        if node is not None:
+            self.items[node].append(item)
+            return
+        node = self._nodes[value] = len(self.hashes)
+        self.hashes.append(value)
+        self.items.append([item])
+        for chunk, table in enumerate(self._tables):
+            table.setdefault((value >> (chunk * CHUNK_BITS)) & _CHUNK_MASK, []).append(node)
+
+    def search_nodes(self, value: int, radius: int) -> Iterator[Tuple[int, int]]:
+        """距离不超过 radius 的节点 (节点编号, 距离)"""
+        hashes = self.hashes
+        if radius >= CHUNK_BITS * CHUNKS // 2:
+            # 半径过大时探查量超过全部节点，直接逐个比较
+            candidates: Iterable[int] = range(len(hashes))
+        else:
+            masks = probe_masks(radius // CHUNKS)
+            candidates = set()
+            update = candidates.update
+            for chunk, table in enumerate(self._tables):
+                key = (value >> (chunk * CHUNK_BITS)) & _CHUNK_MASK
+                lookup = table.get
+                for mask in masks:
+                    bucket = lookup(key ^ mask)
+                    if bucket:
+                        update(bucket)
+        for node in candidates:
+            distance = bin(value ^ hashes[node]).count("1")
+            if distance <= radius:
+                yield node, distance
+
+    def search(self, value: int, radius: int) -> List[Tuple[Any, int]]:
+        """距离不超过 radius 的所有条目，返回 [(条目, 距离)]，按距离升序"""
+        found = [(item, distance) for node, distance in self.search_nodes(value, radius)
+                 for item in self.items[node]]
+        found.sort(key=lambda pair: pair[1])
+        return found
+
+    def pairs_within(self, radius: int) -> Iterator[Tuple[Any, Any]]:
+        """距离不超过 radius 的所有节点对，按批输出 (节点数组a, 节点数组b)，a < b，同一对可能出现多次
+
+        与逐个节点查询等价，但每段按段取值排序后整体做自连接，候选对的距离以向量运算核对。
+        """
+        values = np.array(self.hashes, dtype=np.uint64)
+        if radius >= CHUNK_BITS * CHUNKS // 2:
+            # 半径过大时不能按段筛选，退化为全部节点对
+            left, right = np.triu_indices(len(values), k=1)
+            near = popcount(values[left] ^ values[right]) <= radius
+            yield left[near], right[near]
+            return
+        nodes = np.arange(len(values))
+        for chunk in range(CHUNKS):
+            keys = (values >> np.uint64(chunk * CHUNK_BITS)) & np.uint64(_CHUNK_MASK)
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            for mask in probe_masks(radius // CHUNKS):
+                # 每个节点与段取值等于 key ^ mask 的节点（排序后的一段连续区间）组成候选对
+                probes = keys ^ np.uint64(mask)
+                start = np.searchsorted(sorted_keys, probes, "left")
+                counts = np.searchsorted(sorted_keys, probes, "right") - start
+                left = np.repeat(nodes, counts)
+                offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                right = order[np.repeat(start, counts) + offsets]
+                keep = left < right
+                left, right = left[keep], right[keep]
+                near = popcount(values[left] ^ values[right]) <= radius
+                yield left[near], right[near]
+
+
+# ---- 相似图像索引 ----
+
+class SimilarityIndex:
+    """dataset_index 感知哈希的内存索引
+
+    首次查询时从数据库读取 (image_id, phash) 建立多索引哈希，之后在以下情况重建：
+
+    - 表的 data_version 变化（本进程写入，或启用共享缓存时其他进程写入）
+    - 每隔 index_check_interval 秒检查一次已计算哈希的数量和最大 image_id，有变化
+      （未启用共享缓存时其他进程的写入、导入工具计算哈希）
+    - 索引使用超过 index_max_age 秒（数量不变的哈希更新）
+
+    数据库查询失败时抛出异常，不保留空索引。
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._index: Optional[MultiIndexHash] = None
+        self._hashes: Dict[int, int] = {}
+        self._version: Optional[int] = None
+        self._counts: Optional[Tuple[int, Any]] = None
+        self._built_at = self._checked_at = 0.0
+
+    def hash_index(self) -> MultiIndexHash:
+        """当前的多索引哈希，数据变更后重建"""
+        version = self.db.data_version(HASH_TABLE)
+        with self._lock:
+            now = time.monotonic()
+            if (self._index is not None and self._version == version
+                    and now - self._built_at < DEDUP_CONFIG["index_max_age"]):
+                if now - self._checked_at < DEDUP_CONFIG["index_check_interval"]:
+                    return self._index
+                counts = self._hash_counts()
+                self._checked_at = now
+                if counts == self._counts:
+                    return self._index
+            else:
+                counts = self._hash_counts()
+            self._index, self._hashes = self._build()
+            self._version, self._counts = version, counts
+            self._built_at = self._checked_at = now
+            return self._index
+
+    def _hash_counts(self) -> Tuple[int, Any]:
+        """已计算哈希的图像数和最大 image_id，用于廉价地判断哈希是否变化"""
+        q = self.db.quote
+        row = self.db._run_query(
+            f"SELECT COUNT({q(HASH_COLUMN)}) AS hashed, MAX({q('image_id')}) AS last_id FROM {HASH_TABLE}",
+            table_name=HASH_TABLE
+        )[0]
+        return int(row["hashed"]), row["last_id"]
+
+    def _build(self) -> Tuple[MultiIndexHash, Dict[int, int]]:
+        started = time.perf_counter()
+        q = self.db.quote
+        rows = self.db._run_query(
+            f"SELECT {q('image_id')} AS image_id, {q(HASH_COLUMN)} AS phash FROM {HASH_TABLE} "
+            f"WHERE {q(HASH_COLUMN)} IS NOT NULL",
+            table_name=HASH_TABLE
+        )
+        index = MultiIndexHash()
+        hashes = {}
+        for row in rows:
+            value = int(row["phash"], 16)
+            hashes[row["image_id"]] = value
+            index.add(value, row["image_id"])
+        logger.info(f"感知哈希索引已建立: {len(hashes)} 张图像，{len(index.hashes)} 个不同哈希，"
+                    f"耗时 {time.perf_counter() - started:.2f}s")
+        return index, hashes
+
+    def hash_of(self, image_id: int) -> Optional[int]:
+        """图像的感知哈希，未计算时返回 None"""
+        self.hash_index()
+        return self._hashes.get(image_id)
+
+    def similar(self, image_id: int, max_distance: Optional[int] = None,
+                limit: Optional[int] = None) -> List[Tuple[int, int]]:
+        """与指定图像相似的其他图像 [(image_id, 距离)]，按距离升序；图像没有哈希时抛出 KeyError"""
+        index = self.hash_index()
+        value = self._hashes.get(image_id)
+        if value is None:
+            raise KeyError(image_id)
+        radius = DEDUP_CONFIG["max_distance"] if max_distance is None else max_distance
+        matches = [(other, distance) for other, distance in index.search(value, radius) if other != image_id]
+        return matches[:limit] if limit else matches
+
+    def similar_to_hash(self, value: int, max_distance: Optional[int] = None) -> List[Tuple[int, int]]:
+        """与给定哈希相似的图像 [(image_id, 距离)]"""
+        radius = DEDUP_CONFIG["max_distance"] if max_distance is None else max_distance
+        return self.hash_index().search(value, radius)
+
+    def duplicate_groups(self, max_distance: Optional[int] = None) -> List[List[int]]:
+        """近似重复的图像分组（距离不超过 max_distance 的图像连通为一组），按组大小降序
+
+        由 MultiIndexHash.pairs_within 找出距离在阈值内的哈希对，再以并查集合并，不做两两比较。
+        """
+        index = self.hash_index()
+        radius = DEDUP_CONFIG["max_distance"] if max_distance is None else max_distance
+        parent = list(range(len(index.hashes)))
+
+        def find(node: int) -> int:
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        for left, right in index.pairs_within(radius):
+            for node, other in zip(left.tolist(), right.tolist()):
+                a, b = find(node), find(other)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+        groups: Dict[int, List[int]] = {}
+        for node, items in enumerate(index.items):
+            groups.setdefault(find(node), []).extend(items)
+        return sorted((sorted(items) for items in groups.values() if len(items) > 1),
+                      key=lambda items: (-len(items), items[0]))
+
+
+def register_similarity_routes(api, db=None) -> None:
+    """相似图像接口：GET /api/similar/{image_id}?max_distance=&limit=&fields="""
+    from fastapi import HTTPException, Query, Request
+    from database_config import TABLE_CONFIG
+    from grid import parse_fields
+    from http_cache import conditional_json
+    from rest_api import query_records
+    if db is None:
+        from database import db_manager as db
+    index = SimilarityIndex(db)
+    primary_key = TABLE_CONFIG[HASH_TABLE]["primary_key"]
+
+    @api.get("/api/similar/{image_id}")
+    def similar_images(request: Request, image_id: int, max_distance: Optional[int] = Query(None, ge=0, le=64),
+                       limit: int = Query(DEDUP_CONFIG["max_results"], ge=1), fields: str = ""):
+        try:
+            selected = parse_fields(db, HASH_TABLE, fields)
+            matches = index.similar(image_id, max_distance, limit)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"图像不存在或尚未计算感知哈希: {image_id}")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except db.backend.error_types as e:
+            raise HTTPException(status_code=503, detail=f"读取感知哈希失败: {e}")
+        distances = dict(matches)
+        columns = selected if primary_key in selected else [primary_key] + selected
+        rows = query_records(db, HASH_TABLE, columns, 0, len(matches),
+                             {TABLE_CONFIG[HASH_TABLE]["columns"][primary_key]: list(distances)}) \
+            if matches else []
+        for row in rows:
+            row["distance"] = distances[row[primary_key]]
+        rows.sort(key=lambda row: (row["distance"], row[primary_key]))
+        payload = {
+            "image_id": image_id,
+            "phash": format_hash(index.hash_of(image_id)),
+            "max_distance": DEDUP_CONFIG["max_distance"] if max_distance is None else max_distance,
+            "rows": rows
+        }
+        return conditional_json(request, payload)
+
+
+# ---- 命令行 ----
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="按感知哈希查找相似或近似重复的图像")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    similar = subparsers.add_parser("similar", help="列出与指定图像相似的图像")
+    similar.add_argument("image_id", type=int, help="图像ID")
+    groups = subparsers.add_parser("groups", help="列出近似重复的图像分组")
+    for sub in (similar, groups):
+        sub.add_argument("--max-distance", type=int, help=f"最大汉明距离（默认 {DEDUP_CONFIG['max_distance']}）")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    from database import db_manager
+    index = SimilarityIndex(db_manager)
+    try:
+        index.hash_index()
+    except db_manager.backend.error_types as e:
+        print(f"❌ 读取感知哈希失败: {e}")
+        return 1
+    if args.command == "similar":
+        try:
+            matches = index.similar(args.image_id, args.max_distance)
+        except KeyError:
+            print(f"❌ 图像不存在或尚未计算感知哈希: {args.image_id}（先运行 python ingest.py phash）")
+            return 1
+        for image_id, distance in matches:
+            print(f"{image_id}\t{distance}")
+        print(f"✅ 找到 {len(matches)} 张相似图像")
+        return 0
+
+    groups_found = index.duplicate_groups(args.max_distance)
+    for group in groups_found:
+        print(" ".join(str(image_id) for image_id in group))
+    print(f"✅ 找到 {len(groups_found)} 组近似重复图像，共 {sum(len(g) for g in groups_found)} 张")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
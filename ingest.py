@@ -0,0 +1,746 @@
+#!/usr/bin/env python3
+"""
+数据导入模块
+Bulk and incremental ingestion of image and model repositories
+
+用法:
+    python ingest.py dataset /data/urban_dataset /data/traffic_dataset
+    python ingest.py dataset /data/raw --repository urban_dataset --workers 8
+    python ingest.py dataset /data/urban_dataset --incremental --phash
+    python ingest.py cases /models/model_zoo --incremental
+    python ingest.py metadata --all
+    python ingest.py phash
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# 添加当前目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import INGEST_CONFIG
+from database_config import TABLE_CONFIG
+from image_hash import ImageHashError, image_phash
+from model_metadata import ModelMetadataError, cached_extract
+
+logger = logging.getLogger(__name__)
+
+STATUS_PRESENT = "正常"
+STATUS_DELETED = "已删除"
+# 完整性扫描（integrity.py）写入的状态：引用的文件不存在 / 文件存在但不可用
+STATUS_MISSING = "文件缺失"
+STATUS_CORRUPT = "文件损坏"
+
+# 按文件名（不含扩展名）配对的文件类型
+PAIRED_EXTENSIONS = {".bmp": "bmp_path", ".yuv": "yuv_path", ".json": "json_path"}
+
+# 模型文件扩展名与框架
+MODEL_EXTENSIONS = {".onnx": "onnx", ".prototxt": "caffe", ".caffe": "caffe", ".ir": "ir"}
+CAFFE_WEIGHTS_EXTENSION = ".caffemodel"
+
+
+# ---- 文件解析 ----
+
+def file_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """计算文件内容哈希（分块读取，不把整个文件载入内存）"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_bmp_size(path: str) -> Tuple[int, int]:
+    """从BMP文件头读取 (宽, 高)，不解码像素数据"""
+    with open(path, "rb") as f:
+        header = f.read(26)
+    if len(header) < 26 or header[:2] != b"BM":
+        raise ValueError(f"不是有效的BMP文件: {path}")
+    dib_size = struct.unpack_from("<I", header, 14)[0]
+    if dib_size == 12:
+        # BITMAPCOREHEADER: 16位无符号宽高
+        width, height = struct.unpack_from("<HH", header, 18)
+    else:
+        # BITMAPINFOHEADER 及其扩展: 32位有符号宽高，高度为负表示自上而下存储
+        width, height = struct.unpack_from("<ii", header, 18)
+    return abs(width), abs(height)
+
+
+def normalize_set_value(value: Any, options: List[str]) -> str:
+    """把列表或逗号分隔的字符串规范为SET列的取值（按定义顺序，丢弃未知选项）"""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        items = [item.strip() for item in value.split(",")]
+    else:
+        items = [str(item).strip() for item in value]
+    unknown = [item for item in items if item and item not in options]
+    if unknown:
+        logger.debug(f"忽略未知选项: {unknown}")
+    return ",".join(option for option in options if option in items)
+
+
+def _sidecar_value(sidecar: Dict[str, Any], column: str, columns: Dict[str, str]) -> Any:
+    """按英文列名或中文显示名读取JSON附属文件中的字段"""
+    if column in sidecar:
+        return sidecar[column]
+    return sidecar.get(columns.get(column, column))
+
+
+def _load_sidecar(path: Optional[str]) -> Dict[str, Any]:
+    """读取JSON附属文件，内容不是对象时视为空"""
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        sidecar = json.load(f)
+    return sidecar if isinstance(sidecar, dict) else {}
+
+
+def parse_dataset_record(record: Dict[str, Any]) -> Tuple[Optional[tuple], Optional[str]]:
+    """解析一组同名图像文件，返回 (dataset_index 行, 跳过原因)
+
+    在解析进程中执行，参数与返回值均为可序列化的简单对象。只读取BMP文件头，不解码像素；
+    感知哈希置空（内容变化时旧哈希随之失效），由 compute_image_hashes 另行并行计算。
+    """
+    config = TABLE_CONFIG["dataset_index"]
+    columns, options = config["columns"], config["filter_columns"]
+    try:
+        sidecar = _load_sidecar(record.get("json_path"))
+    except (OSError, ValueError) as e:
+        return None, f"JSON解析失败 {record['json_path']}: {e}"
+
+    width = height = None
+    if record.get("bmp_path"):
+        try:
+            width, height = read_bmp_size(record["bmp_path"])
+        except (OSError, ValueError, struct.error) as e:
+            return None, f"BMP文件头读取失败 {record['bmp_path']}: {e}"
+    if width is None:
+        # 没有BMP时使用附属文件中记录的尺寸（YUV文件本身不含尺寸信息）
+        width = _sidecar_value(sidecar, "image_width", columns) or sidecar.get("width")
+        height = _sidecar_value(sidecar, "image_height", columns) or sidecar.get("height")
+    if not width or not height:
+        return None, f"无法确定图像尺寸: {record['image_name']}"
+
+    row = (
+        record["image_name"],
+        int(height),
+        int(width),
+        record["image_repository"],
+        record.get("bmp_path"),
+        record.get("yuv_path"),
+        record.get("json_path"),
+        normalize_set_value(_sidecar_value(sidecar, "positive_target", columns), options["positive_target"]),
+        normalize_set_value(_sidecar_value(sidecar, "negative_target", columns), options["negative_target"]),
+        normalize_set_value(_sidecar_value(sidecar, "target_distance", columns), options["target_distance"]),
+        str(_sidecar_value(sidecar, "source", columns) or record.get("source") or ""),
+        STATUS_PRESENT,
+        None
+    )
+    return row, None
+
+
+def bmp_phash(path: str) -> Optional[str]:
+    """BMP的感知哈希，无法解码（压缩格式、像素数据不完整等）时返回 None，不影响图像入库"""
+    try:
+        return image_phash(path)
+    except (ImageHashError, OSError, ValueError) as e:
+        logger.debug(f"感知哈希计算失败 {path}: {e}")
+        return None
+
+
+def weights_path(case_path: str, framework: str) -> Optional[str]:
+    """Caffe 模型同目录下的同名 .caffemodel 权重文件"""
+    if framework != "caffe":
+        return None
+    path = os.path.splitext(case_path)[0] + CAFFE_WEIGHTS_EXTENSION
+    return path if os.path.exists(path) else None
+
+
+def model_metadata(case_path: str, framework: str, digest: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+    """提取模型的 input_shape/params/flops/model_size，返回 (结果, 是否命中缓存)"""
+    result, hit = cached_extract(case_path, framework, digest or file_hash(case_path))
+    # 模型大小以权重文件为准（Caffe的 .caffemodel），否则为模型文件本身
+    size_bytes = os.path.getsize(weights_path(case_path, framework) or case_path)
+    return {**result, "model_size": round(size_bytes / (1024 * 1024), 2)}, hit
+
+
+def parse_case_record(record: Dict[str, Any]) -> Tuple[Optional[tuple], Optional[str]]:
+    """解析一个模型文件及其JSON配置并提取模型元数据，返回 (test_cases 行, 跳过原因)
+
+    元数据提取失败时 input_shape/params/flops 写为空值，不影响用例入库。
+    """
+    config = TABLE_CONFIG["test_cases"]
+    columns, options = config["columns"], config["filter_columns"]
+    try:
+        sidecar = _load_sidecar(record.get("case_json_path"))
+    except (OSError, ValueError) as e:
+        return None, f"JSON解析失败 {record['case_json_path']}: {e}"
+
+    category = _sidecar_value(sidecar, "category", columns) or INGEST_CONFIG["default_category"]
+    if category not in options["category"]:
+        return None, f"未知类别 {category}: {record['case_path']}"
+    label = normalize_set_value(_sidecar_value(sidecar, "label", columns), options["label"]) or None
+    try:
+        metadata, _ = model_metadata(record["case_path"], record["framework"],
+                                     record.get("file_hashes", {}).get(record["case_path"]))
+    except ModelMetadataError as e:
+        logger.warning(f"模型元数据提取失败 {record['case_path']}: {e}")
+        size_bytes = os.path.getsize(record.get("weights_path") or record["case_path"])
+        metadata = {"model_size": round(size_bytes / (1024 * 1024), 2)}
+    except OSError as e:
+        return None, f"读取文件失败 {record['case_path']}: {e}"
+
+    row = (
+        str(_sidecar_value(sidecar, "case_name", columns) or record["case_name"]),
+        record["case_repository"],
+        record["case_path"],
+        record.get("case_json_path"),
+        category,
+        label,
+        record["framework"],
+        metadata.get("input_shape"),
+        metadata["model_size"],
+        metadata.get("params"),
+        metadata.get("flops"),
+        _sidecar_value(sidecar, "sources", columns) or record.get("sources"),
+        STATUS_PRESENT
+    )
+    return row, None
+
+
+# ---- 目录扫描 ----
+
+def _walk(root: str) -> Iterator[Tuple[str, List[str]]]:
+    """按确定的顺序遍历目录"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        yield dirpath, sorted(filenames)
+
+
+def scan_image_repository(root: str, repository: Optional[str] = None,
+                          source: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """遍历图像仓库，按文件名配对 bmp/yuv/json 文件
+
+    同一仓库内文件名相同的 .bmp/.yuv/.json 视为同一张图像（可位于不同子目录，
+    例如 bmp/、yuv/、json/）。
+    """
+    root = os.path.abspath(root)
+    repository = repository or os.path.basename(root.rstrip(os.sep))
+    groups: Dict[str, Dict[str, Any]] = {}
+    for dirpath, filenames in _walk(root):
+        for filename in filenames:
+            stem, ext = os.path.splitext(filename)
+            column = PAIRED_EXTENSIONS.get(ext.lower())
+            if column is None:
+                continue
+            group = groups.setdefault(stem, {
+                "image_name": stem, "image_repository": repository, "source": source
+            })
+            path = os.path.join(dirpath, filename)
+            if column in group:
+                logger.warning(f"文件名重复，忽略: {path}（已使用 {group[column]}）")
+                continue
+            group[column] = path
+    for stem in sorted(groups):
+        yield groups[stem]
+
+
+def scan_model_repository(root: str, repository: Optional[str] = None,
+                          sources: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """遍历模型仓库，每个模型文件对应一个测试用例
+
+    JSON配置优先使用同名 .json 文件，其次为同目录下的 config.json；
+    Caffe 的 .prototxt 与同名 .caffemodel 权重文件视为同一个用例。
+    """
+    root = os.path.abspath(root)
+    repository = repository or os.path.basename(root.rstrip(os.sep))
+    for dirpath, filenames in _walk(root):
+        names = set(filenames)
+        for filename in filenames:
+            stem, ext = os.path.splitext(filename)
+            framework = MODEL_EXTENSIONS.get(ext.lower())
+            if framework is None:
+                continue
+            record = {
+                "case_name": stem,
+                "case_repository": repository,
+                "case_path": os.path.join(dirpath, filename),
+                "framework": framework,
+                "sources": sources
+            }
+            for sidecar in (f"{stem}.json", "config.json"):
+                if sidecar in names:
+                    record["case_json_path"] = os.path.join(dirpath, sidecar)
+                    break
+            if framework == "caffe" and f"{stem}{CAFFE_WEIGHTS_EXTENSION}" in names:
+                record["weights_path"] = os.path.join(dirpath, f"{stem}{CAFFE_WEIGHTS_EXTENSION}")
+            yield record
+
+
+# ---- 导入源 ----
+
+class IngestSource:
+    """一张表的导入规则：扫描出的记录如何配对、解析以及按哪个唯一键写入"""
+
+    def __init__(self, table_name: str, columns: List[str], key_columns: List[str],
+                 file_fields: List[str], scanner, parser):
+        self.table_name = table_name
+        self.columns = columns
+        self.key_columns = key_columns
+        self.file_fields = file_fields
+        self.scanner = scanner
+        self.parser = parser
+
+    def key(self, record: Dict[str, Any]) -> Tuple:
+        """记录的唯一键（与表的唯一索引一致）"""
+        return tuple(record[column] for column in self.key_columns)
+
+    def files(self, record: Dict[str, Any]) -> List[str]:
+        """记录对应的所有文件"""
+        return [record[field] for field in self.file_fields if record.get(field)]
+
+
+INGEST_SOURCES = {
+    "dataset_index": IngestSource(
+        "dataset_index",
+        columns=["image_name", "image_height", "image_width", "image_repository",
+                 "bmp_path", "yuv_path", "json_path",
+                 "positive_target", "negative_target", "target_distance", "source", "file_status", "phash"],
+        key_columns=["image_repository", "image_name"],
+        file_fields=["bmp_path", "yuv_path", "json_path"],
+        scanner=scan_image_repository,
+        parser=parse_dataset_record
+    ),
+    "test_cases": IngestSource(
+        "test_cases",
+        columns=["case_name", "case_repository", "case_path", "case_json_path",
+                 "category", "label", "framework", "input_shape", "model_size", "params", "flops",
+                 "sources", "file_status"],
+        key_columns=["case_path"],
+        file_fields=["case_path", "weights_path", "case_json_path"],
+        scanner=scan_model_repository,
+        parser=parse_case_record
+    )
+}
+
+
+# 导入清单中尚未计算的内容哈希
+UNKNOWN_HASH = ""
+
+
+def process_record(item: Tuple[str, Dict[str, Any], bool]) -> Tuple[Optional[tuple], Optional[str], Dict[str, str]]:
+    """解析进程入口：需要时计算文件哈希，并解析记录"""
+    table_name, record, with_hashes = item
+    source = INGEST_SOURCES[table_name]
+    hashes: Dict[str, str] = {}
+    if with_hashes:
+        try:
+            hashes = {path: file_hash(path) for path in source.files(record)}
+        except OSError as e:
+            return None, f"读取文件失败: {e}", {}
+        record = {**record, "file_hashes": hashes}
+    row, reason = source.parser(record)
+    return row, reason, hashes
+
+
+# ---- 导入清单 ----
+
+class Manifest:
+    """本地导入清单：记录每个已导入文件的 (mtime, 大小, 内容哈希)
+
+    同一文件可能属于多条记录（例如多个模型共用 config.json），因此以
+    (表名, 记录键, 路径) 为主键。清单保存在本地SQLite文件中。
+    内容哈希按需计算：全量导入和增量导入新增的文件不读取内容，哈希记为空字符串（UNKNOWN_HASH），
+    文件的 mtime 或大小变化后由增量导入计算。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or INGEST_CONFIG["manifest_path"]
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(
+            "CREATE TABLE IF NOT EXISTS manifest ("
+            "table_name TEXT NOT NULL, row_key TEXT NOT NULL, path TEXT NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, hash TEXT NOT NULL, "
+            "PRIMARY KEY (table_name, row_key, path));"
+            "CREATE INDEX IF NOT EXISTS idx_manifest_path ON manifest (table_name, path);"
+        )
+
+    @staticmethod
+    def row_key(key: Tuple) -> str:
+        return json.dumps(list(key), ensure_ascii=False)
+
+    def entries_under(self, table_name: str, root: str) -> Dict[str, Dict[str, Tuple[int, int, str]]]:
+        """读取目录下已记录的文件，按记录键分组: {row_key: {path: (mtime_ns, size, hash)}}"""
+        prefix = root.rstrip(os.sep) + os.sep
+        upper = prefix[:-1] + chr(ord(os.sep) + 1)
+        groups: Dict[str, Dict[str, Tuple[int, int, str]]] = {}
+        rows = self.connection.execute(
+            "SELECT row_key, path, mtime_ns, size, hash FROM manifest "
+            "WHERE table_name = ? AND path >= ? AND path < ?", (table_name, prefix, upper)
+        )
+        for row_key, path, mtime_ns, size, digest in rows:
+            groups.setdefault(row_key, {})[path] = (mtime_ns, size, digest)
+        return groups
+
+    def replace(self, table_name: str, entries: Dict[str, Dict[str, Tuple[int, int, str]]]) -> None:
+        """替换若干记录的文件条目，值为空字典表示删除该记录"""
+        keys = [(table_name, row_key) for row_key in entries]
+        self.connection.executemany("DELETE FROM manifest WHERE table_name = ? AND row_key = ?", keys)
+        self.connection.executemany(
+            "INSERT INTO manifest (table_name, row_key, path, mtime_ns, size, hash) VALUES (?, ?, ?, ?, ?, ?)",
+            [(table_name, row_key, path, mtime_ns, size, digest)
+             for row_key, files in entries.items()
+             for path, (mtime_ns, size, digest) in files.items()]
+        )
+        self.connection.commit()
+
+    def known_hash(self, table_name: str, path: str) -> Optional[str]:
+        """文件 mtime 和大小与清单一致时返回记录的内容哈希，避免重复读取文件"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        row = self.connection.execute(
+            "SELECT hash FROM manifest WHERE table_name = ? AND path = ? AND mtime_ns = ? AND size = ? "
+            "AND hash != ? LIMIT 1", (table_name, path, st.st_mtime_ns, st.st_size, UNKNOWN_HASH)
+        ).fetchone()
+        return row[0] if row else None
+
+    def recorded(self, table_name: str, paths: List[str]) -> Dict[str, Tuple[int, int, str]]:
+        """批量读取文件导入时记录的 (mtime_ns, 大小, 内容哈希)，不在清单中或未计算哈希的路径不返回"""
+        entries: Dict[str, Tuple[int, int, str]] = {}
+        for start in range(0, len(paths), 500):
+            chunk = paths[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT path, mtime_ns, size, hash FROM manifest WHERE table_name = ? AND hash != ? "
+                f"AND path IN ({', '.join('?' * len(chunk))})", (table_name, UNKNOWN_HASH, *chunk)
+            )
+            for path, mtime_ns, size, digest in rows:
+                entries[path] = (mtime_ns, size, digest)
+        return entries
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+# ---- 导入 ----
+
+def _processed(items: List[Tuple[str, Dict[str, Any], bool]], workers: int,
+               chunksize: int) -> Iterator[Tuple[Optional[tuple], Optional[str], Dict[str, str]]]:
+    """解析记录，workers 大于1时使用进程池"""
+    if workers <= 1 or len(items) < chunksize:
+        yield from map(process_record, items)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(process_record, items, chunksize=chunksize)
+
+
+def ingest(table_name: str, roots: List[str], db=None, incremental: bool = False,
+           repository: Optional[str] = None, source: Optional[str] = None,
+           workers: Optional[int] = None, batch_size: Optional[int] = None,
+           commit_every: Optional[int] = None, manifest: Optional[Manifest] = None) -> Dict[str, Any]:
+    """扫描仓库并写入表
+
+    - 记录按表的唯一键插入或更新（dataset_index: 仓库+图像名称，test_cases: 路径）
+    - 每次导入后在本地清单中记录文件的 mtime 和大小；全量导入不读取文件内容（BMP只读文件头）
+    - incremental 为 True 时，mtime 和大小均未变化的记录直接跳过；只有清单中已有且变化的
+      记录计算内容哈希，与清单中的哈希相同（例如只是重新拷贝）时不写库，因此数据库写入量
+      与变更量成正比
+    - 清单中存在但本次扫描未找到的记录被标记为“已删除”
+    """
+    if db is None:
+        from database import db_manager as db
+    spec = INGEST_SOURCES[table_name]
+    workers = workers if workers is not None else (INGEST_CONFIG["workers"] or os.cpu_count() or 1)
+    started = time.perf_counter()
+    stats = {"scanned": 0, "unchanged": 0, "upserted": 0, "deleted": 0, "skipped": 0}
+    own_manifest = manifest is None
+    manifest = manifest or Manifest()
+
+    items: List[Tuple[str, Dict[str, Any], bool]] = []
+    file_stats: List[Dict[str, Tuple[int, int]]] = []
+    previous_hashes: List[Dict[str, str]] = []
+    deleted: Dict[str, Dict] = {}
+    try:
+        for root in roots:
+            previous = manifest.entries_under(table_name, os.path.abspath(root))
+            for record in spec.scanner(root, repository, source):
+                stats["scanned"] += 1
+                row_key = Manifest.row_key(spec.key(record))
+                old = previous.pop(row_key, None)
+                try:
+                    current = {}
+                    for path in spec.files(record):
+                        st = os.stat(path)
+                        current[path] = (st.st_mtime_ns, st.st_size)
+                except OSError as e:
+                    stats["skipped"] += 1
+                    logger.warning(f"读取文件失败: {e}")
+                    continue
+                if (incremental and old is not None and old.keys() == current.keys()
+                        and all(old[path][:2] == current[path] for path in current)):
+                    stats["unchanged"] += 1
+                    continue
+                # 只有已导入且 mtime/大小变化的记录需要内容哈希判断是否真的改变
+                items.append((table_name, record, incremental and old is not None))
+                file_stats.append(current)
+                previous_hashes.append({path: entry[2] for path, entry in (old or {}).items()})
+            # 清单中有但本次未扫描到的记录，其文件已全部删除
+            deleted.update({row_key: {} for row_key in previous})
+
+        manifest_updates: Dict[str, Dict[str, Tuple[int, int, str]]] = {}
+
+        def rows():
+            for index, (row, reason, hashes) in enumerate(
+                    _processed(items, workers, INGEST_CONFIG["parse_chunksize"])):
+                if row is None:
+                    stats["skipped"] += 1
+                    logger.warning(reason)
+                    continue
+                record = items[index][1]
+                row_key = Manifest.row_key(spec.key(record))
+                manifest_updates[row_key] = {
+                    path: (*file_stats[index][path], hashes.get(path, UNKNOWN_HASH)) for path in file_stats[index]
+                }
+                if items[index][2] and hashes == previous_hashes[index]:
+                    # 只有 mtime 变化（例如重新拷贝），内容未变，无需写库
+                    stats["unchanged"] += 1
+                    continue
+                yield row
+
+        batch_size = batch_size or INGEST_CONFIG["batch_size"]
+        commit_every = commit_every or INGEST_CONFIG["commit_every"]
+        stats["upserted"] = db.upsert_rows(table_name, rows(), columns=spec.columns, key_columns=spec.key_columns,
+                                           batch_size=batch_size, commit_every=commit_every)
+        if deleted:
+            conditions = " AND ".join(f"{db.quote(column)} = %s" for column in spec.key_columns)
+            query = f"UPDATE {table_name} SET {db.quote('file_status')} = %s WHERE {conditions}"
+            stats["deleted"] = len(deleted)
+            db.execute_batches(table_name, query,
+                               [(STATUS_DELETED, *json.loads(row_key)) for row_key in deleted],
+                               batch_size, commit_every)
+        # 数据库提交后再更新清单；中途失败时下一次导入会重新处理这些文件
+        manifest.replace(table_name, {**manifest_updates, **deleted})
+    finally:
+        if own_manifest:
+            manifest.close()
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"{table_name} 导入完成: {stats}")
+    return stats
+
+
+def process_model(item: Tuple[int, str, str, Optional[str]]) -> Tuple[int, Optional[Dict[str, Any]], bool, Optional[str]]:
+    """解析进程入口：提取单个模型的元数据，返回 (用例ID, 结果, 是否命中缓存, 失败原因)"""
+    case_id, case_path, framework, digest = item
+    try:
+        result, hit = model_metadata(case_path, framework, digest)
+        return case_id, result, hit, None
+    except (ModelMetadataError, OSError) as e:
+        return case_id, None, False, f"模型元数据提取失败 {case_path}: {e}"
+
+
+def extract_case_metadata(db=None, all_cases: bool = False, repository: Optional[str] = None,
+                          workers: Optional[int] = None, batch_size: Optional[int] = None,
+                          manifest: Optional[Manifest] = None) -> Dict[str, Any]:
+    """为已有测试用例提取 input_shape/model_size/params/flops
+
+    默认只处理这些字段为空的用例，all_cases 为 True 时处理全部。提取在进程池中
+    并行执行，结果按文件内容哈希缓存，内容未变的模型再次运行时不会重新解析。
+    """
+    if db is None:
+        from database import db_manager as db
+    workers = workers if workers is not None else (INGEST_CONFIG["workers"] or os.cpu_count() or 1)
+    started = time.perf_counter()
+    q = db.quote
+    conditions = [f"{q('file_status')} = %s"]
+    params: List[Any] = [STATUS_PRESENT]
+    if not all_cases:
+        conditions.append(f"({q('input_shape')} IS NULL OR {q('params')} IS NULL OR {q('flops')} IS NULL)")
+    if repository:
+        conditions.append(f"{q('case_repository')} = %s")
+        params.append(repository)
+    cases = db.execute_query(
+        f"SELECT {q('case_id')} AS case_id, {q('case_path')} AS case_path, {q('framework')} AS framework "
+        f"FROM test_cases WHERE {' AND '.join(conditions)}", params
+    )
+
+    own_manifest = manifest is None
+    manifest = manifest or Manifest()
+    try:
+        items = [(case["case_id"], case["case_path"], case["framework"],
+                  manifest.known_hash("test_cases", case["case_path"])) for case in cases]
+    finally:
+        if own_manifest:
+            manifest.close()
+
+    stats = {"cases": len(items), "cached": 0, "extracted": 0, "failed": 0}
+
+    def results():
+        if workers <= 1 or len(items) < 2:
+            yield from map(process_model, items)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(process_model, items, chunksize=max(1, len(items) // (workers * 4)))
+
+    def rows():
+        for case_id, result, hit, reason in results():
+            if result is None:
+                stats["failed"] += 1
+                logger.warning(reason)
+                continue
+            stats["cached" if hit else "extracted"] += 1
+            yield (result["input_shape"], result["model_size"], result["params"], result["flops"], case_id)
+
+    query = (f"UPDATE test_cases SET {q('input_shape')} = %s, {q('model_size')} = %s, "
+             f"{q('params')} = %s, {q('flops')} = %s WHERE {q('case_id')} = %s")
+    db.execute_batches("test_cases", query, rows(), batch_size or INGEST_CONFIG["batch_size"])
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"test_cases 元数据提取完成: {stats}")
+    return stats
+
+
+def process_image_hash(item: Tuple[int, str]) -> Tuple[int, Optional[str]]:
+    """解析进程入口：计算单张图像的感知哈希，返回 (图像ID, 哈希)"""
+    image_id, bmp_path = item
+    return image_id, bmp_phash(bmp_path)
+
+
+def compute_image_hashes(db=None, all_images: bool = False, repository: Optional[str] = None,
+                         workers: Optional[int] = None, batch_size: Optional[int] = None) -> Dict[str, Any]:
+    """为已有图像计算感知哈希（dataset_index.phash）
+
+    默认只处理尚无哈希的图像，all_images 为 True 时全部重新计算。BMP解码和DCT在进程池中
+    并行执行，结果分批写回。
+    """
+    if db is None:
+        from database import db_manager as db
+    workers = workers if workers is not None else (INGEST_CONFIG["workers"] or os.cpu_count() or 1)
+    started = time.perf_counter()
+    q = db.quote
+    conditions = [f"{q('file_status')} = %s", f"{q('bmp_path')} IS NOT NULL"]
+    params: List[Any] = [STATUS_PRESENT]
+    if not all_images:
+        conditions.append(f"{q('phash')} IS NULL")
+    if repository:
+        conditions.append(f"{q('image_repository')} = %s")
+        params.append(repository)
+    items = [(row["image_id"], row["bmp_path"]) for row in db.execute_query(
+        f"SELECT {q('image_id')} AS image_id, {q('bmp_path')} AS bmp_path "
+        f"FROM dataset_index WHERE {' AND '.join(conditions)}", params
+    )]
+    stats = {"images": len(items), "hashed": 0, "failed": 0}
+
+    def results():
+        if workers <= 1 or len(items) < INGEST_CONFIG["parse_chunksize"]:
+            yield from map(process_image_hash, items)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(process_image_hash, items, chunksize=INGEST_CONFIG["parse_chunksize"])
+
+    def rows():
+        for image_id, phash in results():
+            if phash is None:
+                stats["failed"] += 1
+                continue
+            stats["hashed"] += 1
+            yield phash, image_id
+
+    query = f"UPDATE dataset_index SET {q('phash')} = %s WHERE {q('image_id')} = %s"
+    db.execute_batches("dataset_index", query, rows(), batch_size or INGEST_CONFIG["batch_size"])
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"dataset_index 感知哈希计算完成: {stats}")
+    return stats
+
+
+def ingest_dataset(roots: List[str], db=None, **kwargs) -> Dict[str, Any]:
+    """扫描图像仓库并写入 dataset_index"""
+    return ingest("dataset_index", roots, db, **kwargs)
+
+
+def ingest_cases(roots: List[str], db=None, **kwargs) -> Dict[str, Any]:
+    """扫描模型仓库并写入 test_cases"""
+    return ingest("test_cases", roots, db, **kwargs)
+
+
+# ---- 命令行 ----
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="批量导入数据到 AI Resources Database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    commands = {
+        "dataset": ("dataset_index", "扫描图像仓库导入 dataset_index", "JSON附属文件未提供来源时使用的默认值"),
+        "cases": ("test_cases", "扫描模型仓库导入 test_cases", "JSON配置未提供来源时使用的默认值")
+    }
+    for command, (_, help_text, source_help) in commands.items():
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument("roots", nargs="+", help="仓库目录（默认以目录名作为仓库名）")
+        sub.add_argument("--incremental", action="store_true", help="只处理相对导入清单新增或变化的文件")
+        sub.add_argument("--manifest", help="导入清单文件路径")
+        sub.add_argument("--repository", help="覆盖仓库名")
+        sub.add_argument("--source", help=source_help)
+        sub.add_argument("--workers", type=int, help="文件解析进程数（默认CPU核数）")
+        sub.add_argument("--batch-size", type=int, help="每条多行INSERT的行数")
+        sub.add_argument("--commit-every", type=int, help="每个事务提交的行数")
+        if command == "dataset":
+            sub.add_argument("--phash", action="store_true", help="导入后为尚无哈希的图像计算感知哈希（解码全部像素，较慢）")
+
+    metadata = subparsers.add_parser("metadata", help="为已有测试用例提取输入形状、参数量和FLOPs")
+    metadata.add_argument("--all", action="store_true", help="处理全部用例（默认只处理字段为空的用例）")
+    metadata.add_argument("--repository", help="只处理指定仓库")
+    metadata.add_argument("--manifest", help="导入清单文件路径（用于复用已计算的内容哈希）")
+    metadata.add_argument("--workers", type=int, help="提取进程数（默认CPU核数）")
+
+    phash = subparsers.add_parser("phash", help="为已有图像计算感知哈希（用于查找近似重复图像）")
+    phash.add_argument("--all", action="store_true", help="全部重新计算（默认只处理尚无哈希的图像）")
+    phash.add_argument("--repository", help="只处理指定仓库")
+    phash.add_argument("--workers", type=int, help="计算进程数（默认CPU核数）")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.command == "phash":
+        stats = compute_image_hashes(all_images=args.all, repository=args.repository, workers=args.workers)
+        print(f"✅ 计算完成: 图像 {stats['images']}，成功 {stats['hashed']}，无法解码 {stats['failed']}，"
+              f"耗时 {stats['seconds']}s")
+        return 0
+
+    if args.command == "metadata":
+        stats = extract_case_metadata(all_cases=args.all, repository=args.repository, workers=args.workers,
+                                      manifest=Manifest(args.manifest) if args.manifest else None)
+        print(f"✅ 提取完成: 用例 {stats['cases']}，新提取 {stats['extracted']}，缓存命中 {stats['cached']}，"
+              f"失败 {stats['failed']}，耗时 {stats['seconds']}s")
+        return 0
+
+    table_name = commands[args.command][0]
+    stats = ingest(table_name, args.roots, incremental=args.incremental,
+                   repository=args.repository, source=args.source, workers=args.workers,
+                   batch_size=args.batch_size, commit_every=args.commit_every,
+                   manifest=Manifest(args.manifest) if args.manifest else None)
+    print(f"✅ 导入完成: 扫描 {stats['scanned']}，写入 {stats['upserted']}，未变化 {stats['unchanged']}，"
+          f"标记删除 {stats['deleted']}，跳过 {stats['skipped']}，耗时 {stats['seconds']}s")
+    if getattr(args, "phash", False):
+        stats = compute_image_hashes(repository=args.repository, workers=args.workers)
+        print(f"✅ 感知哈希计算完成: 图像 {stats['images']}，成功 {stats['hashed']}，无法解码 {stats['failed']}，"
+              f"耗时 {stats['seconds']}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
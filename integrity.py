@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+文件完整性扫描模块
+Concurrent stat/checksum verification of the files referenced by path columns, with resumable progress
+
+用法:
+    python integrity.py scan dataset_index
+    python integrity.py scan test_cases --checksum --workers 64
+    python integrity.py scan dataset_index --repository urban_dataset --restart
+"""
+import argparse
+import json
+import logging
+import os
+import stat
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# 添加当前目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import INTEGRITY_CONFIG
+from database_config import TABLE_CONFIG
+from ingest import STATUS_CORRUPT, STATUS_DELETED, STATUS_MISSING, STATUS_PRESENT, Manifest, file_hash
+
+logger = logging.getLogger(__name__)
+
+# 单个文件的检查结果
+FILE_OK = "ok"
+FILE_MISSING = "missing"
+FILE_CORRUPT = "corrupt"
+
+# 按仓库限定扫描范围时使用的列
+REPOSITORY_COLUMNS = {"dataset_index": "image_repository", "test_cases": "case_repository"}
+
+
+def check_file(path: str, expected: Optional[Tuple[int, int, str]] = None, checksum: bool = False,
+               reads=None) -> Tuple[str, Optional[str]]:
+    """检查一个文件，返回 (结果, 原因)
+
+    - 不存在（包括上级目录不存在）为 missing；无法访问、不是普通文件或为空文件为 corrupt
+    - checksum 为 True 时流式读取全部内容：读取出错为 corrupt；expected 为导入清单记录的
+      (mtime_ns, 大小, 内容哈希)，mtime 和大小未变但内容哈希不同（静默损坏）同样为 corrupt
+    - reads 为限制同时读取文件数的信号量
+    """
+    try:
+        st = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return FILE_MISSING, "文件不存在"
+    except OSError as e:
+        return FILE_CORRUPT, f"无法访问: {e}"
+    if not stat.S_ISREG(st.st_mode):
+        return FILE_CORRUPT, "不是普通文件"
+    if st.st_size == 0:
+        return FILE_CORRUPT, "空文件"
+    if not checksum:
+        return FILE_OK, None
+    try:
+        with reads or nullcontext():
+            digest = file_hash(path)
+    except OSError as e:
+        return FILE_CORRUPT, f"读取失败: {e}"
+    if expected and expected[:2] == (st.st_mtime_ns, st.st_size) and expected[2] != digest:
+        return FILE_CORRUPT, "内容与导入时不一致（mtime和大小未变）"
+    return FILE_OK, None
+
+
+def check_files(paths: List[str], expected: Dict[str, Tuple[int, int, str]], checksum: bool = False,
+                reads=None) -> List[Tuple[str, Optional[str]]]:
+    """依次检查一组文件（线程池的一个任务处理一组，避免每个文件一个 Future 的调度开销）"""
+    return [check_file(path, expected.get(path), checksum, reads) for path in paths]
+
+
+def row_status(results: List[str]) -> str:
+    """一行引用的全部文件的检查结果合并为 file_status：有文件缺失优先，其次损坏"""
+    if FILE_MISSING in results:
+        return STATUS_MISSING
+    if FILE_CORRUPT in results:
+        return STATUS_CORRUPT
+    return STATUS_PRESENT
+
+
+class Checkpoint:
+    """扫描进度文件：每张表记录已完成的最大主键和累计统计
+
+    每批结果写库后保存，进程中断后下一次扫描从该主键之后继续；扫描选项不同时重新开始。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or INTEGRITY_CONFIG["checkpoint_path"]
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, states: Dict[str, Any]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(states, ensure_ascii=False))
+        os.replace(temp, self.path)
+
+    def load(self, table_name: str, options: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """读取与本次选项一致的未完成进度"""
+        state = self._read().get(table_name)
+        return state if state and state.get("options") == options else None
+
+    def save(self, table_name: str, state: Dict[str, Any]) -> None:
+        states = self._read()
+        states[table_name] = state
+        self._write(states)
+
+    def clear(self, table_name: str) -> None:
+        states = self._read()
+        if states.pop(table_name, None) is not None:
+            self._write(states)
+
+
+def scan_integrity(table_name: str, db=None, checksum: bool = False, repository: Optional[str] = None,
+                   workers: Optional[int] = None, read_workers: Optional[int] = None,
+                   page_size: Optional[int] = None, restart: bool = False,
+                   checkpoint: Optional[Checkpoint] = None, manifest: Optional[Manifest] = None) -> Dict[str, Any]:
+    """检查表中路径列引用的文件并把结果写入每行的 file_status
+
+    - 按主键顺序分批读取（键集分页），每批去重后的路径由线程池并发 stat，线程数即同时进行的
+      I/O 数；校验和模式下另以 read_workers 限制同时流式读取的文件数
+    - 行状态为 正常 / 文件缺失 / 文件损坏，只写入状态发生变化的行；“已删除”的行不检查
+    - 每批写库后保存进度，中断后以相同选项再次运行时从上次的位置继续（restart 为 True 时从头开始）
+    - 返回统计和前 max_reported 个问题文件 problems: [{row_id, column, path, status, reason}]
+    """
+    if db is None:
+        from database import db_manager as db
+    config = TABLE_CONFIG[table_name]
+    primary_key, path_columns = config["primary_key"], config["path_columns"]
+    workers = max(workers or INTEGRITY_CONFIG["workers"], 1)
+    reads = threading.BoundedSemaphore(max(read_workers or INTEGRITY_CONFIG["read_workers"], 1))
+    page_size = page_size or INTEGRITY_CONFIG["page_size"]
+    checkpoint = checkpoint or Checkpoint()
+    options = {"checksum": checksum, "repository": repository}
+    started = time.perf_counter()
+
+    state = None if restart else checkpoint.load(table_name, options)
+    if state:
+        last_id, stats = state["last_id"], state["stats"]
+        logger.info(f"{table_name} 从主键 {last_id} 之后继续扫描（已检查 {stats['rows']} 行）")
+    else:
+        last_id = None
+        stats = {"rows": 0, "files": 0, "missing": 0, "corrupt": 0, "updated": 0, "problems": []}
+    resumed = last_id is not None
+
+    q = db.quote
+    conditions = [f"{q('file_status')} <> %s"]
+    params: List[Any] = [STATUS_DELETED]
+    if repository:
+        conditions.append(f"{q(REPOSITORY_COLUMNS[table_name])} = %s")
+        params.append(repository)
+    select = ", ".join([f"{q(primary_key)} AS row_id", f"{q('file_status')} AS file_status",
+                        *(q(column) for column in path_columns)])
+    update = f"UPDATE {table_name} SET {q('file_status')} = %s WHERE {q(primary_key)} = %s"
+
+    own_manifest = checksum and manifest is None
+    if own_manifest:
+        manifest = Manifest()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="integrity") as executor:
+            while True:
+                where = list(conditions)
+                page_params = list(params)
+                if last_id is not None:
+                    where.append(f"{q(primary_key)} > %s")
+                    page_params.append(last_id)
+                rows = db._run_query(
+                    f"SELECT {select} FROM {table_name} WHERE {' AND '.join(where)} "
+                    f"ORDER BY {q(primary_key)} LIMIT {int(page_size)}", page_params
+                )
+                if not rows:
+                    break
+                paths = sorted({row[column] for row in rows for column in path_columns if row[column]})
+                expected = manifest.recorded(table_name, paths) if checksum else {}
+                # 每个线程分到约4组，组内顺序检查；stat 释放GIL，线程数即同时进行的I/O数
+                size = max(-(-len(paths) // (workers * 4)), 1)
+                groups = [paths[start:start + size] for start in range(0, len(paths), size)]
+                checked = executor.map(lambda group: check_files(group, expected, checksum, reads), groups)
+                results = dict(zip(paths, (result for group in checked for result in group)))
+
+                updates = []
+                for row in rows:
+                    checks = [(column, row[column]) for column in path_columns if row[column]]
+                    status = row_status([results[path][0] for _, path in checks])
+                    for column, path in checks:
+                        result, reason = results[path]
+                        if result != FILE_OK:
+                            stats[result] += 1
+                            if len(stats["problems"]) < INTEGRITY_CONFIG["max_reported"]:
+                                stats["problems"].append({"row_id": row["row_id"], "column": column, "path": path,
+                                                          "status": result, "reason": reason})
+                    if status != row["file_status"]:
+                        updates.append((status, row["row_id"]))
+                stats["rows"] += len(rows)
+                stats["files"] += len(paths)
+                if updates:
+                    stats["updated"] += db.execute_batches(table_name, update, updates)
+                last_id = rows[-1]["row_id"]
+                checkpoint.save(table_name, {"options": options, "last_id": last_id, "stats": stats})
+                logger.info(f"{table_name} 完整性扫描: 已检查 {stats['rows']} 行，缺失 {stats['missing']}，"
+                            f"损坏 {stats['corrupt']}")
+    finally:
+        if own_manifest:
+            manifest.close()
+
+    checkpoint.clear(table_name)
+    stats = {**stats, "table": table_name, "checksum": checksum, "resumed": resumed,
+             "seconds": round(time.perf_counter() - started, 3)}
+    logger.info(f"{table_name} 完整性扫描完成: 检查 {stats['rows']} 行 {stats['files']} 个文件，"
+                f"缺失 {stats['missing']}，损坏 {stats['corrupt']}，更新状态 {stats['updated']} 行")
+    return stats
+
+
+# ---- 命令行 ----
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="路径列引用文件的完整性扫描")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    scan = subparsers.add_parser("scan", help="检查文件是否存在且可读，结果写入 file_status")
+    scan.add_argument("table", choices=list(REPOSITORY_COLUMNS), help="要扫描的表")
+    scan.add_argument("--checksum", action="store_true", help="流式读取全部内容并与导入清单的内容哈希比对")
+    scan.add_argument("--repository", help="只扫描指定仓库")
+    scan.add_argument("--workers", type=int, help=f"并发stat线程数（默认 {INTEGRITY_CONFIG['workers']}）")
+    scan.add_argument("--read-workers", type=int,
+                      help=f"同时读取的文件数（默认 {INTEGRITY_CONFIG['read_workers']}）")
+    scan.add_argument("--restart", action="store_true", help="忽略上次未完成的进度，从头扫描")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    stats = scan_integrity(args.table, checksum=args.checksum, repository=args.repository, workers=args.workers,
+                           read_workers=args.read_workers, restart=args.restart)
+    for item in stats["problems"]:
+        print(f"{item['row_id']}\t{item['status']}\t{item['column']}\t{item['path']}\t{item['reason']}")
+    print(f"✅ 检查 {stats['rows']} 行 {stats['files']} 个文件：缺失 {stats['missing']}，损坏 {stats['corrupt']}，"
+          f"更新状态 {stats['updated']} 行（{stats['seconds']}s）")
+    return 0 if not (stats["missing"] or stats["corrupt"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+延迟导入模块
+Lazy import layer that keeps heavy dependencies off the startup path
+"""
+import importlib
+import logging
+import sys
+import threading
+import types
+from typing import Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+_lazy_modules: Dict[str, "LazyModule"] = {}
+_registry_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """模块代理，首次访问属性时才真正导入目标模块"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._lazy_target = None
+        self._lazy_lock = threading.Lock()
+
+    def _load(self) -> types.ModuleType:
+        """导入并缓存真实模块"""
+        if self._lazy_target is None:
+            with self._lazy_lock:
+                if self._lazy_target is None:
+                    self._lazy_target = importlib.import_module(self.__name__)
+        return self._lazy_target
+
+    def __getattr__(self, item: str):
+        return getattr(self._load(), item)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._lazy_target is not None else "deferred"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """返回模块的延迟代理，同名模块共享同一个代理"""
+    with _registry_lock:
+        module = _lazy_modules.get(name)
+        if module is None:
+            module = LazyModule(name)
+            _lazy_modules[name] = module
+        return module
+
+
+def is_loaded(name: str) -> bool:
+    """检查模块是否已被真正导入"""
+    return name in sys.modules
+
+
+def preload(names: Iterable[str]) -> None:
+    """依次导入模块，失败只记录日志"""
+    for name in names:
+        try:
+            lazy_import(name)._load()
+        except ImportError as e:
+            logger.warning(f"预加载模块失败: {name} - {e}")
+
+
+def preload_in_background(names: Iterable[str]) -> threading.Thread:
+    """在后台线程中预加载模块，避免首次导出时才付出导入开销"""
+    thread = threading.Thread(target=preload, args=(list(names),), name="lazy-preload", daemon=True)
+    thread.start()
+    return thread
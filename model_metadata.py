@@ -0,0 +1,533 @@
+"""
+模型元数据提取模块
+Extract input shape, parameter count and FLOPs from ONNX, Caffe and IR model files
+
+FLOPs 按乘加（MAC）计数，一次乘加计为 INGEST_CONFIG["flops_per_mac"] 次运算
+（默认1，与 ResNet50≈4.1G 的常用口径一致）。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import INGEST_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 提取逻辑变化时递增，使旧的缓存结果失效
+EXTRACTOR_VERSION = 1
+
+Shape = List[int]
+
+
+class ModelMetadataError(Exception):
+    """模型文件无法解析"""
+
+
+def _prod(values) -> int:
+    return int(math.prod(values)) if values else 1
+
+
+def format_shapes(shapes: List[List[Any]]) -> str:
+    """把输入形状格式化为 1x3x224x224，多个输入以逗号分隔"""
+    return ",".join("x".join(str(d) for d in shape) for shape in shapes)
+
+
+def _result(input_shapes: List[List[Any]], params: int, macs: int, unsupported: List[str]) -> Dict[str, Any]:
+    if unsupported:
+        logger.debug(f"以下算子未计入FLOPs: {sorted(set(unsupported))}")
+    return {
+        "input_shape": format_shapes(input_shapes)[:100] or None,
+        "params": int(params),
+        "flops": int(macs * INGEST_CONFIG["flops_per_mac"]),
+        "unsupported": sorted(set(unsupported))
+    }
+
+
+# ---- 层级形状推断（Caffe 与 IR 共用） ----
+
+# 输出形状与输入相同、按元素计算的层
+ELEMENTWISE_LAYERS = {
+    "ReLU", "PReLU", "ELU", "Sigmoid", "TanH", "AbsVal", "Power", "Exp", "Log", "BNLL", "Threshold",
+    "Swish", "Clip", "BatchNorm", "Scale", "Bias", "Softmax", "LRN", "MVN"
+}
+# 只搬移数据、不计算的层
+PASSTHROUGH_LAYERS = {"Dropout", "Split", "Silence"}
+
+
+def _pair(param: Dict[str, Any], name: str, default: int) -> Tuple[int, int]:
+    """读取 kernel/stride/pad/dilation（支持 xxx_size、重复值或 xxx_h/xxx_w）"""
+    key = "kernel_size" if name == "kernel" else name
+    if f"{name}_h" in param or f"{name}_w" in param:
+        return int(param.get(f"{name}_h", default)), int(param.get(f"{name}_w", default))
+    value = param.get(key, default)
+    if isinstance(value, (list, tuple)):
+        value = list(value) or [default]
+        return int(value[0]), int(value[-1])
+    return int(value), int(value)
+
+
+def infer_layers(inputs: Dict[str, Shape], layers: List[Dict[str, Any]]) -> Tuple[int, int, List[str]]:
+    """按层推断形状并累计参数量与乘加次数
+
+    layers 中每层为 {"type", "name", "bottom": [...], "top": [...], "param": {...}}，
+    形状为 NCHW。无法识别的单输入层按形状不变处理并记入 unsupported。
+    """
+    shapes: Dict[str, Shape] = dict(inputs)
+    params = macs = 0
+    unsupported: List[str] = []
+    for layer in layers:
+        kind, param = layer["type"], layer.get("param", {})
+        try:
+            bottoms = [shapes[name] for name in layer.get("bottom", [])]
+        except KeyError as e:
+            raise ModelMetadataError(f"层 {layer.get('name')} 的输入 {e} 形状未知")
+        tops = layer.get("top", [])
+        x = bottoms[0] if bottoms else None
+        out: Optional[Shape] = x
+
+        if kind in ("Input", "Data", "DummyData"):
+            continue
+        if kind in ("Convolution", "Deconvolution"):
+            n, c, h, w = x
+            cout = int(param["num_output"])
+            group = int(param.get("group", 1))
+            kh, kw = _pair(param, "kernel", 1)
+            sh, sw = _pair(param, "stride", 1)
+            ph, pw = _pair(param, "pad", 0)
+            dh, dw = _pair(param, "dilation", 1)
+            if kind == "Convolution":
+                oh = (h + 2 * ph - (dh * (kh - 1) + 1)) // sh + 1
+                ow = (w + 2 * pw - (dw * (kw - 1) + 1)) // sw + 1
+                out = [n, cout, oh, ow]
+                macs += _prod(out) * (c // group) * kh * kw
+            else:
+                oh = sh * (h - 1) + dh * (kh - 1) + 1 - 2 * ph
+                ow = sw * (w - 1) + dw * (kw - 1) + 1 - 2 * pw
+                out = [n, cout, oh, ow]
+                macs += _prod(x) * (cout // group) * kh * kw
+            params += cout * (c // group) * kh * kw
+            if _truthy(param.get("bias_term", True)):
+                params += cout
+        elif kind == "InnerProduct":
+            axis = int(param.get("axis", 1))
+            cout = int(param["num_output"])
+            cin = _prod(x[axis:])
+            out = list(x[:axis]) + [cout]
+            params += cout * cin + (cout if _truthy(param.get("bias_term", True)) else 0)
+            macs += _prod(x[:axis]) * cin * cout
+        elif kind == "Pooling":
+            n, c, h, w = x
+            if _truthy(param.get("global_pooling", False)):
+                out = [n, c, 1, 1]
+                macs += _prod(x)
+            else:
+                kh, kw = _pair(param, "kernel", 1)
+                sh, sw = _pair(param, "stride", 1)
+                ph, pw = _pair(param, "pad", 0)
+                # Caffe 池化输出尺寸向上取整
+                oh = int(math.ceil((h + 2 * ph - kh) / sh)) + 1
+                ow = int(math.ceil((w + 2 * pw - kw) / sw)) + 1
+                out = [n, c, oh, ow]
+                macs += _prod(out) * kh * kw
+        elif kind == "Eltwise":
+            macs += _prod(x) * max(len(bottoms) - 1, 1)
+        elif kind == "Concat":
+            axis = int(param.get("axis", 1))
+            out = list(x)
+            out[axis] = sum(b[axis] for b in bottoms)
+        elif kind == "Flatten":
+            axis = int(param.get("axis", 1))
+            out = list(x[:axis]) + [_prod(x[axis:])]
+        elif kind == "Reshape":
+            dims = [int(d) for d in _as_list(param.get("dim", []))]
+            out = [x[i] if d == 0 else d for i, d in enumerate(dims)]
+            if -1 in out:
+                known = _prod([d for d in out if d != -1])
+                out[out.index(-1)] = _prod(x) // max(known, 1)
+        elif kind in ELEMENTWISE_LAYERS:
+            channels = x[1] if len(x) > 1 else 1
+            if kind == "BatchNorm":
+                params += 2 * channels + 1  # 均值、方差与滑动系数
+            elif kind == "Scale":
+                params += channels * (2 if _truthy(param.get("bias_term", False)) else 1)
+            elif kind in ("PReLU", "Bias"):
+                params += 1 if _truthy(param.get("channel_shared", False)) else channels
+            macs += _prod(x)
+        elif kind in PASSTHROUGH_LAYERS:
+            pass
+        else:
+            unsupported.append(kind)
+            if x is None:
+                raise ModelMetadataError(f"无法推断层 {layer.get('name')}（{kind}）的输出形状")
+
+        for top in tops:
+            shapes[top] = list(out) if out is not None else shapes.get(top)
+    return params, macs, unsupported
+
+
+def _truthy(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.lower() in ("true", "1", "yes")
+    return bool(value)
+
+
+def _as_list(value: Any) -> List[Any]:
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+# ---- Caffe prototxt ----
+
+_TOKEN = re.compile(r'\s*(?:#[^\n]*|"((?:[^"\\]|\\.)*)"|\'((?:[^\'\\]|\\.)*)\'|([{}:<>;,])|([^\s{}:<>;,"\']+))')
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match or match.end() == position:
+            break
+        position = match.end()
+        double, single, symbol, word = match.groups()
+        if double is not None or single is not None:
+            tokens.append(("string", double if double is not None else single))
+        elif symbol:
+            tokens.append(("symbol", symbol))
+        elif word:
+            tokens.append(("word", word))
+    return tokens
+
+
+def _scalar(kind: str, value: str) -> Any:
+    if kind == "string":
+        return value
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_prototxt(text: str) -> Dict[str, List[Any]]:
+    """解析 protobuf 文本格式，字段值统一为列表（重复字段按出现顺序）"""
+    tokens = _tokenize(text)
+    index = 0
+
+    def message(closing: Optional[str]) -> Dict[str, List[Any]]:
+        nonlocal index
+        fields: Dict[str, List[Any]] = {}
+        while index < len(tokens):
+            kind, value = tokens[index]
+            if kind == "symbol" and value in ("}", ">"):
+                if closing is None:
+                    raise ModelMetadataError("prototxt 括号不匹配")
+                index += 1
+                return fields
+            if kind == "symbol" and value in (";", ","):
+                index += 1
+                continue
+            if kind != "word":
+                raise ModelMetadataError(f"prototxt 语法错误: {value}")
+            name = value
+            index += 1
+            if index < len(tokens) and tokens[index] == ("symbol", ":"):
+                index += 1
+            if index >= len(tokens):
+                raise ModelMetadataError(f"prototxt 字段缺少值: {name}")
+            kind, value = tokens[index]
+            if kind == "symbol" and value in ("{", "<"):
+                index += 1
+                fields.setdefault(name, []).append(message(value))
+            else:
+                index += 1
+                fields.setdefault(name, []).append(_scalar(kind, value))
+        if closing is not None:
+            raise ModelMetadataError("prototxt 意外结束")
+        return fields
+
+    return message(None)
+
+
+def _first(fields: Dict[str, List[Any]], name: str, default: Any = None) -> Any:
+    values = fields.get(name)
+    return values[0] if values else default
+
+
+# 各层参数所在的子消息
+CAFFE_PARAM_FIELDS = {
+    "Convolution": "convolution_param", "Deconvolution": "convolution_param",
+    "InnerProduct": "inner_product_param", "Pooling": "pooling_param",
+    "Concat": "concat_param", "Flatten": "flatten_param", "Reshape": "reshape_param",
+    "Scale": "scale_param", "Bias": "bias_param", "PReLU": "prelu_param", "Input": "input_param"
+}
+# 可重复的参数字段
+REPEATED_PARAMS = {"kernel_size", "stride", "pad", "dilation", "dim"}
+
+
+def caffe_layers(net: Dict[str, List[Any]]) -> Tuple[Dict[str, Shape], List[Dict[str, Any]]]:
+    """把解析后的 NetParameter 转为输入形状和层列表"""
+    inputs: Dict[str, Shape] = {}
+    names = net.get("input", [])
+    shapes = [[int(d) for d in shape.get("dim", [])] for shape in net.get("input_shape", [])]
+    flat_dims = [int(d) for d in net.get("input_dim", [])]
+    for i, name in enumerate(names):
+        if i < len(shapes):
+            inputs[name] = shapes[i]
+        elif flat_dims[4 * i:4 * i + 4]:
+            inputs[name] = flat_dims[4 * i:4 * i + 4]
+
+    layers = []
+    for layer in net.get("layer", []):
+        kind = str(_first(layer, "type", ""))
+        sub = _first(layer, CAFFE_PARAM_FIELDS.get(kind, ""), {}) or {}
+        param = {key: (values if key in REPEATED_PARAMS else values[0]) for key, values in sub.items()}
+        if kind == "Reshape" and "shape" in param:
+            param["dim"] = param["shape"].get("dim", [])
+        if kind == "Input":
+            for top, shape in zip(layer.get("top", []), sub.get("shape", [])):
+                inputs[top] = [int(d) for d in shape.get("dim", [])]
+        layers.append({
+            "type": kind,
+            "name": _first(layer, "name", ""),
+            "bottom": layer.get("bottom", []),
+            "top": layer.get("top", []),
+            "param": param
+        })
+    if not inputs:
+        raise ModelMetadataError("未找到输入形状（需要 input_shape/input_dim 或 Input 层）")
+    return inputs, layers
+
+
+def extract_caffe(path: str) -> Dict[str, Any]:
+    """从 Caffe prototxt 提取元数据（参数量由网络结构计算，不读取权重文件）"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        net = parse_prototxt(f.read())
+    inputs, layers = caffe_layers(net)
+    params, macs, unsupported = infer_layers(inputs, layers)
+    return _result(list(inputs.values()), params, macs, unsupported)
+
+
+# ---- IR 文本格式 ----
+
+_IR_INPUT = re.compile(r"^input\s+(\S+)\s*[:=]?\s*([0-9x?]+)$")
+_IR_LAYER = re.compile(r"^(.+?)\s*=\s*(\w+)\s*\(([^)]*)\)\s*(.*)$")
+
+
+def parse_ir(text: str) -> Tuple[Dict[str, Shape], List[Dict[str, Any]]]:
+    """解析IR文本格式
+
+    每行一条语句，# 开头为注释，层类型与参数名沿用 Caffe 的命名:
+
+        input data 1x3x224x224
+        conv1 = Convolution(data) num_output=64 kernel_size=7 stride=2 pad=3
+        pool1 = Pooling(conv1) pool=MAX kernel_size=3 stride=2
+        a, b = Split(pool1)
+        fc = InnerProduct(pool1) num_output=1000
+    """
+    inputs: Dict[str, Shape] = {}
+    layers = []
+    for number, raw in enumerate(text.splitlines(), 1):
+        line = raw.split("#", 1)[0].strip()
+        if not line:
+            continue
+        match = _IR_INPUT.match(line)
+        if match:
+            inputs[match.group(1)] = [int(d) if d.isdigit() else 1 for d in match.group(2).split("x")]
+            continue
+        match = _IR_LAYER.match(line)
+        if not match:
+            raise ModelMetadataError(f"IR 第{number}行无法解析: {line}")
+        tops, kind, bottoms, attrs = match.groups()
+        param: Dict[str, Any] = {}
+        for item in attrs.split():
+            key, _, value = item.partition("=")
+            values = [_scalar("word", v) for v in value.split(",")] if value else [True]
+            param[key] = values if key in REPEATED_PARAMS or len(values) > 1 else values[0]
+        top_names = [t.strip() for t in tops.split(",") if t.strip()]
+        layers.append({
+            "type": kind,
+            "name": top_names[0],
+            "bottom": [b.strip() for b in bottoms.split(",") if b.strip()],
+            "top": top_names,
+            "param": param
+        })
+    if not inputs:
+        raise ModelMetadataError("IR 缺少 input 声明")
+    return inputs, layers
+
+
+def extract_ir(path: str) -> Dict[str, Any]:
+    """从IR文本提取元数据"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        inputs, layers = parse_ir(f.read())
+    params, macs, unsupported = infer_layers(inputs, layers)
+    return _result(list(inputs.values()), params, macs, unsupported)
+
+
+# ---- ONNX ----
+
+# 按输出元素计算一次的算子
+ONNX_ELEMENTWISE = {
+    "Add", "Sub", "Mul", "Div", "Relu", "LeakyRelu", "PRelu", "Sigmoid", "Tanh", "Clip", "Elu", "Selu",
+    "HardSigmoid", "HardSwish", "Softmax", "LogSoftmax", "Exp", "Log", "Sqrt", "Pow", "Erf", "Gelu",
+    "BatchNormalization", "InstanceNormalization", "LayerNormalization", "Neg", "Abs", "Reciprocal",
+    "Max", "Min", "Mean", "Sum", "Where"
+}
+# 只改变形状或搬移数据的算子
+ONNX_ZERO_COST = {
+    "Reshape", "Flatten", "Transpose", "Squeeze", "Unsqueeze", "Concat", "Split", "Slice", "Gather",
+    "Shape", "Constant", "ConstantOfShape", "Identity", "Dropout", "Cast", "Pad", "Expand", "Tile",
+    "Resize", "Upsample", "DepthToSpace", "SpaceToDepth", "Range"
+}
+ONNX_REDUCE = {"ReduceMean", "ReduceSum", "ReduceMax", "ReduceMin", "GlobalAveragePool", "GlobalMaxPool"}
+# 计入参数量的初始化张量类型（FLOAT, FLOAT16, DOUBLE, BFLOAT16），排除形状等整数常量
+ONNX_PARAM_TYPES = {1, 10, 11, 16}
+
+
+def extract_onnx(path: str) -> Dict[str, Any]:
+    """从ONNX模型提取元数据：遍历初始化张量统计参数量，按算子类型累计FLOPs"""
+    try:
+        import onnx
+        from onnx import shape_inference
+    except ImportError:
+        raise ModelMetadataError("未安装 onnx，无法解析ONNX模型（pip install onnx）")
+
+    try:
+        # 不加载外部权重数据，初始化张量的维度信息已足够
+        model = onnx.load(path, load_external_data=False)
+        try:
+            model = shape_inference.infer_shapes(model)
+        except Exception as e:
+            logger.debug(f"ONNX形状推断失败，仅使用已有形状信息: {e}")
+    except Exception as e:
+        raise ModelMetadataError(f"ONNX模型加载失败: {e}")
+
+    graph = model.graph
+    initializers = {tensor.name: list(tensor.dims) for tensor in graph.initializer}
+    params = sum(_prod(tensor.dims) for tensor in graph.initializer if tensor.data_type in ONNX_PARAM_TYPES)
+
+    def dims(value_info) -> List[Any]:
+        return [d.dim_value if d.HasField("dim_value") else (d.dim_param or "?")
+                for d in value_info.type.tensor_type.shape.dim]
+
+    shapes: Dict[str, Shape] = dict(initializers)
+    for value_info in list(graph.input) + list(graph.value_info) + list(graph.output):
+        if value_info.name not in initializers:
+            # 动态维度按1计算
+            shapes[value_info.name] = [d if isinstance(d, int) and d > 0 else 1 for d in dims(value_info)]
+    input_shapes = [dims(v) for v in graph.input if v.name not in initializers]
+
+    macs = 0
+    unsupported: List[str] = []
+    for node in graph.node:
+        op = node.op_type
+        attrs = {a.name: onnx.helper.get_attribute_value(a) for a in node.attribute}
+        x = shapes.get(node.input[0]) if node.input else None
+        out = shapes.get(node.output[0]) if node.output else None
+        if op in ONNX_ZERO_COST:
+            continue
+        if op == "Conv" and out and node.input[1] in shapes:
+            macs += _prod(out) * _prod(shapes[node.input[1]][1:])
+        elif op == "ConvTranspose" and x and node.input[1] in shapes:
+            macs += _prod(x) * _prod(shapes[node.input[1]][1:])
+        elif op == "Gemm" and out and x:
+            k = x[0] if attrs.get("transA", 0) else x[-1]
+            macs += _prod(out) * k
+        elif op == "MatMul" and out and x:
+            macs += _prod(out) * x[-1]
+        elif op in ("MaxPool", "AveragePool", "LpPool") and out:
+            macs += _prod(out) * _prod(attrs.get("kernel_shape", []))
+        elif op in ONNX_REDUCE and x:
+            macs += _prod(x)
+        elif op in ONNX_ELEMENTWISE and out:
+            macs += _prod(out)
+        else:
+            unsupported.append(op)
+    return _result(input_shapes, params, macs, unsupported)
+
+
+EXTRACTORS = {
+    "onnx": extract_onnx,
+    "caffe": extract_caffe,
+    "ir": extract_ir
+}
+
+
+def extract_metadata(path: str, framework: str) -> Dict[str, Any]:
+    """按框架提取模型元数据，返回 input_shape/params/flops"""
+    if framework not in EXTRACTORS:
+        raise ModelMetadataError(f"不支持的框架: {framework}")
+    try:
+        return EXTRACTORS[framework](path)
+    except (KeyError, IndexError, ValueError, TypeError, ZeroDivisionError) as e:
+        raise ModelMetadataError(f"无法推断模型结构: {e!r}")
+
+
+# ---- 结果缓存 ----
+
+class MetadataCache:
+    """以文件内容哈希为键的提取结果缓存（本地SQLite文件）
+
+    相同内容的模型文件（包括被复制或重命名的文件）只提取一次。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or INGEST_CONFIG["metadata_cache_path"]
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        # 多个解析进程并发读写
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS model_metadata ("
+            "hash TEXT NOT NULL, framework TEXT NOT NULL, version INTEGER NOT NULL, result TEXT NOT NULL, "
+            "PRIMARY KEY (hash, framework, version))"
+        )
+        self.connection.commit()
+
+    def get(self, digest: str, framework: str) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute(
+            "SELECT result FROM model_metadata WHERE hash = ? AND framework = ? AND version = ?",
+            (digest, framework, EXTRACTOR_VERSION)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, digest: str, framework: str, result: Dict[str, Any]) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO model_metadata (hash, framework, version, result) VALUES (?, ?, ?, ?)",
+            (digest, framework, EXTRACTOR_VERSION, json.dumps(result, ensure_ascii=False))
+        )
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+_process_cache: Optional[MetadataCache] = None
+
+
+def get_metadata_cache() -> MetadataCache:
+    """当前进程的结果缓存（每个解析进程各自打开一个连接）"""
+    global _process_cache
+    if _process_cache is None or _process_cache.path != INGEST_CONFIG["metadata_cache_path"]:
+        _process_cache = MetadataCache()
+    return _process_cache
+
+
+def cached_extract(path: str, framework: str, digest: str) -> Tuple[Dict[str, Any], bool]:
+    """提取元数据，内容哈希相同的文件直接返回缓存结果，返回 (结果, 是否命中缓存)"""
+    cache = get_metadata_cache()
+    result = cache.get(digest, framework)
+    if result is not None:
+        return result, True
+    result = extract_metadata(path, framework)
+    cache.put(digest, framework, result)
+    return result, False
@@ -0,0 +1,248 @@
+"""
+查询超时与取消模块
+Statement-level query timeouts and cancellation of running queries when the client goes away
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from config import QUERY_TIMEOUT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 客户端主动断开时的非标准状态码（与 nginx 的 499 一致），响应实际不会送达
+STATUS_CLIENT_CLOSED = 499
+
+
+class QueryInterrupted(Exception):
+    """查询被中断（超时或取消）"""
+
+
+class QueryTimeout(QueryInterrupted):
+    """查询超过该类查询的语句超时"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        if timeout:
+            super().__init__(f"查询超时（超过 {timeout:g} 秒），请缩小搜索范围或增加筛选条件")
+        else:
+            super().__init__("查询超时，请缩小搜索范围或增加筛选条件")
+        self.timeout = timeout
+
+
+class QueryCancelled(QueryInterrupted):
+    """请求已取消或客户端已断开，查询被终止"""
+
+    def __init__(self):
+        super().__init__("查询已取消")
+
+
+def query_timeout(kind: str = "default") -> Optional[float]:
+    """一类查询的语句超时秒数，未配置或为0时返回 None（不限制）"""
+    return QUERY_TIMEOUT_CONFIG.get(kind, QUERY_TIMEOUT_CONFIG["default"]) or None
+
+
+class CancelToken:
+    """一个请求的取消标记和正在执行的查询
+
+    cancel() 之后该请求的后续查询直接抛出 QueryCancelled，正在执行的查询由后端终止
+    （MySQL 在旁路连接上执行 KILL QUERY，SQLite 调用 interrupt()）。终止在锁内完成，
+    查询结束后要等终止完成才归还连接，不会误杀连接池中复用该连接的其他查询。
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._running: Dict[int, Tuple[Any, Any]] = {}
+        self._lock = threading.Lock()
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise QueryCancelled()
+
+    @contextmanager
+    def running(self, backend, connection) -> Iterator[None]:
+        """登记正在 connection 上执行的查询"""
+        with self._lock:
+            self.check()
+            self._running[id(connection)] = (backend, connection)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._running.pop(id(connection), None)
+
+    def cancel(self) -> int:
+        """取消请求并终止正在执行的查询，返回终止的查询数"""
+        with self._lock:
+            if self.cancelled:
+                return 0
+            self.cancelled = True
+            if not QUERY_TIMEOUT_CONFIG["kill_on_disconnect"]:
+                return 0
+            killed = 0
+            for backend, connection in self._running.values():
+                try:
+                    backend.cancel(connection)
+                    killed += 1
+                except Exception as e:
+                    logger.warning(f"终止查询失败: {e}")
+        if killed:
+            logger.info(f"请求已取消，终止 {killed} 个正在执行的查询")
+        return killed
+
+
+_current_token: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar("query_cancel_token",
+                                                                                     default=None)
+
+
+@contextmanager
+def cancel_scope(token: Optional[CancelToken] = None) -> Iterator[CancelToken]:
+    """在作用域内执行的查询（含同一上下文中的线程池任务）关联到 token"""
+    token = token or CancelToken()
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+@contextmanager
+def track_query(backend, connection) -> Iterator[None]:
+    """DatabaseManager 执行查询时调用：请求已取消时直接抛出，否则登记到当前请求以便终止"""
+    token = _current_token.get()
+    if token is None:
+        yield
+        return
+    with token.running(backend, connection):
+        yield
+
+
+class SessionQueries:
+    """按界面会话登记进行中的请求，标签页关闭时取消该会话的全部查询"""
+
+    def __init__(self):
+        self._tokens: Dict[str, Set[CancelToken]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, session: Optional[str], token: CancelToken) -> None:
+        if session:
+            with self._lock:
+                self._tokens.setdefault(session, set()).add(token)
+
+    def discard(self, session: Optional[str], token: CancelToken) -> None:
+        if session:
+            with self._lock:
+                tokens = self._tokens.get(session)
+                if tokens is not None:
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._tokens[session]
+
+    def cancel(self, session: Optional[str]) -> int:
+        """取消会话的全部请求，返回终止的查询数"""
+        with self._lock:
+            tokens: List[CancelToken] = list(self._tokens.pop(session, ())) if session else []
+        return sum(token.cancel() for token in tokens)
+
+
+session_queries = SessionQueries()
+
+
+def _current_session() -> Optional[str]:
+    """当前 Gradio 事件的会话标识"""
+    from gradio.context import LocalContext
+    request = LocalContext.request.get(None)
+    return getattr(request, "session_hash", None)
+
+
+def cancellable(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """把同步的 Gradio 事件处理函数包装为可取消的异步函数
+
+    处理函数在线程池中执行，事件任务被取消（cancels= 或 /cancel）时终止其正在执行的查询；
+    请求同时登记到会话，标签页关闭（unload）时由 cancel_session_queries 终止。
+    """
+    @functools.wraps(fn)
+    async def handler(*args):
+        token = CancelToken()
+        session = _current_session()
+        session_queries.add(session, token)
+
+        def run():
+            with cancel_scope(token):
+                return fn(*args)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, contextvars.copy_context().run, run)
+        except asyncio.CancelledError:
+            # 终止查询可能需要建立旁路连接，不在事件循环中等待
+            asyncio.get_running_loop().run_in_executor(None, token.cancel)
+            raise
+        finally:
+            session_queries.discard(session, token)
+
+    return handler
+
+
+def cancel_session_queries() -> None:
+    """标签页关闭或刷新时（Blocks.unload）终止该会话正在执行的查询"""
+    session_queries.cancel(_current_session())
+
+
+class QueryCancellationMiddleware:
+    """客户端断开时终止请求正在执行的查询（ASGI）
+
+    只处理 /api/ 下的查询和导出请求：转发 receive 消息的同时监听 http.disconnect，
+    在响应完成前断开时取消该请求的 CancelToken。同步接口在线程池中执行，线程池任务
+    复制请求的上下文，因此能取得同一个 token。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        from rate_limit import classify
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith("/api/") or classify(path) is None:
+            await self.app(scope, receive, send)
+            return
+
+        token = CancelToken()
+        messages: asyncio.Queue = asyncio.Queue()
+        done = False
+
+        async def watch():
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not done:
+                        asyncio.get_running_loop().run_in_executor(None, token.cancel)
+                    return
+
+        watcher = asyncio.create_task(watch())
+        try:
+            with cancel_scope(token):
+                await self.app(scope, messages.get, send)
+        finally:
+            done = True
+            watcher.cancel()
+
+
+def register_query_control(api) -> None:
+    """注册断开取消中间件，并把查询超时、取消映射为 504 / 499 响应"""
+    from fastapi.responses import JSONResponse
+
+    async def timed_out(request, exc: QueryTimeout):
+        return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+    async def cancelled(request, exc: QueryCancelled):
+        return JSONResponse(status_code=STATUS_CLIENT_CLOSED, content={"detail": str(exc)})
+
+    api.add_exception_handler(QueryTimeout, timed_out)
+    api.add_exception_handler(QueryCancelled, cancelled)
+    api.add_middleware(QueryCancellationMiddleware)
@@ -0,0 +1,288 @@
+"""
+限流与过载保护模块
+Per-client token-bucket rate limiting and load shedding of uncached queries
+"""
+from __future__ import annotations
+
+import functools
+import ipaddress
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from config import PERFORMANCE_CONFIG, SECURITY_CONFIG
+from database_config import TABLE_CONFIG
+
+# 按路径前缀区分的请求类别，各自使用独立的令牌桶预算；其他路径（静态文件、缩略图、页面资源）不限流
+EXPORT_PATHS = ("/api/export/",)
+# 界面的搜索、筛选和导出按钮都经过 Gradio 事件队列，计入查询预算；界面导出另在 export_data 中
+# 按 gr.Request 的客户端扣除导出预算（见 acquire_for_request）
+QUERY_PATHS = ("/api/grid/", "/api/similar/", "/gradio_api/queue/join", "/gradio_api/run/")
+
+
+class Overloaded(Exception):
+    """未命中缓存的查询等待执行名额超时（服务繁忙）"""
+
+    def __init__(self, retry_after: float = 1.0):
+        super().__init__("服务繁忙，请稍后重试")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """令牌桶：容量为 burst，每秒补充 rate 个令牌"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1.0) -> float:
+        """取走 cost 个令牌，成功返回0，否则返回需要等待的秒数"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        # 预算为0时按一分钟后重试
+        return (cost - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class RateLimiter:
+    """按客户端和请求类别的令牌桶限流
+
+    查询和导出各有独立的预算（每分钟次数与突发容量），见 SECURITY_CONFIG["rate_limit"]。
+    令牌桶保存在进程内，最久未访问的客户端在超过 max_clients 时丢弃（丢弃后按满桶重新开始）。
+    多工作进程部署时 nginx 按客户端IP哈希分发，同一客户端的请求由同一进程限流。
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, clock=time.monotonic):
+        config = config or SECURITY_CONFIG["rate_limit"]
+        self.budgets = {
+            "query": (config["requests_per_minute"] / 60.0, float(config["burst"])),
+            "export": (config["exports_per_minute"] / 60.0, float(config["export_burst"]))
+        }
+        self.max_clients = config["max_clients"]
+        self.clock = clock
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def acquire(self, client: str, action: str) -> float:
+        """为一次请求取令牌，允许时返回0，否则返回建议的重试等待秒数"""
+        now = self.clock()
+        key = (client, action)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(*self.budgets[action], now)
+                self._buckets[key] = bucket
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            wait = bucket.take(now)
+            if wait:
+                self.rejected += 1
+            return wait
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"clients": len(self._buckets), "rejected": self.rejected}
+
+
+class LoadShedder:
+    """过载保护：限制同时执行的未命中缓存的查询数
+
+    命中缓存的请求不经过这里，过载时仍然正常返回；需要访问数据库的查询最多等待 queue_timeout 秒
+    取得名额，超时抛出 Overloaded（接口返回503，界面提示服务繁忙），不再排队占用数据库连接。
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None, queue_timeout: Optional[float] = None):
+        self.max_concurrent = max_concurrent or PERFORMANCE_CONFIG["max_concurrent_requests"]
+        self.queue_timeout = PERFORMANCE_CONFIG["queue_timeout"] if queue_timeout is None else queue_timeout
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.active = 0
+        self.shed = 0
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """占用一个执行名额；同一线程内嵌套的查询共用外层名额"""
+        if getattr(self._local, "depth", 0):
+            self._local.depth += 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.shed += 1
+            raise Overloaded(max(self.queue_timeout, 1.0))
+        with self._lock:
+            self.active += 1
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            with self._lock:
+                self.active -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"max_concurrent": self.max_concurrent, "active": self.active, "shed": self.shed}
+
+
+def classify(path: str) -> Optional[str]:
+    """请求路径对应的限流类别，不限流的路径返回 None"""
+    if path.startswith(EXPORT_PATHS):
+        return "export"
+    if path.startswith(QUERY_PATHS):
+        return "query"
+    # REST查询接口 /api/{table}
+    if path.startswith("/api/") and path[len("/api/"):].rstrip("/") in TABLE_CONFIG:
+        return "query"
+    return None
+
+
+@functools.lru_cache(maxsize=16)
+def _proxy_networks(proxies: Tuple[str, ...]) -> Tuple[Tuple[Any, ...], Tuple[str, ...]]:
+    """解析可信代理列表：(IP网段, 无法解析为网段的名称)"""
+    networks, names = [], []
+    for item in proxies:
+        try:
+            networks.append(ipaddress.ip_network(item.strip(), strict=False))
+        except ValueError:
+            names.append(item.strip())
+    return tuple(networks), tuple(names)
+
+
+def is_trusted_proxy(address: Optional[str], trusted_proxies: Optional[Iterable[str]] = None) -> bool:
+    """对端地址是否属于可信代理（默认 SECURITY_CONFIG["rate_limit"]["trusted_proxies"]）"""
+    if not address:
+        return False
+    proxies = SECURITY_CONFIG["rate_limit"]["trusted_proxies"] if trusted_proxies is None else trusted_proxies
+    networks, names = _proxy_networks(tuple(proxies))
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return address in names
+    return any(ip in network for network in networks)
+
+
+def client_key(scope: Dict[str, Any], header: Optional[str] = None,
+               trusted_proxies: Optional[Iterable[str]] = None) -> str:
+    """客户端标识：对端为可信代理（nginx）时取其转发的 X-Real-IP，否则为连接的对端地址
+
+    请求头可以由客户端任意设置，直连应用的客户端每次换一个取值就能得到新的令牌桶，
+    因此只信任来自可信代理的请求头。
+    """
+    client = scope.get("client")
+    peer = client[0] if client else None
+    if is_trusted_proxy(peer, trusted_proxies):
+        name = (header or SECURITY_CONFIG["rate_limit"]["client_header"]).lower().encode("latin-1")
+        for key, value in scope.get("headers") or []:
+            if key == name and value:
+                return value.decode("latin-1").strip()
+    return peer or "unknown"
+
+
+def retry_message(action: str, wait: float) -> str:
+    """超出预算时的提示"""
+    label = "导出" if action == "export" else "查询"
+    return f"{label}请求过于频繁，请 {max(int(math.ceil(wait)), 1)} 秒后重试"
+
+
+def _json_response(status: int, detail: str, retry_after: float) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    body = json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8")
+    start = {
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json; charset=utf-8"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(max(int(math.ceil(retry_after)), 1)).encode("latin-1"))
+        ]
+    }
+    return start, {"type": "http.response.body", "body": body}
+
+
+class RateLimitMiddleware:
+    """按客户端限流的中间件（ASGI）
+
+    只处理 classify 识别的查询和导出请求，超出预算时直接返回429和 Retry-After，不进入应用。
+    """
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.limiter = limiter or RateLimiter()
+
+    async def __call__(self, scope, receive, send):
+        action = classify(scope["path"]) if scope["type"] == "http" else None
+        if action is None or scope.get("method") == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        wait = self.limiter.acquire(client_key(scope), action)
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+        start, body = _json_response(429, retry_message(action, wait), wait)
+        await send(start)
+        await send(body)
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """进程内共享的限流器，中间件和界面事件使用同一组令牌桶"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def acquire_for_request(request, action: str) -> float:
+    """为界面事件（gr.Request）取令牌，返回值同 RateLimiter.acquire
+
+    客户端按 client_key 的规则识别（只信任可信代理转发的请求头）。限流未启用或没有请求信息时不限流。
+    """
+    if request is None or not SECURITY_CONFIG["rate_limit"]["enabled"]:
+        return 0.0
+    client = getattr(request, "client", None)
+    host = getattr(client, "host", None)
+    headers = getattr(request, "headers", None) or {}
+    scope = {
+        "client": (host, getattr(client, "port", 0)) if host else None,
+        "headers": [(str(key).lower().encode("latin-1", "replace"), str(value).encode("latin-1", "replace"))
+                    for key, value in headers.items()]
+    }
+    return get_rate_limiter().acquire(client_key(scope), action)
+
+
+def register_rate_limiting(api, limiter: Optional[RateLimiter] = None) -> None:
+    """注册限流中间件（SECURITY_CONFIG["rate_limit"]["enabled"] 或传入 limiter 时）和过载响应
+
+    查询过载（Overloaded）在所有接口上统一返回503、Retry-After 和“服务繁忙”提示。
+    """
+    from fastapi.responses import JSONResponse
+
+    async def overloaded(request, exc: Overloaded):
+        return JSONResponse(status_code=503, content={"detail": str(exc)},
+                            headers={"Retry-After": str(max(int(math.ceil(exc.retry_after)), 1))})
+
+    api.add_exception_handler(Overloaded, overloaded)
+    if limiter is not None or SECURITY_CONFIG["rate_limit"]["enabled"]:
+        api.add_middleware(RateLimitMiddleware, limiter=limiter or get_rate_limiter())
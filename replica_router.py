@@ -0,0 +1,194 @@
+"""
+读副本路由模块
+Replica-aware connection routing for MySQL reads
+"""
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from config import DB_CONFIG
+from database_config import DATABASE_CONFIG, REPLICA_CONFIG
+from lazy_imports import lazy_import
+
+mysql_connector = lazy_import("mysql.connector")
+
+logger = logging.getLogger(__name__)
+
+
+class Endpoint:
+    """一个数据库节点（主库或只读副本）"""
+
+    def __init__(self, name: str, config: Dict[str, Any], weight: int = 1, role: str = "replica"):
+        self.name = name
+        self.config = config
+        self.weight = max(int(weight), 0)
+        self.role = role
+        self.healthy = True
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error: Optional[str] = None
+        self.pool = None
+
+    def available(self, now: float) -> bool:
+        """健康或已过冷却期（允许一次探测）"""
+        return self.weight > 0 and (self.healthy or now >= self.retry_at)
+
+    def status(self) -> Dict[str, Any]:
+        """节点状态"""
+        return {
+            "name": self.name,
+            "role": self.role,
+            "weight": self.weight,
+            "healthy": self.healthy,
+            "failures": self.failures,
+            "last_error": self.last_error
+        }
+
+
+class ReplicaRouter:
+    """读写分离路由
+
+    - 写操作（read_only=False）始终使用主库
+    - 读操作按权重在健康的只读副本间随机分配，副本连接失败时依次尝试其余副本，
+      全部不可用时回退到主库
+    - 失败的副本在冷却期内不参与分配，冷却期后由下一次请求或后台健康检查探测恢复
+    """
+
+    def __init__(self,
+                 primary_config: Optional[Dict[str, Any]] = None,
+                 replicas: Optional[List[Dict[str, Any]]] = None,
+                 connector: Optional[Callable[[Endpoint], Any]] = None,
+                 failure_cooldown: Optional[float] = None,
+                 max_lag_seconds: Optional[int] = None,
+                 rng: Optional[random.Random] = None):
+        primary_config = primary_config or DATABASE_CONFIG
+        replicas = REPLICA_CONFIG["replicas"] if replicas is None else replicas
+        self.primary = Endpoint("primary", primary_config, role="primary")
+        self.replicas = [
+            Endpoint(
+                f"{r['host']}:{r.get('port', primary_config.get('port', 3306))}",
+                {**primary_config, "host": r["host"], "port": int(r.get("port", primary_config.get("port", 3306)))},
+                weight=r.get("weight", 1)
+            )
+            for r in replicas
+        ]
+        self.connector = connector or self._pooled_connect
+        self.failure_cooldown = REPLICA_CONFIG["failure_cooldown"] if failure_cooldown is None else failure_cooldown
+        self.max_lag_seconds = REPLICA_CONFIG["max_lag_seconds"] if max_lag_seconds is None else max_lag_seconds
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._health_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---- 连接 ----
+
+    def _pooled_connect(self, endpoint: Endpoint):
+        """从节点连接池获取连接，池耗尽时退化为直连"""
+        if DB_CONFIG["pool_size"] > 0:
+            with self._lock:
+                if endpoint.pool is None:
+                    endpoint.pool = mysql_connector.pooling.MySQLConnectionPool(
+                        pool_name=f"ai_resources_{endpoint.role}_{id(endpoint)}",
+                        pool_size=DB_CONFIG["pool_size"],
+                        **endpoint.config
+                    )
+            try:
+                return endpoint.pool.get_connection()
+            except mysql_connector.errors.PoolError:
+                logger.debug(f"连接池已耗尽，直接连接: {endpoint.name}")
+        return mysql_connector.connect(**endpoint.config)
+
+    def _ordered_replicas(self) -> List[Endpoint]:
+        """按权重随机排序可用副本（加权无放回抽样）"""
+        now = time.monotonic()
+        candidates = [r for r in self.replicas if r.available(now)]
+        return sorted(candidates, key=lambda r: self.rng.random() ** (1.0 / r.weight), reverse=True)
+
+    def connect(self, read_only: bool = False):
+        """获取连接，只读请求优先路由到副本"""
+        if read_only:
+            for endpoint in self._ordered_replicas():
+                try:
+                    connection = self.connector(endpoint)
+                    self.mark_success(endpoint)
+                    return connection
+                except Exception as e:
+                    self.mark_failure(endpoint, e)
+            if self.replicas:
+                logger.warning("没有可用的只读副本，回退到主库")
+        return self.connector(self.primary)
+
+    # ---- 健康状态 ----
+
+    def mark_success(self, endpoint: Endpoint) -> None:
+        """记录节点可用"""
+        if not endpoint.healthy:
+            logger.info(f"只读副本恢复: {endpoint.name}")
+        endpoint.healthy = True
+        endpoint.failures = 0
+        endpoint.last_error = None
+
+    def mark_failure(self, endpoint: Endpoint, error: Any) -> None:
+        """记录节点失败并进入冷却期"""
+        endpoint.healthy = False
+        endpoint.failures += 1
+        endpoint.last_error = str(error)
+        endpoint.retry_at = time.monotonic() + self.failure_cooldown
+        logger.warning(f"只读副本不可用: {endpoint.name} - {error}")
+
+    def check_endpoint(self, endpoint: Endpoint) -> bool:
+        """主动健康检查：执行 SELECT 1，并在配置了延迟上限时检查复制延迟"""
+        connection = None
+        try:
+            connection = self.connector(endpoint)
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            if self.max_lag_seconds:
+                cursor.execute("SHOW REPLICA STATUS")
+                status = cursor.fetchone() or {}
+                lag = status.get("Seconds_Behind_Source")
+                if lag is None or lag > self.max_lag_seconds:
+                    raise RuntimeError(f"复制延迟过高: {lag}")
+            cursor.close()
+            self.mark_success(endpoint)
+            return True
+        except Exception as e:
+            self.mark_failure(endpoint, e)
+            return False
+        finally:
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+    def check_all(self) -> None:
+        """检查所有只读副本"""
+        for endpoint in self.replicas:
+            self.check_endpoint(endpoint)
+
+    def start_health_checks(self, interval: Optional[float] = None) -> None:
+        """启动后台健康检查线程"""
+        if not self.replicas or self._health_thread is not None:
+            return
+        interval = interval or REPLICA_CONFIG["health_check_interval"]
+
+        def _loop():
+            while not self._stop.wait(interval):
+                self.check_all()
+
+        self._health_thread = threading.Thread(target=_loop, name="replica-health", daemon=True)
+        self._health_thread.start()
+
+    def stop_health_checks(self) -> None:
+        """停止后台健康检查"""
+        self._stop.set()
+
+    def status(self) -> List[Dict[str, Any]]:
+        """所有节点状态"""
+        return [self.primary.status()] + [r.status() for r in self.replicas]
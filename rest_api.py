@@ -0,0 +1,135 @@
+"""
+REST查询接口模块
+Headless JSON/NDJSON query API over TABLE_CONFIG tables: /api/{table}
+"""
+import json
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import API_CONFIG
+from database_config import TABLE_CONFIG
+from grid import parse_fields, parse_filters, parse_sort
+
+API_PREFIX = "/api"
+# 查询参数中除列筛选外的保留参数
+RESERVED_PARAMS = {"offset", "limit", "search", "filters", "fields", "sort", "format", "names"}
+QUERY_FORMATS = ("json", "ndjson")
+# 范围筛选参数的后缀：<列名>.min / <列名>.max
+RANGE_BOUNDS = ("min", "max")
+# 返回的字段名：original（原始列名，默认，便于脚本使用）/ display（中文列名）
+NAME_STYLES = ("original", "display")
+
+
+def collect_query_filters(db, table_name: str, raw_filters: str,
+                          params: List[tuple]) -> Dict[str, Any]:
+    """合并 filters JSON 与列名形式的查询参数
+
+    取值筛选如 ?framework=onnx&framework=caffe，数值范围如 ?flops.min=1e9&flops.max=5e9。
+    列名可以是中文或原始列名，未知列或同一列同时按取值和范围筛选抛出 ValueError。
+    返回以中文列名为键的筛选条件。
+    """
+    column_mapping = TABLE_CONFIG[table_name]["columns"]
+    merged: Dict[str, Any] = {}
+    items = list(parse_filters(raw_filters).items())
+    for name, value in params:
+        if name in RESERVED_PARAMS or value == "":
+            continue
+        column, _, bound = name.rpartition(".")
+        if bound in RANGE_BOUNDS and column:
+            items.append((column, {bound: value}))
+        else:
+            items.append((name, [value]))
+    for name, values in items:
+        column_chinese = column_mapping[db.resolve_columns(table_name, [name])[0]]
+        current = merged.setdefault(column_chinese, type(values)())
+        if not isinstance(current, type(values)):
+            raise ValueError(f"列不能同时按取值和范围筛选: {name}")
+        if isinstance(values, dict):
+            current.update(values)
+        else:
+            current.extend(values)
+    return merged
+
+
+def _records(df, table_name: str, fields: List[str], names: str):
+    """按字段顺序投影并转换字段名"""
+    column_mapping = TABLE_CONFIG[table_name]["columns"]
+    df = df.reindex(columns=[column_mapping[field] for field in fields])
+    if names == "original":
+        df.columns = fields
+    return df
+
+
+def query_records(db, table_name: str, fields: List[str], offset: int, limit: int,
+                  filters: Optional[Dict[str, Any]] = None, search_text: str = "",
+                  names: str = "original", sort: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """获取一页记录（JSON可表示的值）"""
+    df = db.query_page(table_name, offset, limit, filters, search_text, columns=fields, sort=sort)
+    if df.empty:
+        return []
+    # to_json 负责把空值、时间和DECIMAL转换为JSON可表示的值
+    return json.loads(_records(df, table_name, fields, names).to_json(
+        orient="records", date_format="iso", force_ascii=False, default_handler=str))
+
+
+def iter_ndjson(db, table_name: str, fields: List[str], offset: int = 0, limit: Optional[int] = None,
+                filters: Optional[Dict[str, Any]] = None, search_text: str = "",
+                names: str = "original", batch_size: Optional[int] = None,
+                sort: Optional[List[str]] = None) -> Iterator[bytes]:
+    """按批查询，逐批输出NDJSON（每行一条记录），内存占用与结果总量无关
+
+    批次按排序键（默认主键）键集分页读取且不经过查询缓存（见 DatabaseManager.iter_pages）。
+    """
+    batch_size = batch_size or API_CONFIG["stream_batch_size"]
+    for df in db.iter_pages(table_name, batch_size, filters, search_text, columns=fields, sort=sort,
+                            offset=offset, limit=limit):
+        yield _records(df, table_name, fields, names).to_json(
+            orient="records", lines=True, date_format="iso", force_ascii=False, default_handler=str
+        ).encode("utf-8")
+
+
+def register_query_routes(api, db=None) -> None:
+    """REST查询接口：GET /api/{table}?fields=&search=&filters=&sort=&offset=&limit=&format=&names=&<列名>=<取值>&<列名>.min=&<列名>.max="""
+    from fastapi import HTTPException, Query, Request
+    from fastapi.responses import StreamingResponse
+    from http_cache import conditional_json
+    if db is None:
+        from database import db_manager as db
+
+    @api.get(API_PREFIX + "/{table_name}")
+    def query_table(request: Request, table_name: str, offset: int = Query(0, ge=0),
+                    limit: Optional[int] = Query(None, ge=1), search: str = "", filters: str = "",
+                    fields: str = "", sort: str = "", format: str = "json", names: str = "original"):
+        if table_name not in TABLE_CONFIG:
+            raise HTTPException(status_code=404, detail=f"未知的表: {table_name}")
+        if format not in QUERY_FORMATS:
+            raise HTTPException(status_code=400, detail=f"不支持的格式: {format}")
+        if names not in NAME_STYLES:
+            raise HTTPException(status_code=400, detail=f"不支持的字段名形式: {names}")
+        try:
+            selected = parse_fields(db, table_name, fields)
+            conditions = collect_query_filters(db, table_name, filters, request.query_params.multi_items())
+            order = parse_sort(sort)
+            # 排序列和筛选条件在开始流式输出前校验
+            db.order_clause(table_name, order)
+            db.build_conditions(table_name, conditions, search)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        total = db.count_rows(table_name, conditions, search)
+
+        if format == "ndjson":
+            return StreamingResponse(
+                iter_ndjson(db, table_name, selected, offset, limit, conditions, search, names, sort=order),
+                media_type="application/x-ndjson",
+                headers={"X-Total-Count": str(total)}
+            )
+
+        limit = min(limit or API_CONFIG["default_limit"], API_CONFIG["max_limit"])
+        payload = {
+            "table": table_name,
+            "offset": offset,
+            "limit": limit,
+            "total": total,
+            "fields": selected if names == "original" else [TABLE_CONFIG[table_name]["columns"][f] for f in selected],
+            "rows": query_records(db, table_name, selected, offset, limit, conditions, search, names, order)
+        }
+        return conditional_json(request, payload)
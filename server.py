@@ -0,0 +1,206 @@
+"""
+服务进程模块
+HTTP server: FastAPI application hosting the Gradio UI, single or multi-process
+"""
+import inspect
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from typing import List, Optional
+
+from config import APP_CONFIG, HTTP_CONFIG
+from lazy_imports import preload_in_background
+
+logger = logging.getLogger(__name__)
+
+# 工作进程异常退出后重启前的等待时间（秒），避免崩溃循环占满CPU
+RESTART_DELAY = 2.0
+
+# 前端脚本等静态文件目录
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+# 服务端导出接口
+EXPORT_API_PREFIX = "/api/export"
+EXPORT_DIR = "exports"
+
+
+def register_grid_routes(api, db=None) -> None:
+    """虚拟滚动表格的行窗口接口：GET /api/grid/{table}?offset=&limit=&search=&filters=&fields=&sort=&format=&after=&total="""
+    from fastapi import HTTPException, Query, Request
+    from grid import GRID_API_PREFIX, fetch_window, parse_after, parse_fields, parse_filters, parse_sort
+    from http_cache import conditional_json
+    if db is None:
+        from database import db_manager as db
+
+    @api.get(GRID_API_PREFIX + "/{table_name}")
+    def grid_window(request: Request, table_name: str, offset: int = Query(0, ge=0), limit: int = Query(200, ge=1),
+                    search: str = "", filters: str = "", fields: str = "", sort: str = "", format: str = "json",
+                    after: str = "", total: bool = False):
+        try:
+            window = fetch_window(db, table_name, offset, limit, search, parse_filters(filters), format,
+                                  parse_fields(db, table_name, fields), parse_sort(sort), parse_after(after), total)
+            return conditional_json(request, window)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"未知的表: {table_name}")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+
+def register_export_routes(api, db=None) -> None:
+    """服务端导出接口：GET /api/export/{table}?format=&search=&filters=&fields=&sort=
+
+    按搜索词或筛选条件导出完整结果。ETag 由导出格式和结果内容计算，
+    数据未变化时重复下载返回 304，不再生成和传输文件。
+    """
+    from fastapi import HTTPException, Request, Response
+    from fastapi.responses import FileResponse
+    from database_config import TABLE_CONFIG
+    from exporters import EXPORT_EXTENSIONS, write_export
+    from grid import parse_fields, parse_filters, parse_sort
+    from http_cache import cache_headers, is_not_modified, make_etag
+    from lazy_imports import lazy_import
+    from utils import create_export_filename
+    if db is None:
+        from database import db_manager as db
+    pd = lazy_import("pandas")
+
+    @api.get(EXPORT_API_PREFIX + "/{table_name}")
+    def export_table(request: Request, table_name: str, format: str = "csv", search: str = "", filters: str = "",
+                     fields: str = "", sort: str = ""):
+        if table_name not in TABLE_CONFIG:
+            raise HTTPException(status_code=404, detail=f"未知的表: {table_name}")
+        if format not in EXPORT_EXTENSIONS:
+            raise HTTPException(status_code=400, detail=f"不支持的导出格式: {format}")
+        try:
+            parsed = parse_filters(filters)
+            columns = parse_fields(db, table_name, fields)
+            order = parse_sort(sort)
+            if search:
+                df = db.search_data(table_name, search, columns, order)
+            else:
+                df = db.filter_data(table_name, parsed, columns, order)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        etag = make_etag(table_name, format, list(df.columns),
+                         pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        headers = cache_headers(etag)
+        if is_not_modified(request.headers, etag):
+            return Response(status_code=304, headers=headers)
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        filename = create_export_filename(TABLE_CONFIG[table_name]["name"], EXPORT_EXTENSIONS[format])
+        filepath = write_export(df, os.path.join(EXPORT_DIR, filename), format)
+        return FileResponse(filepath, filename=filename, headers=headers)
+
+
+def create_server():
+    """创建FastAPI应用并挂载Gradio界面"""
+    import gradio as gr
+    from fastapi import FastAPI
+    from fastapi.staticfiles import StaticFiles
+    from app import create_app
+    from grid import GRID_HEAD
+    from http_cache import CompressionMiddleware
+    from image_hash import register_similarity_routes
+    from query_control import register_query_control
+    from rate_limit import register_rate_limiting
+    from rest_api import register_query_routes
+    from thumbnails import register_thumbnail_routes
+
+    api = FastAPI(title=APP_CONFIG["title"], version=APP_CONFIG["version"])
+    # 接口和静态文件需在挂载到根路径的Gradio之前注册
+    register_grid_routes(api)
+    register_export_routes(api)
+    register_query_routes(api)
+    register_similarity_routes(api)
+    register_thumbnail_routes(api)
+    api.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+    if HTTP_CONFIG["compression"]:
+        api.add_middleware(CompressionMiddleware)
+    # 客户端断开时终止请求正在执行的查询；查询超时返回504
+    register_query_control(api)
+    # 最后添加的中间件在最外层，超出限流预算的请求不进入压缩和应用
+    register_rate_limiting(api)
+    blocks = create_app()
+    # 启动后在后台预热常用视图的查询缓存（未启用查询缓存时不启动）
+    from cache_warmer import get_cache_warmer
+    get_cache_warmer().start()
+    # 定期刷新数据库不可用时使用的只读快照
+    from database import db_manager
+    if db_manager.snapshot is not None:
+        db_manager.snapshot.start(db_manager)
+    mount_kwargs = {}
+    # Gradio 6 起 head 由 mount_gradio_app 接收，Blocks 构造参数中的 head 只对 launch() 生效
+    if "head" in inspect.signature(gr.mount_gradio_app).parameters:
+        mount_kwargs["head"] = GRID_HEAD
+    return gr.mount_gradio_app(api, blocks, path="/", **mount_kwargs)
+
+
+def run_worker(port: int, host: Optional[str] = None) -> None:
+    """在指定端口运行一个服务进程"""
+    import uvicorn
+
+    # 导出相关依赖在后台预加载，不占用启动时间
+    preload_in_background(APP_CONFIG["preload_modules"])
+    uvicorn.run(
+        create_server(),
+        host=host or APP_CONFIG["server_name"],
+        port=port,
+        log_level="info" if APP_CONFIG["debug"] else "warning"
+    )
+
+
+def serve(workers: Optional[int] = None, base_port: Optional[int] = None, host: Optional[str] = None) -> None:
+    """启动服务
+
+    workers 为1时在当前进程中运行；大于1时在 base_port 起的连续端口上各启动一个
+    工作进程。Gradio 的事件队列依赖会话粘性，因此每个进程独占一个端口，由 nginx
+    按客户端IP哈希分发，而不是多个进程共用一个监听端口。工作进程之间通过共享缓存
+    （CACHE_BACKEND=shared）复用查询结果。
+    """
+    workers = max(workers or APP_CONFIG["workers"], 1)
+    base_port = base_port or APP_CONFIG["server_port"]
+    if workers == 1:
+        run_worker(base_port, host)
+        return
+
+    # spawn 启动的子进程不继承父进程的数据库连接和线程
+    context = multiprocessing.get_context("spawn")
+    ports = [base_port + i for i in range(workers)]
+    processes: List[Optional[multiprocessing.Process]] = [None] * workers
+    stopping = False
+
+    def start(index: int) -> None:
+        process = context.Process(target=run_worker, args=(ports[index], host),
+                                  name=f"worker-{ports[index]}", daemon=False)
+        process.start()
+        processes[index] = process
+        logger.info(f"工作进程已启动: pid={process.pid} port={ports[index]}")
+
+    def shutdown(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for index in range(workers):
+        start(index)
+
+    try:
+        while not stopping:
+            time.sleep(1.0)
+            for index, process in enumerate(processes):
+                if process is not None and not process.is_alive() and not stopping:
+                    logger.warning(f"工作进程退出(exitcode={process.exitcode})，重新启动: port={ports[index]}")
+                    time.sleep(RESTART_DELAY)
+                    start(index)
+    finally:
+        for process in processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in processes:
+            if process is not None:
+                process.join(timeout=10)
+        logger.info("所有工作进程已停止")
@@ -0,0 +1,334 @@
+"""
+降级只读模式模块
+Last-known-good local snapshots of each table and a connection circuit breaker for database outages
+"""
+from __future__ import annotations
+
+import datetime
+import decimal
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from backends import SQLiteBackend
+from config import SNAPSHOT_CONFIG
+from database_config import SQLITE_CONFIG, TABLE_CONFIG
+
+try:
+    import fcntl
+except ImportError:  # Windows 下不做跨进程互斥
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 熔断器状态
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """数据库连接熔断器
+
+    - closed：正常连接；连续 failure_threshold 次连接失败后打开
+    - open：冷却期内不再尝试连接，直接抛出 DatabaseUnavailable（有快照时改由快照提供数据）
+    - half_open：冷却期结束后只放行一个请求探测，成功则关闭，失败则重新打开且冷却期加倍（不超过 max_reset_timeout）
+    """
+
+    def __init__(self, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None,
+                 max_reset_timeout: Optional[float] = None, clock=time.monotonic):
+        self.failure_threshold = max(failure_threshold or SNAPSHOT_CONFIG["failure_threshold"], 1)
+        self.reset_timeout = SNAPSHOT_CONFIG["reset_timeout"] if reset_timeout is None else reset_timeout
+        self.max_reset_timeout = (SNAPSHOT_CONFIG["max_reset_timeout"] if max_reset_timeout is None
+                                  else max_reset_timeout)
+        self.clock = clock
+        self.failures = 0
+        self.opened = 0
+        self.last_error: Optional[str] = None
+        self._timeout = self.reset_timeout
+        self._retry_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.failures < self.failure_threshold:
+                return BREAKER_CLOSED
+            return BREAKER_HALF_OPEN if self._probing or self.clock() >= self._retry_at else BREAKER_OPEN
+
+    @property
+    def healthy(self) -> bool:
+        """最近一次连接成功（没有未恢复的失败）"""
+        return self.failures == 0
+
+    def allow(self) -> bool:
+        """是否允许尝试连接：关闭时允许；打开且冷却期结束时只允许一个探测"""
+        with self._lock:
+            if self.failures < self.failure_threshold:
+                return True
+            if self._probing or self.clock() < self._retry_at:
+                return False
+            self._probing = True
+            return True
+
+    def retry_after(self) -> float:
+        """距离下一次允许探测的秒数"""
+        with self._lock:
+            return max(self._retry_at - self.clock(), 0.0)
+
+    def record_success(self) -> bool:
+        """记录连接成功，从失败中恢复时返回 True"""
+        with self._lock:
+            recovered = self.failures > 0
+            self.failures = 0
+            self._probing = False
+            self._timeout = self.reset_timeout
+            self.last_error = None
+        return recovered
+
+    def record_failure(self, error: Any) -> bool:
+        """记录连接失败，由正常转为失败时返回 True"""
+        with self._lock:
+            first = self.failures == 0
+            self.failures += 1
+            self.last_error = str(error)
+            if self.failures >= self.failure_threshold:
+                if self._probing:
+                    # 探测失败，冷却期加倍
+                    self._timeout = min(self._timeout * 2, self.max_reset_timeout)
+                if self._probing or self.failures == self.failure_threshold:
+                    self.opened += 1
+                    self._retry_at = self.clock() + self._timeout
+                self._probing = False
+        return first
+
+    def status(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "opened": self.opened,
+                "retry_after": round(self.retry_after(), 1), "last_error": self.last_error}
+
+
+def _sqlite_value(value: Any) -> Any:
+    """把 MySQL 返回值转换为快照中保存的形式（与 SQLite 后端的存储格式一致）"""
+    if isinstance(value, (set, frozenset)):
+        # SET 列以逗号分隔的文本保存
+        return ",".join(sorted(value))
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return str(value)
+    return value
+
+
+class SnapshotStore:
+    """最近一次成功复制的数据快照（本地 SQLite 文件）
+
+    快照与 SQLite 后端使用相同的表结构和 FIND_IN_SET 实现，DatabaseManager 生成的查询
+    （反引号标识符、%s 占位符）可以直接在快照上执行。刷新时先写入临时文件，完成后原子替换，
+    读取方始终看到完整的快照；snapshot_info 表记录每张表的行数和复制时间。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or SNAPSHOT_CONFIG["path"]
+        # 读取快照不执行初始化脚本，文件不存在时不创建
+        self.backend = SQLiteBackend(self.path, init_script="")
+        self._info: Optional[Dict[str, Any]] = None
+        self._info_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- 读取 ----
+
+    def available(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def info(self) -> Dict[str, Any]:
+        """各表的行数和快照时间：{"taken_at": 时间戳, "tables": {表名: 行数}}，没有快照时为空"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return {}
+        with self._lock:
+            if self._info is not None and self._info_mtime == mtime:
+                return self._info
+        connection = sqlite3.connect(self.path)
+        try:
+            rows = connection.execute("SELECT table_name, row_count, taken_at FROM snapshot_info").fetchall()
+        except sqlite3.Error:
+            rows = []
+        finally:
+            connection.close()
+        info = {"taken_at": min(row[2] for row in rows), "tables": {row[0]: row[1] for row in rows}} if rows else {}
+        with self._lock:
+            self._info, self._info_mtime = info, mtime
+        return info
+
+    def taken_at(self) -> Optional[float]:
+        return self.info().get("taken_at")
+
+    def age(self) -> Optional[float]:
+        """快照距今的秒数，没有快照时为 None"""
+        taken_at = self.taken_at()
+        return None if taken_at is None else max(time.time() - taken_at, 0.0)
+
+    def fetch_all(self, query: str, params: Optional[List] = None,
+                  timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """在快照上执行只读查询"""
+        connection = self.backend.connect(read_only=True)
+        try:
+            return self.backend.fetch_all(connection, query, params, timeout=timeout)
+        finally:
+            self.backend.release(connection)
+
+    def status(self) -> Dict[str, Any]:
+        info = self.info()
+        taken_at = info.get("taken_at")
+        return {
+            "path": self.path,
+            "available": bool(info),
+            "taken_at": datetime.datetime.fromtimestamp(taken_at).isoformat() if taken_at else None,
+            "tables": info.get("tables", {})
+        }
+
+    # ---- 刷新 ----
+
+    def refresh(self, db, tables: Optional[List[str]] = None, page_size: Optional[int] = None) -> Dict[str, Any]:
+        """从数据库复制各表到新快照并替换旧快照，数据库异常直接抛出（旧快照保持不变）
+
+        按主键分批读取（键集分页），使用同一个只读连接，不经过查询缓存和快照回退。
+        """
+        tables = tables or SNAPSHOT_CONFIG["tables"]
+        page_size = page_size or SNAPSHOT_CONFIG["page_size"]
+        started = time.perf_counter()
+        taken_at = time.time()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp = f"{self.path}.{os.getpid()}.tmp"
+        if os.path.exists(temp):
+            os.remove(temp)
+
+        counts: Dict[str, int] = {}
+        target_backend = SQLiteBackend(temp, init_script=SQLITE_CONFIG["init_script"])
+        target = target_backend.connect()
+        try:
+            target.execute("PRAGMA synchronous = OFF")
+            target.execute("CREATE TABLE IF NOT EXISTS snapshot_info "
+                           "(table_name TEXT PRIMARY KEY, row_count INTEGER NOT NULL, taken_at REAL NOT NULL)")
+            source = db.get_connection(read_only=True)
+            try:
+                for table_name in tables:
+                    counts[table_name] = self._copy_table(db, source, target_backend, target, table_name, page_size)
+                    target.execute("INSERT INTO snapshot_info VALUES (?, ?, ?)",
+                                   (table_name, counts[table_name], taken_at))
+            finally:
+                db.backend.release(source)
+            target.commit()
+        except BaseException:
+            target.close()
+            os.remove(temp)
+            raise
+        target.close()
+        os.replace(temp, self.path)
+
+        stats = {"tables": counts, "seconds": round(time.perf_counter() - started, 3)}
+        logger.info(f"数据快照已刷新: {counts}，耗时 {stats['seconds']}s")
+        return stats
+
+    def _copy_table(self, db, source, target_backend: SQLiteBackend, target, table_name: str, page_size: int) -> int:
+        """复制一张表：清空初始化脚本写入的示例数据后按主键分批插入"""
+        columns = [row[1] for row in target.execute(f'PRAGMA table_info("{table_name}")').fetchall()]
+        key = TABLE_CONFIG[table_name]["primary_key"] if table_name in TABLE_CONFIG else columns[0]
+        target.execute(f'DELETE FROM "{table_name}"')
+        q = db.quote
+        copied, last = 0, None
+        while True:
+            where = f"WHERE {q(key)} > %s " if last is not None else ""
+            rows = db.backend.fetch_all(source, f"SELECT * FROM {table_name} {where}ORDER BY {q(key)} "
+                                                f"LIMIT {int(page_size)}", [last] if last is not None else None)
+            if not rows:
+                return copied
+            present = [column for column in columns if column in rows[0]]
+            target_backend.execute_many(target, target_backend.insert_sql(table_name, present),
+                                        [tuple(_sqlite_value(row[column]) for column in present) for row in rows])
+            copied += len(rows)
+            last = rows[-1][key]
+
+    def due(self) -> bool:
+        """快照不存在或已超过刷新间隔"""
+        age = self.age()
+        return age is None or age >= SNAPSHOT_CONFIG["refresh_interval"]
+
+    def refresh_if_due(self, db) -> bool:
+        """需要时刷新快照；多个工作进程以锁文件互斥，未取得锁或数据库不可用时跳过"""
+        if not self.due() or not db.breaker.healthy:
+            return False
+        lock_path = f"{self.path}.lock"
+        directory = os.path.dirname(lock_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(lock_path, "w") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return False
+            # 取得锁后再次检查，其他进程可能刚刚刷新完成
+            if not self.due():
+                return False
+            try:
+                self.refresh(db)
+                return True
+            except Exception as e:
+                logger.warning(f"刷新数据快照失败: {e}")
+                return False
+
+    def _run(self, db) -> None:
+        while not self._stop.is_set():
+            self.refresh_if_due(db)
+            self._stop.wait(SNAPSHOT_CONFIG["check_interval"])
+
+    def start(self, db) -> bool:
+        """启动后台刷新线程，未启用时返回 False"""
+        if not SNAPSHOT_CONFIG["enabled"]:
+            return False
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(db,), name="snapshot-refresh", daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def staleness_notice(taken_at: Optional[float], now: Optional[float] = None) -> str:
+    """只读快照模式的提示横幅"""
+    if taken_at is None:
+        return "⚠️ **数据库不可用**: 没有可用的数据快照"
+    age = max((now or time.time()) - taken_at, 0)
+    if age < 3600:
+        ago = f"{int(age // 60)} 分钟前"
+    elif age < 86400:
+        ago = f"{age / 3600:.1f} 小时前"
+    else:
+        ago = f"{age / 86400:.1f} 天前"
+    taken = datetime.datetime.fromtimestamp(taken_at).strftime("%Y-%m-%d %H:%M")
+    return f"⚠️ **只读快照**: 数据库暂不可用，显示 {taken}（{ago}）的快照数据"
+
+
+_snapshot_store: Optional[SnapshotStore] = None
+_snapshot_store_lock = threading.Lock()
+
+
+def get_snapshot_store() -> SnapshotStore:
+    """获取全局快照"""
+    global _snapshot_store
+    if _snapshot_store is None:
+        with _snapshot_store_lock:
+            if _snapshot_store is None:
+                _snapshot_store = SnapshotStore()
+    return _snapshot_store
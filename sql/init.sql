@@ -19,11 +19,18 @@ CREATE TABLE `dataset_index` (
   `negative_target` set('天空','植被','水面','路面','背景') CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
   `target_distance` set('10m','15m','20m','25m','30m') CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
   `source` varchar(100) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
-  PRIMARY KEY (`image_id`) USING BTREE
+  `file_status` enum('正常','已删除','文件缺失','文件损坏') CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL DEFAULT '正常' COMMENT '文件状态',
+  `phash` char(16) CHARACTER SET ascii COLLATE ascii_bin NULL DEFAULT NULL COMMENT '感知哈希（64位DCT哈希的十六进制）',
+  PRIMARY KEY (`image_id`) USING BTREE,
+  UNIQUE INDEX `uk_repository_name`(`image_repository`, `image_name`) USING BTREE,
+  INDEX `idx_image_name`(`image_name`) USING BTREE,
+  INDEX `idx_image_height`(`image_height`) USING BTREE,
+  INDEX `idx_image_width`(`image_width`) USING BTREE,
+  INDEX `idx_file_status`(`file_status`) USING BTREE
 ) ENGINE = InnoDB AUTO_INCREMENT = 1 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
 -- 插入示例数据
-INSERT INTO `dataset_index` VALUES 
+INSERT INTO `dataset_index` (`image_id`, `image_name`, `image_height`, `image_width`, `image_repository`, `bmp_path`, `yuv_path`, `json_path`, `positive_target`, `negative_target`, `target_distance`, `source`) VALUES 
 (1, 'urban_road_001', 1080, 1920, 'urban_dataset', '/data/bmp/urban_road_001.bmp', '/data/yuv/urban_road_001.yuv', '/data/json/urban_road_001.json', '行人,车辆', '天空,路面', '10m,20m', 'road_camera'),
 (2, 'wildlife_012', 720, 1280, 'wildlife_dataset', '/data/bmp/wildlife_012.bmp', '/data/yuv/wildlife_012.yuv', '/data/json/wildlife_012.json', '动物,基础设施', '植被,水面', '15m', 'wildlife_camera'),
 (3, 'bridge_inspection_05', 512, 512, 'industrial_dataset', '/data/bmp/bridge_inspection_05.bmp', '/data/yuv/bridge_inspection_05.yuv', '/data/json/bridge_inspection_05.json', '建筑', '背景', '25m,30m', 'bridge_sensor'),
@@ -48,15 +55,33 @@ CREATE TABLE `test_cases` (
   `sources` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT NULL,
   `update_time` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   `remark` text CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL,
-  PRIMARY KEY (`case_id`) USING BTREE
+  `file_status` enum('正常','已删除','文件缺失','文件损坏') CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL DEFAULT '正常' COMMENT '文件状态',
+  PRIMARY KEY (`case_id`) USING BTREE,
+  UNIQUE INDEX `uk_case_path`(`case_path`) USING BTREE,
+  INDEX `idx_case_name`(`case_name`) USING BTREE,
+  INDEX `idx_model_size`(`model_size`) USING BTREE,
+  INDEX `idx_params`(`params`) USING BTREE,
+  INDEX `idx_flops`(`flops`) USING BTREE,
+  INDEX `idx_update_time`(`update_time`) USING BTREE,
+  INDEX `idx_file_status`(`file_status`) USING BTREE
 ) ENGINE = InnoDB AUTO_INCREMENT = 1 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
 -- 插入示例数据
-INSERT INTO `test_cases` VALUES 
+INSERT INTO `test_cases` (`case_id`, `case_name`, `case_repository`, `case_path`, `case_json_path`, `category`, `label`, `framework`, `input_shape`, `model_size`, `params`, `flops`, `sources`, `update_time`, `remark`) VALUES 
 (1, 'ResNet50_ImageNet', 'model_zoo', '/models/resnet50/resnet50.onnx', '/models/resnet50/config.json', '模型', 'fusion', 'onnx', '1x3x224x224', 97.8, 25557032, 4089184256, 'torchvision', NOW(), '经典图像分类模型'),
 (2, 'YOLOv5s_Detection', 'detection_models', '/models/yolov5s/yolov5s.onnx', '/models/yolov5s/config.json', '模型', 'tiling', 'onnx', '1x3x640x640', 14.1, 7235389, 16500000000, 'ultralytics', NOW(), '轻量级目标检测模型'),
 (3, 'Conv2D_Basic', 'operators', '/ops/conv2d/conv2d_basic.ir', '/ops/conv2d/config.json', '单算子', 'M2M', 'ir', '1x64x56x56', 0.5, 147456, 924844032, 'custom', NOW(), '基础卷积算子'),
 (4, 'DepthFusion_Block', 'fusion_blocks', '/blocks/depth_fusion/depth_fusion.caffe', '/blocks/depth_fusion/config.json', 'block块', 'depth fusion,fusion', 'caffe', '1x128x28x28', 2.3, 589824, 1849688064, 'research', NOW(), '深度融合模块'),
 (5, 'MobileNetV2_Cascade', 'mobile_models', '/models/mobilenetv2/cascade.onnx', '/models/mobilenetv2/config.json', '级联算子', 'tiling,fusion', 'onnx', '1x3x224x224', 13.4, 3504872, 300000000, 'torchvision', NOW(), '移动端优化模型');
 
+-- 创建统计汇总表（由 stats.py 维护）
+DROP TABLE IF EXISTS `table_stats`;
+CREATE TABLE `table_stats` (
+  `table_name` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `row_count` bigint NOT NULL DEFAULT 0,
+  `stats` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT 'JSON格式的汇总统计',
+  `refreshed_at` double NOT NULL COMMENT '刷新时间（Unix时间戳）',
+  PRIMARY KEY (`table_name`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
 SET FOREIGN_KEY_CHECKS = 1;
\ No newline at end of file
@@ -0,0 +1,12 @@
+-- 增量导入所需的结构变更（已有数据库执行一次；新部署的 init.sql 已包含）
+-- 导入前请先确认没有重复的 (image_repository, image_name) 和 case_path
+
+SET NAMES utf8mb4;
+
+ALTER TABLE `dataset_index`
+  ADD COLUMN `file_status` enum('正常','已删除') CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL DEFAULT '正常' COMMENT '文件状态',
+  ADD UNIQUE INDEX `uk_repository_name`(`image_repository`, `image_name`) USING BTREE;
+
+ALTER TABLE `test_cases`
+  ADD COLUMN `file_status` enum('正常','已删除') CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL DEFAULT '正常' COMMENT '文件状态',
+  ADD UNIQUE INDEX `uk_case_path`(`case_path`) USING BTREE;
@@ -0,0 +1,12 @@
+-- 统计汇总表（已有数据库执行一次；新部署的 init.sql 已包含）
+-- 汇总内容在首次读取或数据变更后由应用自动计算
+
+SET NAMES utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `table_stats` (
+  `table_name` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `row_count` bigint NOT NULL DEFAULT 0,
+  `stats` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT 'JSON格式的汇总统计',
+  `refreshed_at` double NOT NULL COMMENT '刷新时间（Unix时间戳）',
+  PRIMARY KEY (`table_name`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
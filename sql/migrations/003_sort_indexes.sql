@@ -0,0 +1,14 @@
+-- 服务端排序列的二级索引（已有数据库执行一次；新部署的 init.sql 已包含）
+-- 单列排序的首页可沿索引顺序或逆序读取，无需对整张表排序
+
+SET NAMES utf8mb4;
+
+ALTER TABLE `dataset_index`
+  ADD INDEX `idx_image_name`(`image_name`) USING BTREE;
+
+ALTER TABLE `test_cases`
+  ADD INDEX `idx_case_name`(`case_name`) USING BTREE,
+  ADD INDEX `idx_model_size`(`model_size`) USING BTREE,
+  ADD INDEX `idx_params`(`params`) USING BTREE,
+  ADD INDEX `idx_flops`(`flops`) USING BTREE,
+  ADD INDEX `idx_update_time`(`update_time`) USING BTREE;
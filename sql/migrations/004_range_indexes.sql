@@ -0,0 +1,9 @@
+-- 数值范围筛选列的二级索引（已有数据库执行一次；新部署的 init.sql 已包含）
+-- 测试用例的 model_size/params/flops 索引已由 003_sort_indexes.sql 创建
+-- 范围条件以 BETWEEN / >= / <= 直接比较列值，可沿索引做范围扫描
+
+SET NAMES utf8mb4;
+
+ALTER TABLE `dataset_index`
+  ADD INDEX `idx_image_height`(`image_height`) USING BTREE,
+  ADD INDEX `idx_image_width`(`image_width`) USING BTREE;
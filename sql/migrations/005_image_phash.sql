@@ -0,0 +1,7 @@
+-- 图像感知哈希列（已有数据库执行一次；新部署的 init.sql 已包含）
+-- 执行后运行 python ingest.py phash 为已有图像计算哈希
+
+SET NAMES utf8mb4;
+
+ALTER TABLE `dataset_index`
+  ADD COLUMN `phash` char(16) CHARACTER SET ascii COLLATE ascii_bin NULL DEFAULT NULL COMMENT '感知哈希（64位DCT哈希的十六进制）';
@@ -0,0 +1,13 @@
+-- 文件完整性扫描的状态取值（已有数据库执行一次；新部署的 init.sql 已包含）
+-- 状态列加二级索引，界面按“文件缺失/文件损坏”筛选时只读取问题行
+-- 执行后运行 python integrity.py scan <表名> 检查路径列引用的文件
+
+SET NAMES utf8mb4;
+
+ALTER TABLE `dataset_index`
+  MODIFY COLUMN `file_status` enum('正常','已删除','文件缺失','文件损坏') CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL DEFAULT '正常' COMMENT '文件状态',
+  ADD INDEX `idx_file_status`(`file_status`) USING BTREE;
+
+ALTER TABLE `test_cases`
+  MODIFY COLUMN `file_status` enum('正常','已删除','文件缺失','文件损坏') CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL DEFAULT '正常' COMMENT '文件状态',
+  ADD INDEX `idx_file_status`(`file_status`) USING BTREE;
@@ -0,0 +1,92 @@
+-- AI Resources Database SQLite 初始化脚本
+-- 与 sql/init.sql 结构一致的嵌入式版本（DB_BACKEND=sqlite）
+-- 放在子目录中，避免被 MySQL 容器的 /docker-entrypoint-initdb.d 执行
+-- SET 列以逗号分隔的文本保存，选项顺序与 MySQL 列定义一致；ENUM 列以 CHECK 约束限制取值
+
+PRAGMA journal_mode = WAL;
+
+-- 创建数据集索引表
+CREATE TABLE IF NOT EXISTS "dataset_index" (
+  "image_id" INTEGER PRIMARY KEY AUTOINCREMENT,
+  "image_name" TEXT NOT NULL,
+  "image_height" INTEGER NOT NULL,
+  "image_width" INTEGER NOT NULL,
+  "image_repository" TEXT NOT NULL,
+  "bmp_path" TEXT NULL DEFAULT NULL,
+  "yuv_path" TEXT NULL DEFAULT NULL,
+  "json_path" TEXT NULL DEFAULT NULL,
+  "positive_target" TEXT NOT NULL,  -- set('行人','车辆','建筑','动物','基础设施')
+  "negative_target" TEXT NOT NULL,  -- set('天空','植被','水面','路面','背景')
+  "target_distance" TEXT NOT NULL,  -- set('10m','15m','20m','25m','30m')
+  "source" TEXT NOT NULL,
+  "file_status" TEXT NOT NULL DEFAULT '正常' CHECK ("file_status" IN ('正常','已删除','文件缺失','文件损坏')),  -- 文件状态
+  "phash" TEXT NULL DEFAULT NULL  -- 感知哈希（64位DCT哈希的十六进制）
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS "uk_repository_name" ON "dataset_index" ("image_repository", "image_name");
+-- 服务端排序与范围筛选列的二级索引
+CREATE INDEX IF NOT EXISTS "idx_image_name" ON "dataset_index" ("image_name");
+CREATE INDEX IF NOT EXISTS "idx_image_height" ON "dataset_index" ("image_height");
+CREATE INDEX IF NOT EXISTS "idx_image_width" ON "dataset_index" ("image_width");
+CREATE INDEX IF NOT EXISTS "idx_dataset_file_status" ON "dataset_index" ("file_status");
+
+-- 插入示例数据
+INSERT INTO "dataset_index" ("image_id", "image_name", "image_height", "image_width", "image_repository", "bmp_path", "yuv_path", "json_path", "positive_target", "negative_target", "target_distance", "source") VALUES
+(1, 'urban_road_001', 1080, 1920, 'urban_dataset', '/data/bmp/urban_road_001.bmp', '/data/yuv/urban_road_001.yuv', '/data/json/urban_road_001.json', '行人,车辆', '天空,路面', '10m,20m', 'road_camera'),
+(2, 'wildlife_012', 720, 1280, 'wildlife_dataset', '/data/bmp/wildlife_012.bmp', '/data/yuv/wildlife_012.yuv', '/data/json/wildlife_012.json', '动物,基础设施', '植被,水面', '15m', 'wildlife_camera'),
+(3, 'bridge_inspection_05', 512, 512, 'industrial_dataset', '/data/bmp/bridge_inspection_05.bmp', '/data/yuv/bridge_inspection_05.yuv', '/data/json/bridge_inspection_05.json', '建筑', '背景', '25m,30m', 'bridge_sensor'),
+(4, 'highway_traffic_023', 1920, 1080, 'traffic_dataset', '/data/bmp/highway_traffic_023.bmp', '/data/yuv/highway_traffic_023.yuv', '/data/json/highway_traffic_023.json', '车辆,基础设施', '天空,路面', '20m,30m', 'highway_camera'),
+(5, 'park_scene_007', 1280, 720, 'urban_dataset', '/data/bmp/park_scene_007.bmp', '/data/yuv/park_scene_007.yuv', '/data/json/park_scene_007.json', '行人,动物', '植被,背景', '10m,15m', 'park_camera');
+
+-- 创建测试用例表
+CREATE TABLE IF NOT EXISTS "test_cases" (
+  "case_id" INTEGER PRIMARY KEY AUTOINCREMENT,
+  "case_name" TEXT NOT NULL,
+  "case_repository" TEXT NOT NULL,
+  "case_path" TEXT NOT NULL,
+  "case_json_path" TEXT NULL DEFAULT NULL,
+  "category" TEXT NOT NULL CHECK ("category" IN ('单算子','级联算子','block块','模型')),
+  "label" TEXT NULL DEFAULT NULL,  -- set('depth fusion','fusion','M2M','tiling')
+  "framework" TEXT NOT NULL CHECK ("framework" IN ('onnx','caffe','ir')),
+  "input_shape" TEXT NULL DEFAULT NULL,
+  "model_size" REAL NULL DEFAULT NULL,  -- 模型大小(MB)
+  "params" INTEGER NULL DEFAULT NULL,  -- 参数量
+  "flops" INTEGER NULL DEFAULT NULL,  -- FLOPs
+  "sources" TEXT NULL DEFAULT NULL,
+  "update_time" TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+  "remark" TEXT NULL,
+  "file_status" TEXT NOT NULL DEFAULT '正常' CHECK ("file_status" IN ('正常','已删除','文件缺失','文件损坏'))  -- 文件状态
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS "uk_case_path" ON "test_cases" ("case_path");
+-- 服务端排序与范围筛选列的二级索引
+CREATE INDEX IF NOT EXISTS "idx_case_name" ON "test_cases" ("case_name");
+CREATE INDEX IF NOT EXISTS "idx_model_size" ON "test_cases" ("model_size");
+CREATE INDEX IF NOT EXISTS "idx_params" ON "test_cases" ("params");
+CREATE INDEX IF NOT EXISTS "idx_flops" ON "test_cases" ("flops");
+CREATE INDEX IF NOT EXISTS "idx_update_time" ON "test_cases" ("update_time");
+CREATE INDEX IF NOT EXISTS "idx_case_file_status" ON "test_cases" ("file_status");
+
+-- 模拟 MySQL 的 ON UPDATE CURRENT_TIMESTAMP
+CREATE TRIGGER IF NOT EXISTS "test_cases_update_time"
+AFTER UPDATE ON "test_cases"
+FOR EACH ROW WHEN NEW."update_time" IS OLD."update_time"
+BEGIN
+  UPDATE "test_cases" SET "update_time" = CURRENT_TIMESTAMP WHERE "case_id" = NEW."case_id";
+END;
+
+-- 插入示例数据
+INSERT INTO "test_cases" ("case_id", "case_name", "case_repository", "case_path", "case_json_path", "category", "label", "framework", "input_shape", "model_size", "params", "flops", "sources", "update_time", "remark") VALUES
+(1, 'ResNet50_ImageNet', 'model_zoo', '/models/resnet50/resnet50.onnx', '/models/resnet50/config.json', '模型', 'fusion', 'onnx', '1x3x224x224', 97.8, 25557032, 4089184256, 'torchvision', CURRENT_TIMESTAMP, '经典图像分类模型'),
+(2, 'YOLOv5s_Detection', 'detection_models', '/models/yolov5s/yolov5s.onnx', '/models/yolov5s/config.json', '模型', 'tiling', 'onnx', '1x3x640x640', 14.1, 7235389, 16500000000, 'ultralytics', CURRENT_TIMESTAMP, '轻量级目标检测模型'),
+(3, 'Conv2D_Basic', 'operators', '/ops/conv2d/conv2d_basic.ir', '/ops/conv2d/config.json', '单算子', 'M2M', 'ir', '1x64x56x56', 0.5, 147456, 924844032, 'custom', CURRENT_TIMESTAMP, '基础卷积算子'),
+(4, 'DepthFusion_Block', 'fusion_blocks', '/blocks/depth_fusion/depth_fusion.caffe', '/blocks/depth_fusion/config.json', 'block块', 'depth fusion,fusion', 'caffe', '1x128x28x28', 2.3, 589824, 1849688064, 'research', CURRENT_TIMESTAMP, '深度融合模块'),
+(5, 'MobileNetV2_Cascade', 'mobile_models', '/models/mobilenetv2/cascade.onnx', '/models/mobilenetv2/config.json', '级联算子', 'fusion,tiling', 'onnx', '1x3x224x224', 13.4, 3504872, 300000000, 'torchvision', CURRENT_TIMESTAMP, '移动端优化模型');
+
+-- 创建统计汇总表（由 stats.py 维护）
+CREATE TABLE IF NOT EXISTS "table_stats" (
+  "table_name" TEXT PRIMARY KEY,
+  "row_count" INTEGER NOT NULL DEFAULT 0,
+  "stats" TEXT NOT NULL,  -- JSON格式的汇总统计
+  "refreshed_at" REAL NOT NULL  -- 刷新时间（Unix时间戳）
+);
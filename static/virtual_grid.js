@@ -0,0 +1,371 @@
+/*
+ * 虚拟滚动表格
+ * <virtual-grid> 只渲染可见区域及上下 overscan 行，行数据按页从 /api/grid/{table} 请求，
+ * 因此无论结果有多少行，页面的传输量和DOM节点数都保持不变。
+ */
+(function () {
+  "use strict";
+
+  if (window.customElements === undefined || window.customElements.get("virtual-grid")) {
+    return;
+  }
+
+  // 滚动区域的最大高度（像素）：浏览器对元素高度有上限（Firefox 约1700万、Chrome 约3300万），
+  // 行数乘行高超出时按比例映射滚动位置
+  var MAX_SCROLL_HEIGHT = 15000000;
+
+  var STYLE = [
+    "virtual-grid{display:block;font-size:12px;border:1px solid #dee2e6;border-radius:6px;overflow:hidden}",
+    "virtual-grid .vg-header,virtual-grid .vg-row{display:grid;align-items:center}",
+    "virtual-grid .vg-header{background:#f8f9fa;font-weight:600;border-bottom:1px solid #dee2e6}",
+    "virtual-grid .vg-viewport{position:relative;overflow:auto}",
+    "virtual-grid .vg-rows{position:absolute;left:0;right:0;top:0}",
+    "virtual-grid .vg-row{border-bottom:1px solid #f1f3f5}",
+    "virtual-grid .vg-row:nth-child(even){background:#fcfcfd}",
+    "virtual-grid .vg-cell{padding:0 8px;white-space:nowrap;overflow:hidden;text-overflow:ellipsis}",
+    "virtual-grid .vg-loading{color:#adb5bd}",
+    "virtual-grid .vg-preview{display:flex;gap:4px;padding:2px 4px;height:100%;box-sizing:border-box}",
+    "virtual-grid .vg-preview a{flex:1;min-width:0;display:flex;align-items:center;justify-content:center}",
+    "virtual-grid .vg-preview img{max-height:100%;max-width:100%}",
+    "virtual-grid .vg-status{padding:4px 8px;color:#6c757d;border-top:1px solid #dee2e6}"
+  ].join("\n");
+
+  function injectStyle() {
+    if (document.getElementById("virtual-grid-style")) {
+      return;
+    }
+    var style = document.createElement("style");
+    style.id = "virtual-grid-style";
+    style.textContent = STYLE;
+    document.head.appendChild(style);
+  }
+
+  function json(value, fallback) {
+    try {
+      return JSON.parse(value);
+    } catch (e) {
+      return fallback;
+    }
+  }
+
+  // 紧凑格式按列编码：dict 为取值表+下标，prefix 为目录前缀编号+共享长度+后缀
+  function decodeColumn(column) {
+    if (column.type === "dict") {
+      return column.codes.map(function (code) {
+        return code === null ? null : column.values[code];
+      });
+    }
+    if (column.type === "prefix") {
+      // 目录前缀编号表按出现顺序在解码时重建，与服务端 grid.encode_prefix 一致
+      var table = [""];
+      var known = new Set([""]);
+      var previous = new Map();
+      return column.prefix.map(function (code, i) {
+        if (code === null) {
+          return null;
+        }
+        var rest = (previous.get(code) || "").slice(0, column.shared[i]) + column.suffix[i];
+        previous.set(code, rest);
+        var value = table[code] + rest;
+        for (var end = value.indexOf("/"); end >= 0; end = value.indexOf("/", end + 1)) {
+          var directory = value.slice(0, end + 1);
+          if (!known.has(directory)) {
+            known.add(directory);
+            table.push(directory);
+          }
+        }
+        return value;
+      });
+    }
+    return column.values;
+  }
+
+  function decodeRows(payload) {
+    if (payload.encoding !== "compact") {
+      return payload.rows;
+    }
+    var columns = payload.data.map(decodeColumn);
+    var rows = new Array(payload.count);
+    for (var i = 0; i < payload.count; i++) {
+      rows[i] = columns.map(function (values) {
+        return values[i];
+      });
+    }
+    return rows;
+  }
+
+  class VirtualGrid extends HTMLElement {
+    connectedCallback() {
+      if (this._initialized) {
+        return;
+      }
+      this._initialized = true;
+      injectStyle();
+
+      this.endpoint = this.dataset.endpoint;
+      this.format = this.dataset.format || "json";
+      this.fields = this.dataset.fields || "";
+      this.sort = this.dataset.sort || "";
+      this.total = parseInt(this.dataset.total, 10) || 0;
+      this.search = this.dataset.search || "";
+      this.filters = this.dataset.filters || "{}";
+      this.columns = json(this.dataset.columns, []);
+      this.pageSize = parseInt(this.dataset.pageSize, 10) || 200;
+      this.overscan = parseInt(this.dataset.overscan, 10) || 40;
+      this.rowHeight = parseInt(this.dataset.rowHeight, 10) || 34;
+      this.cachedPages = parseInt(this.dataset.cachedPages, 10) || 50;
+      this.pages = new Map();
+      this.loading = new Set();
+      this.frame = null;
+      // 缩略图预览列：滚动停止后才请求可见行的缩略图，已加载过的直接显示
+      this.preview = this.dataset.preview || "";
+      this.previewKey = parseInt(this.dataset.previewKey, 10) || 0;
+      this.previewDelay = parseInt(this.dataset.previewDelay, 10) || 150;
+      this.previewSources = (this.dataset.previewSources || "bmp").split(",");
+      this.previewLoaded = new Set();
+      this.previewMissing = new Set();
+      this.previewTimer = null;
+
+      var widths = json(this.dataset.widths, []);
+      var template = this.columns.map(function (_, i) {
+        return widths[i] ? "minmax(60px," + widths[i] + ")" : "minmax(80px,1fr)";
+      }).join(" ");
+      if (this.preview) {
+        template = this.rowHeight * 2 * this.previewSources.length + "px " + template;
+      }
+
+      this.header = document.createElement("div");
+      this.header.className = "vg-header";
+      this.header.style.gridTemplateColumns = template;
+      this.header.style.height = this.rowHeight + "px";
+      // 表头标出服务端排序的方向，多列排序时附带优先级
+      var sorted = {};
+      var sortItems = this.sort ? this.sort.split(",") : [];
+      sortItems.forEach(function (item, i) {
+        var descending = item.charAt(0) === "-";
+        var name = item.replace(/^[+-]/, "");
+        sorted[name] = (descending ? " ▼" : " ▲") + (sortItems.length > 1 ? String(i + 1) : "");
+      });
+      (this.preview ? ["预览"] : []).concat(this.columns).forEach(function (column) {
+        var cell = document.createElement("div");
+        cell.className = "vg-cell";
+        cell.textContent = column + (sorted[column] || "");
+        cell.title = column;
+        this.header.appendChild(cell);
+      }, this);
+
+      this.viewport = document.createElement("div");
+      this.viewport.className = "vg-viewport";
+      this.viewportHeight = parseInt(this.dataset.height, 10) || 600;
+      this.viewport.style.height = this.viewportHeight + "px";
+      this.spacer = document.createElement("div");
+      this.resize();
+      this.rowsContainer = document.createElement("div");
+      this.rowsContainer.className = "vg-rows";
+      this.viewport.appendChild(this.spacer);
+      this.viewport.appendChild(this.rowsContainer);
+
+      this.status = document.createElement("div");
+      this.status.className = "vg-status";
+
+      this.template = template;
+      this.appendChild(this.header);
+      this.appendChild(this.viewport);
+      this.appendChild(this.status);
+
+      // 表头随表体横向滚动
+      this.viewport.addEventListener("scroll", this.schedule.bind(this), { passive: true });
+      this.render();
+    }
+
+    resize() {
+      var height = this.total * this.rowHeight;
+      var spacer = Math.min(height, MAX_SCROLL_HEIGHT);
+      this.spacer.style.height = spacer + "px";
+      // 滚动到底时对应最后一行：可滚动距离按 (内容高度-视口) / (滚动区域高度-视口) 放大
+      this.scale = height > spacer && spacer > this.viewportHeight
+        ? (height - this.viewportHeight) / (spacer - this.viewportHeight)
+        : 1;
+    }
+
+    schedule() {
+      if (this.frame === null) {
+        this.frame = window.requestAnimationFrame(this.render.bind(this));
+      }
+    }
+
+    visibleRange() {
+      // top 为内容坐标（未缩放）中的滚动位置
+      var top = this.viewport.scrollTop * this.scale;
+      var first = Math.floor(top / this.rowHeight);
+      var count = Math.ceil(this.viewport.clientHeight / this.rowHeight);
+      var start = Math.max(first - this.overscan, 0);
+      var end = Math.min(first + count + this.overscan, this.total);
+      return { top: top, first: first, count: count, start: start, end: end };
+    }
+
+    render() {
+      this.frame = null;
+      this.header.style.transform = "translateX(" + -this.viewport.scrollLeft + "px)";
+      var range = this.visibleRange();
+      var firstPage = Math.floor(range.start / this.pageSize);
+      var lastPage = Math.floor(Math.max(range.end - 1, 0) / this.pageSize);
+      for (var page = firstPage; page <= lastPage && range.end > 0; page++) {
+        this.load(page);
+      }
+
+      var fragment = document.createDocumentFragment();
+      for (var index = range.start; index < range.end; index++) {
+        fragment.appendChild(this.renderRow(index));
+      }
+      // 行按内容坐标排列，再平移到视口当前的滚动位置（未缩放时即 start * rowHeight）
+      var offset = this.viewport.scrollTop + range.start * this.rowHeight - range.top;
+      this.rowsContainer.style.transform = "translateY(" + offset + "px)";
+      this.rowsContainer.replaceChildren(fragment);
+      if (this.preview) {
+        this.schedulePreview();
+      }
+
+      var shownEnd = Math.min(range.first + range.count, this.total);
+      this.status.textContent = this.total
+        ? "第 " + (range.first + 1).toLocaleString() + "-" + shownEnd.toLocaleString() +
+          " 行 / 共 " + this.total.toLocaleString() + " 行"
+        : "没有匹配的数据";
+    }
+
+    renderRow(index) {
+      var row = document.createElement("div");
+      row.className = "vg-row";
+      row.style.gridTemplateColumns = this.template;
+      row.style.height = this.rowHeight + "px";
+      var page = this.pages.get(Math.floor(index / this.pageSize));
+      var values = page ? page.rows[index % this.pageSize] : null;
+      if (!values) {
+        row.classList.add("vg-loading");
+      }
+      if (this.preview) {
+        row.appendChild(this.renderPreview(values));
+      }
+      for (var i = 0; i < this.columns.length; i++) {
+        var cell = document.createElement("div");
+        cell.className = "vg-cell";
+        var value = values ? values[i] : (i === 0 ? "…" : "");
+        cell.textContent = value === null || value === undefined ? "" : String(value);
+        if (values) {
+          cell.title = cell.textContent;
+        }
+        row.appendChild(cell);
+      }
+      return row;
+    }
+
+    renderPreview(values) {
+      var cell = document.createElement("div");
+      cell.className = "vg-cell vg-preview";
+      var key = values ? values[this.previewKey] : null;
+      if (key === null || key === undefined) {
+        return cell;
+      }
+      // 每个来源（BMP、YUV第一帧）一张缩略图，没有该文件的来源加载失败后隐藏，不再重复请求
+      this.previewSources.forEach(function (source) {
+        var url = this.preview + "/" + encodeURIComponent(key) + "?source=" + source;
+        var link = document.createElement("a");
+        link.href = url + "&size=512";
+        link.target = "_blank";
+        link.rel = "noopener";
+        link.title = source.toUpperCase();
+        var image = document.createElement("img");
+        image.alt = "";
+        image.decoding = "async";
+        if (this.previewMissing.has(url)) {
+          link.style.visibility = "hidden";
+        } else if (this.previewLoaded.has(url)) {
+          image.src = url;
+        } else {
+          image.dataset.src = url;
+        }
+        link.appendChild(image);
+        cell.appendChild(link);
+      }, this);
+      return cell;
+    }
+
+    schedulePreview() {
+      // 快速滚动经过的行不请求缩略图，避免服务端为一闪而过的行解码BMP
+      if (this.previewTimer !== null) {
+        window.clearTimeout(this.previewTimer);
+      }
+      this.previewTimer = window.setTimeout(this.loadPreviews.bind(this), this.previewDelay);
+    }
+
+    loadPreviews() {
+      this.previewTimer = null;
+      var grid = this;
+      this.rowsContainer.querySelectorAll("img[data-src]:not([src])").forEach(function (image) {
+        var url = image.dataset.src;
+        image.addEventListener("load", function () {
+          grid.previewLoaded.add(url);
+        });
+        image.addEventListener("error", function () {
+          grid.previewMissing.add(url);
+          image.parentNode.style.visibility = "hidden";
+        });
+        image.src = url;
+      });
+    }
+
+    load(page) {
+      if (this.pages.has(page) || this.loading.has(page)) {
+        if (this.pages.has(page)) {
+          // 刷新最近使用顺序
+          var entry = this.pages.get(page);
+          this.pages.delete(page);
+          this.pages.set(page, entry);
+        }
+        return;
+      }
+      this.loading.add(page);
+      var params = new URLSearchParams({
+        offset: String(page * this.pageSize),
+        limit: String(this.pageSize),
+        search: this.search,
+        filters: this.filters,
+        fields: this.fields,
+        sort: this.sort,
+        format: this.format
+      });
+      // 已加载上一页时从其最后一行的排序键继续（键集分页），否则按 offset 跳转
+      var previous = this.pages.get(page - 1);
+      if (previous && previous.last) {
+        params.set("after", JSON.stringify(previous.last));
+      }
+      var grid = this;
+      fetch(this.endpoint + "?" + params.toString(), { credentials: "same-origin" })
+        .then(function (response) {
+          if (!response.ok) {
+            throw new Error(response.status + " " + response.statusText);
+          }
+          return response.json();
+        })
+        .then(function (payload) {
+          grid.loading.delete(page);
+          grid.pages.set(page, { rows: decodeRows(payload), last: payload.last });
+          while (grid.pages.size > grid.cachedPages) {
+            grid.pages.delete(grid.pages.keys().next().value);
+          }
+          // 只有第一页返回总数
+          if (payload.total !== undefined && payload.total !== grid.total) {
+            grid.total = payload.total;
+            grid.resize();
+          }
+          grid.schedule();
+        })
+        .catch(function (error) {
+          grid.loading.delete(page);
+          grid.status.textContent = "❌ 数据加载失败: " + error.message;
+        });
+    }
+  }
+
+  window.customElements.define("virtual-grid", VirtualGrid);
+})();
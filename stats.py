@@ -0,0 +1,220 @@
+"""
+统计汇总模块
+Materialised per-table statistics for the dashboard
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import threading
+import time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import STATS_CONFIG
+from database_config import TABLE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 物化汇总表：每个数据表一行，stats 列保存JSON格式的统计结果
+STATS_TABLE = "table_stats"
+
+# 除 filter_columns 外按取值分组计数的枚举列
+GROUPED_COLUMNS = ["file_status"]
+
+# test_cases 按框架和类别汇总的数值列
+GROUP_BY_COLUMNS = ["framework", "category"]
+MEASURE_COLUMNS = ["model_size", "params", "flops"]
+
+
+def _number(value: Any) -> Any:
+    """DECIMAL 转为 float，其余数值原样返回"""
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def percentile(values: List[Any], q: float) -> Any:
+    """最近秩法分位数，values 需已排序"""
+    if not values:
+        return None
+    rank = max(int(math.ceil(q / 100 * len(values))), 1)
+    return values[rank - 1]
+
+
+def summarize(values: Iterable[Any]) -> Dict[str, Any]:
+    """非空数值的个数、总和与分位数"""
+    values = sorted(_number(v) for v in values if v is not None)
+    summary = {"count": len(values), "sum": sum(values)}
+    for q in STATS_CONFIG["percentiles"]:
+        summary[f"p{q}"] = percentile(values, q)
+    return summary
+
+
+def compute_table_stats(db, table_name: str) -> Dict[str, Any]:
+    """扫描表计算汇总统计
+
+    - 每列的去重数、非空数和空值数在同一条聚合查询中计算
+    - SET/ENUM 筛选列的各选项计数（FIND_IN_SET，多选值计入每个选项）
+    - 文件状态等枚举列按取值分组计数
+    - test_cases 按框架和类别汇总模型大小、参数量、FLOPs 的总和与分位数
+    """
+    started = time.perf_counter()
+    config = TABLE_CONFIG[table_name]
+    q = db.quote
+    columns = list(config["columns"])
+
+    select = ["COUNT(*) AS total"]
+    for index, column in enumerate(columns):
+        select.append(f"COUNT(DISTINCT {q(column)}) AS d{index}")
+        select.append(f"COUNT({q(column)}) AS n{index}")
+    row = db._run_query(f"SELECT {', '.join(select)} FROM {table_name}")[0]
+    total = int(row["total"])
+    column_stats = {}
+    for index, column in enumerate(columns):
+        non_null = int(row[f"n{index}"])
+        column_stats[column] = {
+            "unique_count": int(row[f"d{index}"]),
+            "non_null_count": non_null,
+            "null_count": total - non_null
+        }
+
+    histograms: Dict[str, Dict[str, int]] = {}
+    filter_columns = config.get("filter_columns", {})
+    options = [(column, option) for column, values in filter_columns.items() for option in values]
+    if options:
+        select = [f"SUM(CASE WHEN FIND_IN_SET(%s, {q(column)}) > 0 THEN 1 ELSE 0 END) AS h{index}"
+                  for index, (column, _) in enumerate(options)]
+        row = db._run_query(f"SELECT {', '.join(select)} FROM {table_name}", [option for _, option in options])[0]
+        for index, (column, option) in enumerate(options):
+            histograms.setdefault(column, {})[option] = int(row[f"h{index}"] or 0)
+    for column in GROUPED_COLUMNS:
+        if column in config["columns"] and column not in filter_columns:
+            rows = db._run_query(
+                f"SELECT {q(column)} AS value, COUNT(*) AS count FROM {table_name} GROUP BY {q(column)}"
+            )
+            histograms[column] = {str(r["value"]): int(r["count"]) for r in rows}
+
+    groups: Dict[str, Dict[str, Any]] = {}
+    if all(column in config["columns"] for column in GROUP_BY_COLUMNS + MEASURE_COLUMNS):
+        rows = db._run_query(
+            f"SELECT {', '.join(q(c) for c in GROUP_BY_COLUMNS + MEASURE_COLUMNS)} FROM {table_name}"
+        )
+        for group_column in GROUP_BY_COLUMNS:
+            members: Dict[str, List[Dict[str, Any]]] = {}
+            for r in rows:
+                members.setdefault(str(r[group_column]), []).append(r)
+            groups[group_column] = {
+                value: {"count": len(items), **{m: summarize(r[m] for r in items) for m in MEASURE_COLUMNS}}
+                for value, items in sorted(members.items())
+            }
+        groups["all"] = {"count": len(rows), **{m: summarize(r[m] for r in rows) for m in MEASURE_COLUMNS}}
+
+    return {
+        "table": table_name,
+        "total": total,
+        "columns": column_stats,
+        "histograms": histograms,
+        "groups": groups,
+        "refreshed_at": time.time(),
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+def placeholder_stats(table_name: str) -> Dict[str, Any]:
+    """尚未计算过汇总的表的占位结果，pending 为 True，计算在后台进行"""
+    return {
+        "table": table_name,
+        "total": None,
+        "columns": {},
+        "histograms": {},
+        "groups": {},
+        "refreshed_at": None,
+        "seconds": None,
+        "pending": True
+    }
+
+
+class StatsManager:
+    """物化汇总统计
+
+    统计结果保存在 table_stats 表中，读取只需按表名取一行（并经过查询缓存），
+    与数据量无关。表数据通过 DatabaseManager 写入后，缓存失效回调会延迟
+    refresh_delay 秒重新计算该表的汇总，期间的连续写入只触发一次刷新；
+    绕过写入接口的变更由 max_age 兜底，过期的汇总在读取时后台刷新。
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._timers: Dict[str, threading.Timer] = {}
+        # 汇总表不可用（例如未执行迁移）时保留最近一次计算结果
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        db.add_invalidation_hook(self.schedule_refresh)
+
+    def load(self, table_name: str) -> Optional[Dict[str, Any]]:
+        """读取物化的汇总统计，不存在时返回 None"""
+        q = self.db.quote
+        rows = self.db.cached_query(
+            STATS_TABLE,
+            f"SELECT {q('stats')} AS stats FROM {STATS_TABLE} WHERE {q('table_name')} = %s",
+            [table_name]
+        )
+        if not rows:
+            return self._latest.get(table_name)
+        try:
+            return json.loads(rows[0]["stats"])
+        except (TypeError, ValueError) as e:
+            logger.warning(f"统计汇总损坏，将重新计算: {table_name} - {e}")
+            return None
+
+    def get(self, table_name: str) -> Dict[str, Any]:
+        """获取表的汇总统计，从未计算过时立即安排后台计算并返回占位结果"""
+        stats = self.load(table_name)
+        if stats is None:
+            self.schedule_refresh(table_name, delay=0)
+            return placeholder_stats(table_name)
+        if time.time() - stats["refreshed_at"] > STATS_CONFIG["max_age"]:
+            self.schedule_refresh(table_name)
+        return stats
+
+    def refresh(self, table_name: str) -> Dict[str, Any]:
+        """重新计算并保存表的汇总统计（读主库，刚写入的数据不受副本复制延迟影响）"""
+        with self.db.primary_reads():
+            stats = compute_table_stats(self.db, table_name)
+        self._latest[table_name] = stats
+        columns = ["table_name", "row_count", "stats", "refreshed_at"]
+        query = self.db.backend.upsert_sql(STATS_TABLE, columns, ["table_name"])
+        row = (table_name, stats["total"], json.dumps(stats, ensure_ascii=False), stats["refreshed_at"])
+        try:
+            self.db.execute_batches(STATS_TABLE, query, [row])
+        except self.db.backend.error_types as e:
+            logger.error(f"保存统计汇总失败: {e}")
+        logger.info(f"{table_name} 统计汇总已刷新，耗时 {stats['seconds']}s")
+        return stats
+
+    def schedule_refresh(self, table_name: str, delay: Optional[float] = None) -> None:
+        """延迟刷新表的汇总统计，已有待执行的刷新时不重复安排"""
+        if table_name not in TABLE_CONFIG:
+            return
+        delay = STATS_CONFIG["refresh_delay"] if delay is None else delay
+        with self._lock:
+            if table_name in self._timers:
+                return
+            timer = threading.Timer(delay, self._scheduled_refresh, args=(table_name,))
+            timer.name = f"stats-refresh-{table_name}"
+            timer.daemon = True
+            self._timers[table_name] = timer
+        timer.start()
+
+    def _scheduled_refresh(self, table_name: str) -> None:
+        with self._lock:
+            self._timers.pop(table_name, None)
+        try:
+            self.refresh(table_name)
+        except self.db.backend.error_types as e:
+            logger.error(f"刷新统计汇总失败: {table_name} - {e}")
+
+    def pending(self) -> List[str]:
+        """等待刷新的表"""
+        with self._lock:
+            return sorted(self._timers)
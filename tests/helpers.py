@@ -0,0 +1,60 @@
+"""
+测试辅助函数
+Shared test fixtures: embedded databases and BMP writers
+"""
+import struct
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backends import SQLiteBackend
+from cache import MemoryCache
+from database import DatabaseManager
+
+def memory_db(backend=None):
+    """使用独立内存缓存的数据库管理器，默认后端为内嵌SQLite内存数据库（含示例数据）"""
+    return DatabaseManager(backend or SQLiteBackend(":memory:"), cache=MemoryCache())
+
+def cancel_stats_refresh(db):
+    """取消写入后安排的统计汇总刷新，避免测试结束后后台线程访问已关闭的数据库"""
+    for timer in db.stats._timers.values():
+        timer.cancel()
+
+def write_bmp(path, pixels, bits=24, top_down=False):
+    """写入未压缩BMP（pixels 为 高x宽x3 的RGB数组或 高x宽 的灰度数组）"""
+    pixels = np.asarray(pixels, dtype=np.uint8)
+    height, width = pixels.shape[:2]
+    palette = b""
+    if bits == 8:
+        palette = bytes(b for level in range(256) for b in (level, level, level, 0))
+        data = pixels
+    else:
+        data = pixels[:, :, ::-1]
+        if bits == 32:
+            data = np.concatenate([data, np.zeros((height, width, 1), dtype=np.uint8)], axis=2)
+        data = data.reshape(height, -1)
+    row_size = (bits * width + 31) // 32 * 4
+    rows = np.zeros((height, row_size), dtype=np.uint8)
+    rows[:, :data.shape[1]] = data
+    if not top_down:
+        rows = rows[::-1]
+    offset = 54 + len(palette)
+    dib = struct.pack("<IiiHHIIiiII", 40, width, -height if top_down else height, 1, bits, 0,
+                      rows.size, 0, 0, 256 if bits == 8 else 0, 0)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"BM" + struct.pack("<IHHI", offset + rows.size, 0, 0, offset) + dib + palette
+                     + rows.tobytes())
+
+def write_bmp_header(path, width, height, core=False):
+    """写入只有文件头的BMP文件（core 为 True 时使用OS/2 BITMAPCOREHEADER）"""
+    if core:
+        dib = struct.pack("<IHHHH", 12, width, height, 1, 24)
+    else:
+        dib = struct.pack("<IiiHHI", 40, width, height, 1, 24, 0) + b"\0" * 20
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"BM" + struct.pack("<IHHI", 14 + len(dib), 0, 0, 14 + len(dib)) + dib)
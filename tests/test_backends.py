@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+存储后端测试
+Storage backend tests (embedded SQLite, no external service required)
+"""
+import sys
+from pathlib import Path
+import unittest
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backends import SQLiteBackend, MySQLBackend, create_backend, find_in_set
+from database import DatabaseManager
+from database_config import TABLE_CONFIG
+
+class TestFindInSet(unittest.TestCase):
+    """FIND_IN_SET 等价实现测试"""
+
+    def test_find_in_set(self):
+        """测试位置与缺失值"""
+        self.assertEqual(find_in_set("车辆", "行人,车辆"), 2)
+        self.assertEqual(find_in_set("行", "行人,车辆"), 0)
+        self.assertEqual(find_in_set("fusion", "depth fusion,fusion"), 2)
+        self.assertEqual(find_in_set("fusion", None), 0)
+
+class TestSQLiteBackend(unittest.TestCase):
+    """SQLite后端测试类"""
+
+    def setUp(self):
+        """使用带示例数据的内存数据库"""
+        self.db = DatabaseManager(SQLiteBackend(":memory:"))
+
+    def test_create_backend(self):
+        """测试按名称创建后端"""
+        self.assertIsInstance(create_backend("mysql"), MySQLBackend)
+        self.assertIsInstance(create_backend("sqlite", path=":memory:"), SQLiteBackend)
+        with self.assertRaises(ValueError):
+            create_backend("oracle")
+
+    def test_get_all_data(self):
+        """测试获取所有数据及中文列名"""
+        for table in ["dataset_index", "test_cases"]:
+            with self.subTest(table=table):
+                df = self.db.get_all_data(table)
+                self.assertEqual(len(df), 5)
+                self.assertEqual(list(df.columns), list(TABLE_CONFIG[table]["columns"].values()))
+
+    def test_filter_set_columns(self):
+        """测试SET/ENUM字段筛选语义"""
+        df = self.db.filter_data("dataset_index", {"正向目标": ["行人"]})
+        self.assertEqual(sorted(df["图像ID"]), [1, 5])
+
+        df = self.db.filter_data("dataset_index", {"正向目标": ["车辆", "动物"], "目标距离": ["15m"]})
+        self.assertEqual(sorted(df["图像ID"]), [2, 5])
+
+        df = self.db.filter_data("test_cases", {"标签": ["fusion"]})
+        self.assertEqual(sorted(df["用例ID"]), [1, 4, 5])
+
+        df = self.db.filter_data("test_cases", {"类别": ["模型"], "框架": ["onnx"]})
+        self.assertEqual(sorted(df["用例ID"]), [1, 2])
+
+    def test_filter_plain_column(self):
+        """测试普通字段IN筛选"""
+        df = self.db.filter_data("dataset_index", {"仓库": ["urban_dataset"]})
+        self.assertEqual(sorted(df["图像ID"]), [1, 5])
+
+    def test_search_data(self):
+        """测试全局搜索"""
+        df = self.db.search_data("test_cases", "mobilenet")
+        self.assertEqual(list(df["用例ID"]), [5])
+        self.assertTrue(self.db.search_data("dataset_index", "no_such_value").empty)
+
+    def test_table_stats(self):
+        """测试统计"""
+        total, filtered = self.db.get_table_stats("dataset_index", {"负向目标": ["路面"]})
+        self.assertEqual((total, filtered), (5, 2))
+
+        stats = self.db.get_column_stats("test_cases", "框架")
+        self.assertEqual(stats["unique_count"], 3)
+        self.assertEqual(stats["null_count"], 0)
+
+    def test_set_value_format(self):
+        """测试SET值以定义顺序的逗号分隔文本返回"""
+        df = self.db.filter_data("dataset_index", {"正向目标": ["建筑"]})
+        self.assertIsInstance(df, pd.DataFrame)
+        self.assertEqual(df.iloc[0]["图像名称"], "bridge_inspection_05")
+        df = self.db.filter_data("test_cases", {"用例ID": [5]})
+        self.assertEqual(df.iloc[0]["标签"], "fusion,tiling")
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestFindInSet))
+    suite.addTest(loader.loadTestsFromTestCase(TestSQLiteBackend))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+查询缓存测试
+Query cache tests (in-process and shared cache backends)
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backends import SQLiteBackend
+from cache import MemoryCache, SharedCache, create_cache
+from database import DatabaseManager
+from tests.helpers import memory_db
+
+class TestMemoryCache(unittest.TestCase):
+    """进程内缓存测试类"""
+
+    def test_get_or_set(self):
+        """测试命中时不再调用loader"""
+        cache = MemoryCache()
+        calls = []
+        loader = lambda: calls.append(1) or "value"
+        self.assertEqual(cache.get_or_set("dataset_index", ("q", ()), loader), "value")
+        self.assertEqual(cache.get_or_set("dataset_index", ("q", ()), loader), "value")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_ttl_and_lru(self):
+        """测试过期与LRU淘汰"""
+        cache = MemoryCache(max_entries=2, default_ttl=60)
+        cache.set("a", 1, ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("a"))
+
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+
+    def test_bump_version(self):
+        """测试按命名空间失效"""
+        cache = MemoryCache()
+        cache.get_or_set("test_cases", "q", lambda: 1)
+        cache.get_or_set("dataset_index", "q", lambda: 1)
+        cache.bump_version("test_cases")
+        self.assertEqual(cache.lookup("test_cases", "q"), (False, None))
+        self.assertEqual(cache.lookup("dataset_index", "q"), (True, 1))
+
+class TestSharedCache(unittest.TestCase):
+    """共享缓存测试类（两个实例模拟两个工作进程）"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmpdir.name) / "cache.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_shared_between_instances(self):
+        """测试结果与版本号在实例间共享"""
+        first, second = SharedCache(self.path), SharedCache(self.path)
+        first.get_or_set("dataset_index", ("q", (1,)), lambda: {"rows": [1, 2]})
+        self.assertEqual(second.lookup("dataset_index", ("q", (1,))), (True, {"rows": [1, 2]}))
+
+        second.bump_version("dataset_index")
+        self.assertFalse(first.lookup("dataset_index", ("q", (1,)))[0])
+
+    def test_max_bytes_eviction(self):
+        """测试超出容量时淘汰最旧条目"""
+        cache = SharedCache(self.path, max_bytes=4096)
+        for i in range(10):
+            cache.set(f"k{i}", b"x" * 1000)
+        self.assertLessEqual(cache.stats()["bytes"], 4096)
+        self.assertIsNotNone(cache.get("k9"))
+        self.assertIsNone(cache.get("k0"))
+
+    def test_create_cache(self):
+        """测试按名称创建缓存后端"""
+        self.assertIsInstance(create_cache("shared", path=self.path), SharedCache)
+        with self.assertRaises(ValueError):
+            create_cache("redis")
+
+class TestDatabaseCache(unittest.TestCase):
+    """DatabaseManager 查询缓存测试类"""
+
+    def setUp(self):
+        self.backend = SQLiteBackend(":memory:")
+        self.db = memory_db(self.backend)
+
+    def test_cached_queries_and_invalidation(self):
+        """测试重复查询命中缓存，失效后读取最新数据"""
+        self.assertEqual(len(self.db.get_all_data("dataset_index")), 5)
+        self.assertEqual(len(self.db.get_all_data("dataset_index")), 5)
+        self.assertEqual(self.db.cache.stats()["hits"], 1)
+
+        connection = self.backend.connect()
+        connection.execute("DELETE FROM dataset_index WHERE image_id = 1")
+        connection.commit()
+        connection.close()
+        self.assertEqual(len(self.db.get_all_data("dataset_index")), 5)
+
+        self.db.invalidate_cache("dataset_index")
+        self.assertEqual(len(self.db.get_all_data("dataset_index")), 4)
+        self.assertEqual(self.db.get_table_stats("dataset_index")[0], 4)
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestMemoryCache))
+    suite.addTest(loader.loadTestsFromTestCase(TestSharedCache))
+    suite.addTest(loader.loadTestsFromTestCase(TestDatabaseCache))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
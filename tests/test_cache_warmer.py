@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+查询缓存预热测试
+Cache warmer tests: view frequency table, seed views and background re-materialisation
+"""
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backends import SQLiteBackend
+from cache import MemoryCache
+from cache_warmer import CacheWarmer, seed_views, view_key
+from config import CACHE_WARMUP_CONFIG, GRID_CONFIG
+from database import DatabaseManager
+from grid import default_fields, fetch_window
+from tests.helpers import memory_db
+
+class TestViewFrequency(unittest.TestCase):
+    """视图频率表测试类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmpdir.name) / "warmup.json")
+        self.db = memory_db()
+        self.warmer = CacheWarmer(self.db, self.path)
+
+    def tearDown(self):
+        self.warmer.stop()
+        self.tmpdir.cleanup()
+
+    def test_seed_views(self):
+        """测试固定视图为无筛选视图和每个选项的单选筛选"""
+        views = seed_views("test_cases")
+        self.assertEqual(len(views), 1 + 4 + 3)
+        self.assertEqual(views[0], ("", {}, default_fields("test_cases"), []))
+        self.assertIn(("", {"框架": ["onnx"]}, default_fields("test_cases"), []), views)
+        self.assertEqual(len(seed_views("dataset_index")), 1 + 5)
+
+    def test_top_views_and_persistence(self):
+        """测试按请求次数排序、与固定视图去重，以及保存后重新加载"""
+        for _ in range(3):
+            self.warmer.record("test_cases", "", {"标签": ["fusion"]}, ["case_id"], ["-参数量"])
+        self.warmer.record("test_cases", "resnet", {}, ["case_id"], [])
+        self.warmer.record("test_cases", "", {"框架": ["onnx"]}, default_fields("test_cases"), [])
+        top = self.warmer.top_views("test_cases", 2)
+        self.assertEqual(top[0], (("", {"标签": ["fusion"]}, ["case_id"], ["-参数量"]), 3))
+        views = self.warmer.views("test_cases")
+        self.assertEqual(len(views), len(seed_views("test_cases")) + 2)
+        self.assertEqual(len({view_key(*view) for view in views}), len(views))
+
+        self.warmer.save()
+        reloaded = CacheWarmer(self.db, self.path)
+        self.assertEqual(reloaded.top_views("test_cases"), self.warmer.top_views("test_cases"))
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(sum(json.load(f)["test_cases"].values()), 5)
+
+    def test_save_merges_workers(self):
+        """测试多个工作进程保存时累加各自新增的次数，重复保存不重复计数"""
+        other = CacheWarmer(self.db, self.path)
+        for _ in range(2):
+            self.warmer.record("test_cases", "resnet")
+        other.record("test_cases", "resnet")
+        other.record("test_cases", "yolo")
+        self.warmer.save()
+        other.save()
+        self.warmer.save()
+        with open(self.path, encoding="utf-8") as f:
+            counts = json.load(f)["test_cases"]
+        self.assertEqual(counts, {view_key("resnet", {}, [], []): 3, view_key("yolo", {}, [], []): 1})
+        self.assertEqual(self.warmer.top_views("test_cases"), other.top_views("test_cases"))
+        other.stop()
+
+    def test_one_leader_per_host(self):
+        """测试共用频率表的多个进程中只有一个负责后台预热，持锁者停止后由其他进程接替"""
+        other = CacheWarmer(self.db, self.path)
+        self.assertTrue(self.warmer.is_leader())
+        self.assertFalse(other.is_leader())
+        self.warmer.stop()
+        self.assertTrue(other.is_leader())
+        other.stop()
+
+    def test_max_views(self):
+        """测试频率表超出上限时保留最常用的视图"""
+        original = CACHE_WARMUP_CONFIG["max_views"]
+        CACHE_WARMUP_CONFIG["max_views"] = 10
+        try:
+            for _ in range(4):
+                self.warmer.record("test_cases", "popular")
+            for index in range(10):
+                self.warmer.record("test_cases", f"rare{index}")
+            top = self.warmer.top_views("test_cases", 100)
+            self.assertLessEqual(len(top), 10)
+            self.assertEqual(top[0][0][0], "popular")
+        finally:
+            CACHE_WARMUP_CONFIG["max_views"] = original
+
+class TestWarming(unittest.TestCase):
+    """预热与变更后重新预热测试类"""
+
+    def setUp(self):
+        self.cache = MemoryCache()
+        self.db = DatabaseManager(SQLiteBackend(":memory:"), cache=self.cache)
+        self.warmer = CacheWarmer(self.db, "")
+        self.grid_mode = GRID_CONFIG["mode"]
+
+    def tearDown(self):
+        self.warmer.stop()
+        GRID_CONFIG["mode"] = self.grid_mode
+
+    def assert_cached(self, table_name, filters, fields=None, sort=None, search=""):
+        """界面和表格接口对该视图的查询全部命中缓存"""
+        misses = self.cache.misses
+        self.db.get_table_stats(table_name, filters if not search else None)
+        fetch_window(self.db, table_name, 0, GRID_CONFIG["page_size"], search, filters, GRID_CONFIG["wire_format"],
+                     fields or default_fields(table_name), sort or [])
+        self.assertEqual(self.cache.misses, misses)
+
+    def test_warm_seed_and_recorded_views(self):
+        """测试固定视图和记录的视图在预热后命中缓存"""
+        GRID_CONFIG["mode"] = "virtual"
+        self.warmer.record("test_cases", "", {"标签": ["fusion"]}, ["case_id", "case_name"], ["-参数量"])
+        stats = self.warmer.warm("test_cases")
+        self.assertEqual((stats["warmed"], stats["failed"]), (len(seed_views("test_cases")) + 1, 0))
+        self.assert_cached("test_cases", {})
+        self.assert_cached("test_cases", {"类别": ["模型"]})
+        self.assert_cached("test_cases", {"标签": ["fusion"]}, ["case_id", "case_name"], ["-参数量"])
+        self.assertEqual(self.warmer.stale_tables(), ["dataset_index"])
+
+    def test_rewarm_after_change(self):
+        """测试数据变更后延迟重新预热"""
+        GRID_CONFIG["mode"] = "virtual"
+        self.warmer.warm("test_cases")
+        self.db.execute_batches("test_cases", "UPDATE test_cases SET remark = %s WHERE case_id = %s", [("x", 1)])
+        self.assertIn("test_cases", self.warmer.stale_tables())
+        # 失效回调已安排延迟预热，改为立即执行
+        self.warmer._timers.pop("test_cases").cancel()
+        self.warmer.schedule("test_cases", delay=0)
+        deadline = time.monotonic() + 10
+        while "test_cases" in self.warmer.stale_tables() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assert_cached("test_cases", {"框架": ["caffe"]})
+
+    def test_dataframe_mode(self):
+        """测试 dataframe 模式预热完整结果"""
+        GRID_CONFIG["mode"] = "dataframe"
+        self.warmer.warm("dataset_index")
+        misses = self.cache.misses
+        self.db.filter_data("dataset_index", {"正向目标": ["车辆"]}, default_fields("dataset_index"), [])
+        self.assertEqual(self.cache.misses, misses)
+
+    def test_without_cache(self):
+        """测试未启用查询缓存时不预热"""
+        warmer = CacheWarmer(DatabaseManager(SQLiteBackend(":memory:")), "")
+        if warmer.db.cache is None:
+            self.assertEqual(warmer.warm("test_cases")["warmed"], 0)
+            self.assertFalse(warmer.start())
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestViewFrequency))
+    suite.addTest(loader.loadTestsFromTestCase(TestWarming))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
@@ -13,8 +13,11 @@ import pandas as pd
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+from backends import MySQLBackend
 from database import db_manager
 from database_config import TABLE_CONFIG
+from replica_router import ReplicaRouter
+from tests.helpers import cancel_stats_refresh, memory_db
 
 class TestDatabase(unittest.TestCase):
     """数据库测试类"""
@@ -101,6 +104,241 @@ class TestDatabase(unittest.TestCase):
             self.assertTrue(os.path.exists(json_path))
             os.remove(json_path)  # 清理测试文件
 
+def dataset_row(name, **extra):
+    """生成一行 dataset_index 数据（中文列名）"""
+    row = {"图像名称": name, "高度": 720, "宽度": 1280, "仓库": "batch_repo", "正向目标": "行人",
+           "负向目标": "天空", "目标距离": "10m", "来源": "unit_test"}
+    row.update(extra)
+    return row
+
+class TestDatabaseWrite(unittest.TestCase):
+    """批量写入测试类（内嵌SQLite）"""
+    
+    def setUp(self):
+        self.db = memory_db()
+        self.invalidated = []
+        self.db.add_invalidation_hook(self.invalidated.append)
+    
+    def names(self):
+        df = self.db.filter_data("dataset_index", {"仓库": ["batch_repo"]})
+        return sorted(df["图像名称"]) if not df.empty else []
+    
+    def test_insert_rows_with_chinese_columns(self):
+        """测试中文列名批量插入、分批提交与缓存失效"""
+        self.assertEqual(self.names(), [])
+        rows = [dataset_row(f"img_{i:03d}") for i in range(25)]
+        written = self.db.insert_rows("dataset_index", rows, batch_size=4, commit_every=10)
+        self.assertEqual(written, 25)
+        self.assertEqual(len(self.names()), 25)
+        self.assertEqual(self.invalidated, ["dataset_index"])
+    
+    def test_insert_dataframe_and_tuples(self):
+        """测试DataFrame（含空值、原始列名）与元组行写入"""
+        df = pd.DataFrame([dataset_row("a"), dataset_row("b")]).rename(columns={"图像名称": "image_name"})
+        df["bmp_path"] = ["a.bmp", None]
+        self.assertEqual(self.db.insert_rows("dataset_index", df), 2)
+        row = dataset_row("c")
+        self.db.insert_rows("dataset_index", [tuple(row.values())], columns=list(row.keys()))
+        self.assertEqual(self.names(), ["a", "b", "c"])
+        paths = self.db.execute_query(
+            "SELECT bmp_path FROM dataset_index WHERE image_repository = %s ORDER BY image_name",
+            ["batch_repo"])
+        self.assertEqual([row["bmp_path"] for row in paths], ["a.bmp", None, None])
+    
+    def test_upsert_rows(self):
+        """测试按主键与唯一键插入或更新"""
+        self.db.upsert_rows("dataset_index", [dataset_row("x", 图像ID=9001)])
+        self.db.upsert_rows("dataset_index", [dataset_row("y", 图像ID=9001)])
+        self.assertEqual(self.names(), ["y"])
+        self.db.upsert_rows("dataset_index", [dataset_row("y", 来源="camera")],
+                            key_columns=["image_repository", "image_name"])
+        rows = self.db.filter_data("dataset_index", {"仓库": ["batch_repo"]})
+        self.assertEqual((len(rows), rows.iloc[0]["来源"]), (1, "camera"))
+    
+    def test_invalid_rows(self):
+        """测试未知列、缺少键列与失败回滚"""
+        with self.assertRaises(ValueError):
+            self.db.insert_rows("dataset_index", [{"不存在的列": 1}])
+        with self.assertRaises(ValueError):
+            self.db.upsert_rows("dataset_index", [dataset_row("z")])
+        with self.assertRaises(self.db.backend.error_types):
+            self.db.insert_rows("dataset_index", [dataset_row("dup"), dataset_row("dup")])
+        self.assertEqual(self.names(), [])
+        self.assertEqual(self.invalidated, [])
+
+class FakeMySQLConnection:
+    """autocommit 模式的假 MySQL 连接，记录事务调用，可在第 N 次批量执行时失败"""
+    
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.executed = 0
+        self.calls = []
+    
+    def start_transaction(self):
+        self.calls.append("begin")
+    
+    def commit(self):
+        self.calls.append("commit")
+    
+    def rollback(self):
+        self.calls.append("rollback")
+    
+    def cursor(self):
+        return self
+    
+    def executemany(self, query, rows):
+        self.executed += 1
+        if self.executed == self.fail_at:
+            raise MySQLBackend().error_types[0]("Duplicate entry")
+        self.calls.append(len(rows))
+        self.rowcount = len(rows)
+    
+    def close(self):
+        pass
+    
+    def is_connected(self):
+        return True
+
+class TestMySQLWriteTransactions(unittest.TestCase):
+    """MySQL 写入事务测试类（假连接）"""
+    
+    def setUp(self):
+        self.connection = FakeMySQLConnection()
+        router = ReplicaRouter({"host": "primary", "port": 3306}, [], connector=lambda endpoint: self.connection)
+        self.db = memory_db(MySQLBackend({"host": "primary", "port": 3306}, router))
+        self.invalidated = []
+        self.db.add_invalidation_hook(self.invalidated.append)
+    
+    def tearDown(self):
+        cancel_stats_refresh(self.db)
+    
+    def insert(self, count):
+        rows = [dataset_row(f"img_{i:03d}") for i in range(count)]
+        return self.db.insert_rows("dataset_index", rows, batch_size=4, commit_every=10)
+    
+    def test_commit_every(self):
+        """测试每个提交块显式开始事务并提交"""
+        self.assertEqual(self.insert(25), 25)
+        self.assertEqual(self.connection.calls, ["begin", 4, 4, 4, "commit",
+                                                 "begin", 4, 4, 4, "commit",
+                                                 "begin", 1, "commit"])
+        self.assertEqual(self.invalidated, ["dataset_index"])
+    
+    def test_rollback(self):
+        """测试失败时回滚未提交的事务，已提交的批次仍使缓存失效"""
+        self.connection.fail_at = 5
+        with self.assertRaises(self.db.backend.error_types):
+            self.insert(25)
+        self.assertEqual(self.connection.calls, ["begin", 4, 4, 4, "commit", "begin", 4, "rollback"])
+        self.assertEqual(self.invalidated, ["dataset_index"])
+        
+        self.connection.calls.clear()
+        self.invalidated.clear()
+        self.connection.executed, self.connection.fail_at = 0, 2
+        with self.assertRaises(self.db.backend.error_types):
+            self.insert(25)
+        self.assertEqual(self.connection.calls, ["begin", 4, "rollback"])
+        self.assertEqual(self.invalidated, [])
+
+class TestColumnProjection(unittest.TestCase):
+    """列投影测试类（内嵌SQLite）"""
+    
+    def setUp(self):
+        self.db = memory_db()
+    
+    def test_projection(self):
+        """测试只获取指定的列，中文与原始列名均可"""
+        df = self.db.get_all_data("test_cases", ["case_id", "路径"])
+        self.assertEqual(list(df.columns), ["用例ID", "路径"])
+        df = self.db.filter_data("test_cases", {"框架": ["onnx"]}, ["框架"])
+        self.assertEqual(set(df["框架"]), {"onnx"})
+        df = self.db.search_data("dataset_index", "road", ["图像名称"])
+        self.assertEqual(list(df.columns), ["图像名称"])
+        self.assertGreater(len(df), 0)
+        df = self.db.query_page("dataset_index", 1, 2, columns=["image_id"])
+        self.assertEqual(list(df["图像ID"]), [2, 3])
+    
+    def test_select_list(self):
+        """测试列清单的引用与校验"""
+        self.assertEqual(self.db.select_list("test_cases"), "*")
+        self.assertEqual(self.db.select_list("test_cases", ["参数量", "flops"]), '"params", "flops"')
+        for columns in (["remark; DROP TABLE test_cases"], []):
+            with self.subTest(columns=columns), self.assertRaises(ValueError):
+                self.db.select_list("test_cases", columns)
+
+class TestSorting(unittest.TestCase):
+    """服务端排序测试类（内嵌SQLite）"""
+    
+    def setUp(self):
+        self.db = memory_db()
+    
+    def test_order_clause(self):
+        """测试排序子句、主键补充与校验"""
+        self.assertEqual(self.db.order_clause("test_cases"), 'ORDER BY "case_id" ASC')
+        self.assertEqual(self.db.order_clause("test_cases", ["-FLOPs"]), 'ORDER BY "flops" DESC, "case_id" DESC')
+        self.assertEqual(self.db.order_clause("test_cases", ["params", "-update_time", "params"]),
+                         'ORDER BY "params" ASC, "update_time" DESC, "case_id" DESC')
+        self.assertEqual(self.db.order_clause("test_cases", ["-用例ID", "flops"]), 'ORDER BY "case_id" DESC')
+        for sort in (["remark"], ["-unknown"]):
+            with self.subTest(sort=sort), self.assertRaises(ValueError):
+                self.db.order_clause("test_cases", sort)
+    
+    def test_sorted_queries(self):
+        """测试排序后的分页连续且与整体排序一致"""
+        df = self.db.filter_data("test_cases", {"框架": ["onnx"]}, ["flops"], ["-flops"])
+        self.assertEqual(list(df["FLOPs"]), sorted(df["FLOPs"], reverse=True))
+        pages = [self.db.query_page("test_cases", offset, 2, columns=["case_id"], sort=["-模型大小(MB)"])
+                 for offset in (0, 2, 4)]
+        ordered = self.db.get_all_data("test_cases", ["case_id"], ["-model_size"])
+        self.assertEqual([i for page in pages for i in page["用例ID"]], list(ordered["用例ID"]))
+        df = self.db.search_data("dataset_index", "road", sort=["image_name"])
+        self.assertEqual(list(df["图像名称"]), sorted(df["图像名称"]))
+    
+    def test_sort_uses_index(self):
+        """测试单列排序的首页沿二级索引读取"""
+        query = (f"SELECT * FROM test_cases WHERE 1=1 {self.db.order_clause('test_cases', ['-flops'])} "
+                 "LIMIT 200 OFFSET 0")
+        plan = " ".join(row["detail"] for row in self.db.execute_query(f"EXPLAIN QUERY PLAN {query}"))
+        self.assertIn("idx_flops", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+class TestRangeFilters(unittest.TestCase):
+    """数值范围筛选测试类（内嵌SQLite）"""
+    
+    def setUp(self):
+        self.db = memory_db()
+    
+    def test_range_condition(self):
+        """测试范围条件的SQL、参数与校验"""
+        self.assertEqual(self.db.range_condition("test_cases", "flops", {"min": "1e9", "max": 5e9}),
+                         ('"flops" BETWEEN %s AND %s', [1000000000, 5000000000]))
+        self.assertEqual(self.db.range_condition("test_cases", "model_size", {"min": 2.5}), ('"model_size" >= %s', [2.5]))
+        self.assertEqual(self.db.range_condition("dataset_index", "image_width", {"max": 1280}),
+                         ('"image_width" <= %s', [1280]))
+        self.assertEqual(self.db.range_condition("dataset_index", "image_width", {"max": ""}), ("", []))
+        for column, bounds in (("remark", {"min": 1}), ("flops", {"min": "abc"}), ("flops", {"min": "inf"}),
+                               ("flops", {"low": 1})):
+            with self.subTest(column=column, bounds=bounds), self.assertRaises(ValueError):
+                self.db.range_condition("test_cases", column, bounds)
+    
+    def test_range_queries(self):
+        """测试范围筛选与取值筛选组合，计数与查询一致"""
+        filters = {"高度": {"min": 720, "max": 1080}}
+        df = self.db.filter_data("dataset_index", filters, ["image_height"])
+        self.assertEqual(sorted(df["高度"]), [720, 1080])
+        self.assertEqual(self.db.count_rows("dataset_index", filters), 2)
+        filters = {"FLOPs": {"min": 1e9}, "框架": ["onnx"]}
+        df = self.db.filter_data("test_cases", filters, ["case_name"])
+        self.assertEqual(sorted(df["用例名称"]), ["ResNet50_ImageNet", "YOLOv5s_Detection"])
+        self.assertEqual(self.db.get_table_stats("test_cases", {"参数量": {"max": 1_000_000}}), (5, 2))
+    
+    def test_range_uses_index(self):
+        """测试范围条件沿二级索引扫描"""
+        where, params = self.db.build_conditions("dataset_index", {"宽度": {"min": 1000, "max": 2000}})
+        plan = " ".join(row["detail"] for row in self.db.execute_query(
+            f"EXPLAIN QUERY PLAN SELECT image_id FROM dataset_index WHERE {where}", params))
+        self.assertIn("idx_image_width", plan)
+
 class TestDatabaseConfig(unittest.TestCase):
     """数据库配置测试类"""
     
@@ -133,6 +371,11 @@ if __name__ == "__main__":
     
     # 添加数据库测试
     suite.addTest(unittest.makeSuite(TestDatabase))
+    suite.addTest(unittest.makeSuite(TestDatabaseWrite))
+    suite.addTest(unittest.makeSuite(TestMySQLWriteTransactions))
+    suite.addTest(unittest.makeSuite(TestColumnProjection))
+    suite.addTest(unittest.makeSuite(TestSorting))
+    suite.addTest(unittest.makeSuite(TestRangeFilters))
     suite.addTest(unittest.makeSuite(TestDatabaseConfig))
     
     # 运行测试
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+虚拟滚动表格测试
+Windowed grid tests (paged queries and the row window endpoint)
+"""
+import html
+import json
+import sys
+from pathlib import Path
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from benchmarks.synthetic_data import generate_rows
+from grid import (decode_compact, encode_dictionary, encode_prefix, fetch_window, grid_columns, parse_filters,
+                  render_grid)
+from server import register_grid_routes
+from tests.helpers import memory_db
+
+class TestPagedQueries(unittest.TestCase):
+    """分页查询测试类"""
+
+    def setUp(self):
+        self.db = memory_db()
+
+    def test_query_page(self):
+        """测试分页按主键排序"""
+        first = self.db.query_page("dataset_index", 0, 2)
+        second = self.db.query_page("dataset_index", 2, 2)
+        self.assertEqual(list(first["图像ID"]) + list(second["图像ID"]), [1, 2, 3, 4])
+
+    def test_count_rows(self):
+        """测试匹配行数与筛选、搜索结果一致"""
+        filters = {"正向目标": ["车辆"]}
+        self.assertEqual(self.db.count_rows("dataset_index", filters), len(self.db.filter_data("dataset_index", filters)))
+        self.assertEqual(self.db.count_rows("dataset_index", search_text="urban"),
+                         len(self.db.search_data("dataset_index", "urban")))
+        self.assertEqual(self.db.count_rows("dataset_index"), 5)
+
+    def test_fetch_window(self):
+        """测试行窗口的列顺序和总数"""
+        window = fetch_window(self.db, "test_cases", 1, 2, filters={"框架": ["onnx"]}, with_total=True)
+        self.assertEqual(window["columns"], grid_columns("test_cases"))
+        self.assertEqual((window["offset"], window["total"], len(window["rows"])), (1, 3, 2))
+        self.assertEqual(window["rows"][0][0], 2)
+        self.assertEqual(fetch_window(self.db, "test_cases", 100, 10)["rows"], [])
+
+    def test_total_only_on_first_window(self):
+        """测试只有第一个窗口（或显式请求时）计算总数"""
+        self.assertEqual(fetch_window(self.db, "test_cases", 0, 2)["total"], 5)
+        self.assertNotIn("total", fetch_window(self.db, "test_cases", 2, 2))
+
+    def test_keyset_windows(self):
+        """测试按上一个窗口的 last 读取的窗口与按 offset 分页一致，排序键可为时间和空值列"""
+        generated = list(generate_rows("test_cases", 50))
+        for row in generated[::4]:
+            row["model_size"] = None
+        self.db.upsert_rows("test_cases", generated)
+        for sort in ([], ["-flops"], ["更新时间"], ["模型大小(MB)"], ["-model_size", "case_id"]):
+            with self.subTest(sort=sort):
+                expected = fetch_window(self.db, "test_cases", 0, 1000, fields=["case_id"], sort=sort)["rows"]
+                rows, after = [], None
+                for offset in range(0, len(expected) + 7, 7):
+                    window = fetch_window(self.db, "test_cases", offset, 7, fields=["case_id"], sort=sort,
+                                          after=after)
+                    rows.extend(window["rows"])
+                    # 与浏览器端一样经JSON传回
+                    after = json.loads(json.dumps(window["last"]))
+                self.assertEqual(rows, expected)
+        with self.assertRaises(ValueError):
+            fetch_window(self.db, "test_cases", 7, 7, after=[1, 2])
+
+    def test_fetch_window_fields(self):
+        """测试行窗口只包含选择的列"""
+        window = fetch_window(self.db, "test_cases", 0, 3, fields=["case_id", "路径"])
+        self.assertEqual(window["columns"], ["用例ID", "路径"])
+        self.assertEqual([len(row) for row in window["rows"]], [2, 2, 2])
+        compact = fetch_window(self.db, "test_cases", 0, 3, wire_format="compact", fields=["case_id", "case_path"])
+        self.assertEqual([column["type"] for column in compact["data"]], ["plain", "prefix"])
+        self.assertEqual(decode_compact(compact["data"], compact["count"]), window["rows"])
+
+class TestGridEndpoint(unittest.TestCase):
+    """行窗口接口测试类"""
+
+    def setUp(self):
+        api = FastAPI()
+        register_grid_routes(api, memory_db())
+        self.client = TestClient(api)
+
+    def test_window(self):
+        """测试按筛选条件请求窗口"""
+        response = self.client.get("/api/grid/dataset_index", params={
+            "offset": 0, "limit": 10, "filters": json.dumps({"目标距离": ["10m"]})
+        })
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(payload["total"], len(payload["rows"]))
+        self.assertTrue(all("10m" in row[payload["columns"].index("目标距离")] for row in payload["rows"]))
+
+    def test_errors(self):
+        """测试未知表和错误的筛选条件"""
+        self.assertEqual(self.client.get("/api/grid/unknown").status_code, 404)
+        self.assertEqual(self.client.get("/api/grid/dataset_index", params={"filters": "[1]"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/grid/dataset_index", params={"offset": -1}).status_code, 422)
+        self.assertEqual(self.client.get("/api/grid/dataset_index", params={"format": "xml"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/grid/dataset_index", params={"fields": "remark"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/grid/dataset_index", params={"sort": "-source"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/grid/dataset_index", params={"after": "{}"}).status_code, 400)
+
+    def test_sorted_window(self):
+        """测试按排序请求窗口"""
+        payload = self.client.get("/api/grid/test_cases", params={"fields": "case_id,flops", "sort": "-flops"}).json()
+        flops = [row[1] for row in payload["rows"]]
+        self.assertEqual(flops, sorted(flops, reverse=True))
+
+class TestCompactFormat(unittest.TestCase):
+    """紧凑传输格式测试类"""
+
+    def test_dictionary_roundtrip(self):
+        """测试字典编码与空值"""
+        encoded = encode_dictionary(["a", None, "b", "a"])
+        self.assertEqual((encoded["values"], encoded["codes"]), (["a", "b"], [0, None, 1, 0]))
+        self.assertEqual(decode_compact([encoded], 4), [["a"], [None], ["b"], ["a"]])
+
+    def test_prefix_roundtrip(self):
+        """测试路径前缀压缩只传输变化的部分"""
+        paths = ["/data/bmp/a/img_0001.bmp", "/data/bmp/a/img_0002.bmp", "/data/bmp/b/x_0001.bmp", None,
+                 "/data/bmp/a/img_0003.bmp", "relative.bmp", "/data/bmp/a/img_0003.bmp"]
+        encoded = encode_prefix(paths)
+        self.assertEqual(encoded["suffix"][1], "img_0002.bmp")
+        self.assertEqual(encoded["suffix"][4], "3.bmp")
+        self.assertEqual(encoded["suffix"][6], "")
+        self.assertEqual([row[0] for row in decode_compact([encoded], len(paths))], paths)
+
+    def test_compact_window(self):
+        """测试紧凑格式窗口可还原且体积显著减小"""
+        db = memory_db()
+        db.upsert_rows("dataset_index", generate_rows("dataset_index", 2000))
+        plain = fetch_window(db, "dataset_index", 0, 1000)
+        compact = fetch_window(db, "dataset_index", 0, 1000, wire_format="compact")
+        self.assertNotIn("rows", compact)
+        self.assertEqual(decode_compact(compact["data"], compact["count"]), plain["rows"])
+        size = lambda payload: len(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        self.assertGreater(size(plain) / size(compact), 2.5)
+        with self.assertRaises(ValueError):
+            fetch_window(db, "dataset_index", 0, 10, wire_format="xml")
+
+class TestRendering(unittest.TestCase):
+    """表格元素渲染测试类"""
+
+    def test_parse_filters(self):
+        """测试筛选条件解析"""
+        self.assertEqual(parse_filters(""), {})
+        self.assertEqual(parse_filters('{"框架": ["onnx"], "类别": []}'), {"框架": ["onnx"]})
+        self.assertEqual(parse_filters('{"FLOPs": {"min": 1e9, "max": null}, "参数量": {}}'), {"FLOPs": {"min": 1e9}})
+        with self.assertRaises(ValueError):
+            parse_filters('{"框架": "onnx"}')
+
+    def test_render_grid_escapes_search(self):
+        """测试搜索词在属性中被转义"""
+        rendered = render_grid("dataset_index", 42, search_text='"><script>')
+        self.assertIn('data-total="42"', rendered)
+        self.assertIn('data-fields=""', rendered)
+        rendered = render_grid("test_cases", 1, fields=["case_id", "flops"])
+        self.assertIn('data-fields="case_id,flops"', rendered)
+        self.assertIn('data-sort="-FLOPs"', render_grid("test_cases", 1, sort=["-FLOPs"]))
+        self.assertIn(html.escape(json.dumps(["用例ID", "FLOPs"], ensure_ascii=False)), rendered)
+        self.assertNotIn("<script>", rendered)
+
+    def test_render_grid_preview(self):
+        """测试显示主键列时带缩略图预览属性"""
+        rendered = render_grid("dataset_index", 1, fields=["image_name", "image_id"])
+        self.assertIn('data-preview="/api/thumbnail"', rendered)
+        self.assertIn('data-preview-key="1"', rendered)
+        self.assertIn('data-preview-sources="bmp,yuv"', rendered)
+        self.assertNotIn("data-preview", render_grid("dataset_index", 1, fields=["image_name"]))
+        self.assertNotIn("data-preview", render_grid("test_cases", 1))
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestPagedQueries))
+    suite.addTest(loader.loadTestsFromTestCase(TestGridEndpoint))
+    suite.addTest(loader.loadTestsFromTestCase(TestCompactFormat))
+    suite.addTest(loader.loadTestsFromTestCase(TestRendering))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+HTTP缓存与压缩测试
+Response compression and conditional request tests
+"""
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastapi import FastAPI, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+import server
+from database import DatabaseManager
+from http_cache import (BROTLI_AVAILABLE, CompressionMiddleware, choose_encoding, http_date, is_not_modified,
+                        make_etag)
+from server import register_export_routes, register_grid_routes
+from tests.helpers import cancel_stats_refresh, memory_db
+
+class TestCompression(unittest.TestCase):
+    """响应压缩测试类"""
+
+    def setUp(self):
+        api = FastAPI()
+        body = json.dumps([{"路径": f"/data/bmp/img_{i:05d}.bmp"} for i in range(500)])
+
+        @api.get("/api/large")
+        def large():
+            return Response(content=body, media_type="application/json", headers={"ETag": '"abc"'})
+
+        @api.get("/api/small")
+        def small():
+            return PlainTextResponse("ok")
+
+        @api.get("/api/stream")
+        def stream():
+            return StreamingResponse((body[i:i + 100] for i in range(0, len(body), 100)), media_type="text/csv")
+
+        @api.get("/api/binary")
+        def binary():
+            return Response(content=b"\0" * 4096, media_type="application/octet-stream")
+
+        @api.get("/ui/large")
+        def ui_large():
+            return Response(content=body, media_type="application/json")
+
+        api.add_middleware(CompressionMiddleware, minimum_size=1024, paths=["/api/"])
+        self.client = TestClient(api)
+        self.body = body
+
+    def test_choose_encoding(self):
+        """测试按 Accept-Encoding 选择编码"""
+        self.assertEqual(choose_encoding("gzip, deflate"), "gzip")
+        self.assertIsNone(choose_encoding("identity"))
+        self.assertIsNone(choose_encoding("gzip;q=0"))
+        self.assertEqual(choose_encoding("br, gzip"), "br" if BROTLI_AVAILABLE else "gzip")
+        self.assertEqual(choose_encoding("br;q=0.5, gzip"), "gzip")
+
+    def test_gzip(self):
+        """测试大响应被压缩，ETag 转为弱 ETag"""
+        response = self.client.get("/api/large", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["etag"], 'W/"abc"')
+        self.assertIn("Accept-Encoding", response.headers["vary"])
+        self.assertLess(int(response.headers["content-length"]), len(self.body) / 5)
+        self.assertEqual(response.text, self.body)
+
+    @unittest.skipUnless(BROTLI_AVAILABLE, "未安装 brotli")
+    def test_brotli(self):
+        """测试客户端支持时优先使用 brotli"""
+        response = self.client.get("/api/large", headers={"Accept-Encoding": "gzip, br"})
+        self.assertEqual(response.headers["content-encoding"], "br")
+        self.assertEqual(response.text, self.body)
+
+    def test_streaming(self):
+        """测试分块响应流式压缩"""
+        response = self.client.get("/api/stream", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.text, self.body)
+
+    def test_skipped(self):
+        """测试小响应、二进制类型和范围外路径不压缩"""
+        for path in ("/api/small", "/api/binary", "/ui/large"):
+            response = self.client.get(path, headers={"Accept-Encoding": "gzip"})
+            self.assertNotIn("content-encoding", response.headers, path)
+        self.assertNotIn("content-encoding", self.client.get("/api/large", headers={"Accept-Encoding": "identity"}).headers)
+
+class TestConditionalRequests(unittest.TestCase):
+    """条件请求测试类"""
+
+    def setUp(self):
+        self.db = memory_db()
+        self.export_dir = tempfile.mkdtemp()
+        self._export_dir, server.EXPORT_DIR = server.EXPORT_DIR, self.export_dir
+        api = FastAPI()
+        register_grid_routes(api, self.db)
+        register_export_routes(api, self.db)
+        api.add_middleware(CompressionMiddleware)
+        self.client = TestClient(api)
+
+    def tearDown(self):
+        server.EXPORT_DIR = self._export_dir
+        shutil.rmtree(self.export_dir, ignore_errors=True)
+
+    def test_is_not_modified(self):
+        """测试 If-None-Match 优先于 If-Modified-Since"""
+        etag = make_etag("x")
+        self.assertTrue(is_not_modified({"if-none-match": etag.replace("W/", "")}, etag))
+        self.assertTrue(is_not_modified({"if-none-match": f'"other", {etag}'}, etag))
+        self.assertFalse(is_not_modified({"if-none-match": '"other"', "if-modified-since": http_date(2000)}, etag, 1000))
+        self.assertTrue(is_not_modified({"if-modified-since": http_date(2000)}, etag, 1000.5))
+        self.assertFalse(is_not_modified({"if-modified-since": http_date(1000)}, etag, 2000))
+        self.assertFalse(is_not_modified({"if-modified-since": "bogus"}, etag, 1000))
+
+    def test_grid_revalidation(self):
+        """测试行窗口重复请求返回 304，数据变更后返回新内容"""
+        path = "/api/grid/test_cases?offset=0&limit=10"
+        first = self.client.get(path)
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn("last-modified", first.headers)
+        etag = first.headers["etag"]
+        cached = self.client.get(path, headers={"If-None-Match": etag})
+        self.assertEqual((cached.status_code, cached.content), (304, b""))
+        self.db.execute_batches("test_cases", "UPDATE test_cases SET label = %s WHERE case_id = %s", [("changed", 1)])
+        changed = self.client.get(path, headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["etag"], etag)
+
+    def test_write_from_other_process(self):
+        """测试其他进程（共享缓存和数据库的另一个 DatabaseManager）写入后不返回过期的 304"""
+        path = "/api/grid/test_cases?offset=0&limit=10"
+        first = self.client.get(path)
+        other = DatabaseManager(self.db.backend, cache=self.db.cache)
+        other.execute_batches("test_cases", "UPDATE test_cases SET label = %s WHERE case_id = %s", [("other", 1)])
+        cancel_stats_refresh(other)
+        for headers in ({"If-Modified-Since": http_date(time.time() + 60)},
+                        {"If-None-Match": first.headers["etag"], "If-Modified-Since": http_date(time.time() + 60)}):
+            changed = self.client.get(path, headers=headers)
+            self.assertEqual(changed.status_code, 200)
+            self.assertNotEqual(changed.headers["etag"], first.headers["etag"])
+        export = "/api/export/test_cases?format=csv"
+        self.assertEqual(self.client.get(export, headers={"If-Modified-Since": http_date(time.time() + 60)}).status_code,
+                         200)
+
+    def test_export_revalidation(self):
+        """测试导出下载的 ETag 与压缩"""
+        path = "/api/export/dataset_index?format=csv&filters=" + json.dumps({"目标距离": ["10m"]})
+        first = self.client.get(path, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("attachment", first.headers["content-disposition"])
+        self.assertTrue(first.text.lstrip("﻿").startswith("图像ID"))
+        cached = self.client.get(path, headers={"If-None-Match": first.headers["etag"]})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(len(os.listdir(self.export_dir)), 1)
+        other = self.client.get(path.replace("format=csv", "format=json"), headers={"If-None-Match": first.headers["etag"]})
+        self.assertEqual(other.status_code, 200)
+
+    def test_export_errors(self):
+        """测试导出接口的参数校验"""
+        self.assertEqual(self.client.get("/api/export/unknown").status_code, 404)
+        self.assertEqual(self.client.get("/api/export/dataset_index?format=xml").status_code, 400)
+        self.assertEqual(self.client.get("/api/export/dataset_index?filters=[1]").status_code, 400)
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestCompression))
+    suite.addTest(loader.loadTestsFromTestCase(TestConditionalRequests))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+图像感知哈希测试
+Perceptual hash, multi-index hash and near-duplicate lookup tests
+"""
+import random
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from config import DEDUP_CONFIG
+from image_hash import (ImageHashError, MultiIndexHash, SimilarityIndex, hamming, image_phash, phash,
+                        read_bmp_gray, register_similarity_routes)
+from ingest import compute_image_hashes
+from tests.helpers import cancel_stats_refresh, memory_db, write_bmp
+
+def sample_image(seed, height=96, width=128):
+    """平滑的随机图像（低频图案叠加少量噪声）"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width] / max(height, width)
+    image = np.zeros((height, width))
+    for _ in range(6):
+        fx, fy, phase = rng.uniform(0, 6, 3)
+        image += np.sin(2 * np.pi * (fx * x + fy * y) + phase)
+    image = (image - image.min()) / (image.max() - image.min()) * 200 + 20
+    return np.repeat(image[:, :, None], 3, axis=2) + rng.normal(0, 2, (height, width, 3))
+
+class TestPerceptualHash(unittest.TestCase):
+    """BMP解码与感知哈希测试类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_read_bmp_formats(self):
+        """测试各种位深和行序解码为相同的灰度矩阵"""
+        gray = np.clip(sample_image(1, 7, 5)[:, :, 0], 0, 255).astype(np.uint8)
+        image = np.repeat(gray[:, :, None], 3, axis=2)
+        write_bmp(self.root / "a.bmp", image)
+        write_bmp(self.root / "b.bmp", image, bits=32, top_down=True)
+        write_bmp(self.root / "c.bmp", gray, bits=8)
+        for name in ("a.bmp", "b.bmp", "c.bmp"):
+            decoded = read_bmp_gray(str(self.root / name))
+            self.assertEqual(decoded.shape, (7, 5))
+            np.testing.assert_allclose(decoded, gray, atol=0.5)
+        (self.root / "d.bmp").write_bytes(b"not a bitmap")
+        with self.assertRaises(ImageHashError):
+            read_bmp_gray(str(self.root / "d.bmp"))
+
+    def test_hash_robustness(self):
+        """测试亮度变化和缩放只改变少数几位，不同图像距离较大"""
+        image = sample_image(2)
+        original = phash(image[:, :, 0])
+        self.assertLessEqual(hamming(original, phash(image[:, :, 0] + 20)), 2)
+        self.assertLessEqual(hamming(original, phash(image[::2, ::2, 0])), 6)
+        self.assertGreater(hamming(original, phash(sample_image(3)[:, :, 0])), 16)
+
+        write_bmp(self.root / "a.bmp", np.clip(image, 0, 255))
+        value = image_phash(str(self.root / "a.bmp"))
+        self.assertEqual(len(value), 16)
+        self.assertLessEqual(hamming(int(value, 16), original), 2)
+
+class TestMultiIndexHash(unittest.TestCase):
+    """多索引哈希测试类"""
+
+    def setUp(self):
+        rng = random.Random(0)
+        self.values = []
+        for _ in range(300):
+            base = rng.getrandbits(64)
+            self.values.append(base)
+            for _ in range(2):
+                flips = rng.sample(range(64), rng.randint(0, 10))
+                self.values.append(base ^ sum(1 << bit for bit in flips))
+        self.index = MultiIndexHash()
+        for item, value in enumerate(self.values):
+            self.index.add(value, item)
+
+    def test_search_matches_brute_force(self):
+        """测试各种半径的查询结果与逐个比较一致"""
+        for radius in (0, 3, 8, 12, 40):
+            for query in self.values[:30]:
+                expected = sorted((item, hamming(query, value)) for item, value in enumerate(self.values)
+                                  if hamming(query, value) <= radius)
+                self.assertEqual(sorted(self.index.search(query, radius)), expected)
+
+    def test_pairs_within(self):
+        """测试自连接得到的节点对与逐个查询一致"""
+        for radius in (4, 9, 40):
+            pairs = {pair for left, right in self.index.pairs_within(radius)
+                     for pair in zip(left.tolist(), right.tolist())}
+            expected = {(node, other) for node, value in enumerate(self.index.hashes)
+                        for other, _ in self.index.search_nodes(value, radius) if node < other}
+            self.assertEqual(pairs, expected)
+
+class TestSimilarityIndex(unittest.TestCase):
+    """相似图像索引与接口测试类"""
+
+    def setUp(self):
+        self.db = memory_db()
+        self.set_hashes({1: 0, 2: 0b111, 3: 0xFF00, 4: (1 << 64) - 1})
+        self.index = SimilarityIndex(self.db)
+
+    def set_hashes(self, hashes, db=None):
+        (db or self.db).execute_batches("dataset_index", "UPDATE dataset_index SET phash = %s WHERE image_id = %s",
+                                [(format(value, "016x"), image_id) for image_id, value in hashes.items()])
+
+    def test_similar(self):
+        """测试按距离查找相似图像"""
+        self.assertEqual(self.index.similar(1, 3), [(2, 3)])
+        self.assertEqual(self.index.similar(1, 8), [(2, 3), (3, 8)])
+        self.assertEqual(self.index.similar(1, 64, limit=1), [(2, 3)])
+        with self.assertRaises(KeyError):
+            self.index.similar(5)
+
+    def test_rebuild_after_write(self):
+        """测试数据变更后重建索引"""
+        self.assertEqual(self.index.duplicate_groups(3), [[1, 2]])
+        self.set_hashes({5: 0b1})
+        self.assertEqual(self.index.duplicate_groups(3), [[1, 2, 5]])
+        self.assertEqual(self.index.duplicate_groups(8), [[1, 2, 3, 5]])
+
+    def test_rebuild_after_external_write(self):
+        """测试其他进程的写入（不共享缓存版本）在检查间隔到期后被发现"""
+        self.assertEqual(self.index.duplicate_groups(3), [[1, 2]])
+        other = memory_db(self.db.backend)
+        self.set_hashes({5: 0b1}, other)
+        cancel_stats_refresh(other)
+        self.assertEqual(self.index.duplicate_groups(3), [[1, 2]])
+        with patch.dict(DEDUP_CONFIG, {"index_check_interval": 0}):
+            self.assertEqual(self.index.duplicate_groups(3), [[1, 2, 5]])
+
+    def test_query_error_not_cached(self):
+        """测试读取哈希失败时抛出异常且不保留空索引"""
+        with patch.object(self.db.backend, "fetch_all", side_effect=sqlite3.OperationalError("database is locked")):
+            with self.assertRaises(self.db.backend.error_types):
+                self.index.similar(1)
+        self.assertEqual(self.index.similar(1, 3), [(2, 3)])
+
+    def test_similar_route(self):
+        """测试相似图像接口"""
+        api = FastAPI()
+        register_similarity_routes(api, self.db)
+        client = TestClient(api)
+        payload = client.get("/api/similar/1", params={"max_distance": 8, "fields": "image_name"}).json()
+        self.assertEqual(payload["phash"], "0000000000000000")
+        self.assertEqual([(row["image_id"], row["distance"]) for row in payload["rows"]], [(2, 3), (3, 8)])
+        self.assertEqual(payload["rows"][0]["image_name"], "wildlife_012")
+        self.assertEqual(client.get("/api/similar/5").status_code, 404)
+        self.assertEqual(client.get("/api/similar/1", params={"fields": "nope"}).status_code, 400)
+        self.assertEqual(client.get("/api/similar/1", params={"max_distance": 65}).status_code, 422)
+
+    def test_compute_image_hashes(self):
+        """测试为已有图像计算并写回感知哈希"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "a.bmp"
+            write_bmp(path, np.clip(sample_image(4), 0, 255))
+            self.db.execute_batches("dataset_index", "UPDATE dataset_index SET bmp_path = %s WHERE image_id = %s",
+                                    [(str(path), 1), (str(path), 2)])
+            self.db.execute_batches("dataset_index", "UPDATE dataset_index SET phash = NULL WHERE image_id = %s",
+                                    [(2,)])
+            stats = compute_image_hashes(self.db, workers=1)
+            self.assertEqual((stats["hashed"], stats["failed"]), (1, 1))
+            self.assertEqual(self.index.hash_of(2), int(image_phash(str(path)), 16))
+            self.assertEqual(self.index.hash_of(1), 0)
+            compute_image_hashes(self.db, all_images=True, workers=1)
+            self.assertEqual(self.index.hash_of(1), self.index.hash_of(2))
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestPerceptualHash))
+    suite.addTest(loader.loadTestsFromTestCase(TestMultiIndexHash))
+    suite.addTest(loader.loadTestsFromTestCase(TestSimilarityIndex))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
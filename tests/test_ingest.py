@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+数据导入测试
+Bulk ingestion tests (temporary repositories, embedded SQLite)
+"""
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backends import SQLiteBackend
+from config import INGEST_CONFIG
+from database import DatabaseManager
+from ingest import (UNKNOWN_HASH, Manifest, ingest_cases, ingest_dataset, normalize_set_value, read_bmp_size,
+                    scan_image_repository)
+from tests.helpers import write_bmp_header
+
+class TestParsing(unittest.TestCase):
+    """文件解析测试类"""
+
+    def test_read_bmp_size(self):
+        """测试读取BMP文件头尺寸"""
+        with tempfile.TemporaryDirectory() as tmp:
+            write_bmp_header(Path(tmp) / "a.bmp", 1920, 1080)
+            write_bmp_header(Path(tmp) / "b.bmp", 640, -480)
+            write_bmp_header(Path(tmp) / "c.bmp", 320, 240, core=True)
+            (Path(tmp) / "d.bmp").write_bytes(b"not a bitmap")
+            self.assertEqual(read_bmp_size(str(Path(tmp) / "a.bmp")), (1920, 1080))
+            self.assertEqual(read_bmp_size(str(Path(tmp) / "b.bmp")), (640, 480))
+            self.assertEqual(read_bmp_size(str(Path(tmp) / "c.bmp")), (320, 240))
+            with self.assertRaises(ValueError):
+                read_bmp_size(str(Path(tmp) / "d.bmp"))
+
+    def test_normalize_set_value(self):
+        """测试SET取值规范为定义顺序"""
+        options = ["行人", "车辆", "建筑"]
+        self.assertEqual(normalize_set_value(["车辆", "行人"], options), "行人,车辆")
+        self.assertEqual(normalize_set_value("建筑, 未知", options), "建筑")
+        self.assertEqual(normalize_set_value(None, options), "")
+
+class TestIngestDataset(unittest.TestCase):
+    """dataset_index 导入测试类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name) / "harbor_dataset"
+        write_bmp_header(self.root / "bmp" / "dock_001.bmp", 1280, 720)
+        (self.root / "yuv").mkdir(parents=True)
+        (self.root / "yuv" / "dock_001.yuv").write_bytes(b"\0" * 16)
+        (self.root / "json").mkdir(parents=True)
+        (self.root / "json" / "dock_001.json").write_text(json.dumps({
+            "positive_target": ["车辆", "行人"], "负向目标": "水面", "target_distance": "20m,10m",
+            "source": "harbor_camera"
+        }, ensure_ascii=False), encoding="utf-8")
+        (self.root / "yuv" / "dock_002.yuv").write_bytes(b"\0" * 16)
+        (self.root / "json" / "dock_002.json").write_text(json.dumps({"width": 640, "height": 480}))
+        (self.root / "yuv" / "dock_003.yuv").write_bytes(b"\0" * 16)
+        self.db = DatabaseManager(SQLiteBackend(":memory:"))
+        self.manifest = Manifest(str(Path(self.tmpdir.name) / "manifest.db"))
+
+    def tearDown(self):
+        self.manifest.close()
+        self.tmpdir.cleanup()
+
+    def ingest(self, **kwargs):
+        return ingest_dataset([str(self.root)], db=self.db, manifest=self.manifest, workers=1, **kwargs)
+
+    def test_scan_pairs_by_stem(self):
+        """测试按文件名配对"""
+        records = list(scan_image_repository(str(self.root)))
+        self.assertEqual([r["image_name"] for r in records], ["dock_001", "dock_002", "dock_003"])
+        self.assertEqual(records[0]["image_repository"], "harbor_dataset")
+        self.assertTrue(records[0]["bmp_path"].endswith("dock_001.bmp"))
+        self.assertTrue(records[0]["yuv_path"].endswith("dock_001.yuv"))
+        self.assertNotIn("bmp_path", records[1])
+
+    def test_ingest_dataset(self):
+        """测试批量写入并跳过无法解析的图像"""
+        stats = self.ingest(batch_size=1)
+        self.assertEqual((stats["scanned"], stats["upserted"], stats["skipped"]), (3, 2, 1))
+
+        df = self.db.filter_data("dataset_index", {"仓库": ["harbor_dataset"]})
+        first = df[df["图像名称"] == "dock_001"].iloc[0]
+        self.assertEqual((first["宽度"], first["高度"]), (1280, 720))
+        self.assertEqual(first["正向目标"], "行人,车辆")
+        self.assertEqual(first["负向目标"], "水面")
+        self.assertEqual(first["目标距离"], "10m,20m")
+        self.assertEqual(first["来源"], "harbor_camera")
+        self.assertEqual(first["文件状态"], "正常")
+        second = df[df["图像名称"] == "dock_002"].iloc[0]
+        self.assertEqual((second["宽度"], second["高度"]), (640, 480))
+        # 导入只读取BMP文件头，感知哈希留待 ingest.py phash 计算
+        hashes = self.db.execute_query("SELECT phash FROM dataset_index WHERE image_repository = %s",
+                                       ["harbor_dataset"])
+        self.assertEqual([row["phash"] for row in hashes], [None, None])
+
+        # 全量重新导入按唯一键更新，不产生重复行
+        stats = self.ingest()
+        self.assertEqual(stats["upserted"], 2)
+        self.assertEqual(self.db.get_table_stats("dataset_index")[0], 7)
+
+    def test_incremental(self):
+        """测试增量导入只处理变化的文件并标记删除"""
+        self.ingest()
+        # 全量导入不读取文件内容，清单中的哈希待文件变化后再计算
+        entries = self.manifest.entries_under("dataset_index", str(self.root))
+        self.assertEqual({digest for files in entries.values() for _, _, digest in files.values()}, {UNKNOWN_HASH})
+        stats = self.ingest(incremental=True)
+        self.assertEqual((stats["unchanged"], stats["upserted"]), (2, 0))
+
+        # mtime 变化：此前没有内容哈希，计算哈希并写库
+        bmp = self.root / "bmp" / "dock_001.bmp"
+        os.utime(bmp, ns=(1, 1))
+        stats = self.ingest(incremental=True)
+        self.assertEqual((stats["unchanged"], stats["upserted"]), (1, 1))
+        # 再次只修改mtime不改变内容：与记录的哈希相同，不写库
+        os.utime(bmp, ns=(2, 2))
+        stats = self.ingest(incremental=True)
+        self.assertEqual((stats["unchanged"], stats["upserted"]), (2, 0))
+
+        write_bmp_header(bmp, 1920, 1080)
+        (self.root / "yuv" / "dock_002.yuv").unlink()
+        (self.root / "json" / "dock_002.json").unlink()
+        stats = self.ingest(incremental=True)
+        self.assertEqual((stats["upserted"], stats["deleted"]), (1, 1))
+
+        df = self.db.filter_data("dataset_index", {"仓库": ["harbor_dataset"]})
+        rows = df.set_index("图像名称")
+        self.assertEqual(rows.loc["dock_001", "宽度"], 1920)
+        self.assertEqual(rows.loc["dock_002", "文件状态"], "已删除")
+        self.assertEqual(self.ingest(incremental=True)["deleted"], 0)
+
+class TestIngestCases(unittest.TestCase):
+    """test_cases 导入测试类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name) / "zoo"
+        (self.root / "resnet").mkdir(parents=True)
+        (self.root / "resnet" / "resnet18.onnx").write_bytes(b"\0" * 2 * 1024 * 1024)
+        (self.root / "resnet" / "config.json").write_text(json.dumps({
+            "category": "模型", "label": ["tiling", "fusion"], "sources": "torchvision"
+        }), encoding="utf-8")
+        (self.root / "blocks").mkdir()
+        (self.root / "blocks" / "fuse.prototxt").write_text(
+            'input: "data" input_dim: 1 input_dim: 8 input_dim: 4 input_dim: 4\n'
+            'layer { name: "fc" type: "InnerProduct" bottom: "data" top: "fc" inner_product_param { num_output: 2 } }'
+        )
+        (self.root / "blocks" / "fuse.caffemodel").write_bytes(b"\0" * 1024 * 1024)
+        (self.root / "blocks" / "fuse.json").write_text(json.dumps({"类别": "block块"}, ensure_ascii=False),
+                                                       encoding="utf-8")
+        self.db = DatabaseManager(SQLiteBackend(":memory:"))
+        self.manifest = Manifest(str(Path(self.tmpdir.name) / "manifest.db"))
+        self.cache_path = INGEST_CONFIG["metadata_cache_path"]
+        INGEST_CONFIG["metadata_cache_path"] = str(Path(self.tmpdir.name) / "metadata.db")
+
+    def tearDown(self):
+        INGEST_CONFIG["metadata_cache_path"] = self.cache_path
+        self.manifest.close()
+        self.tmpdir.cleanup()
+
+    def test_ingest_cases(self):
+        """测试模型仓库导入与增量更新"""
+        stats = ingest_cases([str(self.root)], db=self.db, manifest=self.manifest, workers=1)
+        self.assertEqual(stats["upserted"], 2)
+        rows = self.db.filter_data("test_cases", {"仓库": ["zoo"]}).set_index("用例名称")
+        self.assertEqual(rows.loc["resnet18", "框架"], "onnx")
+        self.assertEqual(rows.loc["resnet18", "标签"], "fusion,tiling")
+        self.assertEqual(rows.loc["resnet18", "模型大小(MB)"], 2.0)
+        self.assertEqual(rows.loc["fuse", "类别"], "block块")
+        self.assertEqual(rows.loc["fuse", "模型大小(MB)"], 1.0)
+        self.assertEqual(rows.loc["fuse", "输入形状"], "1x8x4x4")
+        self.assertEqual((rows.loc["fuse", "参数量"], rows.loc["fuse", "FLOPs"]), (258, 256))
+
+        (self.root / "blocks" / "fuse.caffemodel").write_bytes(b"\0" * 3 * 1024 * 1024)
+        stats = ingest_cases([str(self.root)], db=self.db, manifest=self.manifest, workers=1, incremental=True)
+        self.assertEqual((stats["upserted"], stats["unchanged"]), (1, 1))
+        rows = self.db.filter_data("test_cases", {"仓库": ["zoo"]}).set_index("用例名称")
+        self.assertEqual(rows.loc["fuse", "模型大小(MB)"], 3.0)
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestParsing))
+    suite.addTest(loader.loadTestsFromTestCase(TestIngestDataset))
+    suite.addTest(loader.loadTestsFromTestCase(TestIngestCases))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
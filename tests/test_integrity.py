@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+文件完整性扫描测试
+Referenced-file integrity scanner tests
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from ingest import Manifest, file_hash
+from integrity import FILE_CORRUPT, FILE_MISSING, FILE_OK, Checkpoint, check_file, scan_integrity
+from tests.helpers import memory_db
+
+class TestCheckFile(unittest.TestCase):
+    """单个文件检查测试类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_stat_checks(self):
+        """测试缺失、空文件和目录的判定"""
+        path = self.root / "a.bmp"
+        path.write_bytes(b"BM" + b"\0" * 62)
+        self.assertEqual(check_file(str(path))[0], FILE_OK)
+        self.assertEqual(check_file(str(self.root / "missing.bmp"))[0], FILE_MISSING)
+        self.assertEqual(check_file(str(path / "child"))[0], FILE_MISSING)
+        (self.root / "empty.json").write_bytes(b"")
+        self.assertEqual(check_file(str(self.root / "empty.json"))[0], FILE_CORRUPT)
+        self.assertEqual(check_file(str(self.root))[0], FILE_CORRUPT)
+
+    def test_checksum(self):
+        """测试 mtime 和大小未变但内容不同的文件判定为损坏"""
+        path = self.root / "a.yuv"
+        path.write_bytes(b"\x10" * 96)
+        st = os.stat(path)
+        recorded = (st.st_mtime_ns, st.st_size, file_hash(str(path)))
+        self.assertEqual(check_file(str(path), recorded, checksum=True)[0], FILE_OK)
+        path.write_bytes(b"\x11" * 96)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        self.assertEqual(check_file(str(path), recorded)[0], FILE_OK)
+        self.assertEqual(check_file(str(path), recorded, checksum=True)[0], FILE_CORRUPT)
+        # 文件被正常修改（mtime 变化）时不视为损坏
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        self.assertEqual(check_file(str(path), recorded, checksum=True)[0], FILE_OK)
+
+class TestScanIntegrity(unittest.TestCase):
+    """表扫描、状态写回与断点续扫测试类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name)
+        self.db = memory_db()
+        self.checkpoint = Checkpoint(str(self.root / "checkpoint.json"))
+        rows = []
+        for image_id in range(1, 6):
+            paths = []
+            for extension in ("bmp", "yuv", "json"):
+                path = self.root / f"{image_id}.{extension}"
+                path.write_bytes(b"data")
+                paths.append(str(path))
+            rows.append((*paths, image_id))
+        self.db.execute_batches("dataset_index", "UPDATE dataset_index SET bmp_path = %s, yuv_path = %s, "
+                                "json_path = %s WHERE image_id = %s", rows)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def statuses(self):
+        rows = self.db.execute_query("SELECT image_id, file_status FROM dataset_index ORDER BY image_id")
+        return {row["image_id"]: row["file_status"] for row in rows}
+
+    def scan(self, **kwargs):
+        return scan_integrity("dataset_index", self.db, checkpoint=self.checkpoint, workers=4, **kwargs)
+
+    def test_scan_records_status(self):
+        """测试问题行写入缺失/损坏状态，修复后恢复正常，已删除的行不检查"""
+        (self.root / "2.bmp").unlink()
+        (self.root / "3.json").write_bytes(b"")
+        (self.root / "4.yuv").unlink()
+        (self.root / "4.json").write_bytes(b"")
+        self.db.execute_batches("dataset_index", "UPDATE dataset_index SET file_status = %s WHERE image_id = %s",
+                                [("已删除", 5)])
+        (self.root / "5.bmp").unlink()
+
+        stats = self.scan(page_size=2)
+        self.assertEqual((stats["rows"], stats["missing"], stats["corrupt"], stats["updated"]), (4, 2, 2, 3))
+        self.assertEqual(self.statuses(), {1: "正常", 2: "文件缺失", 3: "文件损坏", 4: "文件缺失", 5: "已删除"})
+        self.assertEqual({(item["row_id"], item["column"]) for item in stats["problems"]},
+                         {(2, "bmp_path"), (3, "json_path"), (4, "yuv_path"), (4, "json_path")})
+        filtered = self.db.filter_data("dataset_index", {"文件状态": ["文件缺失", "文件损坏"]}, ["image_id"])
+        self.assertEqual(sorted(filtered["图像ID"]), [2, 3, 4])
+
+        (self.root / "2.bmp").write_bytes(b"data")
+        stats = self.scan()
+        self.assertEqual(stats["updated"], 1)
+        self.assertEqual(self.statuses()[2], "正常")
+
+    def test_resume(self):
+        """测试从保存的进度继续扫描，选项不同或 restart 时从头开始"""
+        (self.root / "1.bmp").unlink()
+        (self.root / "4.bmp").unlink()
+        self.checkpoint.save("dataset_index", {
+            "options": {"checksum": False, "repository": None}, "last_id": 3,
+            "stats": {"rows": 3, "files": 9, "missing": 0, "corrupt": 0, "updated": 0, "problems": []}
+        })
+        stats = self.scan()
+        self.assertTrue(stats["resumed"])
+        self.assertEqual((stats["rows"], stats["missing"]), (5, 1))
+        self.assertEqual(self.statuses()[1], "正常")
+        self.assertEqual(self.statuses()[4], "文件缺失")
+        self.assertIsNone(self.checkpoint.load("dataset_index", {"checksum": False, "repository": None}))
+
+        self.checkpoint.save("dataset_index", {
+            "options": {"checksum": False, "repository": None}, "last_id": 3,
+            "stats": {"rows": 3, "files": 9, "missing": 0, "corrupt": 0, "updated": 0, "problems": []}
+        })
+        stats = self.scan(restart=True)
+        self.assertFalse(stats["resumed"])
+        self.assertEqual((stats["rows"], stats["missing"]), (5, 2))
+        stats = self.scan(repository="urban_dataset")
+        self.assertEqual((stats["rows"], stats["missing"]), (2, 1))
+
+    def test_checksum_against_manifest(self):
+        """测试校验和模式与导入清单比对"""
+        path = self.root / "3.yuv"
+        st = os.stat(path)
+        manifest = Manifest(str(self.root / "manifest.db"))
+        try:
+            manifest.replace("dataset_index", {'["x", "3"]': {str(path): (st.st_mtime_ns, st.st_size, "0" * 32)}})
+            self.assertEqual(self.scan()["corrupt"], 0)
+            stats = self.scan(checksum=True, manifest=manifest, read_workers=2)
+            self.assertEqual(stats["corrupt"], 1)
+            self.assertEqual(self.statuses()[3], "文件损坏")
+        finally:
+            manifest.close()
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestCheckFile))
+    suite.addTest(loader.loadTestsFromTestCase(TestScanIntegrity))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+模型元数据提取测试
+Model metadata extraction tests (Caffe prototxt, IR text, result cache)
+"""
+import sys
+import tempfile
+from pathlib import Path
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backends import SQLiteBackend
+from config import INGEST_CONFIG
+from database import DatabaseManager
+from ingest import Manifest, extract_case_metadata
+from model_metadata import ModelMetadataError, extract_metadata, parse_prototxt
+
+LENET_PROTOTXT = """
+name: "LeNet"  # 经典LeNet
+input: "data"
+input_shape { dim: 1 dim: 1 dim: 28 dim: 28 }
+layer { name: "conv1" type: "Convolution" bottom: "data" top: "conv1"
+  convolution_param { num_output: 20 kernel_size: 5 stride: 1 } }
+layer { name: "pool1" type: "Pooling" bottom: "conv1" top: "pool1"
+  pooling_param { pool: MAX kernel_size: 2 stride: 2 } }
+layer { name: "conv2" type: "Convolution" bottom: "pool1" top: "conv2"
+  convolution_param { num_output: 50 kernel_size: 5 } }
+layer { name: "pool2" type: "Pooling" bottom: "conv2" top: "pool2"
+  pooling_param { pool: MAX kernel_size: 2 stride: 2 } }
+layer { name: "ip1" type: "InnerProduct" bottom: "pool2" top: "ip1" inner_product_param { num_output: 500 } }
+layer { name: "relu1" type: "ReLU" bottom: "ip1" top: "ip1" }
+layer { name: "ip2" type: "InnerProduct" bottom: "ip1" top: "ip2" inner_product_param { num_output: 10 } }
+layer { name: "prob" type: "Softmax" bottom: "ip2" top: "prob" }
+"""
+
+LENET_IR = """
+# 与 LENET_PROTOTXT 相同的网络
+input data 1x1x28x28
+conv1 = Convolution(data) num_output=20 kernel_size=5
+pool1 = Pooling(conv1) pool=MAX kernel_size=2 stride=2
+conv2 = Convolution(pool1) num_output=50 kernel_size=5
+pool2 = Pooling(conv2) pool=MAX kernel_size=2 stride=2
+ip1 = InnerProduct(pool2) num_output=500
+ip1 = ReLU(ip1)
+ip2 = InnerProduct(ip1) num_output=10
+prob = Softmax(ip2)
+"""
+
+# LeNet: 参数量 431080，乘加 2308230
+LENET_PARAMS = 431080
+LENET_MACS = 2308230
+
+class TestExtractors(unittest.TestCase):
+    """提取器测试类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, text):
+        path = self.root / name
+        path.write_text(text, encoding="utf-8")
+        return str(path)
+
+    def test_parse_prototxt(self):
+        """测试文本格式解析（重复字段、嵌套消息、注释）"""
+        net = parse_prototxt(LENET_PROTOTXT)
+        self.assertEqual(net["name"], ["LeNet"])
+        self.assertEqual(net["input_shape"][0]["dim"], [1, 1, 28, 28])
+        self.assertEqual(len(net["layer"]), 8)
+        self.assertEqual(net["layer"][1]["pooling_param"][0]["pool"], ["MAX"])
+        with self.assertRaises(ModelMetadataError):
+            parse_prototxt("layer { name: 'x'")
+
+    def test_caffe(self):
+        """测试Caffe参数量与FLOPs"""
+        result = extract_metadata(self.write("lenet.prototxt", LENET_PROTOTXT), "caffe")
+        self.assertEqual(result["input_shape"], "1x1x28x28")
+        self.assertEqual(result["params"], LENET_PARAMS)
+        self.assertEqual(result["flops"], LENET_MACS)
+
+    def test_ir(self):
+        """测试IR文本与Caffe结果一致"""
+        result = extract_metadata(self.write("lenet.ir", LENET_IR), "ir")
+        self.assertEqual((result["params"], result["flops"]), (LENET_PARAMS, LENET_MACS))
+        with self.assertRaises(ModelMetadataError):
+            extract_metadata(self.write("bad.ir", "conv1 = Convolution(data) num_output=8"), "ir")
+
+    @unittest.skipUnless(__import__("importlib").util.find_spec("onnx"), "未安装onnx")
+    def test_onnx(self):
+        """测试ONNX初始化张量与Conv/Gemm的FLOPs"""
+        import numpy as np
+        from onnx import TensorProto, helper, numpy_helper, save
+        graph = helper.make_graph(
+            [helper.make_node("Conv", ["x", "w"], ["y"], kernel_shape=[3, 3], pads=[1, 1, 1, 1]),
+             helper.make_node("Flatten", ["y"], ["f"]),
+             helper.make_node("Gemm", ["f", "fc"], ["out"], transB=1)],
+            "net",
+            [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1, 3, 8, 8])],
+            [helper.make_tensor_value_info("out", TensorProto.FLOAT, [1, 10])],
+            [numpy_helper.from_array(np.zeros((4, 3, 3, 3), np.float32), "w"),
+             numpy_helper.from_array(np.zeros((10, 256), np.float32), "fc")]
+        )
+        path = str(self.root / "net.onnx")
+        save(helper.make_model(graph), path)
+        result = extract_metadata(path, "onnx")
+        self.assertEqual(result["input_shape"], "1x3x8x8")
+        self.assertEqual(result["params"], 4 * 27 + 2560)
+        self.assertEqual(result["flops"], 256 * 27 + 10 * 256)
+
+class TestExtractCaseMetadata(unittest.TestCase):
+    """已有测试用例的元数据提取测试类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name)
+        self.cache_path = INGEST_CONFIG["metadata_cache_path"]
+        INGEST_CONFIG["metadata_cache_path"] = str(self.root / "metadata.db")
+        self.backend = SQLiteBackend(":memory:")
+        self.db = DatabaseManager(self.backend)
+        self.manifest = Manifest(str(self.root / "manifest.db"))
+        (self.root / "lenet.prototxt").write_text(LENET_PROTOTXT, encoding="utf-8")
+        (self.root / "lenet.caffemodel").write_bytes(b"\0" * 1024 * 1024)
+        connection = self.backend.connect()
+        connection.execute(
+            "INSERT INTO test_cases (case_name, case_repository, case_path, category, framework) "
+            "VALUES ('LeNet', 'classic', ?, '模型', 'caffe')", (str(self.root / "lenet.prototxt"),)
+        )
+        connection.commit()
+        connection.close()
+
+    def tearDown(self):
+        INGEST_CONFIG["metadata_cache_path"] = self.cache_path
+        self.manifest.close()
+        self.tmpdir.cleanup()
+
+    def test_extract_and_cache(self):
+        """测试只处理缺失字段的用例，重复运行命中缓存"""
+        stats = extract_case_metadata(self.db, workers=1, manifest=self.manifest)
+        self.assertEqual((stats["cases"], stats["extracted"]), (1, 1))
+        row = self.db.filter_data("test_cases", {"仓库": ["classic"]}).iloc[0]
+        self.assertEqual((row["参数量"], row["FLOPs"]), (LENET_PARAMS, LENET_MACS))
+        self.assertEqual(row["输入形状"], "1x1x28x28")
+        self.assertEqual(row["模型大小(MB)"], 1.0)
+
+        self.assertEqual(extract_case_metadata(self.db, workers=1, manifest=self.manifest)["cases"], 0)
+        stats = extract_case_metadata(self.db, all_cases=True, repository="classic", workers=1,
+                                      manifest=self.manifest)
+        self.assertEqual((stats["cases"], stats["cached"], stats["extracted"]), (1, 1, 0))
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestExtractors))
+    suite.addTest(loader.loadTestsFromTestCase(TestExtractCaseMetadata))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
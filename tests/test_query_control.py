@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+查询超时与取消测试
+Statement timeout and cancellation tests
+"""
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastapi import FastAPI
+
+from backends import with_execution_time
+from benchmarks.synthetic_data import generate_rows
+from config import QUERY_TIMEOUT_CONFIG
+from query_control import (CancelToken, QueryCancelled, QueryTimeout, SessionQueries, cancel_scope, cancellable,
+                           register_query_control)
+from tests.helpers import memory_db
+
+# 不会自行结束的查询，只能被超时或取消中断
+ENDLESS = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT COUNT(*) AS n FROM c"
+
+class TestStatementTimeout(unittest.TestCase):
+    """语句超时测试类"""
+
+    def setUp(self):
+        self.db = memory_db()
+        self.original = dict(QUERY_TIMEOUT_CONFIG)
+
+    def tearDown(self):
+        QUERY_TIMEOUT_CONFIG.update(self.original)
+
+    def test_mysql_hint(self):
+        """测试 MAX_EXECUTION_TIME 提示只加在 SELECT 语句上"""
+        self.assertEqual(with_execution_time("SELECT a FROM t", 1.5),
+                         "SELECT /*+ MAX_EXECUTION_TIME(1500) */ a FROM t")
+        self.assertEqual(with_execution_time("\n  select COUNT(*) FROM t", 20),
+                         "\n  select /*+ MAX_EXECUTION_TIME(20000) */ COUNT(*) FROM t")
+        self.assertEqual(with_execution_time("UPDATE t SET a = 1", 5), "UPDATE t SET a = 1")
+
+    def test_timeout_per_kind(self):
+        """测试按查询类别的超时，默认类别不限制"""
+        QUERY_TIMEOUT_CONFIG.update({"search": 0.2, "default": 0})
+        started = time.monotonic()
+        with self.assertRaises(QueryTimeout) as context:
+            self.db._run_query(ENDLESS, kind="search")
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(context.exception.timeout, 0.2)
+        self.assertEqual(self.db._run_query("SELECT 1 AS n", kind="search"), [{"n": 1}])
+
+    def test_search_timeout_not_cached(self):
+        """测试超时的搜索抛出 QueryTimeout 且不写入缓存"""
+        self.db.upsert_rows("test_cases", generate_rows("test_cases", 5000))
+        QUERY_TIMEOUT_CONFIG["search"] = 1e-6
+        with self.assertRaises(QueryTimeout):
+            self.db.search_data("test_cases", "resnet")
+        QUERY_TIMEOUT_CONFIG["search"] = 0
+        self.assertGreater(len(self.db.search_data("test_cases", "resnet")), 0)
+
+class TestCancellation(unittest.TestCase):
+    """查询取消测试类"""
+
+    def setUp(self):
+        self.db = memory_db()
+
+    def run_endless(self, token, outcome):
+        """在 token 的作用域中执行不会结束的查询，记录抛出的异常"""
+        with cancel_scope(token):
+            try:
+                self.db._run_query(ENDLESS)
+            except Exception as e:
+                outcome.append(e)
+
+    def wait_running(self, token):
+        deadline = time.monotonic() + 5
+        while not token._running and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(token._running)
+
+    def test_cancel_running_query(self):
+        """测试取消终止正在执行的查询，之后的查询直接抛出 QueryCancelled"""
+        token, outcome = CancelToken(), []
+        thread = threading.Thread(target=self.run_endless, args=(token, outcome))
+        thread.start()
+        self.wait_running(token)
+        self.assertEqual(token.cancel(), 1)
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertIsInstance(outcome[0], QueryCancelled)
+        with cancel_scope(token):
+            with self.assertRaises(QueryCancelled):
+                self.db._run_query("SELECT 1")
+        # 不在作用域内的查询不受影响
+        self.assertEqual(self.db._run_query("SELECT 1 AS n"), [{"n": 1}])
+
+    def test_session_queries(self):
+        """测试按会话取消全部请求"""
+        sessions = SessionQueries()
+        first, second, other = CancelToken(), CancelToken(), CancelToken()
+        sessions.add("s1", first)
+        sessions.add("s1", second)
+        sessions.add("s2", other)
+        sessions.discard("s1", second)
+        sessions.cancel("s1")
+        self.assertEqual((first.cancelled, second.cancelled, other.cancelled), (True, False, False))
+
+    def test_cancellable_handler(self):
+        """测试事件任务被取消时终止处理函数中的查询"""
+        outcome = []
+
+        def handler():
+            try:
+                return self.db._run_query(ENDLESS)
+            except Exception as e:
+                outcome.append(e)
+                raise
+
+        async def main():
+            task = asyncio.ensure_future(cancellable(handler)())
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            deadline = time.monotonic() + 5
+            while not outcome and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+
+        asyncio.run(main())
+        self.assertIsInstance(outcome[0], QueryCancelled)
+
+    def test_disconnect_middleware(self):
+        """测试客户端断开时终止接口正在执行的查询，超时返回504"""
+        api = FastAPI()
+        outcome = []
+
+        @api.get("/api/grid/endless")
+        def endless():
+            try:
+                return self.db._run_query(ENDLESS)
+            except Exception as e:
+                outcome.append(e)
+                raise
+
+        @api.get("/api/grid/timeout")
+        def timeout():
+            raise QueryTimeout(20)
+
+        register_query_control(api)
+
+        async def call(path, disconnect_after):
+            sent = []
+            requested = False
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await asyncio.sleep(disconnect_after)
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {"type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+                     "headers": [], "scheme": "http", "server": ("testserver", 80), "client": ("127.0.0.1", 1),
+                     "root_path": "", "http_version": "1.1"}
+            await asyncio.wait_for(api(scope, receive, send), 10)
+            return sent[0]["status"]
+
+        self.assertEqual(asyncio.run(call("/api/grid/endless", 0.2)), 499)
+        self.assertIsInstance(outcome[0], QueryCancelled)
+        self.assertEqual(asyncio.run(call("/api/grid/timeout", 10)), 504)
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestStatementTimeout))
+    suite.addTest(loader.loadTestsFromTestCase(TestCancellation))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+限流与过载保护测试
+Per-client rate limiting and load shedding tests
+"""
+import sys
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+import unittest
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from config import SECURITY_CONFIG
+from rate_limit import (LoadShedder, Overloaded, RateLimiter, TokenBucket, acquire_for_request, classify, client_key,
+                        register_rate_limiting)
+from rest_api import register_query_routes
+from tests.helpers import memory_db
+
+CONFIG = {"requests_per_minute": 60, "burst": 3, "exports_per_minute": 6, "export_burst": 1, "max_clients": 2}
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestRateLimiter(unittest.TestCase):
+    """令牌桶限流测试类"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(CONFIG, self.clock)
+
+    def test_token_bucket(self):
+        """测试突发容量用完后按速率补充"""
+        bucket = TokenBucket(1.0, 2, 0.0)
+        self.assertEqual((bucket.take(0.0), bucket.take(0.0)), (0.0, 0.0))
+        self.assertAlmostEqual(bucket.take(0.0), 1.0)
+        self.assertAlmostEqual(bucket.take(0.5), 0.5)
+        self.assertEqual(bucket.take(1.0), 0.0)
+        self.assertEqual(TokenBucket(0.0, 0, 0.0).take(5.0), 60.0)
+
+    def test_separate_budgets(self):
+        """测试查询和导出预算互相独立，不同客户端互不影响"""
+        for _ in range(3):
+            self.assertEqual(self.limiter.acquire("a", "query"), 0.0)
+        self.assertAlmostEqual(self.limiter.acquire("a", "query"), 1.0)
+        self.assertEqual(self.limiter.acquire("a", "export"), 0.0)
+        self.assertAlmostEqual(self.limiter.acquire("a", "export"), 10.0)
+        self.assertEqual(self.limiter.acquire("b", "query"), 0.0)
+        self.clock.now = 1.0
+        self.assertEqual(self.limiter.acquire("a", "query"), 0.0)
+        self.assertEqual(self.limiter.stats()["rejected"], 2)
+
+    def test_max_clients(self):
+        """测试超过上限时丢弃最久未访问的客户端"""
+        self.limiter.acquire("a", "query")
+        self.limiter.acquire("b", "query")
+        self.limiter.acquire("c", "query")
+        self.assertEqual(self.limiter.stats()["clients"], 2)
+        self.assertNotIn(("a", "query"), self.limiter._buckets)
+
+    def test_classify_and_client_key(self):
+        """测试请求类别和客户端标识"""
+        self.assertEqual(classify("/api/export/test_cases"), "export")
+        self.assertEqual(classify("/api/grid/test_cases"), "query")
+        self.assertEqual(classify("/api/test_cases"), "query")
+        self.assertEqual(classify("/gradio_api/queue/join"), "query")
+        self.assertIsNone(classify("/api/thumbnail/dataset_index/1"))
+        self.assertIsNone(classify("/static/grid.js"))
+        scope = {"headers": [(b"x-real-ip", b"10.0.0.7")], "client": ("127.0.0.1", 5000)}
+        self.assertEqual(client_key(scope, "X-Real-IP"), "10.0.0.7")
+        self.assertEqual(client_key({"headers": [], "client": ("127.0.0.1", 5000)}, "X-Real-IP"), "127.0.0.1")
+
+    def test_untrusted_peer_header_ignored(self):
+        """测试不可信对端伪造的 X-Real-IP 被忽略，只按连接地址区分"""
+        spoofed = [{"headers": [(b"x-real-ip", f"10.0.0.{i}".encode())], "client": ("203.0.113.5", 5000)}
+                   for i in range(3)]
+        self.assertEqual({client_key(scope, "X-Real-IP") for scope in spoofed}, {"203.0.113.5"})
+        for _ in range(3):
+            self.assertEqual(self.limiter.acquire(client_key(spoofed[0], "X-Real-IP"), "query"), 0.0)
+        self.assertGreater(self.limiter.acquire(client_key(spoofed[1], "X-Real-IP"), "query"), 0.0)
+        proxied = {"headers": [(b"x-real-ip", b"10.0.0.7")], "client": ("172.18.0.3", 5000)}
+        self.assertEqual(client_key(proxied, "X-Real-IP"), "10.0.0.7")
+        self.assertEqual(client_key(proxied, "X-Real-IP", trusted_proxies=["127.0.0.1"]), "172.18.0.3")
+
+    def test_ui_request_export_budget(self):
+        """测试界面事件按 gr.Request 的客户端扣除导出预算，只信任可信代理转发的请求头"""
+        def request(peer, real_ip):
+            return SimpleNamespace(client=SimpleNamespace(host=peer, port=5000), headers={"x-real-ip": real_ip})
+
+        with patch.dict(SECURITY_CONFIG["rate_limit"], {"enabled": True}), \
+                patch("rate_limit.get_rate_limiter", return_value=self.limiter):
+            self.assertEqual(acquire_for_request(request("127.0.0.1", "10.0.0.7"), "export"), 0.0)
+            self.assertGreater(acquire_for_request(request("127.0.0.1", "10.0.0.7"), "export"), 0.0)
+            self.assertEqual(acquire_for_request(request("127.0.0.1", "10.0.0.8"), "export"), 0.0)
+            self.assertEqual(acquire_for_request(request("203.0.113.5", "10.0.0.9"), "export"), 0.0)
+            self.assertGreater(acquire_for_request(request("203.0.113.5", "10.0.0.10"), "export"), 0.0)
+        with patch.dict(SECURITY_CONFIG["rate_limit"], {"enabled": False}):
+            self.assertEqual(acquire_for_request(request("127.0.0.1", "10.0.0.7"), "export"), 0.0)
+
+class TestLoadShedding(unittest.TestCase):
+    """过载保护测试类"""
+
+    def setUp(self):
+        self.db = memory_db()
+        self.db.load_shedder = LoadShedder(1, 0.05)
+        self.held = threading.Event()
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def hold_slot(self):
+        """在另一个线程中占用唯一的执行名额"""
+        def hold():
+            with self.db.load_shedder.slot():
+                self.held.set()
+                self.release.wait(10)
+        thread = threading.Thread(target=hold, daemon=True)
+        thread.start()
+        self.held.wait(10)
+        return thread
+
+    def test_shed_uncached_queries(self):
+        """测试名额用完时未命中缓存的查询抛出 Overloaded，命中缓存的查询正常返回"""
+        cached = self.db.filter_data("test_cases", {"框架": ["onnx"]})
+        thread = self.hold_slot()
+        self.assertEqual(len(self.db.filter_data("test_cases", {"框架": ["onnx"]})), len(cached))
+        with self.assertRaises(Overloaded):
+            self.db.filter_data("test_cases", {"框架": ["caffe"]})
+        self.assertEqual(self.db.load_shedder.stats()["shed"], 1)
+        self.release.set()
+        thread.join(10)
+        self.assertGreater(len(self.db.filter_data("test_cases", {"框架": ["caffe"]})), 0)
+
+    def test_nested_queries_share_slot(self):
+        """测试同一线程内嵌套的查询不重复占用名额"""
+        shedder = LoadShedder(1, 0.01)
+        with shedder.slot():
+            with shedder.slot():
+                self.assertEqual(shedder.stats()["active"], 1)
+        self.assertEqual(shedder.stats()["active"], 0)
+
+    def test_http_responses(self):
+        """测试超出预算返回429，过载返回503，均带 Retry-After"""
+        # TestClient 的对端地址为 testclient，视为转发 X-Real-IP 的代理
+        patcher = patch.dict(SECURITY_CONFIG["rate_limit"], {"trusted_proxies": ["testclient"]})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        api = FastAPI()
+        register_query_routes(api, self.db)
+        register_rate_limiting(api, RateLimiter(CONFIG))
+        client = TestClient(api)
+        for _ in range(3):
+            self.assertEqual(client.get("/api/test_cases", params={"limit": 1}).status_code, 200)
+        response = client.get("/api/test_cases", params={"limit": 1})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["retry-after"], "1")
+        other = client.get("/api/test_cases", params={"limit": 1}, headers={"X-Real-IP": "10.0.0.8"})
+        self.assertEqual(other.status_code, 200)
+
+        self.hold_slot()
+        response = client.get("/api/test_cases", params={"limit": 2}, headers={"X-Real-IP": "10.0.0.9"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["retry-after"], "1")
+        self.assertIn("服务繁忙", response.json()["detail"])
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestRateLimiter))
+    suite.addTest(loader.loadTestsFromTestCase(TestLoadShedding))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+读副本路由测试
+Replica routing tests with a fake connector
+"""
+import sys
+import random
+from pathlib import Path
+import unittest
+from collections import Counter
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backends import SQLiteBackend
+from replica_router import ReplicaRouter
+from tests.helpers import cancel_stats_refresh, memory_db
+
+class FakeConnector:
+    """按节点名返回假连接，可模拟节点故障"""
+
+    def __init__(self):
+        self.down = set()
+        self.calls = []
+
+    def __call__(self, endpoint):
+        self.calls.append(endpoint.name)
+        if endpoint.name in self.down:
+            raise ConnectionError(f"{endpoint.name} down")
+        return endpoint.name
+
+class RecordingBackend(SQLiteBackend):
+    """记录每次连接是否为只读（可路由到副本）的后端"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_only = []
+
+    def connect(self, read_only: bool = False):
+        self.read_only.append(read_only)
+        return super().connect(read_only)
+
+class TestReplicaRouter(unittest.TestCase):
+    """读写路由测试类"""
+
+    def setUp(self):
+        """两个权重不同的副本"""
+        self.connector = FakeConnector()
+        self.router = ReplicaRouter(
+            {"host": "primary", "port": 3306},
+            [{"host": "r1", "port": 3306, "weight": 3}, {"host": "r2", "port": 3306, "weight": 1}],
+            connector=self.connector,
+            failure_cooldown=60,
+            rng=random.Random(7)
+        )
+
+    def test_writes_use_primary(self):
+        """测试写请求固定到主库"""
+        self.assertEqual(self.router.connect(read_only=False), "primary")
+
+    def test_weighted_reads(self):
+        """测试读请求按权重分配"""
+        counts = Counter(self.router.connect(read_only=True) for _ in range(4000))
+        self.assertNotIn("primary", counts)
+        self.assertAlmostEqual(counts["r1:3306"] / 4000, 0.75, delta=0.05)
+
+    def test_failover(self):
+        """测试副本故障时切换到其余副本，全部故障时回退主库"""
+        self.connector.down.add("r1:3306")
+        self.assertEqual(self.router.connect(read_only=True), "r2:3306")
+        self.connector.down.add("r2:3306")
+        self.assertEqual(self.router.connect(read_only=True), "primary")
+
+        # 冷却期内不再尝试故障副本
+        self.connector.calls.clear()
+        self.router.connect(read_only=True)
+        self.assertEqual(self.connector.calls, ["primary"])
+
+    def test_recovery_after_cooldown(self):
+        """测试冷却期结束后副本重新参与分配"""
+        self.connector.down.add("r1:3306")
+        self.router.connect(read_only=True)
+        self.connector.down.clear()
+        self.router.replicas[0].retry_at = 0
+        seen = {self.router.connect(read_only=True) for _ in range(50)}
+        self.assertIn("r1:3306", seen)
+        self.assertTrue(all(e["healthy"] for e in self.router.status()))
+
+class TestReadYourWrites(unittest.TestCase):
+    """写后读路由测试类"""
+
+    def setUp(self):
+        self.backend = RecordingBackend(":memory:")
+        self.db = memory_db(self.backend)
+
+    def tearDown(self):
+        cancel_stats_refresh(self.db)
+
+    def reads(self, fn):
+        self.backend.read_only.clear()
+        fn()
+        return self.backend.read_only
+
+    def test_pin_after_write(self):
+        """测试写入一张表后该表的读查询使用主库，其他表和窗口期之后仍读副本"""
+        self.assertEqual(self.reads(lambda: self.db.count_rows("test_cases")), [True])
+        self.db.execute_batches("test_cases", "DELETE FROM test_cases WHERE case_id = %s", [(1,)])
+        self.assertEqual(self.reads(lambda: self.db.count_rows("test_cases")), [False])
+        self.assertEqual(self.reads(lambda: self.db.count_rows("dataset_index")), [True])
+        self.db._written_at["test_cases"] -= 3600
+        self.assertEqual(self.reads(lambda: self.db.count_rows("test_cases", {"类别": ["模型"]})), [True])
+
+    def test_refresh_reads_primary(self):
+        """测试统计汇总刷新从主库读取"""
+        reads = self.reads(lambda: self.db.stats.refresh("dataset_index"))
+        # 汇总查询读主库，保存汇总为写连接
+        self.assertTrue(reads)
+        self.assertNotIn(True, reads)
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestReplicaRouter))
+    suite.addTest(loader.loadTestsFromTestCase(TestReadYourWrites))
+    result = unittest.TextTestRunner(verbosity=2).run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
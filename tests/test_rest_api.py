@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+REST查询接口测试
+Headless query API tests (/api/{table})
+"""
+import json
+import sys
+from pathlib import Path
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from benchmarks.synthetic_data import generate_rows
+from rest_api import collect_query_filters, iter_ndjson, parse_fields, register_query_routes
+from tests.helpers import memory_db
+
+class TestQueryHelpers(unittest.TestCase):
+    """参数解析与分批输出测试类"""
+
+    def setUp(self):
+        self.db = memory_db()
+
+    def test_parse_fields(self):
+        """测试字段列表接受中文或原始列名"""
+        self.assertEqual(parse_fields(self.db, "test_cases", "case_id, 路径"), ["case_id", "case_path"])
+        self.assertIn("remark", parse_fields(self.db, "test_cases", ""))
+        with self.assertRaises(ValueError):
+            parse_fields(self.db, "test_cases", "unknown")
+
+    def test_collect_filters(self):
+        """测试 filters JSON 与列名参数合并"""
+        filters = collect_query_filters(self.db, "test_cases", '{"框架": ["onnx"]}',
+                                        [("framework", "caffe"), ("类别", "模型"), ("limit", "5"), ("label", "")])
+        self.assertEqual(filters, {"框架": ["onnx", "caffe"], "类别": ["模型"]})
+        with self.assertRaises(ValueError):
+            collect_query_filters(self.db, "test_cases", "", [("unknown", "x")])
+    
+    def test_collect_range_filters(self):
+        """测试 <列名>.min / <列名>.max 范围参数"""
+        filters = collect_query_filters(self.db, "test_cases", '{"参数量": {"max": 5e6}}',
+                                        [("flops.min", "1e9"), ("FLOPs.max", "5e9"), ("params.min", "1")])
+        self.assertEqual(filters, {"参数量": {"max": 5e6, "min": "1"}, "FLOPs": {"min": "1e9", "max": "5e9"}})
+        with self.assertRaises(ValueError):
+            collect_query_filters(self.db, "test_cases", "", [("flops", "1"), ("flops.min", "1")])
+
+    def test_iter_ndjson_batches(self):
+        """测试分批流式输出覆盖全部行且不重复"""
+        self.db.upsert_rows("test_cases", generate_rows("test_cases", 2500))
+        chunks = list(iter_ndjson(self.db, "test_cases", ["case_id"], batch_size=1000))
+        ids = [json.loads(line)["case_id"] for chunk in chunks for line in chunk.decode("utf-8").splitlines()]
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertEqual(len(ids), self.db.count_rows("test_cases"))
+        limited = b"".join(iter_ndjson(self.db, "test_cases", ["case_id"], offset=10, limit=25, batch_size=10))
+        self.assertEqual(len(limited.splitlines()), 25)
+
+    def test_iter_ndjson_keyset(self):
+        """测试按排序列键集分页：跨批次、非零偏移时与一次性查询的结果一致，且不写入查询缓存"""
+        self.db.upsert_rows("test_cases", generate_rows("test_cases", 600))
+        # 制造大量相同和为空的排序值，跨越批次边界
+        self.db.execute_batches("test_cases", "UPDATE test_cases SET model_size = %s WHERE case_id = %s",
+                                [(None if case_id % 2 else 1.5, case_id) for case_id in range(5, 600, 5)])
+        self.db.cache.clear()
+        for sort in ([], ["-model_size"], ["model_size", "-case_name"]):
+            with self.subTest(sort=sort):
+                expected = self.db.query_page("test_cases", 37, 10 ** 6, {"框架": ["onnx"]}, columns=["case_id"],
+                                              sort=sort)["用例ID"].tolist()
+                self.db.cache.clear()
+                chunks = list(iter_ndjson(self.db, "test_cases", ["case_id"], offset=37,
+                                          filters={"框架": ["onnx"]}, batch_size=16, sort=sort))
+                ids = [json.loads(line)["case_id"] for chunk in chunks for line in chunk.decode("utf-8").splitlines()]
+                self.assertGreater(len(chunks), 2)
+                self.assertEqual(ids, expected)
+                self.assertEqual(self.db.cache.stats()["entries"], 0)
+
+class TestQueryEndpoint(unittest.TestCase):
+    """查询接口测试类"""
+
+    def setUp(self):
+        self.db = memory_db()
+        api = FastAPI()
+        register_query_routes(api, self.db)
+        self.client = TestClient(api)
+
+    def test_json_page(self):
+        """测试分页、投影和列名参数筛选"""
+        response = self.client.get("/api/test_cases", params={"framework": "onnx", "fields": "case_id,case_path",
+                                                              "limit": 2, "offset": 1})
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual((payload["total"], payload["offset"], payload["limit"]), (3, 1, 2))
+        self.assertEqual(payload["fields"], ["case_id", "case_path"])
+        self.assertEqual([list(row) for row in payload["rows"]], [["case_id", "case_path"]] * 2)
+        self.assertIn("etag", response.headers)
+
+    def test_display_names_and_search(self):
+        """测试中文字段名与全局搜索"""
+        payload = self.client.get("/api/dataset_index", params={"search": "road", "fields": "图像名称",
+                                                                "names": "display"}).json()
+        self.assertEqual(payload["fields"], ["图像名称"])
+        self.assertEqual(len(payload["rows"]), payload["total"])
+        self.assertTrue(all("road" in row["图像名称"] for row in payload["rows"]))
+
+    def test_ndjson(self):
+        """测试NDJSON流式输出"""
+        response = self.client.get("/api/test_cases", params={"format": "ndjson", "fields": "case_path"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        lines = response.text.splitlines()
+        self.assertEqual(len(lines), int(response.headers["x-total-count"]))
+        self.assertEqual(set(json.loads(lines[0])), {"case_path"})
+
+    def test_errors(self):
+        """测试未知表、未知列和错误参数"""
+        self.assertEqual(self.client.get("/api/unknown").status_code, 404)
+        self.assertEqual(self.client.get("/api/test_cases", params={"fields": "nope"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/test_cases", params={"nope": "1"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/test_cases", params={"format": "xml"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/test_cases", params={"names": "x"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/test_cases", params={"limit": 0}).status_code, 422)
+        self.assertEqual(self.client.get("/api/test_cases", params={"sort": "remark", "format": "ndjson"}).status_code, 400)
+
+    def test_range_filter(self):
+        """测试范围参数筛选与错误参数"""
+        payload = self.client.get("/api/test_cases", params={"flops.min": "1e9", "fields": "flops"}).json()
+        self.assertEqual(payload["total"], 3)
+        self.assertTrue(all(row["flops"] >= 1e9 for row in payload["rows"]))
+        self.assertEqual(self.client.get("/api/test_cases", params={"remark.min": "1"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/test_cases", params={"flops.max": "x", "format": "ndjson"}).status_code,
+                         400)
+    
+    def test_sort(self):
+        """测试排序对JSON与NDJSON一致"""
+        params = {"fields": "case_name", "sort": "-params"}
+        rows = self.client.get("/api/test_cases", params=params).json()["rows"]
+        lines = self.client.get("/api/test_cases", params=dict(params, format="ndjson")).text.splitlines()
+        self.assertEqual([json.loads(line) for line in lines], rows)
+        self.assertEqual(rows[0]["case_name"], "ResNet50_ImageNet")
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestQueryHelpers))
+    suite.addTest(loader.loadTestsFromTestCase(TestQueryEndpoint))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+降级只读模式测试
+Circuit breaker, table snapshots and degraded read-only serving tests
+"""
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backends import DatabaseUnavailable, SQLiteBackend
+from benchmarks.synthetic_data import generate_rows
+from cache import MemoryCache
+from database import DatabaseManager
+from snapshot import BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN, CircuitBreaker, SnapshotStore, staleness_notice
+from tests.helpers import cancel_stats_refresh
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FlakyBackend(SQLiteBackend):
+    """可以模拟宕机的数据库后端，记录连接尝试次数"""
+
+    name = "flaky"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.down = False
+        self.attempts = 0
+
+    def connect(self, read_only: bool = False):
+        self.attempts += 1
+        if self.down:
+            raise sqlite3.OperationalError("Can't connect to database server")
+        return super().connect(read_only)
+
+class TestCircuitBreaker(unittest.TestCase):
+    """熔断器测试类"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5, max_reset_timeout=12, clock=self.clock)
+
+    def test_open_and_recover(self):
+        """测试连续失败后打开，冷却期后只放行一个探测，成功后关闭"""
+        self.assertTrue(self.breaker.record_failure("down"))
+        self.assertEqual(self.breaker.state, BREAKER_CLOSED)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.record_failure("down"))
+        self.assertEqual(self.breaker.state, BREAKER_OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_after(), 5)
+
+        self.clock.now = 5
+        self.assertEqual(self.breaker.state, BREAKER_HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.assertTrue(self.breaker.record_success())
+        self.assertEqual(self.breaker.state, BREAKER_CLOSED)
+        self.assertTrue(self.breaker.healthy)
+
+    def test_backoff(self):
+        """测试探测失败后冷却期加倍且不超过上限"""
+        self.breaker.record_failure("down")
+        self.breaker.record_failure("down")
+        for expected in (10, 12, 12):
+            self.clock.now += self.breaker.retry_after()
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record_failure("still down")
+            self.assertEqual(self.breaker.retry_after(), expected)
+        self.assertEqual(self.breaker.status()["opened"], 4)
+
+    def test_staleness_notice(self):
+        """测试快照提示显示快照时间和距今时长"""
+        taken_at = time.mktime((2026, 10, 19, 8, 30, 0, 0, 0, -1))
+        notice = staleness_notice(taken_at, taken_at + 3 * 3600)
+        self.assertIn("2026-10-19 08:30", notice)
+        self.assertIn("3.0 小时前", notice)
+        self.assertIn("25 分钟前", staleness_notice(taken_at, taken_at + 1500))
+        self.assertIn("没有可用的数据快照", staleness_notice(None))
+
+class TestDegradedMode(unittest.TestCase):
+    """快照与降级只读模式测试类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.backend = FlakyBackend(":memory:")
+        self.store = SnapshotStore(str(Path(self.tmpdir.name) / "snapshot.db"))
+        self.db = DatabaseManager(self.backend, cache=MemoryCache(), snapshot=self.store)
+        self.clock = FakeClock()
+        self.db.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5, clock=self.clock)
+        self.db.upsert_rows("test_cases", generate_rows("test_cases", 300))
+
+    def tearDown(self):
+        # 写入触发的统计刷新不在模拟宕机期间执行
+        cancel_stats_refresh(self.db)
+        self.tmpdir.cleanup()
+
+    def test_refresh(self):
+        """测试快照复制全部表并记录行数和时间，再次刷新时替换旧快照"""
+        total = self.db.get_table_stats("test_cases")[0]
+        stats = self.store.refresh(self.db, page_size=64)
+        self.assertEqual(stats["tables"]["test_cases"], total)
+        self.assertEqual(self.store.info()["tables"]["dataset_index"], self.db.get_table_stats("dataset_index")[0])
+        self.assertLess(self.store.age(), 60)
+        self.assertFalse(self.store.due())
+
+        self.db.execute_batches("test_cases", "DELETE FROM test_cases WHERE case_id = %s", [(1,)])
+        self.store.refresh(self.db)
+        self.assertEqual(self.store.info()["tables"]["test_cases"], total - 1)
+        self.assertEqual(list(Path(self.tmpdir.name).glob("*.tmp")), [])
+
+    def test_serve_snapshot_when_down(self):
+        """测试数据库不可用时从快照提供筛选和搜索，熔断期间不再尝试连接，恢复后切回数据库"""
+        self.store.refresh(self.db)
+        onnx = len(self.db.filter_data("test_cases", {"框架": ["onnx"]}))
+        snapshot_total = self.db.get_table_stats("test_cases")[0]
+        self.db.execute_batches("test_cases", "DELETE FROM test_cases WHERE case_id <= %s", [(10,)])
+        live = self.db.get_table_stats("test_cases")[0]
+        self.assertEqual(live, snapshot_total - 10)
+        self.assertEqual(self.db.degraded_notice(), "")
+
+        self.backend.down = True
+        self.assertEqual(len(self.db.filter_data("test_cases", {"框架": ["onnx"]})), onnx)
+        self.assertEqual(self.db.get_table_stats("test_cases")[0], snapshot_total)
+        self.assertGreater(len(self.db.search_data("test_cases", "onnx")), 0)
+        self.assertIn("只读快照", self.db.degraded_notice())
+        attempts = self.backend.attempts
+        self.db.count_rows("test_cases", {"类别": ["模型"]})
+        self.assertEqual(self.backend.attempts, attempts)
+        with self.assertRaises(DatabaseUnavailable):
+            self.db.insert_rows("test_cases", [{"case_name": "x"}])
+
+        self.backend.down = False
+        self.clock.now = 5
+        self.assertEqual(self.db.get_table_stats("test_cases")[0], live)
+        self.assertEqual(self.db.degraded_notice(), "")
+
+    def test_without_snapshot(self):
+        """测试没有快照时熔断期间直接报告数据库不可用"""
+        attempts = self.backend.attempts
+        self.backend.down = True
+        for _ in range(2):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.db._run_query("SELECT 1")
+        with self.assertRaises(DatabaseUnavailable):
+            self.db._run_query("SELECT 1")
+        self.assertEqual(self.db.execute_query("SELECT 1"), [])
+        self.assertEqual(self.backend.attempts, attempts + 2)
+        self.assertEqual(self.db.degraded_notice(), "")
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestCircuitBreaker))
+    suite.addTest(loader.loadTestsFromTestCase(TestDegradedMode))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
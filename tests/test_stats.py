@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+统计汇总测试
+Materialised statistics tests (embedded SQLite)
+"""
+import sys
+import time
+from pathlib import Path
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import STATS_CONFIG
+from stats import STATS_TABLE, compute_table_stats, percentile, summarize
+from tests.helpers import memory_db
+
+class TestSummaries(unittest.TestCase):
+    """汇总函数测试类"""
+
+    def test_percentile(self):
+        """测试最近秩分位数"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 90), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_summarize_skips_nulls(self):
+        """测试汇总忽略空值"""
+        summary = summarize([3, None, 1, 2])
+        self.assertEqual((summary["count"], summary["sum"], summary["p50"]), (3, 6, 2))
+
+class TestStatsManager(unittest.TestCase):
+    """物化汇总测试类"""
+
+    def setUp(self):
+        self.refresh_delay = STATS_CONFIG["refresh_delay"]
+        STATS_CONFIG["refresh_delay"] = 0.05
+        self.db = memory_db()
+
+    def tearDown(self):
+        STATS_CONFIG["refresh_delay"] = self.refresh_delay
+
+    def wait_for_refresh(self):
+        deadline = time.monotonic() + 5
+        while self.db.stats.pending() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        time.sleep(0.1)
+
+    def test_compute_table_stats(self):
+        """测试列统计、选项分布与分组汇总"""
+        stats = compute_table_stats(self.db, "test_cases")
+        self.assertEqual(stats["total"], 5)
+        self.assertEqual(stats["columns"]["framework"],
+                         {"unique_count": 3, "non_null_count": 5, "null_count": 0})
+        self.assertEqual(stats["histograms"]["label"]["fusion"], 3)
+        self.assertEqual(stats["histograms"]["file_status"], {"正常": 5})
+        self.assertEqual(stats["groups"]["framework"]["onnx"]["count"], 3)
+        self.assertAlmostEqual(stats["groups"]["framework"]["onnx"]["model_size"]["sum"], 125.3)
+        self.assertEqual(stats["groups"]["all"]["params"]["p50"], 3504872)
+
+    def test_get_reads_materialised_row(self):
+        """测试首次读取时返回占位结果并在后台计算保存，之后直接读取汇总表"""
+        pending = self.db.stats.get("dataset_index")
+        self.assertTrue(pending["pending"])
+        self.assertIsNone(pending["total"])
+        self.assertEqual(self.db.get_column_stats("dataset_index", "仓库")["total_count"],
+                         self.db.get_table_stats("dataset_index")[0])
+        self.wait_for_refresh()
+        stats = self.db.stats.get("dataset_index")
+        self.assertNotIn("pending", stats)
+        rows = self.db.execute_query(f"SELECT row_count FROM {STATS_TABLE} WHERE table_name = %s",
+                                     ["dataset_index"])
+        self.assertEqual(rows[0]["row_count"], stats["total"])
+        self.assertEqual(self.db.stats.get("dataset_index")["refreshed_at"], stats["refreshed_at"])
+        self.assertEqual(self.db.get_column_stats("dataset_index", "仓库")["total_count"], stats["total"])
+
+    def test_refresh_on_write(self):
+        """测试写入后延迟刷新汇总"""
+        before = self.db.stats.refresh("test_cases")
+        self.db.upsert_rows("test_cases", [{
+            "用例名称": "extra", "仓库": "zoo", "路径": "/zoo/extra.onnx", "类别": "模型", "框架": "onnx",
+            "params": 100
+        }], key_columns=["case_path"])
+        self.assertEqual(self.db.stats.pending(), ["test_cases"])
+        self.wait_for_refresh()
+        after = self.db.stats.get("test_cases")
+        self.assertEqual(after["total"], before["total"] + 1)
+        self.assertEqual(after["groups"]["framework"]["onnx"]["count"], 4)
+        self.assertEqual(self.db.stats.pending(), [])
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestSummaries))
+    suite.addTest(loader.loadTestsFromTestCase(TestStatsManager))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
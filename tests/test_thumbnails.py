@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+缩略图测试
+On-demand thumbnail generation, disk cache and endpoint tests
+"""
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from pathlib import Path
+import unittest
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from image_hash import ImageHashError, read_bmp_rgb
+from tests.helpers import memory_db, write_bmp
+from thumbnails import (PIL_AVAILABLE, ThumbnailBusy, ThumbnailCache, ThumbnailService, encode_png, fit_size,
+                        register_thumbnail_routes, resize)
+
+def gradient(height, width):
+    """水平方向红色渐变、垂直方向绿色渐变的RGB图像"""
+    y, x = np.mgrid[0:height, 0:width]
+    return np.stack([x * 255 // max(width - 1, 1), y * 255 // max(height - 1, 1), np.full_like(x, 128)],
+                    axis=2).astype(np.uint8)
+
+def png_size(data):
+    """PNG的 (宽, 高)"""
+    return struct.unpack(">II", data[16:24])
+
+class TestRendering(unittest.TestCase):
+    """缩略图生成测试类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_fit_size(self):
+        """测试保持宽高比且不放大"""
+        self.assertEqual(fit_size(1080, 1920, 128), (72, 128))
+        self.assertEqual(fit_size(4000, 10, 128), (128, 1))
+        self.assertEqual(fit_size(50, 60, 128), (50, 60))
+
+    def test_sampled_read(self):
+        """测试大图按步长读取与完整读取后取样一致"""
+        image = gradient(600, 900)
+        write_bmp(self.root / "a.bmp", image)
+        sampled = read_bmp_rgb(str(self.root / "a.bmp"), 100)
+        self.assertEqual(sampled.shape, (67, 100, 3))
+        np.testing.assert_array_equal(sampled, image[::9, ::9])
+        np.testing.assert_array_equal(read_bmp_rgb(str(self.root / "a.bmp")), image)
+
+    def test_resize_and_png(self):
+        """测试区域平均缩小与PNG编码"""
+        image = gradient(64, 96)
+        small = resize(image, 16, 24)
+        self.assertEqual(small.shape, (16, 24, 3))
+        np.testing.assert_allclose(small[:, :, 2], 128)
+        np.testing.assert_allclose(small[0, :, 0], image[:4].reshape(4, 24, 4, 3)[:, :, :, 0].mean(axis=(0, 2)), atol=1)
+        data = encode_png(small)
+        self.assertEqual(data[:8], b"\x89PNG\r\n\x1a\n")
+        self.assertEqual(png_size(data), (24, 16))
+        length = struct.unpack(">I", data[33:37])[0]
+        raw = np.frombuffer(zlib.decompress(data[41:41 + length]), dtype=np.uint8).reshape(16, 1 + 24 * 3)
+        np.testing.assert_array_equal(raw[:, 1:].reshape(16, 24, 3), small)
+
+class TestThumbnailService(unittest.TestCase):
+    """缩略图缓存测试类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name)
+        write_bmp(self.root / "a.bmp", gradient(300, 400))
+        self.cache = ThumbnailCache(str(self.root / "cache"), max_bytes=10 ** 7)
+        self.service = ThumbnailService(self.cache, workers=0)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_cached(self):
+        """测试第二次请求命中磁盘缓存，BMP变化后重新生成"""
+        source = str(self.root / "a.bmp")
+        path = self.service.submit(source, 64, "png").result()
+        self.assertEqual(png_size(Path(path).read_bytes()), (64, 48))
+        self.assertEqual(self.service.submit(source, 64, "png").result(), path)
+        self.assertEqual((self.service.stats["generated"], self.service.stats["hits"]), (1, 1))
+        self.assertNotEqual(self.service.submit(source, 32, "png").result(), path)
+
+        write_bmp(self.root / "a.bmp", gradient(200, 100))
+        os.utime(source, ns=(1, 1))
+        changed = self.service.submit(source, 64, "png").result()
+        self.assertNotEqual(changed, path)
+        self.assertEqual(png_size(Path(changed).read_bytes()), (32, 64))
+
+    @unittest.skipUnless(PIL_AVAILABLE, "需要Pillow")
+    def test_webp(self):
+        """测试Pillow编码webp"""
+        path = self.service.submit(str(self.root / "a.bmp"), 64, "webp").result()
+        data = Path(path).read_bytes()
+        self.assertEqual((data[:4], data[8:12]), (b"RIFF", b"WEBP"))
+
+    def test_errors(self):
+        """测试文件缺失、无法解码和排队上限"""
+        with self.assertRaises(OSError):
+            self.service.submit(str(self.root / "missing.bmp"))
+        (self.root / "bad.bmp").write_bytes(b"not a bitmap")
+        with self.assertRaises(ImageHashError):
+            self.service.submit(str(self.root / "bad.bmp"), 64, "png").result()
+        self.assertEqual(self.service.stats["failed"], 1)
+
+        service = ThumbnailService(self.cache, workers=1, max_pending=1)
+        service._pending["other"] = None
+        with self.assertRaises(ThumbnailBusy):
+            service.submit(str(self.root / "a.bmp"), 80, "png")
+
+    def test_size_cap(self):
+        """测试超过上限时删除最久未使用的缩略图"""
+        source = str(self.root / "a.bmp")
+        first = self.service.submit(source, 100, "png").result()
+        os.utime(first, (1, 1))
+        self.cache.max_bytes = os.path.getsize(first) + 100
+        second = self.service.submit(source, 90, "png").result()
+        self.assertFalse(os.path.exists(first))
+        self.assertTrue(os.path.exists(second))
+        self.assertEqual(self.cache.clear(), 1)
+
+class TestThumbnailEndpoint(unittest.TestCase):
+    """缩略图接口测试类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name)
+        write_bmp(self.root / "a.bmp", gradient(120, 160))
+        self.db = memory_db()
+        self.db.execute_batches("dataset_index", "UPDATE dataset_index SET bmp_path = %s WHERE image_id = %s",
+                                [(str(self.root / "a.bmp"), 1)])
+        api = FastAPI()
+        register_thumbnail_routes(api, self.db, ThumbnailService(ThumbnailCache(str(self.root / "cache")),
+                                                                 workers=0))
+        self.client = TestClient(api)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_thumbnail(self):
+        """测试生成、缓存验证与错误状态码"""
+        response = self.client.get("/api/thumbnail/1", params={"size": 64, "format": "png"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "image/png")
+        self.assertEqual(png_size(response.content), (64, 48))
+        self.assertIn("max-age", response.headers["cache-control"])
+        revalidated = self.client.get("/api/thumbnail/1", params={"size": 64, "format": "png"},
+                                      headers={"If-None-Match": response.headers["etag"]})
+        self.assertEqual(revalidated.status_code, 304)
+        # 示例数据的BMP路径不存在
+        self.assertEqual(self.client.get("/api/thumbnail/2").status_code, 404)
+        self.assertEqual(self.client.get("/api/thumbnail/999").status_code, 404)
+        self.assertEqual(self.client.get("/api/thumbnail/1", params={"format": "gif"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/thumbnail/1", params={"size": 4096}).status_code, 422)
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestRendering))
+    suite.addTest(loader.loadTestsFromTestCase(TestThumbnailService))
+    suite.addTest(loader.loadTestsFromTestCase(TestThumbnailEndpoint))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
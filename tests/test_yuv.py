@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+YUV帧解码测试
+YUV layout decoding, size verification and preview endpoint tests
+"""
+import io
+import sqlite3
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import yuv
+from tests.helpers import memory_db
+from thumbnails import ThumbnailCache, ThumbnailService, register_thumbnail_routes
+from yuv import (YuvError, check_yuv_size, frame_size, read_yuv_rgb, resolve_layout, verify_yuv_sizes,
+                 yuv_to_rgb)
+
+def make_planes(height, width, seed=0):
+    """随机的 Y 平面与 4:2:0 色度平面"""
+    rng = np.random.default_rng(seed)
+    y = rng.integers(16, 236, (height, width), dtype=np.uint8)
+    u = rng.integers(16, 241, (height // 2, width // 2), dtype=np.uint8)
+    v = rng.integers(16, 241, (height // 2, width // 2), dtype=np.uint8)
+    return y, u, v
+
+def encode_frame(layout, y, u, v):
+    """按布局打包一帧（YUYV 每行使用同一色度行）"""
+    height, width = y.shape
+    if layout == "I420":
+        return y.tobytes() + u.tobytes() + v.tobytes()
+    if layout in ("NV12", "NV21"):
+        interleaved = np.empty((height // 2, width), dtype=np.uint8)
+        interleaved[:, 0::2], interleaved[:, 1::2] = (u, v) if layout == "NV12" else (v, u)
+        return y.tobytes() + interleaved.tobytes()
+    packed = np.empty((height, width * 2), dtype=np.uint8)
+    packed[:, 0::2] = y
+    packed[:, 1::4] = np.repeat(u, 2, axis=0)
+    packed[:, 3::4] = np.repeat(v, 2, axis=0)
+    return packed.tobytes()
+
+def expected_rgb(y, u, v):
+    """逐像素上采样色度后转换，作为解码结果的参照"""
+    upsample = lambda plane: np.repeat(np.repeat(plane, 2, axis=0), 2, axis=1)
+    return yuv_to_rgb(y, upsample(u), upsample(v))
+
+class TestDecoding(unittest.TestCase):
+    """YUV布局解码测试类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name)
+        self.y, self.u, self.v = make_planes(24, 32)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, layout, frames=1):
+        path = self.root / f"{layout}.yuv"
+        path.write_bytes(encode_frame(layout, self.y, self.u, self.v) * frames)
+        return str(path)
+
+    def test_layouts(self):
+        """测试各布局解码结果一致"""
+        expected = expected_rgb(self.y, self.u, self.v)
+        for layout in ("I420", "NV12", "NV21", "YUYV"):
+            np.testing.assert_array_equal(read_yuv_rgb(self.write(layout), 32, 24, layout), expected, layout)
+
+    def test_sampled_and_frames(self):
+        """测试按步长取样与读取后续帧"""
+        path = self.write("NV12", frames=2)
+        expected = expected_rgb(self.y, self.u, self.v)
+        sampled = read_yuv_rgb(path, 32, 24, "NV12", min_side=8)
+        np.testing.assert_array_equal(sampled, expected[::4, ::4])
+        np.testing.assert_array_equal(read_yuv_rgb(path, 32, 24, "NV12", frame=1), expected)
+        with self.assertRaises(YuvError):
+            read_yuv_rgb(path, 32, 24, "NV12", frame=2)
+
+    def test_color_conversion(self):
+        """测试有限范围与全范围的参考色"""
+        gray = np.full((1, 1), 128, dtype=np.uint8)
+        np.testing.assert_array_equal(yuv_to_rgb(np.full((1, 1), 235, np.uint8), gray, gray, False), [[[255] * 3]])
+        np.testing.assert_array_equal(yuv_to_rgb(np.full((1, 1), 16, np.uint8), gray, gray, False), [[[0] * 3]])
+        red = yuv_to_rgb(np.full((1, 1), 76, np.uint8), np.full((1, 1), 85, np.uint8),
+                         np.full((1, 1), 255, np.uint8), True)
+        self.assertEqual(red[0, 0, 0], 254)
+        self.assertLess(red[0, 0, 1:].max(), 2)
+
+    def test_errors(self):
+        """测试布局名称、奇数尺寸和文件过短"""
+        self.assertEqual(resolve_layout("nv21"), "NV21")
+        with self.assertRaises(ValueError):
+            resolve_layout("RGB24")
+        path = self.write("I420")
+        with self.assertRaises(YuvError):
+            read_yuv_rgb(path, 31, 24, "I420")
+        with self.assertRaises(YuvError):
+            read_yuv_rgb(path, 64, 48, "I420")
+
+class TestVerification(unittest.TestCase):
+    """YUV大小校验测试类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name)
+        self.db = memory_db()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_check_size(self):
+        """测试整数帧、其他布局和缺失文件"""
+        path = self.root / "a.yuv"
+        path.write_bytes(b"\0" * frame_size("NV12", 32, 24) * 3)
+        self.assertEqual(check_yuv_size(str(path), 32, 24, "I420")["frames"], 3)
+        path.write_bytes(b"\0" * frame_size("YUYV", 32, 24))
+        result = check_yuv_size(str(path), 32, 24, "NV12")
+        self.assertEqual((result["status"], result["layouts"]), ("mismatch", ["YUYV"]))
+        self.assertEqual(check_yuv_size(str(self.root / "b.yuv"), 32, 24)["status"], "missing")
+
+    def test_verify_table(self):
+        """测试按表批量校验"""
+        (self.root / "ok.yuv").write_bytes(b"\0" * frame_size("NV12", 1920, 1080))
+        (self.root / "short.yuv").write_bytes(b"\0" * 100)
+        self.db.execute_batches("dataset_index", "UPDATE dataset_index SET yuv_path = %s WHERE image_id = %s",
+                                [(str(self.root / "ok.yuv"), 1), (str(self.root / "short.yuv"), 2)])
+        stats = verify_yuv_sizes(self.db, "NV12")
+        self.assertEqual(stats["checked"], self.db.count_rows("dataset_index"))
+        self.assertEqual((stats["ok"], stats["mismatch"]), (1, 1))
+        self.assertEqual(stats["missing"], stats["checked"] - 2)
+        self.assertEqual(stats["mismatches"][0]["image_id"], 2)
+        self.assertEqual(verify_yuv_sizes(self.db, "NV12", repository="urban_dataset")["ok"], 1)
+
+    def test_verify_database_error(self):
+        """测试读取记录失败时抛出异常，命令行退出码非0"""
+        error = sqlite3.OperationalError("no such table: dataset_index")
+        with patch.object(self.db.backend, "fetch_all", side_effect=error):
+            with self.assertRaises(self.db.backend.error_types):
+                verify_yuv_sizes(self.db)
+            with patch("database.db_manager", self.db), redirect_stdout(io.StringIO()):
+                self.assertEqual(yuv.main(["verify"]), 2)
+
+    def test_preview_endpoint(self):
+        """测试缩略图接口的YUV来源"""
+        y, u, v = make_planes(48, 64)
+        (self.root / "a.yuv").write_bytes(encode_frame("I420", y, u, v))
+        self.db.execute_batches("dataset_index", "UPDATE dataset_index SET yuv_path = %s, image_width = 64, "
+                                "image_height = 48 WHERE image_id = %s", [(str(self.root / "a.yuv"), 1)])
+        api = FastAPI()
+        register_thumbnail_routes(api, self.db, ThumbnailService(ThumbnailCache(str(self.root / "cache")),
+                                                                 workers=0))
+        client = TestClient(api)
+        params = {"source": "yuv", "layout": "I420", "format": "png", "size": 32}
+        response = client.get("/api/thumbnail/1", params=params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content[16:24], b"\0\0\0\x20\0\0\0\x18")
+        # 不同布局对应不同的缓存文件和ETag
+        other = client.get("/api/thumbnail/1", params=dict(params, layout="NV12"))
+        self.assertNotEqual(other.headers["etag"], response.headers["etag"])
+        self.assertEqual(client.get("/api/thumbnail/1", params=dict(params, layout="YUYV")).status_code, 415)
+        self.assertEqual(client.get("/api/thumbnail/1", params=dict(params, layout="RGB")).status_code, 400)
+        self.assertEqual(client.get("/api/thumbnail/1", params=dict(params, source="tiff")).status_code, 400)
+
+if __name__ == "__main__":
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestDecoding))
+    suite.addTest(loader.loadTestsFromTestCase(TestVerification))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+    sys.exit(0 if result.wasSuccessful() else 1)
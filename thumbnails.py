@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+缩略图模块
+On-demand BMP/YUV thumbnails for dataset_index rows: bounded process pool, size-capped disk cache
+
+用法:
+    python thumbnails.py prune    # 按上限清理磁盘缓存
+    python thumbnails.py clear    # 清空磁盘缓存
+"""
+import argparse
+import hashlib
+import importlib.util
+import logging
+import os
+import struct
+import sys
+import tempfile
+import threading
+import zlib
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# 添加当前目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import THUMBNAIL_CONFIG
+from image_hash import read_bmp_rgb
+from lazy_imports import lazy_import
+from yuv import read_yuv_rgb, resolve_layout
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_API_PREFIX = "/api/thumbnail"
+THUMBNAIL_TABLE = "dataset_index"
+# 缩略图来源：bmp（thumbnail_column）/ yuv（yuv_column 的第一帧，尺寸取 image_width/image_height）
+SOURCES = ("bmp", "yuv")
+MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+# Pillow 为可选依赖，未安装时以 zlib 编码 PNG
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+
+class ThumbnailBusy(Exception):
+    """排队中的生成任务已达上限"""
+
+
+def resolve_format(requested: Optional[str] = None) -> str:
+    """实际使用的编码格式：webp/jpeg 需要 Pillow，否则使用 png"""
+    fmt = (requested or THUMBNAIL_CONFIG["format"]).lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt not in MEDIA_TYPES:
+        raise ValueError(f"不支持的缩略图格式: {requested}")
+    return fmt if PIL_AVAILABLE else "png"
+
+
+# ---- 生成 ----
+
+def fit_size(height: int, width: int, size: int) -> Tuple[int, int]:
+    """保持宽高比、最长边不超过 size 的尺寸（不放大）"""
+    scale = size / max(height, width)
+    if scale >= 1:
+        return height, width
+    return max(round(height * scale), 1), max(round(width * scale), 1)
+
+
+def resize(pixels, height: int, width: int):
+    """按区域平均缩小到 height x width"""
+    result = pixels.astype(np.float32)
+    for axis, length in ((0, height), (1, width)):
+        current = result.shape[axis]
+        if current == length:
+            continue
+        index = np.arange(length) * current // length
+        counts = np.diff(np.append(index, current)).astype(np.float32)
+        shape = [1] * result.ndim
+        shape[axis] = length
+        result = np.add.reduceat(result, index, axis=axis) / counts.reshape(shape)
+    return np.clip(result + 0.5, 0, 255).astype(np.uint8)
+
+
+def encode_png(pixels) -> bytes:
+    """RGB矩阵编码为PNG（每行过滤类型0）"""
+    height, width = pixels.shape[:2]
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), pixels.reshape(height, -1)], axis=1)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)) + chunk(b"IEND", b""))
+
+
+def encode_image(pixels, fmt: str, quality: int) -> bytes:
+    """RGB矩阵编码为 webp/jpeg（Pillow）或 png"""
+    if fmt == "png":
+        return encode_png(pixels)
+    import io
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, "RGB").save(buffer, format=fmt.upper(), quality=quality)
+    return buffer.getvalue()
+
+
+def render_thumbnail(source: str, target: str, size: int, fmt: str, quality: int,
+                     yuv_frame: Optional[Tuple[int, int, str]] = None) -> int:
+    """生成缩略图并写入 target（进程池入口），返回文件字节数
+
+    source 为BMP文件；指定 yuv_frame (宽, 高, 布局) 时为原始YUV文件，取第一帧。
+    大图按步长只读取约 2*size 行像素再区域平均缩小。先写临时文件再重命名，
+    其他进程不会读到写了一半的文件。
+    """
+    if yuv_frame:
+        width, height, layout = yuv_frame
+        pixels = read_yuv_rgb(source, width, height, layout, min_side=size * 2)
+    else:
+        pixels = read_bmp_rgb(source, size * 2)
+    data = encode_image(resize(pixels, *fit_size(pixels.shape[0], pixels.shape[1], size)), fmt, quality)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temporary, target)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+    return len(data)
+
+
+# ---- 磁盘缓存 ----
+
+class ThumbnailCache:
+    """缩略图磁盘缓存
+
+    文件名由源文件路径、修改时间、文件大小、尺寸和格式（YUV还有宽高和布局）计算，源文件变化后对应新的文件名，旧文件由容量清理删除。
+    命中时更新文件的修改时间，目录超过 max_bytes 时按修改时间删除最久未使用的文件，降到上限的90%。
+    多个工作进程共享同一目录，各自估计目录大小，超限时重新扫描。
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.directory = directory or THUMBNAIL_CONFIG["cache_dir"]
+        self.max_bytes = THUMBNAIL_CONFIG["max_cache_mb"] * 1024 * 1024 if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+
+    def key(self, source: str, size: int, fmt: str, variant: str = "") -> str:
+        """缓存键，源文件不存在时抛出 OSError"""
+        stat = os.stat(source)
+        return hashlib.sha1(f"{source}\0{stat.st_mtime_ns}\0{stat.st_size}\0{size}\0{fmt}\0{variant}"
+                            .encode("utf-8")).hexdigest()
+
+    def path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{fmt}")
+
+    def lookup(self, path: str) -> bool:
+        """缓存文件是否存在，存在时记为最近使用"""
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        """缓存文件 [(修改时间, 字节数, 路径)]"""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for directory in os.scandir(self.directory):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def added(self, nbytes: int) -> None:
+        """记录新写入的文件，超过上限时清理"""
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self.entries())
+            else:
+                self._size += nbytes
+            if self._size > self.max_bytes:
+                self._prune()
+
+    def prune(self) -> int:
+        """按上限清理，返回删除的文件数"""
+        with self._lock:
+            return self._prune()
+
+    def _prune(self) -> int:
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._size = total
+        if removed:
+            logger.info(f"缩略图缓存已清理: 删除 {removed} 个文件，剩余 {total / 1024 / 1024:.1f}MB")
+        return removed
+
+    def clear(self) -> int:
+        """删除全部缓存文件，返回删除的文件数"""
+        with self._lock:
+            entries = self.entries()
+            for _, _, path in entries:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            self._size = 0
+            return len(entries)
+
+
+def _variant(yuv_frame: Optional[Tuple[int, int, str]]) -> str:
+    return "yuv:{}x{}:{}".format(*yuv_frame) if yuv_frame else ""
+
+
+class ThumbnailService:
+    """按需生成缩略图
+
+    命中磁盘缓存时直接返回文件路径，不解码BMP；未命中时提交到至多 workers 个进程的进程池
+    （workers 为0时在调用线程中生成）。同一缩略图的并发请求共享同一个生成任务，
+    排队的任务超过 max_pending 时抛出 ThumbnailBusy，快速滚动时不会积压无限的解码任务。
+    """
+
+    def __init__(self, cache: Optional[ThumbnailCache] = None, workers: Optional[int] = None,
+                 max_pending: Optional[int] = None):
+        self.cache = cache or ThumbnailCache()
+        self.workers = THUMBNAIL_CONFIG["workers"] if workers is None else workers
+        self.max_pending = max_pending or THUMBNAIL_CONFIG["max_pending"]
+        self.stats = {"hits": 0, "generated": 0, "failed": 0}
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Future] = {}
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # 服务进程中有多个线程，子进程以 spawn 方式启动
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def etag_key(self, source: str, size: Optional[int] = None, fmt: Optional[str] = None,
+                 yuv_frame: Optional[Tuple[int, int, str]] = None) -> str:
+        """缩略图的缓存键（可用作ETag），源文件不存在时抛出 OSError"""
+        return self.cache.key(source, size or THUMBNAIL_CONFIG["size"], resolve_format(fmt), _variant(yuv_frame))
+
+    def submit(self, source: str, size: Optional[int] = None, fmt: Optional[str] = None,
+               yuv_frame: Optional[Tuple[int, int, str]] = None) -> "Future[str]":
+        """获取缩略图，返回结果为缓存文件路径的 Future（yuv_frame 见 render_thumbnail）
+
+        源文件不存在时抛出 OSError，排队已满时抛出 ThumbnailBusy；解码失败时 Future 的异常为 ImageHashError。
+        """
+        size = size or THUMBNAIL_CONFIG["size"]
+        fmt = resolve_format(fmt)
+        key = self.cache.key(source, size, fmt, _variant(yuv_frame))
+        target = self.cache.path(key, fmt)
+        result: Future = Future()
+        if self.cache.lookup(target):
+            self.stats["hits"] += 1
+            result.set_result(target)
+            return result
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                return pending
+            if len(self._pending) >= self.max_pending:
+                raise ThumbnailBusy(f"缩略图生成任务已达上限: {self.max_pending}")
+            self._pending[key] = result
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        def finished(task: Future) -> None:
+            with self._lock:
+                self._pending.pop(key, None)
+            error = task.exception()
+            if error is not None:
+                self.stats["failed"] += 1
+                result.set_exception(error)
+                return
+            self.stats["generated"] += 1
+            self.cache.added(task.result())
+            result.set_result(target)
+
+        args = (source, target, size, fmt, THUMBNAIL_CONFIG["quality"], yuv_frame)
+        if self.workers > 0:
+            self._pool().submit(render_thumbnail, *args).add_done_callback(finished)
+        else:
+            task: Future = Future()
+            try:
+                task.set_result(render_thumbnail(*args))
+            except Exception as e:
+                task.set_exception(e)
+            finished(task)
+        return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def register_thumbnail_routes(api, db=None, service: Optional[ThumbnailService] = None) -> None:
+    """缩略图接口：GET /api/thumbnail/{image_id}?size=&format=&source=bmp|yuv&layout="""
+    import asyncio
+    from fastapi import HTTPException, Query, Request, Response
+    from fastapi.responses import FileResponse
+    from starlette.concurrency import run_in_threadpool
+    from database_config import TABLE_CONFIG
+    from http_cache import is_not_modified, make_etag
+    from image_hash import ImageHashError
+    if db is None:
+        from database import db_manager as db
+    service = service or ThumbnailService()
+    config = TABLE_CONFIG[THUMBNAIL_TABLE]
+    q = db.quote
+    query = (f"SELECT {q(config['thumbnail_column'])} AS bmp, {q(config['yuv_column'])} AS yuv, "
+             f"{q('image_width')} AS width, {q('image_height')} AS height FROM {THUMBNAIL_TABLE} "
+             f"WHERE {q(config['primary_key'])} = %s")
+
+    def locate(image_id: int, size: Optional[int], fmt: str, kind: str,
+               layout: Optional[str]) -> Tuple[str, Optional[Tuple[int, int, str]], str]:
+        rows = db.execute_query(query, [image_id])
+        if not rows or not rows[0][kind]:
+            raise FileNotFoundError(image_id)
+        row = rows[0]
+        yuv_frame = (row["width"] or 0, row["height"] or 0, resolve_layout(layout)) if kind == "yuv" else None
+        return row[kind], yuv_frame, service.etag_key(row[kind], size, fmt, yuv_frame)
+
+    @api.get(THUMBNAIL_API_PREFIX + "/{image_id}")
+    async def thumbnail(request: Request, image_id: int,
+                        size: Optional[int] = Query(None, ge=16, le=THUMBNAIL_CONFIG["max_size"]),
+                        format: Optional[str] = None, source: str = "bmp", layout: Optional[str] = None):
+        try:
+            if source not in SOURCES:
+                raise ValueError(f"不支持的缩略图来源: {source}")
+            fmt = resolve_format(format)
+            path, yuv_frame, key = await run_in_threadpool(locate, image_id, size, fmt, source, layout)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except OSError:
+            raise HTTPException(status_code=404, detail=f"图像不存在或{source.upper()}文件缺失: {image_id}")
+        headers = {"ETag": make_etag(key), "Cache-Control": THUMBNAIL_CONFIG["cache_control"]}
+        if is_not_modified(request.headers, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        try:
+            # 缓存查找和 workers 为0时的生成不占用事件循环
+            path = await asyncio.wrap_future(await run_in_threadpool(service.submit, path, size, fmt, yuv_frame))
+        except ThumbnailBusy as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except ImageHashError as e:
+            raise HTTPException(status_code=415, detail=str(e))
+        except OSError:
+            raise HTTPException(status_code=404, detail=f"{source.upper()}文件缺失: {image_id}")
+        return FileResponse(path, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+# ---- 命令行 ----
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="管理缩略图磁盘缓存")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("prune", help=f"按上限（{THUMBNAIL_CONFIG['max_cache_mb']}MB）删除最久未使用的缩略图")
+    subparsers.add_parser("clear", help="删除全部缩略图")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    cache = ThumbnailCache()
+    removed = cache.prune() if args.command == "prune" else cache.clear()
+    print(f"✅ 删除 {removed} 个缩略图文件（{cache.directory}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,11 +2,15 @@
 工具函数模块
 Utility functions for the Gradio application
 """
+from __future__ import annotations
+
 import os
 import logging
 from datetime import datetime
 from typing import Dict, Any, Optional
-import pandas as pd
+from lazy_imports import lazy_import
+
+pd = lazy_import("pandas")
 
 # 配置日志
 logging.basicConfig(
@@ -83,9 +87,8 @@ def create_export_filename(table_name: str, export_format: str = "csv") -> str:
 
 def check_database_health() -> Dict[str, Any]:
     """检查数据库健康状态"""
+    from database import db_manager
     try:
-        from database import db_manager
-        
         # 测试连接
         connection = db_manager.get_connection()
         if connection:
@@ -99,14 +102,18 @@ def check_database_health() -> Dict[str, Any]:
             "status": "healthy",
             "connection": True,
             "query_test": len(result) > 0,
+            "backend": db_manager.backend.status(),
             "timestamp": datetime.now().isoformat()
         }
         
     except Exception as e:
+        # 有可用快照时为降级状态：筛选和搜索由只读快照提供
         return {
-            "status": "unhealthy",
+            "status": "degraded" if db_manager.serving_snapshot else "unhealthy",
             "connection": False,
             "error": str(e),
+            "breaker": db_manager.breaker.status(),
+            "snapshot": db_manager.snapshot.status() if db_manager.snapshot is not None else None,
             "timestamp": datetime.now().isoformat()
         }
 
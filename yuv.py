@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+YUV帧解码模块
+Memory-mapped raw YUV frame decoding (I420/NV12/NV21/YUYV) and batch size verification
+
+用法:
+    python yuv.py verify --repository urban_dataset
+    python yuv.py verify --layout YUYV
+"""
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# 添加当前目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import YUV_CONFIG
+from image_hash import ImageHashError
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+YUV_TABLE = "dataset_index"
+# 每像素字节数的分子/分母：4:2:0 为1.5字节，YUYV (4:2:2 打包) 为2字节
+LAYOUTS = {"I420": (3, 2), "NV12": (3, 2), "NV21": (3, 2), "YUYV": (2, 1)}
+
+_tables: Dict[bool, Tuple[Any, ...]] = {}
+
+
+class YuvError(ImageHashError):
+    """YUV帧无法解码"""
+
+
+def resolve_layout(layout: Optional[str] = None) -> str:
+    """规范化布局名称，默认为 YUV_CONFIG["layout"]"""
+    name = (layout or YUV_CONFIG["layout"]).upper()
+    if name not in LAYOUTS:
+        raise ValueError(f"不支持的YUV布局: {layout}（可选 {', '.join(LAYOUTS)}）")
+    return name
+
+
+def frame_size(layout: str, width: int, height: int) -> int:
+    """一帧的字节数"""
+    numerator, denominator = LAYOUTS[resolve_layout(layout)]
+    return width * height * numerator // denominator
+
+
+def matching_layouts(file_size: int, width: int, height: int) -> List[str]:
+    """文件大小为整数帧的布局"""
+    return [layout for layout in LAYOUTS
+            if frame_size(layout, width, height) and file_size % frame_size(layout, width, height) == 0
+            and file_size > 0]
+
+
+def conversion_tables(full_range: Optional[bool] = None) -> Tuple[Any, ...]:
+    """BT.601 转换查找表（float32）：亮度（含舍入的0.5）、V对R、U对G、V对G、U对B 的贡献"""
+    full_range = YUV_CONFIG["full_range"] if full_range is None else full_range
+    tables = _tables.get(full_range)
+    if tables is None:
+        levels = np.arange(256, dtype=np.float64)
+        chroma = levels - 128
+        if full_range:
+            luma, (rv, gu, gv, bu) = levels, (1.402, 0.344136, 0.714136, 1.772)
+        else:
+            luma, (rv, gu, gv, bu) = (levels - 16) * 1.164, (1.596, 0.392, 0.813, 2.017)
+        tables = tuple(table.astype(np.float32) for table in
+                       (luma + 0.5, rv * chroma, -gu * chroma, -gv * chroma, bu * chroma))
+        _tables[full_range] = tables
+    return tables
+
+
+def convert(y, u, v, block: Tuple[int, int] = (1, 1), full_range: Optional[bool] = None):
+    """YUV 转 RGB（uint8，高x宽x3）
+
+    每个色度样本覆盖 block=(行数, 列数) 个亮度像素（4:2:0 为 (2, 2)，YUYV 为 (1, 2)）。色度项只在色度分辨率上
+    查表计算一次，再通过广播与亮度相加，不展开上采样后的色度平面。
+    """
+    luma, rv, gu, gv, bu = conversion_tables(full_range)
+    height, width = y.shape
+    rows, columns = block
+    base = luma[y].reshape(height // rows, rows, width // columns, columns)
+    rgb = np.empty((height, width, 3), dtype=np.uint8)
+    for channel, term in enumerate((rv[v], gu[u] + gv[v], bu[u])):
+        value = base + term[:, None, :, None]
+        np.clip(value, 0, 255, out=value)
+        rgb[:, :, channel] = value.reshape(height, width)
+    return rgb
+
+
+def yuv_to_rgb(y, u, v, full_range: Optional[bool] = None):
+    """BT.601 YUV 转 RGB，u/v 已上采样到与 y 相同的形状"""
+    return convert(y, u, v, (1, 1), full_range)
+
+
+def read_yuv_rgb(path: str, width: int, height: int, layout: Optional[str] = None, frame: int = 0,
+                 min_side: Optional[int] = None):
+    """读取YUV文件中的一帧为RGB矩阵（uint8，高x宽x3）
+
+    文件以内存映射方式访问，指定 min_side 时按整数步长隔行隔列取样（结果的最长边不小于 min_side），
+    只读取需要的行。色度按所在的像素块取值（最近邻上采样），颜色转换为整帧的查表与向量运算。
+    """
+    layout = resolve_layout(layout)
+    if width <= 0 or height <= 0:
+        raise YuvError(f"YUV尺寸无效: {width}x{height}")
+    if width % 2 or (height % 2 and LAYOUTS[layout] == (3, 2)):
+        raise YuvError(f"{layout} 需要偶数的宽高: {width}x{height}")
+    size = frame_size(layout, width, height)
+    if os.path.getsize(path) < size * (frame + 1):
+        raise YuvError(f"YUV文件不足 {frame + 1} 帧（{layout} {width}x{height} 每帧 {size} 字节）: {path}")
+    data = np.memmap(path, dtype=np.uint8, mode="r", offset=size * frame, shape=(size,))
+    step = max(max(width, height) // min_side, 1) if min_side else 1
+
+    if layout == "YUYV":
+        # 每行按 Y0 U Y1 V 打包，两个像素共用一组色度
+        packed = data.reshape(height, width * 2)
+        if step == 1:
+            return convert(packed[:, 0::2], packed[:, 1::4], packed[:, 3::4], (1, 2))
+        columns = np.arange(0, width, step)
+        packed = packed[::step]
+        return convert(packed[:, columns * 2], packed[:, columns // 2 * 4 + 1], packed[:, columns // 2 * 4 + 3])
+
+    luma = data[:width * height].reshape(height, width)
+    if layout == "I420":
+        quarter = width * height // 4
+        u = data[width * height:width * height + quarter].reshape(height // 2, width // 2)
+        v = data[width * height + quarter:].reshape(height // 2, width // 2)
+    else:
+        # NV12 为 UV 交错，NV21 为 VU 交错
+        interleaved = data[width * height:].reshape(height // 2, width)
+        u, v = interleaved[:, 0::2], interleaved[:, 1::2]
+        if layout == "NV21":
+            u, v = v, u
+    if step == 1:
+        return convert(luma, u, v, (2, 2))
+    # 取样位置的色度按所在的 2x2 块直接索引
+    chroma_rows = (np.arange(0, height, step) // 2)[:, None]
+    chroma_columns = (np.arange(0, width, step) // 2)[None, :]
+    return convert(luma[::step, ::step], u[chroma_rows, chroma_columns], v[chroma_rows, chroma_columns])
+
+
+# ---- 批量校验 ----
+
+def check_yuv_size(path: str, width: int, height: int, layout: Optional[str] = None) -> Dict[str, Any]:
+    """按声明的分辨率检查YUV文件大小，返回 {status, size, frames, layouts}
+
+    status 为 ok（整数帧）、mismatch（大小不是整数帧，layouts 为能整除的其他布局）或 missing（文件不存在）。
+    """
+    layout = resolve_layout(layout)
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return {"status": "missing", "size": None, "frames": 0, "layouts": []}
+    expected = frame_size(layout, width, height)
+    if expected and size and size % expected == 0:
+        return {"status": "ok", "size": size, "frames": size // expected, "layouts": [layout]}
+    return {"status": "mismatch", "size": size, "frames": 0, "layouts": matching_layouts(size, width, height)}
+
+
+def verify_yuv_sizes(db=None, layout: Optional[str] = None, repository: Optional[str] = None) -> Dict[str, Any]:
+    """校验 dataset_index 中YUV文件的大小与声明的分辨率是否一致（只读取文件大小，不读取内容）
+
+    返回统计和不一致的记录列表 mismatches: [{image_id, yuv_path, width, height, status, size, layouts}]。
+    读取记录失败时抛出数据库异常（db.backend.error_types），不当作没有YUV文件。
+    """
+    if db is None:
+        from database import db_manager as db
+    layout = resolve_layout(layout)
+    q = db.quote
+    conditions = [f"{q('yuv_path')} IS NOT NULL"]
+    params: List[Any] = []
+    if repository:
+        conditions.append(f"{q('image_repository')} = %s")
+        params.append(repository)
+    rows = db._run_query(
+        f"SELECT {q('image_id')} AS image_id, {q('yuv_path')} AS yuv_path, {q('image_width')} AS width, "
+        f"{q('image_height')} AS height FROM {YUV_TABLE} WHERE {' AND '.join(conditions)} "
+        f"ORDER BY {q('image_id')}", params, table_name=YUV_TABLE
+    )
+    stats: Dict[str, Any] = {"layout": layout, "checked": 0, "ok": 0, "mismatch": 0, "missing": 0, "mismatches": []}
+    for row in rows:
+        stats["checked"] += 1
+        result = check_yuv_size(row["yuv_path"], row["width"] or 0, row["height"] or 0, layout)
+        stats[result["status"]] += 1
+        if result["status"] != "ok":
+            stats["mismatches"].append({
+                "image_id": row["image_id"], "yuv_path": row["yuv_path"], "width": row["width"],
+                "height": row["height"], "status": result["status"], "size": result["size"],
+                "layouts": result["layouts"]
+            })
+    logger.info(f"YUV大小校验完成: 检查 {stats['checked']}，一致 {stats['ok']}，不一致 {stats['mismatch']}，"
+                f"缺失 {stats['missing']}")
+    return stats
+
+
+# ---- 命令行 ----
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="YUV帧工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    verify = subparsers.add_parser("verify", help="校验YUV文件大小与声明的分辨率是否一致")
+    verify.add_argument("--layout", type=str.upper, choices=list(LAYOUTS), help=f"YUV布局（{'/'.join(LAYOUTS)}，默认 {YUV_CONFIG['layout']}）")
+    verify.add_argument("--repository", help="只校验指定仓库")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    from database import db_manager
+    try:
+        stats = verify_yuv_sizes(db_manager, layout=args.layout, repository=args.repository)
+    except db_manager.backend.error_types as e:
+        print(f"❌ 读取YUV记录失败: {e}")
+        return 2
+    for item in stats["mismatches"]:
+        hint = f"（大小符合 {'/'.join(item['layouts'])}）" if item["layouts"] else ""
+        print(f"{item['image_id']}\t{item['status']}\t{item['width']}x{item['height']}\t"
+              f"{item['size'] if item['size'] is not None else '-'}\t{item['yuv_path']}{hint}")
+    print(f"✅ 检查 {stats['checked']} 个YUV文件（{stats['layout']}）：一致 {stats['ok']}，"
+          f"不一致 {stats['mismatch']}，缺失 {stats['missing']}")
+    return 0 if not stats["mismatches"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())